@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import time
+import traceback
+
+from calvin.utilities import calvinuuid
+from calvin.utilities import calvin_callback
+from calvin.utilities.calvin_callback import CalvinCB
+
+
+class LegacyCalvinCB(object):
+    """ CalvinCB as it was constructed before, with an id and (at log level INFO) a stack per instance """
+    def __init__(self, func, *args, **kwargs):
+        super(LegacyCalvinCB, self).__init__()
+        self._debug_info = traceback.format_stack(limit=10)[:-2] if self.capture else None
+        self._id = calvinuuid.uuid("CB")
+        self.func = func
+        self.args = list(args)
+        self.kwargs = kwargs
+        try:
+            self.name = self.func.__name__
+        except:
+            self.name = self.func.name if hasattr(self.func, 'name') else "unknown"
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*(self.args + list(args)), **dict(self.kwargs, **kwargs))
+
+
+def parse_arguments():
+    long_description = """
+Compare the cost of creating and calling callbacks, as done for every token sent on a tunnel.
+  """
+
+    argparser = argparse.ArgumentParser(description=long_description)
+
+    argparser.add_argument('-n', '--callbacks', dest='callbacks', type=int, default=100000,
+                           help='Number of callbacks created in each run')
+
+    return argparser.parse_args()
+
+
+def send_message(peer_id, link, msg, callback=None, status=None):
+    pass
+
+
+def run(cb_class, n):
+    """ Returns average (create time, call time) per tunnel message, i.e. for two nested callbacks """
+    msg = {'cmd': 'TUNNEL_DATA'}
+    start = time.time()
+    cbs = [cb_class(send_message, msg=msg, callback=cb_class(send_message)) for _ in xrange(n)]
+    create_time = time.time() - start
+    start = time.time()
+    for cb in cbs:
+        cb("peer", None)
+    call_time = time.time() - start
+    return create_time / n, call_time / n
+
+
+def main():
+    args = parse_arguments()
+    print "%-30s %12s %12s" % ("callback", "create us/msg", "call us/msg")
+    for name, cb_class, capture in [("legacy", LegacyCalvinCB, False),
+                                    ("legacy, log level INFO", LegacyCalvinCB, True),
+                                    ("lean", CalvinCB, False),
+                                    ("lean, callback_debug", CalvinCB, True)]:
+        LegacyCalvinCB.capture = capture
+        calvin_callback.capture_debug_info(capture)
+        create_time, call_time = run(cb_class, args.callbacks)
+        print "%-30s %12.2f %12.2f" % (name, create_time * 1e6, call_time * 1e6)
+
+
+if __name__ == '__main__':
+    main()
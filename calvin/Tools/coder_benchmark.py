@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+import time
+import uuid
+
+from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory
+
+
+def parse_arguments():
+    long_description = """
+Compare the message coders on token streams as sent between runtimes.
+  """
+
+    argparser = argparse.ArgumentParser(description=long_description)
+
+    argparser.add_argument('-n', '--messages', dest='messages', type=int, default=10000,
+                           help='Number of messages in each stream')
+
+    argparser.add_argument('-c', '--coder', dest='coders', action='append', default=[],
+                           help='Coder to compare, can be repeated (default all)')
+
+    return argparser.parse_args()
+
+
+def token_streams(n):
+    """ Returns a dictionary with lists of messages, as sent over a tunnel between two runtimes """
+    rt1, rt2, tunnel_id, port_id, peer_port_id = [str(uuid.uuid4()) for _ in range(5)]
+
+    def tunnel_data(value):
+        return {'cmd': 'TUNNEL_DATA', 'from_rt_uuid': rt1, 'to_rt_uuid': rt2, 'tunnel_id': tunnel_id,
+                'value': value}
+
+    def token(sequencenbr, value):
+        return tunnel_data({'cmd': 'TOKEN', 'port_id': port_id, 'peer_port_id': peer_port_id,
+                            'sequencenbr': sequencenbr, 'token': Token(value).encode()})
+
+    def tokens(sequencenbr, values):
+        return tunnel_data({'cmd': 'TOKENS', 'port_id': port_id, 'peer_port_id': peer_port_id,
+                            'sequencenbr': sequencenbr, 'epoch': 0,
+                            'tokens': [Token(v).encode() for v in values]})
+
+    def reply(sequencenbr):
+        return tunnel_data({'cmd': 'TOKENS_REPLY', 'port_id': peer_port_id, 'peer_port_id': port_id,
+                            'sequencenbr': sequencenbr, 'credit': 16, 'epoch': 0, 'value': 'ACK'})
+
+    payload = os.urandom(1024)
+    return {
+        'int tokens': [token(i, i) for i in range(n)],
+        'float tokens': [token(i, i * 0.5) for i in range(n)],
+        'string tokens': [token(i, "temperature %d" % i) for i in range(n)],
+        'batches of 16': [tokens(i * 16, range(i, i + 16)) for i in range(n // 16)],
+        'replies': [reply(i) for i in range(n)],
+        'bytes tokens (1kB)': [token(i, payload) for i in range(n // 10)],
+    }
+
+
+def run(coder_name, messages):
+    """ Returns average (size, encode time, decode time) per message, None if the coder can't encode them """
+    sender = message_coder_factory.get(coder_name)
+    receiver = message_coder_factory.get(coder_name)
+    try:
+        start = time.time()
+        encoded = [sender.encode(m) for m in messages]
+        encode_time = time.time() - start
+        start = time.time()
+        for data in encoded:
+            receiver.decode(data)
+        decode_time = time.time() - start
+    except Exception:
+        return None
+    n = float(len(messages))
+    return sum(len(data) for data in encoded) / n, encode_time / n, decode_time / n
+
+
+def main():
+    args = parse_arguments()
+    coders = args.coders or message_coder_factory.get_prio_list()
+    streams = token_streams(args.messages)
+    print "%-20s %-10s %12s %12s %12s" % ("stream", "coder", "bytes/msg", "encode us", "decode us")
+    for stream in sorted(streams):
+        for coder_name in coders:
+            result = run(coder_name, streams[stream])
+            if result is None:
+                print "%-20s %-10s %12s" % (stream, coder_name, "n/a")
+            else:
+                size, encode_time, decode_time = result
+                print "%-20s %-10s %12.1f %12.2f %12.2f" % (stream, coder_name, size, encode_time * 1e6,
+                                                            decode_time * 1e6)
+
+
+if __name__ == '__main__':
+    main()
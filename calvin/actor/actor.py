@@ -150,6 +150,106 @@ def condition(action_input=[], action_output=[]):
     return wrap
 
 
+def _largest_batch(available, upper):
+    """Largest batch size in 0..upper for which available(size) holds, assuming it holds for 0"""
+    low, high = 0, upper
+    while low < high:
+        mid = (low + high + 1) // 2
+        if available(mid):
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _first_exception(tokens):
+    for i, token in enumerate(tokens):
+        if isinstance(token, ExceptionToken):
+            return i
+    return len(tokens)
+
+
+def batch_condition(action_input=[], action_output=[], min_batch=1, max_batch=16):
+    """
+    Decorator batch_condition is the batched form of condition, an action consumes and produces
+    several tokens per firing.
+    Input ports are given as port names, or as (port name, min, max) tuples to override the default
+    batch limits for that port. The same number of tokens, within the limits of every input port,
+    are read from each input port and the action is called with a list of values per input port.
+    The action returns a tuple with a list of values per output port, each at most as long as the
+    batch (or max_batch for actions without inputs).
+    An ExceptionToken ends a batch early, also below the minimum batch size, and is then handled
+    as in condition with one token per port.
+    Return value is a tuple (did_fire, output_available, exhaust_list)
+    """
+
+    ports = [p if isinstance(p, (tuple, list)) else (p, min_batch, max_batch) for p in action_input]
+    input_names = [p[0] for p in ports]
+    lower = max([p[1] for p in ports] or [min_batch])
+    upper = min([p[2] for p in ports] or [max_batch])
+    tokens_produced = len(action_output)
+
+    def wrap(action_method):
+
+        @functools.wraps(action_method)
+        def batch_condition_wrapper(self):
+            inports = [self.inports[portname] for portname in input_names]
+            outports = [self.outports[portname] for portname in action_output]
+            output_ok = all(port.tokens_available(1) for port in outports)
+            #
+            # Find largest batch with tokens on all input ports and free token slots on all output ports
+            #
+            nbr = _largest_batch(lambda n: (all(port.tokens_available(n) for port in inports) and
+                                            all(port.tokens_available(n) for port in outports)), upper)
+            if nbr == 0:
+                return (False, output_ok, ())
+            #
+            # Build the arguments for the action from the input port(s), stop batch at ExceptionTokens
+            #
+            batch = [port.peek_tokens(nbr) for port in inports]
+            first = min([_first_exception(tokens) for tokens in batch] or [nbr])
+            if nbr < lower and first == nbr:
+                # Too few tokens and no ExceptionToken ending the batch early
+                for port in inports:
+                    port.peek_cancel()
+                return (False, output_ok, ())
+            if first < nbr:
+                nbr = first or 1
+                batch = [tokens[:nbr] for tokens in batch]
+            exhausted_ports = set()
+            for port in inports:
+                if port.commit_tokens(nbr):
+                    exhausted_ports.add(port)
+
+            if first == 0:
+                # FIXME: Simplify exception handling
+                args = [t[0] if isinstance(t[0], ExceptionToken) else t[0].value for t in batch]
+                production = [[value] for value in self.exception_handler(action_method, args) or ()]
+            else:
+                production = action_method(self, *[[t.value for t in tokens] for tokens in batch]) or ()
+
+            valid_production = (tokens_produced == len(production) and
+                                all(isinstance(p, (list, tuple)) and len(p) <= nbr for p in production))
+
+            if not valid_production:
+                #
+                # Error condition
+                #
+                action = "%s.%s" % (self._type, action_method.__name__)
+                raise Exception("%s invalid production %s, expected %s with at most %d values each" % (
+                    action, str(production), str(tuple(action_output)), nbr))
+            #
+            # Write the results from the action to the output port(s)
+            #
+            for port, values in zip(outports, production):
+                port.write_tokens([v if isinstance(v, Token) else Token(v) for v in values])
+
+            return (True, True, exhausted_ports)
+
+        return batch_condition_wrapper
+    return wrap
+
+
 def stateguard(action_guard):
     """
     Decorator guard refines the criteria for picking an action to run by stating a function
@@ -277,6 +377,14 @@ class Actor(object):
     def migration_info(self):
         return self._migration_info
 
+    @property
+    def scheduling_class(self):
+        return self._scheduling_class
+
+    @property
+    def time_budget(self):
+        return self._time_budget
+
     # What are the arguments, really?
     def __init__(self, actor_type, name='', allow_invalid_transitions=True, disable_transition_checks=False,
                  disable_state_checks=False, actor_id=None, security=None):
@@ -287,10 +395,12 @@ class Actor(object):
         self._id = actor_id or calvinuuid.uuid("ACTOR")
         _log.debug("New actor id: %s, supplied actor id %s" % (self._id, actor_id))
         self._deployment_requirements = []
+        self._scheduling_class = 'normal'
+        self._time_budget = None
         self._port_property_capabilities = None
         self._signature = None
         self._component_members = set([self._id])  # We are only part of component if this is extended
-        self._managed = set(('_id', '_name', '_has_started', '_deployment_requirements', '_signature', '_subject_attributes', '_migration_info', "_port_property_capabilities", "_replication_data"))
+        self._managed = set(('_id', '_name', '_has_started', '_deployment_requirements', '_signature', '_subject_attributes', '_migration_info', "_port_property_capabilities", "_replication_data", "_scheduling_class", "_time_budget"))
         self._has_started = False
         self._calvinsys = None
         self._using = {}
@@ -487,9 +597,12 @@ class Actor(object):
             self._exhaust_cb = None
 
     @verify_status([STATUS.ENABLED])
-    def fire(self):
+    def fire(self, time_budget=0.020, usage=None):
         """
-        Fire an actor.
+        Fire an actor, actions are fired repeatedly until none can fire or time_budget seconds have passed.
+        When given, usage.action_fired(action_name, wall, cpu) is called for each fired action,
+        with the time since the previous fired action (or start of fire), i.e. including guards
+        that did not fire. Action attempts that do not fire are never timed on their own.
         Returns True if any action fired
         """
         # FIXME: Move authorization decision to scheduler
@@ -500,6 +613,8 @@ class Actor(object):
             return False
 
         start_time = time.time()
+        if usage is not None:
+            mark_time, mark_cpu = start_time, time.clock()
         actor_did_fire = False
         #
         # Repeatedly go over the action priority list
@@ -508,6 +623,10 @@ class Actor(object):
         while not done:
             for action_method in self.__class__.action_priority:
                 did_fire, output_ok, exhausted = action_method(self)
+                if did_fire and usage is not None:
+                    now, now_cpu = time.time(), time.clock()
+                    usage.action_fired(action_method.__name__, now - mark_time, now_cpu - mark_cpu)
+                    mark_time, mark_cpu = now, now_cpu
                 actor_did_fire |= did_fire
                 # Action firing should fire the first action that can fire,
                 # hence when fired start from the beginning priority list
@@ -524,9 +643,8 @@ class Actor(object):
                 #
                 # Limit time given to actors even if it could continue a new round of firing
                 #
-                # FIXME: IMHO this decision should be made in the scheduler. No timing here.
                 time_spent = time.time() - start_time
-                done = time_spent > 0.020
+                done = time_spent > time_budget
             else:
                 #
                 # We reached the end of the list without ANY firing during this round
@@ -673,6 +791,14 @@ class Actor(object):
     def component_members(self):
         return self._component_members
 
+    def set_scheduling_class(self, scheduling_class):
+        """ Set the scheduling class, i.e. realtime, normal or background, used by the scheduler """
+        self._scheduling_class = scheduling_class
+
+    def set_time_budget(self, time_budget):
+        """ Set the time budget (seconds) used by the scheduler, None for the runtime default """
+        self._time_budget = None if time_budget is None else float(time_budget)
+
     def requirements_add(self, deploy_reqs, extend=False):
         if extend:
             self._deployment_requirements.extend(deploy_reqs)
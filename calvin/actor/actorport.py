@@ -250,7 +250,11 @@ class InPort(Port):
         if metadata is None:
             metadata = self.id
         # The return has information on if the queue exhausted the remaining tokens
-        return self.queue.commit(metadata)
+        exhausted = self.queue.commit(metadata)
+        # Token slots freed
+        for endpoint_ in self.endpoints:
+            endpoint_.notify()
+        return exhausted
 
     def read(self, metadata=None):
         """
@@ -265,6 +269,46 @@ class InPort(Port):
         exhausted = self.peek_commit(metadata)
         return (token, exhausted)
 
+    def peek_tokens(self, length, metadata=None):
+        """Used by actor (owner) to peek several tokens from the port. Commit with peek_commit or reset with peek_cancel."""
+        if metadata is None:
+            metadata = self.id
+        try:
+            peek_many = self.queue.peek_many
+        except AttributeError:
+            return [self.queue.peek(metadata) for _ in range(length)]
+        return peek_many(metadata, length)
+
+    def commit_tokens(self, length, metadata=None):
+        """Used by actor (owner) to commit the length oldest peeked tokens, peeking of any others is cancelled."""
+        if metadata is None:
+            metadata = self.id
+        try:
+            commit_many = self.queue.commit_many
+        except AttributeError:
+            self.queue.cancel(metadata)
+            for _ in range(length):
+                self.queue.peek(metadata)
+            exhausted = self.queue.commit(metadata)
+        else:
+            exhausted = commit_many(metadata, length)
+            self.queue.cancel(metadata)
+        # Token slots freed
+        for endpoint_ in self.endpoints:
+            endpoint_.notify()
+        return exhausted
+
+    def read_tokens(self, length, metadata=None):
+        """
+        Used by actor (owner) to read several tokens from the port.
+        Returns tuple (tokens, exhaust) where exhaust is port (exhausted) or None (not exhausted)
+        """
+        if metadata is None:
+            metadata = self.id
+        tokens = self.peek_tokens(length, metadata)
+        exhausted = self.commit_tokens(length, metadata)
+        return (tokens, exhausted)
+
     def tokens_available(self, length, metadata=None):
         """Used by actor (owner) to check number of tokens on the port."""
         if metadata is None:
@@ -364,10 +408,26 @@ class OutPort(Port):
     def exhausted_tokens(self, tokens):
         _log.debug("actoroutport.exhausted_tokens %s %s" % (self.owner._id, self.id))
         self.queue.set_exhausted_tokens(tokens)
+        for endpoint_ in self.endpoints:
+            endpoint_.notify()
 
     def write_token(self, data):
         """docstring for write_token"""
         self.queue.write(data, self.id)
+        for endpoint_ in self.endpoints:
+            endpoint_.notify()
+
+    def write_tokens(self, tokens):
+        """Write several tokens, caller must check that there are enough token slots available"""
+        try:
+            write_many = self.queue.write_many
+        except AttributeError:
+            for token in tokens:
+                self.queue.write(token, self.id)
+        else:
+            write_many(tokens, self.id)
+        for endpoint_ in self.endpoints:
+            endpoint_.notify()
 
     def tokens_available(self, length):
         """Used by actor (owner) to check number of token slots available on the port."""
@@ -16,7 +16,7 @@
 
 # encoding: utf-8
 
-from calvin.actor.actor import Actor, manage, condition
+from calvin.actor.actor import Actor, manage, batch_condition
 from calvin.runtime.north.calvin_token import EOSToken, ExceptionToken
 
 
@@ -49,13 +49,16 @@ class FromString(Actor):
         self.default = ExceptionToken() if self.exception_output is None else self.exception_output
         self.use('calvinsys.native.python-json', shorthand='json')
 
-    @condition(['string'], ['data'])
-    def load(self, string):
-        try:
-            res = self['json'].loads(string)
-        except:
-            res = self.default
-        return (res,)
+    @batch_condition(['string'], ['data'])
+    def load(self, strings):
+        result = []
+        for string in strings:
+            try:
+                res = self['json'].loads(string)
+            except:
+                res = self.default
+            result.append(res)
+        return (result,)
 
     action_priority = (load,)
     require = ['calvinsys.native.python-json']
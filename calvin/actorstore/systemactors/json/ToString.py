@@ -16,7 +16,7 @@
 
 # encoding: utf-8
 
-from calvin.actor.actor import Actor, manage, condition
+from calvin.actor.actor import Actor, manage, batch_condition
 from calvin.runtime.north.calvin_token import EOSToken, ExceptionToken
 
 
@@ -47,9 +47,10 @@ class ToString(Actor):
     def setup(self):
         self.use('calvinsys.native.python-json', shorthand="json")
 
-    @condition(['data'], ['string'])
-    def dump(self, value):
-        return (self['json'].dumps(value),)
+    @batch_condition(['data'], ['string'])
+    def dump(self, values):
+        dumps = self['json'].dumps
+        return ([dumps(value) for value in values],)
 
     action_priority = (dump,)
     requires = ['calvinsys.native.python-json']
@@ -1,4 +1,5 @@
 from calvin.actor.actor import Actor, manage, condition, stateguard
+from calvin.runtime.north.calvin_token import BinaryToken
 
 
 class Camera(Actor):
@@ -9,7 +10,7 @@ class Camera(Actor):
     Inputs:
       trigger: binary input
     Outputs:
-      image: generated image
+      image: generated jpeg image, binary data
     """
 
     @manage(['device', 'width', 'height', 'trigger'])
@@ -38,7 +39,7 @@ class Camera(Actor):
     def get_image(self, trigger):
         self.trigger = None
         image = self.camera.get_image()
-        return (image, )
+        return (BinaryToken(image) if image is not None else None, )
 
     @stateguard(lambda self: trigger is None)
     @condition(action_input=['trigger'])
@@ -1,12 +1,15 @@
-from calvin.actor.actor import Actor, condition
+from calvin.actor.actor import Actor, condition, stateguard
+
+# Images being analyzed at once
+MAX_PENDING = 2
 
 
 class FaceDetect(Actor) :
     """
-    Detect faces in a jpg-image
+    Detect faces in a jpg-image, the detection runs in a worker process
 
     Inputs:
-        image: Image to analyze
+        image: jpeg image to analyze, binary data
     Outputs:
         faces: non-zero if face detected
     """
@@ -16,15 +19,23 @@ class FaceDetect(Actor) :
 
     def setup(self):
         self.use("calvinsys.media.image", shorthand="image")
+        self.use("calvinsys.process.pool", shorthand="pool")
         self.image = self["image"]
+        self.pool = self["pool"]
 
     def did_migrate(self):
         self.setup()
 
-    @condition(['image'], ['faces'])
+    @stateguard(lambda self: self.pool.pending() < MAX_PENDING)
+    @condition(['image'], [])
     def detect(self, image):
-        found = self.image.detect_face(image)
-        return (found, )
+        self.pool.submit(self.image.detect_face_job, image)
+
+    @stateguard(lambda self: self.pool.has_result())
+    @condition([], ['faces'])
+    def found(self):
+        # None when the detection failed
+        return (self.pool.read() is True, )
 
-    action_priority = (detect, )
-    requires =  ['calvinsys.media.image']
+    action_priority = (found, detect)
+    requires =  ['calvinsys.media.image', 'calvinsys.process.pool']
@@ -16,6 +16,7 @@
 
 from calvin.actor.actor import Actor, manage, condition, stateguard
 from calvin.utilities.calvinlogger import get_logger
+from calvin.runtime.north.calvin_token import BinaryToken
 
 _log = get_logger(__name__)
 
@@ -27,7 +28,7 @@ class IPCamera(Actor):
     Inputs:
       trigger: binary input
     Outputs:
-      image: generated image
+      image: generated jpeg image, binary data
       status: 200/404/whatever
     """
 
@@ -81,10 +82,9 @@ class IPCamera(Actor):
     @stateguard(lambda self: self.request and self.received_status == 200 and self['http'].received_body(self.request))
     @condition(action_output=['image'])
     def handle_body(self):
-        body = self['http'].body(self.request)
-        image = self['base64'].b64encode(body)
+        image = self['http'].body(self.request)
         self.reset_request()
-        return (image,)
+        return (BinaryToken(image),)
 
     @stateguard(lambda self: self.request and self.received_status and self.received_status != 200)
     @condition()
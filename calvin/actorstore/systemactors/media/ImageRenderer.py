@@ -19,6 +19,9 @@ from calvin.actor.actor import Actor, condition, manage
 
 _log = get_actor_logger(__name__)
 
+# Start of raw jpeg and png data, other images are base64 encoded
+_IMAGE_MAGIC = ('\xff\xd8', '\x89PNG')
+
 
 class ImageRenderer(Actor):
 
@@ -26,7 +29,7 @@ class ImageRenderer(Actor):
     Render image.
 
     Inputs:
-      image: image to render
+      image: jpeg or png image to render, binary data or base64 encoded
     """
 
     @manage(['width', 'height'])
@@ -52,7 +55,10 @@ class ImageRenderer(Actor):
     @condition(action_input=('image',))
     def render_image(self, image):
         if image is not None:
-            self.image.show_image(self['base64'].b64decode(image), self.width, self.height)
+            if not isinstance(image, bytearray) and not image.startswith(_IMAGE_MAGIC):
+                # E.g. from the chart actors, or runtimes without binary tokens
+                image = self['base64'].b64decode(image)
+            self.image.show_image(image, self.width, self.height)
 
     action_priority = (render_image, )
     requires =  ['calvinsys.media.image', 'calvinsys.native.python-base64']
@@ -14,7 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from calvin.actor.actor import Actor, manage, condition
+from calvin.actor.actor import Actor, manage, batch_condition
 
 
 class Sum(Actor):
@@ -30,10 +30,13 @@ class Sum(Actor):
     def init(self):
         self.sum = 0
 
-    @condition(['integer'], ['integer'])
-    def sum(self, input):
-        self.sum = self.sum + input
-        return (self.sum, )
+    @batch_condition(['integer'], ['integer'])
+    def sum(self, inputs):
+        sums = []
+        for value in inputs:
+            self.sum = self.sum + value
+            sums.append(self.sum)
+        return (sums, )
 
     def report(self):
         return self.sum
@@ -17,7 +17,7 @@
 
 from collections import defaultdict
 
-from calvin.actor.actor import Actor, manage, condition, stateguard
+from calvin.actor.actor import Actor, manage, condition, batch_condition, stateguard
 from calvin.runtime.north.calvin_token import EOSToken
 
 from calvin.utilities.calvinlogger import get_logger
@@ -43,9 +43,10 @@ class WordCount(Actor):
     def exception_handler(self, action, args):
         self.finished = True
 
-    @condition(['in'], [])
-    def count_word(self, word):
-        self.word_counts[word] = self.word_counts[word] + 1
+    @batch_condition(['in'], [])
+    def count_word(self, words):
+        for word in words:
+            self.word_counts[word] = self.word_counts[word] + 1
 
 
     @stateguard(lambda self: self.finished is True)
@@ -17,6 +17,13 @@
 from calvin.runtime.south.plugins.media import image
 
 
+def detect_face_job(img):
+    """
+    Return True if face detected in img, module level to be run in a worker process
+    """
+    return image.Image().detect_face(img)
+
+
 class Image(object):
 
     """
@@ -41,6 +48,9 @@ class Image(object):
         """
         return self.image.detect_face(image)
 
+    # Picklable, for calvinsys.process.pool
+    detect_face_job = staticmethod(detect_face_job)
+
     def to_string(self, image, format):
         """
         Return a string representation of the image. Uses StringIO
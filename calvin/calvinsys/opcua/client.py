@@ -42,7 +42,7 @@ class OPCUAClient(object):
         self.state = OPCUAClient.STATE["init"]
     
     def _trigger(self):
-        self._node.sched.trigger_loop(actor_ids=[self._actor])
+        self._node.sched.trigger_loop(actor_ids=[self._actor.id])
         
     def _set_state(self, new_state):
         _log.info("%s -> %s" % (self.state, new_state,))
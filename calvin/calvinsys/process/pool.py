@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from calvin.runtime.south.plugins.async import process
+from calvin.utilities.calvinlogger import get_logger
+
+_log = get_logger(__name__)
+
+
+class ProcessPool(object):
+
+    """
+    Run CPU heavy functions in worker processes, letting other actors on the runtime fire meanwhile.
+    The actor is triggered when a result is available, results are read in the order the jobs were submitted.
+    N.B. Functions must be defined on module level and arguments and results must be picklable.
+         Jobs still outstanding when the actor migrates are lost.
+    """
+
+    def __init__(self, node, actor):
+        super(ProcessPool, self).__init__()
+        self._node = node
+        self._actor = actor
+        self._jobs = []
+
+    def _done(self, result, job):
+        job['result'] = result
+        job['done'] = True
+        self._node.sched.trigger_loop(actor_ids=[self._actor.id])
+
+    def _failed(self, failure, job):
+        _log.error("Job in worker process failed for actor %s: %s" % (self._actor.id, failure.getErrorMessage()))
+        self._done(None, job)
+
+    def submit(self, func, *args, **kwargs):
+        job = {'done': False, 'result': None}
+        self._jobs.append(job)
+        d = process.defer_to_process(func, *args, **kwargs)
+        d.addCallbacks(self._done, self._failed, callbackArgs=(job,), errbackArgs=(job,))
+
+    def pending(self):
+        """ Number of submitted jobs not yet read """
+        return len(self._jobs)
+
+    def has_result(self):
+        return bool(self._jobs) and self._jobs[0]['done']
+
+    def read(self):
+        """ Result of oldest job, None if the job failed """
+        if self.has_result():
+            return self._jobs.pop(0)['result']
+
+
+def register(node=None, actor=None):
+    return ProcessPool(node, actor)
@@ -123,21 +123,21 @@ _lr_productions = [
   ('value -> portref','value',1,'p_value','parser.py',395),
   ('portref -> AND IDENTIFIER DOT IDENTIFIER opt_direction','portref',5,'p_portref','parser.py',400),
   ('portref -> AND DOT IDENTIFIER opt_direction','portref',4,'p_portref','parser.py',401),
-  ('bool -> TRUE','bool',1,'p_bool','parser.py',420),
-  ('bool -> FALSE','bool',1,'p_bool','parser.py',421),
-  ('null -> NULL','null',1,'p_null','parser.py',426),
-  ('dictionary -> LBRACE members RBRACE','dictionary',3,'p_dictionary','parser.py',431),
-  ('members -> <empty>','members',0,'p_members','parser.py',436),
-  ('members -> members member COMMA','members',3,'p_members','parser.py',437),
-  ('members -> members member','members',2,'p_members','parser.py',438),
-  ('member -> string COLON value','member',3,'p_member','parser.py',447),
-  ('values -> <empty>','values',0,'p_values','parser.py',452),
-  ('values -> values value COMMA','values',3,'p_values','parser.py',453),
-  ('values -> values value','values',2,'p_values','parser.py',454),
-  ('array -> LBRACK values RBRACK','array',3,'p_array','parser.py',463),
-  ('identifiers -> <empty>','identifiers',0,'p_identifiers','parser.py',468),
-  ('identifiers -> identifiers IDENTIFIER COMMA','identifiers',3,'p_identifiers','parser.py',469),
-  ('identifiers -> identifiers IDENTIFIER','identifiers',2,'p_identifiers','parser.py',470),
-  ('qualified_name -> qualified_name DOT IDENTIFIER','qualified_name',3,'p_qualified_name','parser.py',477),
-  ('qualified_name -> IDENTIFIER','qualified_name',1,'p_qualified_name','parser.py',478),
+  ('bool -> TRUE','bool',1,'p_bool','parser.py',412),
+  ('bool -> FALSE','bool',1,'p_bool','parser.py',413),
+  ('null -> NULL','null',1,'p_null','parser.py',418),
+  ('dictionary -> LBRACE members RBRACE','dictionary',3,'p_dictionary','parser.py',423),
+  ('members -> <empty>','members',0,'p_members','parser.py',428),
+  ('members -> members member COMMA','members',3,'p_members','parser.py',429),
+  ('members -> members member','members',2,'p_members','parser.py',430),
+  ('member -> string COLON value','member',3,'p_member','parser.py',439),
+  ('values -> <empty>','values',0,'p_values','parser.py',444),
+  ('values -> values value COMMA','values',3,'p_values','parser.py',445),
+  ('values -> values value','values',2,'p_values','parser.py',446),
+  ('array -> LBRACK values RBRACK','array',3,'p_array','parser.py',455),
+  ('identifiers -> <empty>','identifiers',0,'p_identifiers','parser.py',460),
+  ('identifiers -> identifiers IDENTIFIER COMMA','identifiers',3,'p_identifiers','parser.py',461),
+  ('identifiers -> identifiers IDENTIFIER','identifiers',2,'p_identifiers','parser.py',462),
+  ('qualified_name -> qualified_name DOT IDENTIFIER','qualified_name',3,'p_qualified_name','parser.py',469),
+  ('qualified_name -> IDENTIFIER','qualified_name',1,'p_qualified_name','parser.py',470),
 ]
@@ -45,8 +45,11 @@ ACTORS = '/actors'
 ACTOR_DISABLE = '/actor/{}/disable'
 ACTOR_MIGRATE = '/actor/{}/migrate'
 ACTOR_REPLICATE = '/actor/{}/replicate'
+ACTOR_USAGE = '/actor/{}/usage'
+ACTOR_TIME_BUDGET = '/actor/{}/time_budget'
 APPLICATION_PATH = '/application/{}'
 APPLICATION_MIGRATE = '/application/{}/migrate'
+APPLICATION_TIME_BUDGET = '/application/{}/time_budget'
 ACTOR_PORT = '/actor/{}/port/{}'
 ACTOR_REPORT = '/actor/{}/report'
 SET_PORT_PROPERTY = '/set_port_property'
@@ -61,6 +64,8 @@ METER_PATH = '/meter/{}'
 METER_PATH_TIMED = '/meter/{}/timed'
 METER_PATH_AGGREGATED = '/meter/{}/aggregated'
 METER_PATH_METAINFO = '/meter/{}/metainfo'
+SCHEDULER_LATENCY = '/scheduler/latency'
+LINKS = '/links'
 CSR_REQUEST = '/certificate_authority/certificate_signing_request'
 AUTHENTICATION = '/authentication'
 AUTHENTICATION_USERS_DB = '/authentication/users_db'
@@ -367,6 +372,28 @@ class RequestHandler(object):
         r = self._get(rt, timeout, async, METER_PATH_METAINFO.format(user_id))
         return self.check_response(r)
 
+    def get_actor_usage(self, rt, actor_id, timeout=DEFAULT_TIMEOUT, async=False):
+        r = self._get(rt, timeout, async, ACTOR_USAGE.format(actor_id))
+        return self.check_response(r)
+
+    def set_actor_time_budget(self, rt, actor_id, time_budget, timeout=DEFAULT_TIMEOUT, async=False):
+        data = {'time_budget': time_budget}
+        r = self._post(rt, timeout, async, ACTOR_TIME_BUDGET.format(actor_id), data)
+        return self.check_response(r)
+
+    def set_application_time_budget(self, rt, application_id, time_budget, timeout=DEFAULT_TIMEOUT, async=False):
+        data = {'time_budget': time_budget}
+        r = self._post(rt, timeout, async, APPLICATION_TIME_BUDGET.format(application_id), data)
+        return self.check_response(r)
+
+    def get_scheduler_latency(self, rt, timeout=DEFAULT_TIMEOUT, async=False):
+        r = self._get(rt, timeout, async, SCHEDULER_LATENCY)
+        return self.check_response(r)
+
+    def get_link_statistics(self, rt, timeout=DEFAULT_TIMEOUT, async=False):
+        r = self._get(rt, timeout, async, LINKS)
+        return self.check_response(r)
+
     def add_index(self, rt, index, value, timeout=DEFAULT_TIMEOUT, async=False):
         data = {'value': value}
         path = INDEX_PATH.format(index)
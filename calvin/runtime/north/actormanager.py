@@ -50,7 +50,7 @@ class ActorManager(object):
 
     def new(self, actor_type, args, state=None, prev_connections=None, connection_list=None, callback=None,
             signature=None, actor_def=None, security=None, access_decision=None, shadow_actor=False,
-            port_properties=None):
+            port_properties=None, register=True):
         """
         Instantiate an actor of type 'actor_type'. Parameters are passed in 'args',
         'name' is an optional parameter in 'args', specifying a human readable name.
@@ -62,6 +62,7 @@ class ActorManager(object):
              prev_connections or,
           2) a mangled list of tuples with (in_node_id, in_port_id, out_node_id, out_port_id) supplied as
              connection_list
+        Without register the actor is not added to storage, see register().
         """
         _log.debug("class: %s args: %s state: %s, signature: %s" % (actor_type, args, state, signature))
         _log.analyze(self.node.id, "+", {'actor_type': actor_type, 'state': state})
@@ -80,7 +81,8 @@ class ActorManager(object):
 
         self.actors[a.id] = a
 
-        self.node.storage.add_actor(a, self.node.id)
+        if register:
+            self.node.storage.add_actor(a, self.node.id)
 
         if prev_connections:
             # Convert prev_connections to connection_list format
@@ -195,6 +197,11 @@ class ActorManager(object):
             raise(e)
         return a
 
+    def register(self, actor_ids, cb=None):
+        """ Add actors created without register to storage, in one batch """
+        actors = [self.actors[actor_id] for actor_id in actor_ids if actor_id in self.actors]
+        self.node.storage.add_actors(actors, self.node.id, cb=cb)
+
     def destroy(self, actor_id, temporary=False):
         """ Destroy an actor, temporary should be True when migrating """
         if actor_id not in self.actors:
@@ -202,15 +209,18 @@ class ActorManager(object):
 
         # @TOOD - check order here
         self.node.metering.remove_actor_info(actor_id)
+        self.node.sched.remove_actor(actor_id)
         a = self.actors[actor_id]
         a.will_end()
         port_ids = self.node.pm.remove_ports_of_actor(a)
         # @TOOD - insert callback here
         if not temporary:
             self.node.storage.delete_actor(actor_id, cb=self._destroy_log_cb)
-            for port_id in port_ids:
-                self.node.storage.delete_port(port_id)
+            self.node.storage.delete_ports(port_ids)
             self.node.control.log_actor_destroy(a.id)
+        else:
+            # Migrating, the new runtime registers the actor and must not be overwritten by a republish
+            self.node.storage.forget_actor(actor_id, port_ids)
         del self.actors[actor_id]
 
     def _destroy_log_cb(self, key, value):
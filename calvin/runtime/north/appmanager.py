@@ -20,6 +20,7 @@ from calvin.utilities.calvin_callback import CalvinCB
 from calvin.utilities import dynops
 from calvin.utilities import calvinlogger
 from calvin.runtime.north.plugins.requirements import req_operations
+from calvin.runtime.north.scheduler import SCHEDULING_CLASSES
 import calvin.requests.calvinresponse as response
 from calvin.utilities import calvinuuid
 from calvin.actorstore.store import ActorStore, GlobalStore
@@ -49,6 +50,8 @@ class Application(object):
         self.components = {}
         self.deploy_info = deploy_info
         self._collect_placement_cb = None
+        # Time budget of the application's actors, None for the runtime default
+        self.time_budget = None
 
     def add_actor(self, actor_id):
         # Save actor_id and mapping to name while the actor is still on this node
@@ -56,6 +59,9 @@ class Application(object):
             actor_id = [actor_id]
         for a in actor_id:
             self.actors[a] = self.am.actors[a].name if a in self.am.actors else None
+            # Actors added after the application time budget was set get it as well
+            if self.time_budget is not None and a in self.am.actors:
+                self.am.actors[a].set_time_budget(self.time_budget)
 
     def remove_actor(self, actor_id):
         try:
@@ -199,6 +205,7 @@ class AppManager(object):
         application.clear_node_info()
         application.actor_replicas = []
         application.replication_ids = []
+        remote_actor_ids = []
         for actor_id in application.actors.keys():
             if actor_id in self._node.am.list_actors():
                 # TODO fix this if master can switch from original actor
@@ -208,23 +215,33 @@ class AppManager(object):
                 application.update_node_info(self._node.id, actor_id)
             else:
                 _log.analyze(self._node.id, "+ REMOTE ACTOR", {'actor_id': actor_id})
-                self.storage.get_actor(actor_id, CalvinCB(func=self._destroy_actor_cb, application=application))
+                remote_actor_ids.append(actor_id)
+        if remote_actor_ids:
+            self.storage.get_actors(remote_actor_ids, CalvinCB(func=self._destroy_actors_cb, application=application))
 
         _log.analyze(self._node.id, "+ LOCAL REPLICAS", {'replicas': application.actor_replicas})
+        remote_actor_ids = []
         for actor_id in application.actor_replicas[:]:
             application.actors[actor_id] = "noname"
             application.actor_replicas.remove(actor_id)
             if actor_id in self._node.am.list_actors():
                 application.update_node_info(self._node.id, actor_id)
             else:
-                self.storage.get_actor(actor_id,
-                    CalvinCB(func=self._destroy_actor_cb, application=application, check_replica=False))
+                remote_actor_ids.append(actor_id)
+        if remote_actor_ids:
+            self.storage.get_actors(remote_actor_ids,
+                CalvinCB(func=self._destroy_actors_cb, application=application, check_replica=False))
 
         if application.complete_node_info() and not application.replication_ids and not application.actor_replicas:
             # All actors were local
             _log.analyze(self._node.id, "+ DONE", {'actors': application.actors, 'replicas': application.actor_replicas})
             self._destroy_final(application)
 
+    def _destroy_actors_cb(self, key, value, application, check_replica=True):
+        """ Get actors callback """
+        for actor_id in key:
+            self._destroy_actor_cb(actor_id, value.get(actor_id), application, check_replica=check_replica)
+
     def _destroy_actor_cb(self, key, value, application, retries=0, check_replica=True):
         """ Get actor callback """
         _log.analyze(self._node.id, "+", {'actor_id': key, 'value': value, 'retries': retries,
@@ -517,6 +534,7 @@ class AppManager(object):
                                               self._node.am, actors=value['actors_name_map'], deploy_info=deploy_info)
         app.group_components()
         app._migrated_actors = {a: None for a in app.actors}
+        remote_actor_reqs = {}
         for actor_id, actor_name in app.actors.iteritems():
             req = app.get_req(actor_name)
             if req is None:
@@ -531,9 +549,14 @@ class AppManager(object):
                                                                    actor_id=actor_id, cb=cb))
             else:
                 _log.analyze(self._node.id, "+ OTHER NODE", {'actor_id': actor_id, 'actor_name': actor_name})
-                self.storage.get_actor(actor_id, cb=CalvinCB(self._migrate_from_rt, app=app,
-                                                                  actor_id=actor_id, req=req,
-                                                                  move=move, cb=cb))
+                remote_actor_reqs[actor_id] = req
+        if remote_actor_reqs:
+            self.storage.get_actors(remote_actor_reqs.keys(), cb=CalvinCB(self._migrate_from_rts, app=app,
+                                                                          reqs=remote_actor_reqs, move=move, cb=cb))
+
+    def _migrate_from_rts(self, key, value, app, reqs, move, cb):
+        for actor_id in key:
+            self._migrate_from_rt(actor_id, value.get(actor_id), app, actor_id, reqs[actor_id], move, cb)
 
     def _migrate_from_rt(self, key, value, app, actor_id, req, move, cb):
         if not value:
@@ -615,6 +638,11 @@ class Deployer(object):
         return self.deploy_info['requirements'][name] if (self.deploy_info and 'requirements' in self.deploy_info
                                                             and name in self.deploy_info['requirements']) else []
 
+    def get_scheduling_class(self, actor_name):
+        name = self.component_name(actor_name) or actor_name
+        name = name.split(':', 1)[1] if self.ns else name
+        return self.deploy_info['scheduling'].get(name) if (self.deploy_info and 'scheduling' in self.deploy_info) else None
+
     def lookup_and_verify(self, actor_name, info, cb=None):
         """
         Lookup and verify actor in actor store.
@@ -680,7 +708,8 @@ class Deployer(object):
             info['args']['name'] = actor_name
             actor_id = self.node.am.new(actor_type=info['actor_type'], args=info['args'], signature=info['signature'], 
                                         actor_def=actor_def, security=self.sec, access_decision=access_decision, 
-                                        shadow_actor='shadow_actor' in info, port_properties=port_properties)
+                                        shadow_actor='shadow_actor' in info, port_properties=port_properties,
+                                        register=False)
             if not actor_id:
                 raise Exception("Could not instantiate actor %s" % actor_name)
             deploy_req = self.get_req(actor_name)
@@ -696,6 +725,12 @@ class Deployer(object):
                         self.node.am.actors[actor_id]._replication_data.inhibate(actor_id, True)
                 # Placement requirements
                 self.node.am.actors[actor_id].requirements_add(actor_reqs, extend=False)
+            scheduling_class = self.get_scheduling_class(actor_name)
+            if scheduling_class in SCHEDULING_CLASSES:
+                self.node.am.actors[actor_id].set_scheduling_class(scheduling_class)
+            elif scheduling_class:
+                # Keep the default class rather than one the scheduler does not know
+                _log.warning("Unknown scheduling class %s for actor %s, ignored" % (scheduling_class, actor_name))
             self.actor_map[actor_name] = actor_id
             self.node.app_manager.add(self.app_id, actor_id)
         except Exception as e:
@@ -744,6 +779,8 @@ class Deployer(object):
         self._instantiate_counter += 1
         if self._instantiate_counter < len(self._verified_actors):
             return
+        # All actors of the application are added to storage at once
+        self.node.am.register(self.actor_map.values())
         for component_name, actor_names in self.components.iteritems():
             actor_ids = [self.actor_map[n] for n in actor_names]
             for actor_id in actor_ids:
@@ -19,18 +19,27 @@ import time
 import glob
 import importlib
 
-from calvin.utilities import calvinuuid
+from calvin.runtime.north.reply_tracker import ReplyTracker
+from calvin.runtime.north.routing_table import RoutingTable
+from calvin.runtime.north.join_manager import JoinManager
 from calvin.utilities.calvin_callback import CalvinCB
 import calvin.requests.calvinresponse as response
 from calvin.runtime.south.plugins.async import async
 from calvin.utilities import calvinlogger
 from calvin.utilities import calvinconfig
+from calvin.utilities.utils import get_host_id
 _log = calvinlogger.get_logger(__name__)
 _conf = calvinconfig.get()
 
 # FIXME should be read from calvin config
 TRANSPORT_PLUGIN_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), *['south', 'plugins', 'transports'])
 TRANSPORT_PLUGIN_NS = "calvin.runtime.south.plugins.transports"
+# Seconds to collect link changes before announcing our routes to the peers
+ROUTE_ANNOUNCE_DELAY = 0.5
+# A replaced link is closed after this many RTTs, within the bounds below (seconds)
+OLD_LINK_CLOSE_RTTS = 4
+OLD_LINK_CLOSE_MIN = 0.5
+OLD_LINK_CLOSE_MAX = 3.0
 
 
 class CalvinBaseLink(object):
@@ -48,7 +57,7 @@ class CalvinBaseLink(object):
     def send_with_reply(self, callback, msg, dest_peer_id=None):
         raise NotImplementedError()
 
-    def send(self, msg, dest_peer_id=None):
+    def send(self, msg, dest_peer_id=None, flush=False):
         raise NotImplementedError()
 
     def close(self, dest_peer_id=None):
@@ -74,78 +83,61 @@ class CalvinLink(CalvinBaseLink):
         self.routes = old_link.routes if old_link else []
         # FIXME replies should also be made independent on the link object,
         # to handle dying transports losing reply callbacks
-        self.replies = old_link.replies if old_link else {}
-        self.replies_timeout = old_link.replies_timeout if old_link else {}
+        self.replies = old_link.replies if old_link else ReplyTracker()
         if old_link:
             # close old link after a period, since might still receive messages on the transport layer
-            # TODO chose the delay based on RTT instead of arbitrary 3 seconds
-            _log.analyze(self.rt_id, "+ DELAYED LINK CLOSE", {})
-            async.DelayedCall(3.0, old_link.close)
+            delay = min(max(OLD_LINK_CLOSE_RTTS * old_link.get_rtt(), OLD_LINK_CLOSE_MIN), OLD_LINK_CLOSE_MAX)
+            _log.analyze(self.rt_id, "+ DELAYED LINK CLOSE", {'delay': delay})
+            async.DelayedCall(delay, old_link.close)
 
     def reply_handler(self, payload):
         """ Gets called when a REPLY messages arrives on this link """
         try:
-            # Cancel timeout
-            self.replies_timeout.pop(payload['msg_uuid']).cancel()
+            callback, send_time = self.replies.pop(payload['msg_uuid'])
         except KeyError:
+            # Unknown or already timed out, we ignore it
             _log.warning("Tried to handle reply for unknown message msgid %s", payload['msg_uuid'])
-            # We ignore any errors in cancelling timeout
-            pass
-
-        try:
-            # Call the registered callback,for the reply message id, with the reply data as argument
-            reply = self.replies.pop(payload['msg_uuid'])
-
-            # RTT here also inlcudes delay(actors running...) times in remote runtime
-            self._rtt = (self._rtt*2 + (time.time() - reply['send_time']))/3
-
-            reply['callback'](response.CalvinResponse(encoded=payload['value']))
-        except KeyError:
-            _log.warning("Tried to handle reply for unknown message msgid %s", payload['msg_uuid'])
-        except: # Dangerous but needed
-            _log.exception("Unknown exception in response handler")
-            # We ignore unknown replies
             return
 
-    def reply_timeout(self, msg_id):
-        """ Gets called when a request times out """
-        try:
-            # remove timeout
-            self.replies_timeout.pop(msg_id)
-        except KeyError:
-            _log.warning("Tried to handle reply for unknown message msgid %s", payload['msg_uuid'])
-            # We ignore any errors in cancelling timeout
-            pass
-
+        # RTT here also inlcudes delay(actors running...) times in remote runtime
+        self._rtt = (self._rtt*2 + (time.time() - send_time))/3
         try:
-            self.replies.pop(msg_id)['callback'](response.CalvinResponse(response.GATEWAY_TIMEOUT))
-        except KeyError:
-            _log.warning("Tried to handle reply for unknown message msgid %s", payload['msg_uuid'])
+            # Call the registered callback,for the reply message id, with the reply data as argument
+            callback(response.CalvinResponse(encoded=payload['value']))
         except: # Dangerous but needed
             _log.exception("Unknown exception in response handler")
-            # We ignore unknown replies
 
     def send_with_reply(self, callback, msg, dest_peer_id=None):
         """ Adds a message id to the message and send it,
             also registers the callback for the reply.
+            The callback gets a GATEWAY_TIMEOUT response when no reply arrives in time.
         """
-        msg_id = calvinuuid.uuid("MSGID")
-        self.replies[msg_id] = {'callback': callback, 'send_time': time.time()}
-        self.replies_timeout[msg_id] = async.DelayedCall(10.0, CalvinCB(self.reply_timeout, msg_id))
-        msg['msg_uuid'] = msg_id
+        msg['msg_uuid'] = self.replies.add(callback)
         self.send(msg, dest_peer_id)
 
-    def send(self, msg, dest_peer_id=None):
+    def get_statistics(self):
+        """ Counters of the transport and of the requests sent on the link """
+        statistics = self.transport.get_statistics()
+        statistics.update(self.replies.get_statistics())
+        return statistics
+
+    def send(self, msg, dest_peer_id=None, flush=False):
         """ Adds the from and to node ids to the message and
             sends the message using the transport.
 
             The from and to node ids seems redundant since the link goes only between
             two nodes. But is included for verification and to later allow routing of messages.
+
+            Set flush for latency sensitive messages, the transport then sends it and any
+            messages collected before it at once. REPLYs are always flushed, the requester waits for them.
         """
         msg['from_rt_uuid'] = self.rt_id
         msg['to_rt_uuid'] = self.peer_id if dest_peer_id is None else dest_peer_id
         _log.analyze(self.rt_id, "SEND", msg)
-        self.transport.send(msg)
+        if flush or msg.get('cmd') == 'REPLY':
+            self.transport.send(msg, flush=True)
+        else:
+            self.transport.send(msg)
 
     def close(self, dest_peer_id=None):
         """ Disconnect the transport and hence the link object won't work anymore """
@@ -157,11 +149,14 @@ class CalvinLink(CalvinBaseLink):
 class CalvinRoutingLink(CalvinBaseLink):
     """ CalvinRoutingLink class manage one RT to RT link between
         this peer and peer_id using link as an proxy.
+        announced is True when the route is from the routing table, the link then
+        follows the route when the next hop changes.
     """
 
-    def __init__(self, peer_id, link):
+    def __init__(self, peer_id, link, announced=False):
         super(CalvinRoutingLink, self).__init__(peer_id)
         self.link = link
+        self.announced = announced
 
     def reply_handler(self, payload):
         """ Call reply_handler on link """
@@ -172,10 +167,10 @@ class CalvinRoutingLink(CalvinBaseLink):
         """
         self.link.send_with_reply(callback, msg, self.peer_id)
 
-    def send(self, msg, dest_peer_id=None):
+    def send(self, msg, dest_peer_id=None, flush=False):
         """ Send msg on transport.
         """
-        self.link.send(msg, self.peer_id)
+        self.link.send(msg, self.peer_id, flush)
 
     def close(self, dest_peer_id=None):
         """ Call disconnect on link """
@@ -204,6 +199,17 @@ class CalvinNetwork(object):
         self.pending_joins = {}  # key: uri, value: list of callbacks or None
         self.pending_joins_by_id = {}  # key: peer id, value: uri
         self.control = self.node.control
+        self.routing_table = RoutingTable(self.node.id, self._link_rtt)
+        self._route_announcements = _conf.get(None, 'route_announcements')
+        self._route_announce_timer = None
+        self.join_manager = JoinManager(self._transport_join, self._join_given_up,
+                                        concurrency=_conf.get(None, 'join_concurrency'),
+                                        retries=_conf.get(None, 'join_retries'),
+                                        backoff=_conf.get(None, 'join_backoff'),
+                                        backoff_max=_conf.get(None, 'join_backoff_max'),
+                                        timeout=_conf.get(None, 'join_timeout'))
+        self._uri_peers = {}  # key: uri we joined, value: peer node id
+        self.host_id = get_host_id()
 
     def __recv_handler(self, tp_link, payload):
         _log.debug("Dummy recv handler")
@@ -318,6 +324,9 @@ class CalvinNetwork(object):
             corresponding_server_node_names = [None] * len(uris)
 
         for uri, peer_id, server_node_name in zip(uris, corresponding_peer_ids, corresponding_server_node_names):
+            if peer_id is None and self._link_connected(self._uri_peers.get(uri)):
+                # Joined this uri before and the link is still up, reuse it
+                peer_id = self._uri_peers[uri]
             if not (uri in self.pending_joins or peer_id in self.pending_joins_by_id or peer_id in self._links):
                 # No simultaneous join detected
                 schema = uri.split(":", 1)[0]
@@ -328,9 +337,9 @@ class CalvinNetwork(object):
                         self.pending_joins_by_id[peer_id] = uri
                     if callback:
                         self.pending_joins[uri] = [callback]
-                    # Ask the transport plugin to do the join
+                    # Ask the transport plugin to do the join, when there is room for more ongoing joins
                     _log.analyze(self.node.id, "+ TRANSPORT", {'uri': uri, 'peer_id': peer_id}, peer_node_id=peer_id)
-                    self.transports[schema].join(uri, server_node_name)
+                    self.join_manager.request(uri, server_node_name)
                 else:
                     _log.warning("Trying to join non existing transport %s", schema)
             else:
@@ -339,7 +348,7 @@ class CalvinNetwork(object):
                 if callback:
                     if peer_id in self._links:
                         # Link was already established, then need to call the callback now
-                        callback(status=response.CalvinResponse(True), uri=uri)
+                        callback(status=response.CalvinResponse(True), uri=uri, peer_node_id=peer_id)
                         continue
                     # Otherwise also want to be called when the ongoing link setup finishes
                     if uri in self.pending_joins:
@@ -347,6 +356,14 @@ class CalvinNetwork(object):
                     else:
                         self.pending_joins[uri] = [callback]
 
+    def _transport_join(self, uri, server_node_name):
+        schema = uri.split(":", 1)[0]
+        return self.transports[schema].join(uri, server_node_name)
+
+    def _link_connected(self, peer_id):
+        link = self._links.get(peer_id)
+        return isinstance(link, CalvinLink) and link.transport.is_connected()
+
     def _join_finished(self, tp_link, peer_id, uri, is_orginator):
         """ Peer join is (not) accepted, called by transport plugin.
             This may be initiated by us (is_orginator=True) or by the peer,
@@ -360,18 +377,27 @@ class CalvinNetwork(object):
         """
         # while a link is pending it is the responsibility of the transport layer, since
         # higher layers don't have any use for it anyway
+        if is_orginator and self.join_manager.stale(tp_link):
+            # Joined after the attempt timed out, the join is retried or given up already
+            _log.debug("Ignoring timed out join of %s", uri)
+            tp_link.disconnect()
+            return
         _log.analyze(self.node.id, "+", {'uri': uri, 'peer_id': peer_id,
                                          'pending_joins': self.pending_joins,
                                          'pending_joins_by_id': self.pending_joins_by_id},
                                          peer_node_id=peer_id, tb=True)
         if tp_link is None:
             # This is a failed join lets send it upwards
+            self.join_manager.failed(uri, retry=False)
             if uri in self.pending_joins:
                 cbs = self.pending_joins.pop(uri)
                 if cbs:
                     for cb in cbs:
                         cb(status=response.CalvinResponse(response.SERVICE_UNAVAILABLE), uri=uri, peer_node_id=peer_id)
             return
+        if isinstance(self._links.get(peer_id), CalvinRoutingLink):
+            # Reached through another runtime until now, use the direct link instead
+            self.link_remove(peer_id)
         # Only support for one RT to RT communication link per peer
         if peer_id in self._links:
             # Likely simultaneous join requests, use the one requested by the node with highest id
@@ -395,6 +421,11 @@ class CalvinNetwork(object):
             # No simultaneous join detected, just add the link
             _log.analyze(self.node.id, "+ INSERT", {'uri': uri, 'peer_id': peer_id}, peer_node_id=peer_id, tb=True)
             self._links[peer_id] = CalvinLink(self.node.id, peer_id, tp_link)
+        self.routing_table.add_link(peer_id)
+        self._routes_changed()
+        if is_orginator:
+            self.join_manager.finished(uri, peer_id)
+            self._uri_peers[uri] = peer_id
 
         # Find and call any callbacks registered for the uri or peer id
         _log.debug("join _finished: %s: peer_id: %s, uri: %s\npending_joins_by_id: %s\npending_joins: %s" % (self.node.id, peer_id,
@@ -419,7 +450,10 @@ class CalvinNetwork(object):
         return
 
     def _join_failed(self, tp_link, peer_id, uri, is_orginator, reason):
-        cbs = self.pending_joins.pop(uri)
+        if self.join_manager.stale(tp_link):
+            return
+        self.join_manager.failed(uri, retry=False)
+        cbs = self.pending_joins.pop(uri, None)
         if cbs:
             for cb in cbs:
                 cb(status=response.CalvinResponse(False), uri=uri, peer_node_id=None)
@@ -458,6 +492,14 @@ class CalvinNetwork(object):
             _log.analyze(self.node.id, "+ USE CACHE", {}, peer_node_id=peer_id, tb=True)
             self._link_request(peer_id, callback=callback)
             return None
+        via = self.routing_table.next_hop(peer_id)
+        if via is not None and via in self._links:
+            # Announced by a peer, route through it without looking up the node in storage
+            _log.analyze(self.node.id, "+ USE ROUTE", {'via': via}, peer_node_id=peer_id)
+            self._links[peer_id] = CalvinRoutingLink(peer_id, self._links[via], announced=True)
+            self._links[via].routes.append(peer_id)
+            self._callback_link(peer_id, callback)
+            return self._links[peer_id]
 
         # We don't have the peer, let's ask for it in storage
         _log.analyze(self.node.id, "+ CHECK STORAGE", {}, peer_node_id=peer_id, tb=True)
@@ -465,6 +507,67 @@ class CalvinNetwork(object):
         self.node.storage.get_node(peer_id, CalvinCB(self._update_cache_request_finished, callback=None))
         return None
 
+    def link_route(self, peer_id):
+        """ Returns the direct link that messages to peer_id are sent on, None when no route is known """
+        link = self._links.get(peer_id)
+        if isinstance(link, CalvinRoutingLink):
+            return link.link
+        if link is not None:
+            return link
+        via = self.routing_table.next_hop(peer_id)
+        return self._links.get(via) if via is not None else None
+
+    def _link_rtt(self, peer_id):
+        link = self._links.get(peer_id)
+        return link.get_rtt() if isinstance(link, CalvinLink) else None
+
+    def routes_update(self, peer_id, routes):
+        """ Routes announced by a directly linked peer, dict with key: destination, value: [cost, hops]
+
+            Changes of the reachable destinations or of their hops, and large cost increases, are
+            passed on, see RoutingTable.update. Hence routes through loops count up to MAX_HOPS and
+            are dropped. Other cost changes reach the peers with the next announcement, while the
+            next hops here are chosen with the new costs.
+        """
+        changed = self.routing_table.update(peer_id, routes)
+        self._reroute_links()
+        if changed:
+            # Pass on to the other peers, only when changed to not bounce announcements back and forth
+            self._routes_changed()
+
+    def _reroute_links(self):
+        """ Move routed links from the routing table to the current next hop, remove them when the route is gone """
+        for peer_id, link in self._links.items():
+            if not isinstance(link, CalvinRoutingLink) or not link.announced:
+                continue
+            via = self.routing_table.next_hop(peer_id)
+            if via is None or not isinstance(self._links.get(via), CalvinLink):
+                # Route withdrawn, a new link is requested when needed
+                _log.analyze(self.node.id, "+ ROUTE WITHDRAWN", {}, peer_node_id=peer_id)
+                self.link_remove(peer_id)
+                self.control.log_link_disconnected(peer_id)
+            elif self._links[via] is not link.link:
+                _log.analyze(self.node.id, "+ REROUTE", {'via': via}, peer_node_id=peer_id)
+                link.link.routes.remove(peer_id)
+                link.link = self._links[via]
+                link.link.routes.append(peer_id)
+
+    def _routes_changed(self):
+        """ Announce our routes to the peers, once for changes close in time """
+        if not self._route_announcements or self._route_announce_timer is not None:
+            return
+        self._route_announce_timer = async.DelayedCall(ROUTE_ANNOUNCE_DELAY, self._announce_routes)
+
+    def _announce_routes(self):
+        self._route_announce_timer = None
+        for peer_id, link in self._links.items():
+            if not isinstance(link, CalvinLink):
+                continue
+            try:
+                link.send({'cmd': 'ROUTE_UPDATE', 'routes': self.routing_table.announcement(peer_id)})
+            except Exception:
+                _log.exception("Failed to announce routes to %s", peer_id)
+
     def _execute_cached_callbacks(self, peer_id):
         if peer_id in self._peer_cache:
             cbs = self._peer_cache[peer_id].pop('callbacks')
@@ -505,12 +608,16 @@ class CalvinNetwork(object):
                 # WARNING: here if one iteration takes more then 5 minutes then we are in a retry loop :/
                 self.node.storage.get_node(peer_id, CalvinCB(self._update_cache_request_finished, callback=None))
             else:
-                cbs = self._peer_cache[peer_id].pop('callbacks')
-                self._peer_cache[peer_id]['callbacks'] = []
-                if cbs:
-                    for cb in cbs:
-                        cb(peer_id, None, status=response.CalvinResponse(False))
-                _log.warning("Join failed on peer %s on all uris", peer_id)
+                self._link_request_failed(peer_id)
+
+    def _link_request_failed(self, peer_id):
+        """ No uri (left) to join the peer on, make the callbacks """
+        cbs = self._peer_cache[peer_id].pop('callbacks')
+        self._peer_cache[peer_id]['callbacks'] = []
+        if cbs:
+            for cb in cbs:
+                cb(peer_id, None, status=response.CalvinResponse(False))
+        _log.warning("Join failed on peer %s on all uris", peer_id)
 
     def _link_request(self, peer_id, callback=None, force=False):
         """
@@ -530,6 +637,10 @@ class CalvinNetwork(object):
             if not self._peer_cache[peer_id]['callbacks'] and callback:
                 self._peer_cache[peer_id]['callbacks'] = [callback]
             _log.debug("First call or force")
+            if not self._peer_cache[peer_id]['uris']:
+                # None of the peer's uris can be used from here
+                self._link_request_failed(peer_id)
+                return
             self.join([self._peer_cache[peer_id]['uris'][0]], CalvinCB(self._link_request_finished, peer_id=peer_id),
                       corresponding_server_node_names=[self._peer_cache[peer_id]['server_name']])
         elif callback:
@@ -565,8 +676,8 @@ class CalvinNetwork(object):
         else:
             server_node_name_as_str = None
 
-        # Set values from storage
-        self._peer_cache[key]['uris'] = value['uris']
+        # Set values from storage, the uris we can use in order of preference
+        self._peer_cache[key]['uris'] = self.get_supported_uri(value['uris'], value.get('host_id')) or []
         self._peer_cache[key]['timestamp'] = time.time()
         self._peer_cache[key]['server_name'] = server_node_name_as_str
 
@@ -579,10 +690,11 @@ class CalvinNetwork(object):
             else:
                 self.link_request(value['proxy'], CalvinCB(self._routing_link_finished, dest_peer_id=key, callback=callback))
 
-    # Static
-    def get_supported_uri(self, uri_or_uris):
-        """ Match configured transport interfaces with uris and return first match.
-            returns: First supported uri, None if no match
+    def get_supported_uri(self, uri_or_uris, host_id=None):
+        """ Match configured transport interfaces with uris.
+            Host local transports (calvinunix) are first when host_id is the id of this host,
+            and left out otherwise.
+            returns: List of supported uris, None if no match
         """
         if not isinstance(uri_or_uris, list):
             uris = [uri_or_uris]
@@ -598,19 +710,36 @@ class CalvinNetwork(object):
                 if uri.startswith(transport):
                     supported_uris.append(uri)
 
+        local_uris = [uri for uri in supported_uris if uri.startswith('calvinunix')]
+        supported_uris = [uri for uri in supported_uris if not uri.startswith('calvinunix')]
+        if host_id is not None and host_id == self.host_id:
+            supported_uris = local_uris + supported_uris
+
         if supported_uris:
             return supported_uris
         return None
 
     # TODO: send the peer_id and so on upstream
     def _peer_connection_failed(self, tp_link, uri, status):
-        cbs = self.pending_joins.pop(uri)
+        if self.join_manager.stale(tp_link):
+            _log.debug("Timed out join of %s failed", uri)
+            return
+        if self.join_manager.failed(uri):
+            _log.info("Connection failed on uri %s, status %s, will retry", uri, status)
+            return
+        self._join_given_up(uri)
+        _log.warning("Connection failed on uri %s, status %s", uri, status)
+
+    def _join_given_up(self, uri):
+        """ Joining uri failed and will not be retried """
+        for peer_id, peer_uri in self.pending_joins_by_id.items():
+            if peer_uri == uri:
+                del self.pending_joins_by_id[peer_id]
+        cbs = self.pending_joins.pop(uri, None)
         if cbs:
             for cb in cbs:
                 cb(status=response.CalvinResponse(False), uri=uri, peer_node_id=None)
 
-        _log.warning("Connection failed on uri %s, status %s", uri, status)
-
     def _peer_disconnected(self, link, rt_id, reason):
         if reason == "ERROR": _log.warning("Peer disconnected %s with reason %s", rt_id, reason)
         else: _log.debug("Peer disconnected %s with reason %s", rt_id, reason)
@@ -634,6 +763,8 @@ class CalvinNetwork(object):
                 self._links.pop(peer_id)
             else:
                 self._links.pop(peer_id)
+                self.routing_table.remove_link(peer_id)
+                self._routes_changed()
         except KeyError:
             _log.error("Tried to remove non existing link to peer_id %s", peer_id)
 
@@ -647,3 +778,12 @@ class CalvinNetwork(object):
 
     def list_direct_links(self):
         return [peer_id for peer_id, l in self._links.items() if isinstance(l, CalvinLink)]
+
+    def link_statistics(self):
+        """ Counters of sent and received messages, bytes and requests for each direct link """
+        statistics = {}
+        for peer_id, l in self._links.items():
+            if isinstance(l, CalvinLink):
+                statistics[peer_id] = l.get_statistics()
+                statistics[peer_id].update(self.join_manager.get_statistics(peer_id))
+        return statistics
@@ -110,7 +110,11 @@ class Node(object):
         self.rm = replicationmanager.ReplicationManager(self)
         self.control = calvincontrol.get_calvincontrol()
 
-        _scheduler = scheduler.DebugScheduler if _log.getEffectiveLevel() <= logging.DEBUG else scheduler.Scheduler
+        debug = _log.getEffectiveLevel() <= logging.DEBUG
+        if _conf.get(None, 'scheduler') == 'event':
+            _scheduler = scheduler.DebugEventScheduler if debug else scheduler.EventScheduler
+        else:
+            _scheduler = scheduler.DebugScheduler if debug else scheduler.Scheduler
         self.sched = _scheduler(self, self.am, self.monitor)
         self.async_msg_ids = {}
         self._calvinsys = CalvinSys(self)
@@ -217,6 +221,9 @@ class Node(object):
         """ Run once when main loop is started """
         interfaces = _conf.get(None, 'transports')
         self.network.register(interfaces, ['json'])
+        if 'calvinunix' in self.network.transports and not any(uri.startswith('calvinunix') for uri in self.uris):
+            # Let runtimes on the same host connect on a unix socket
+            self.uris.append(self.network.transports["calvinunix"].get_default_uri())
         self.network.start_listeners(self.uris)
         # Start storage after network, proto etc since storage proxy expects them
         self.storage.start(cb=CalvinCB(self._storage_started_cb))
@@ -21,6 +21,7 @@ from calvin.utilities import calvinlogger
 from calvin.utilities import calvinconfig
 from calvin.utilities import proxyconfig
 import calvin.requests.calvinresponse as response
+from calvin.runtime.north.routing_table import MAX_HOPS
 
 _log = calvinlogger.get_logger(__name__)
 _conf = calvinconfig.get()
@@ -51,10 +52,18 @@ def send_message(peer_id, link, msg, callback=None, status=None, **kwargs):
         if callback:
             callback(status=status)
 
+def _flush_forwarded(payload):
+    """ The sender waits for REPLYs and token (N)ACKs, forward them without batching """
+    if payload.get('cmd') == 'REPLY':
+        return True
+    value = payload.get('value')
+    return payload.get('cmd') == 'TUNNEL_DATA' and isinstance(value, dict) and \
+        value.get('cmd') in ('TOKEN_REPLY', 'TOKENS_REPLY')
+
 def forward_message(peer_id, link, payload, status=None):
     if status or status is None:
         try:
-            link.transport.send(payload)
+            link.transport.send(payload, flush=_flush_forwarded(payload))
         except Exception as e:
             _log.exception("Failed to forward data to {} on a link, msg => {}".format(peer_id, repr(payload)))
 
@@ -93,6 +102,9 @@ class CalvinTunnel(object):
         self.recv_handler = None
         self.down_handler = None
         self.up_handler = None
+        # The link used last and its bound send method
+        self._link = None
+        self._link_send = None
 
     def _late_link(self, peer_node_id):
         """ Sometimes the peer is unknown even when a tunnel object is needed.
@@ -135,16 +147,26 @@ class CalvinTunnel(object):
         if not reply:
             _log.error("Got none ack on destruction of tunnel!\n%s" % reply)
 
-    def send(self, payload):
+    def send(self, payload, flush=False):
         """ Send a payload over the tunnel
             payload must be serializable, i.e. only built-in types such as:
             dict, list, tuple, string, numbers, booleans, etc
+            Set flush for latency sensitive payloads, see CalvinLink.send
         """
-        def _failed_to_send(payload, status):
-            _log.analyze(self.rt_id, "+ TUNNEL FAILED", payload, peer_node_id=self.peer_node_id)
-
         msg = {'cmd': 'TUNNEL_DATA', 'value': payload, 'tunnel_id': self.id}
-        self.network.link_request(self.peer_node_id, callback=CalvinCB(send_message, msg=msg, callback=CalvinCB(_failed_to_send, payload)))
+        link = self.network.link_get(self.peer_node_id)
+        if link is None:
+            # Link needs to be (re-)established first, tunnel data is never replied to
+            self.network.link_request(self.peer_node_id, callback=CalvinCB(send_message, msg=msg))
+            return
+        if link is not self._link:
+            self._link = link
+            self._link_send = link.send
+        try:
+            self._link_send(msg, flush=flush)
+        except Exception:
+            _log.exception("Failed to send data to {} on a link, msg => {}".format(self.peer_node_id, repr(msg)))
+            _log.analyze(self.rt_id, "+ TUNNEL FAILED", payload, peer_node_id=self.peer_node_id)
 
     def register_recv(self, handler):
         """ Register the handler of incoming messages on this tunnel """
@@ -166,6 +188,7 @@ class CalvinTunnel(object):
         """
         self.status = CalvinTunnel.STATUS.TERMINATED
         self.tunnels[self.peer_node_id].pop(self.id)
+        self._link = self._link_send = None
         if not local_only:
             #FIXME use the tunnel_destroy cmd directly instead
             raise NotImplementedError()
@@ -195,6 +218,7 @@ class CalvinProto(CalvinCBClass):
             'TUNNEL_DESTROY': [CalvinCB(self.tunnel_destroy_handler)],
             'TUNNEL_DATA': [CalvinCB(self.tunnel_data_handler)],
             'REPLY': [CalvinCB(self.reply_handler)],
+            'ROUTE_UPDATE': [CalvinCB(self.route_update_handler)],
             'AUTHENTICATION_DECISION': [CalvinCB(self.authentication_decision_handler)],
             'AUTHORIZATION_REGISTER': [CalvinCB(self.authorization_register_handler)],
             'AUTHORIZATION_DECISION': [CalvinCB(self.authorization_decision_handler)],
@@ -268,8 +292,22 @@ class CalvinProto(CalvinCBClass):
             # Call the proper handler for the command using CalvinCBClass
             self._callback_execute(payload['cmd'], payload)
         else:
-            # Get/request a link to destination and forward message
-            self.network.link_request(payload['to_rt_uuid'], CalvinCB(forward_message, payload=payload))
+            # Forward message on the link to the next hop, otherwise get/request a link to destination.
+            # Count the hops to drop messages caught in a routing loop.
+            payload['hops'] = payload.get('hops', 0) + 1
+            if payload['hops'] > MAX_HOPS:
+                _log.warning("Dropping %s message to %s after %d hops", payload.get('cmd'),
+                             payload['to_rt_uuid'], payload['hops'])
+                return
+            link = self.network.link_route(payload['to_rt_uuid'])
+            if link is not None:
+                forward_message(payload['to_rt_uuid'], link, payload)
+            else:
+                self.network.link_request(payload['to_rt_uuid'], CalvinCB(forward_message, payload=payload))
+
+    def route_update_handler(self, payload):
+        """ A peer announces which runtimes can be reached through it """
+        self.network.routes_update(payload['from_rt_uuid'], payload['routes'])
 
     #
     # Remote commands supported by protocol
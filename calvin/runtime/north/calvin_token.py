@@ -36,7 +36,8 @@ class Token(object):
         class_ = {
             'Token':Token,
             'ExceptionToken':ExceptionToken,
-            'EOSToken': EOSToken
+            'EOSToken': EOSToken,
+            'BinaryToken': BinaryToken
         }.get(token_type, ExceptionToken)
         return class_(representaton.get('data', 'Bad Token'))
 
@@ -47,6 +48,16 @@ class Token(object):
         # To get it printed nicely also in lists
         return self.__str__()
 
+class BinaryToken(Token):
+
+    """ Token with binary data (str or bytearray), e.g. an image, sent as is between runtimes """
+
+    def __init__(self, value=''):
+        super(BinaryToken, self).__init__(value)
+
+    def __str__(self):
+        return "<%s> %d bytes" % (self.__class__.__name__, len(self.value))
+
 class ExceptionToken(Token):
 
     """ Base class for exception tokens """
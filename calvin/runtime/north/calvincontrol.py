@@ -151,6 +151,53 @@ control_api_doc += \
 """
 re_get_node = re.compile(r"GET /node/(NODE_" + uuid_re + "|" + uuid_re + ")\sHTTP/1")
 
+control_api_doc += \
+    """
+    GET /links
+    Get counters for the links from this runtime to other runtimes
+    Response status code: OK
+    Response:
+    {
+        <node-id>: {"messages_sent": <count>, "messages_received": <count>,
+                    "bytes_sent": <bytes on the link>, "bytes_sent_uncompressed": <bytes before compression>,
+                    "bytes_received": <bytes on the link>, "bytes_received_uncompressed": <bytes after decompression>,
+                    "batching": <true if messages are batched>, "compression": <codec name or null>,
+                    "requests_sent": <count>, "requests_outstanding": <requests waiting for reply>,
+                    "replies_received": <count>, "requests_timed_out": <count>,
+                    "join_latency": <seconds to join, when joined by this runtime>, "join_attempts": <count>},
+        ...
+    }
+"""
+re_get_links = re.compile(r"GET /links\sHTTP/1")
+
+control_api_doc += \
+    """
+    GET /routes
+    Get the runtimes reachable from this runtime and the runtime messages to them are sent to
+    Response status code: OK
+    Response:
+    {
+        <node-id>: <next hop node-id or null when currently unreachable>,
+        ...
+    }
+"""
+re_get_routes = re.compile(r"GET /routes\sHTTP/1")
+
+control_api_doc += \
+    """
+    GET /storage/cache
+    Get statistics of the registry cache, values read from storage reused until they expire or change
+    Response status code: OK
+    Response:
+    {
+        "hits": <number of reads answered from the cache>,
+        "misses": <number of reads sent to storage>,
+        "invalidations": <number of writes and reported changes>,
+        "size": <number of cached values>
+    }
+"""
+re_get_storage_cache = re.compile(r"GET /storage/cache\sHTTP/1")
+
 control_api_doc += \
     """
     POST /node/{node-id}/attributes/indexed_public
@@ -297,6 +344,48 @@ control_api_doc += \
 """
 re_post_actor_disable = re.compile(r"POST /actor/(ACTOR_" + uuid_re + "|" + uuid_re + ")/disable\sHTTP/1")
 
+control_api_doc += \
+    """
+    GET /scheduler/latency
+    Get histograms, per scheduling class, of the time from actors being triggered until fired
+    Response status code: OK
+    Response:
+    {
+        <scheduling class>: {"buckets": [<upper bound seconds>, ...],
+                             "counts": [<count per bucket, last bucket is larger than all bounds>, ...],
+                             "count": <total count>, "mean": <seconds>, "max": <seconds>},
+        ...
+    }
+"""
+re_get_scheduler_latency = re.compile(r"GET /scheduler/latency\sHTTP/1")
+
+control_api_doc += \
+    """
+    GET /actor/{actor-id}/usage
+    Get wall clock and CPU time (seconds) spent firing the actor on this runtime
+    Response status code: OK or NOT_FOUND
+    Response:
+    {
+        "fire_count": <number of times fired by the scheduler>,
+        "wall": <total wall clock time>,
+        "cpu": <total CPU time>,
+        "overruns": <number of times the time budget was exceeded>,
+        "time_budget": <time budget>,
+        "actions": {<action-name>: {"fire_count": <count>, "wall": <time>, "cpu": <time>}, ...}
+    }
+"""
+re_get_actor_usage = re.compile(r"GET /actor/(ACTOR_" + uuid_re + "|" + uuid_re + ")/usage\sHTTP/1")
+
+control_api_doc += \
+    """
+    POST /actor/{actor-id}/time_budget
+    Set the time an actor may repeatedly fire actions before other actors are fired
+    Body: {"time_budget": <seconds> or null for the runtime default}
+    Response status code: OK, BAD_REQUEST or NOT_FOUND
+    Response: none
+"""
+re_post_actor_time_budget = re.compile(r"POST /actor/(ACTOR_" + uuid_re + "|" + uuid_re + ")/time_budget\sHTTP/1")
+
 # control_api_doc += \
 """
     GET /actor/{actor-id}/port/{port-id}
@@ -383,7 +472,8 @@ control_api_doc += \
                                               }, ...
                                            ],
                 ...
-                            }
+                            },
+            "scheduling": {"<actor instance 1 name>": "realtime", "normal" or "background", ...}  # optional
            }
     }
     Note that either a script or app_info must be supplied. Optionally security
@@ -418,6 +508,9 @@ control_api_doc += \
          "kwargs": {"index": ["node_name", {"organization": "org.testexample", "name": "testNode1"}]}
          "type": "+"
         }
+    The scheduling class of an actor decides the order actors are fired, actors
+    of a higher class are fired first. Actors are "normal" unless specified.
+
     Response status code: OK, CREATED, BAD_REQUEST, UNAUTHORIZED or INTERNAL_ERROR
     Response: {"application_id": <application-id>,
                "actor_map": {<actor name with namespace>: <actor id>, ...}
@@ -453,6 +546,18 @@ control_api_doc += \
 """
 re_post_application_migrate = re.compile(r"POST /application/(APP_" + uuid_re + "|" + uuid_re + ")/migrate\sHTTP/1")
 
+control_api_doc += \
+    """
+    POST /application/{application-id}/time_budget
+    Set the time budget of the application's actors running on this runtime, see POST /actor/{actor-id}/time_budget
+    Actors later added to the application on this runtime get the time budget as well, the budget follows migrated actors
+    Body: {"time_budget": <seconds> or null for the runtime default}
+    Response status code: OK, BAD_REQUEST or NOT_FOUND
+    Response: {"actor_ids": [<actor-id>, ...]} actors that got the time budget
+"""
+re_post_application_time_budget = re.compile(
+    r"POST /application/(APP_" + uuid_re + "|" + uuid_re + ")/time_budget\sHTTP/1")
+
 control_api_doc += \
     """
     POST /disconnect
@@ -544,6 +649,11 @@ control_api_doc += \
         {
             <actor-id>: [<start time of counter>, <last modification time>],
             ...
+        },
+        'usage':
+        {
+            <actor-id>: <time usage as for GET /actor/{actor-id}/usage, without time_budget>,
+            ...
         }
     }
 """
@@ -846,6 +956,12 @@ class CalvinControl(object):
             (re_actor_report, self.handle_actor_report),
             (re_post_actor_migrate, self.handle_actor_migrate),
             (re_post_actor_disable, self.handle_actor_disable),
+            (re_get_actor_usage, self.handle_get_actor_usage),
+            (re_get_scheduler_latency, self.handle_get_scheduler_latency),
+            (re_get_links, self.handle_get_links),
+            (re_get_routes, self.handle_get_routes),
+            (re_get_storage_cache, self.handle_get_storage_cache),
+            (re_post_actor_time_budget, self.handle_post_actor_time_budget),
             (re_post_actor_replicate, self.handle_actor_replicate),
             (re_get_port, self.handle_get_port),
             (re_get_port_state, self.handle_get_port_state),
@@ -853,6 +969,7 @@ class CalvinControl(object):
             (re_set_port_property, self.handle_set_port_property),
             (re_post_deploy, self.handle_deploy),
             (re_post_application_migrate, self.handle_post_application_migrate),
+            (re_post_application_time_budget, self.handle_post_application_time_budget),
             (re_delete_node, self.handle_quit),
             (re_post_disconnect, self.handle_disconnect),
             (re_post_meter, self.handle_post_meter),
@@ -1250,6 +1367,18 @@ class CalvinControl(object):
         """
         self.send_response(handle, connection, json.dumps(self.node.network.list_links()))
 
+    @authentication_decorator
+    def handle_get_links(self, handle, connection, match, data, hdr):
+        self.send_response(handle, connection, json.dumps(self.node.network.link_statistics()))
+
+    @authentication_decorator
+    def handle_get_routes(self, handle, connection, match, data, hdr):
+        self.send_response(handle, connection, json.dumps(self.node.network.routing_table.get_routes()))
+
+    @authentication_decorator
+    def handle_get_storage_cache(self, handle, connection, match, data, hdr):
+        self.send_response(handle, connection, json.dumps(self.node.storage.get_cache_statistics()))
+
     @authentication_decorator
     def handle_get_node(self, handle, connection, match, data, hdr):
         """ Get node information from id
@@ -1423,6 +1552,60 @@ class CalvinControl(object):
             status = calvinresponse.NOT_FOUND
         self.send_response(handle, connection, None, status)
 
+    @authentication_decorator
+    def handle_get_actor_usage(self, handle, connection, match, data, hdr):
+        try:
+            usage = self.node.sched.get_usage(match.group(1))
+            status = calvinresponse.OK
+        except KeyError:
+            usage = None
+            status = calvinresponse.NOT_FOUND
+        self.send_response(handle, connection, None if usage is None else json.dumps(usage), status=status)
+
+    @authentication_decorator
+    def handle_get_scheduler_latency(self, handle, connection, match, data, hdr):
+        self.send_response(handle, connection, json.dumps(self.node.sched.get_latency()))
+
+    def _time_budget_from(self, data):
+        """ Validated time budget from request body, raises ValueError """
+        if not isinstance(data, dict) or 'time_budget' not in data:
+            raise ValueError("Missing time_budget")
+        time_budget = data['time_budget']
+        if time_budget is not None and float(time_budget) <= 0.0:
+            raise ValueError("Time budget must be positive")
+        return time_budget
+
+    @authentication_decorator
+    def handle_post_actor_time_budget(self, handle, connection, match, data, hdr):
+        actor_id = match.group(1)
+        try:
+            time_budget = self._time_budget_from(data)
+        except (ValueError, TypeError):
+            self.send_response(handle, connection, None, status=calvinresponse.BAD_REQUEST)
+            return
+        if actor_id in self.node.am.actors:
+            self.node.sched.set_time_budget([actor_id], time_budget)
+            status = calvinresponse.OK
+        else:
+            status = calvinresponse.NOT_FOUND
+        self.send_response(handle, connection, None, status=status)
+
+    @authentication_decorator
+    def handle_post_application_time_budget(self, handle, connection, match, data, hdr):
+        try:
+            time_budget = self._time_budget_from(data)
+        except (ValueError, TypeError):
+            self.send_response(handle, connection, None, status=calvinresponse.BAD_REQUEST)
+            return
+        application = self.node.app_manager.applications.get(match.group(1))
+        if application is None:
+            self.send_response(handle, connection, None, status=calvinresponse.NOT_FOUND)
+            return
+        application.time_budget = time_budget
+        actor_ids = [actor_id for actor_id in application.get_actors() if actor_id in self.node.am.actors]
+        self.node.sched.set_time_budget(actor_ids, time_budget)
+        self.send_response(handle, connection, json.dumps({'actor_ids': actor_ids}), status=calvinresponse.OK)
+
     @authentication_decorator
     def handle_actor_replicate(self, handle, connection, match, data, hdr):
         data = {} if data is None else data
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import time
+import weakref
+from collections import deque
+
+from calvin.runtime.south.plugins.async import async
+from calvin.utilities import calvinlogger
+
+_log = calvinlogger.get_logger(__name__)
+
+# Joins of uris with these schemas are not retried, a runtime on the same host that is not
+# listening won't start to by waiting, the peer's other uris are tried instead
+HOST_LOCAL_SCHEMAS = ('calvinunix',)
+
+
+class JoinManager(object):
+    """
+        Paces the joins this runtime initiates, so that a cluster restart does not
+        open connections to all peers at once.
+
+        At most concurrency joins are in progress, the others wait in a queue.
+        A join that fails to connect is retried up to retries times, after a delay
+        that starts at backoff seconds and doubles up to backoff_max, with jitter
+        so that restarting runtimes spread out, host-local uris are not retried.
+        A join not finished within timeout seconds counts as a failed connect.
+
+        start_join(uri, server_node_name) asks the transport to join the uri, and returns
+        the transport object of the attempt when there is one. A timed out attempt is
+        disconnected, a later result of it is to be ignored, see stale.
+        give_up(uri) is called when the join failed and will not be retried.
+    """
+
+    def __init__(self, start_join, give_up, concurrency=16, retries=3, backoff=1.0, backoff_max=30.0, timeout=15.0):
+        super(JoinManager, self).__init__()
+        self._start_join = start_join
+        self._give_up = give_up
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self._queue = deque()  # uris waiting for a free slot
+        self._joins = {}  # key: uri, value: dict with server_node_name, attempts, start time, timer
+        self._active = set()  # uris being joined
+        self._latency = {}  # key: peer id, value: dict with join latency and attempts
+        self._stale = weakref.WeakSet()  # transports of timed out join attempts
+
+    def __contains__(self, uri):
+        return uri in self._joins
+
+    def request(self, uri, server_node_name=None):
+        """ Join uri when there is a free slot """
+        if uri in self._joins:
+            return
+        self._joins[uri] = {'server_node_name': server_node_name, 'attempts': 0, 'start': time.time(), 'timer': None,
+                            'transport': None}
+        self._queue.append(uri)
+        self._start_next()
+
+    def _start_next(self):
+        while self._queue and len(self._active) < self.concurrency:
+            uri = self._queue.popleft()
+            join = self._joins[uri]
+            join['attempts'] += 1
+            join['timer'] = async.DelayedCall(self.timeout, self._timed_out, uri)
+            self._active.add(uri)
+            try:
+                join['transport'] = self._start_join(uri, join['server_node_name'])
+            except Exception:
+                _log.exception("Failed to start join of %s", uri)
+                self.failed(uri, retry=False)
+
+    def _release(self, uri):
+        self._active.discard(uri)
+        timer = self._joins[uri]['timer']
+        if timer is not None and timer.active():
+            timer.cancel()
+        self._joins[uri]['timer'] = None
+        self._joins[uri]['transport'] = None
+
+    def finished(self, uri, peer_id):
+        """ The join of uri succeeded """
+        if uri not in self._joins:
+            return
+        self._release(uri)
+        join = self._joins.pop(uri)
+        self._latency[peer_id] = {'join_latency': time.time() - join['start'], 'join_attempts': join['attempts']}
+        _log.debug("Joined %s at %s in %.3f s, %d attempts", peer_id, uri,
+                   self._latency[peer_id]['join_latency'], join['attempts'])
+        self._start_next()
+
+    def failed(self, uri, retry=True):
+        """ The join of uri failed, returns True when it will be retried """
+        if uri not in self._joins or uri not in self._active:
+            return False
+        self._release(uri)
+        join = self._joins[uri]
+        if retry and join['attempts'] <= self.retries and uri.split(':', 1)[0] not in HOST_LOCAL_SCHEMAS:
+            delay = min(self.backoff * 2 ** (join['attempts'] - 1), self.backoff_max) * random.uniform(0.5, 1.5)
+            _log.debug("Join of %s failed, retry in %.1f s", uri, delay)
+            join['timer'] = async.DelayedCall(delay, self._retry, uri)
+            self._start_next()
+            return True
+        self._joins.pop(uri)
+        self._start_next()
+        return False
+
+    def _retry(self, uri):
+        if uri in self._joins:
+            self._joins[uri]['timer'] = None
+            self._queue.append(uri)
+            self._start_next()
+
+    def _timed_out(self, uri):
+        if uri not in self._active:
+            return
+        self._joins[uri]['timer'] = None
+        _log.warning("Join of %s timed out", uri)
+        transport = self._joins[uri]['transport']
+        if transport is not None:
+            # The attempt may still connect or fail later, when a retry is in progress
+            self._stale.add(transport)
+            try:
+                transport.disconnect()
+            except Exception:
+                _log.exception("Failed to disconnect timed out join of %s", uri)
+        if not self.failed(uri):
+            self._give_up(uri)
+
+    def stale(self, transport):
+        """ True when transport is from a timed out join attempt, i.e. its join result should be ignored """
+        if transport in self._stale:
+            self._stale.discard(transport)
+            return True
+        return False
+
+    def get_statistics(self, peer_id):
+        """ Latency (seconds from request to joined) and attempts of the last join initiated to peer_id """
+        return self._latency.get(peer_id, {})
@@ -107,7 +107,8 @@ class Metering(object):
         if user_id not in self.users:
             _log.debug("get_aggregated_meter: User id not found")
             raise Exception("User id not found")
-        response = {'activity': self.actors_aggregated, 'time': self.actors_aggregated_time}
+        response = {'activity': self.actors_aggregated, 'time': self.actors_aggregated_time,
+                    'usage': self.node.sched.get_usage()}
         return response
 
     def forget(self, current):
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import struct
+from collections import OrderedDict
+from message_coder import MessageCoderBase
+
+#
+# Compact binary encoding of messages between runtimes.
+#
+# Each value starts with a one byte tag. Integers and lengths are varints, integers zigzag
+# encoded. Strings used in most messages (keys, message types, ...) are sent as an index into
+# KNOWN_STRINGS and tokens as an index into TOKEN_TYPES followed by the token data.
+# UUID strings seen a second time are given an integer alias, defined inline in the message
+# where the alias is first used. The aliases belong to the coder instance, i.e. to the link,
+# and rely on messages being decoded in the order they were encoded.
+# str (bytes) and bytearray values are sent as is.
+#
+# The tables below are part of the wire format, changing them requires a new coder name.
+#
+
+KNOWN_STRINGS = (
+    # Message keys
+    'cmd', 'msg_uuid', 'from_rt_uuid', 'to_rt_uuid', 'value', 'payload', 'tunnel_id', 'port_id',
+    'peer_port_id', 'peer_port', 'local_port', 'sequencenbr', 'token', 'tokens', 'epoch', 'credit',
+    'type', 'data', 'status', 'success', 'tunnel_status', 'token_protocol', 'port_properties',
+    'peer_port_properties', 'peer_actor_id', 'peer_port_name', 'peer_port_dir', 'peer_node_id',
+    'actor_id', 'policy', 'state', 'requirements', 'key', 'id',
+    # Message types
+    'TUNNEL_DATA', 'TOKEN', 'TOKEN_REPLY', 'TOKENS', 'TOKENS_REPLY', 'REPLY', 'TUNNEL_NEW',
+    'TUNNEL_DESTROY', 'PORT_CONNECT', 'PORT_DISCONNECT', 'PORT_REMOTE_CONNECT', 'ACTOR_NEW',
+    'ACTOR_MIGRATE', 'APP_DESTROY', 'AUTHENTICATION_DECISION', 'AUTHORIZATION_REGISTER',
+    'AUTHORIZATION_DECISION', 'AUTHORIZATION_SEARCH',
+    # Values
+    'ACK', 'NACK', 'ABORT', 'in', 'out', 'direction', 'queue_length', 'routing', 'nbr_peers', 'default',
+)
+
+TOKEN_TYPES = ('Token', 'ExceptionToken', 'EOSToken', 'BinaryToken')
+
+# Number of aliases kept per link, the oldest is replaced when all are used
+ALIAS_SLOTS = 4096
+# Number of UUIDs remembered as seen once, most UUIDs (e.g. message ids) are never repeated
+SEEN_SIZE = 1024
+
+TAG_NONE = 0
+TAG_TRUE = 1
+TAG_FALSE = 2
+TAG_INT = 3
+TAG_FLOAT = 4
+TAG_BYTES = 5
+TAG_TEXT = 6
+TAG_BYTEARRAY = 7
+TAG_LIST = 8
+TAG_DICT = 9
+TAG_KNOWN = 10
+TAG_TOKEN = 11
+TAG_ALIAS = 12
+TAG_ALIAS_DEF = 13
+
+_FLOAT = struct.Struct('>d')
+
+
+_KNOWN_CODES = {s: chr(TAG_KNOWN) + chr(i) for i, s in enumerate(KNOWN_STRINGS)}
+_TOKEN_CODES = {s: chr(TAG_TOKEN) + chr(i) for i, s in enumerate(TOKEN_TYPES)}
+_TAGS = [chr(tag) for tag in range(TAG_ALIAS_DEF + 1)]
+
+
+def _varint(n):
+    if n < 0x80:
+        return chr(n)
+    out = bytearray()
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def _is_uuid(s):
+    return len(s) == 36 and s[8] == '-' and s[13] == '-' and s[18] == '-' and s[23] == '-'
+
+
+class MessageCoder(MessageCoderBase):
+
+    def __init__(self, *args, **kwargs):
+        super(MessageCoder, self).__init__(*args, **kwargs)
+        # Encoding side of the link
+        self._aliases = {}
+        self._alias_slots = [None] * ALIAS_SLOTS
+        self._next_alias = 0
+        self._seen = OrderedDict()
+        # Decoding side of the link
+        self._peer_aliases = {}
+
+    def encode(self, data):
+        out = []
+        defined = []
+        try:
+            self._encode(data, out, defined)
+        except:
+            # The peer never sees the aliases defined in this message
+            self._undo_aliases(defined)
+            raise
+        return ''.join(out)
+
+    def decode(self, data):
+        value, pos = self._decode(data, 0)
+        if pos != len(data):
+            raise ValueError("Trailing data after message")
+        return value
+
+    def _encode(self, value, out, defined):
+        t = type(value)
+        if t is dict or (t is not str and isinstance(value, dict)):
+            if len(value) == 2 and 'data' in value:
+                token_type = value.get('type')
+                if isinstance(token_type, basestring) and token_type in _TOKEN_CODES:
+                    out.append(_TOKEN_CODES[token_type])
+                    self._encode(value['data'], out, defined)
+                    return
+            out.append(_TAGS[TAG_DICT])
+            out.append(_varint(len(value)))
+            for k, v in value.iteritems():
+                self._encode(k, out, defined)
+                self._encode(v, out, defined)
+        elif t is str or t is unicode:
+            self._encode_string(value, out, defined)
+        elif value is None:
+            out.append(_TAGS[TAG_NONE])
+        elif value is True:
+            out.append(_TAGS[TAG_TRUE])
+        elif value is False:
+            out.append(_TAGS[TAG_FALSE])
+        elif isinstance(value, (int, long)):
+            out.append(_TAGS[TAG_INT])
+            out.append(_varint((value << 1) if value >= 0 else ((-value << 1) - 1)))
+        elif isinstance(value, float):
+            out.append(_TAGS[TAG_FLOAT])
+            out.append(_FLOAT.pack(value))
+        elif isinstance(value, (list, tuple)):
+            out.append(_TAGS[TAG_LIST])
+            out.append(_varint(len(value)))
+            for v in value:
+                self._encode(v, out, defined)
+        elif isinstance(value, basestring):
+            self._encode_string(value, out, defined)
+        elif isinstance(value, bytearray):
+            out.append(_TAGS[TAG_BYTEARRAY])
+            out.append(_varint(len(value)))
+            out.append(str(value))
+        else:
+            raise TypeError("Can't encode %s" % type(value))
+
+    def _encode_string(self, value, out, defined):
+        code = _KNOWN_CODES.get(value)
+        if code is not None:
+            out.append(code)
+            return
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+            tag = TAG_TEXT
+        else:
+            tag = TAG_BYTES
+        if _is_uuid(value):
+            alias = self._aliases.get(value)
+            if alias is not None:
+                out.append(_TAGS[TAG_ALIAS])
+                out.append(_varint(alias))
+                return
+            if value in self._seen:
+                del self._seen[value]
+                out.append(_TAGS[TAG_ALIAS_DEF])
+                out.append(_varint(self._define_alias(value, defined)))
+                out.append(value)
+                return
+            self._seen[value] = True
+            if len(self._seen) > SEEN_SIZE:
+                self._seen.popitem(last=False)
+        out.append(_TAGS[tag])
+        out.append(_varint(len(value)))
+        out.append(value)
+
+    def _define_alias(self, value, defined):
+        alias = self._next_alias % ALIAS_SLOTS
+        old = self._alias_slots[alias]
+        if old is not None:
+            del self._aliases[old]
+        self._alias_slots[alias] = value
+        self._aliases[value] = alias
+        self._next_alias += 1
+        defined.append((alias, old, value))
+        return alias
+
+    def _undo_aliases(self, defined):
+        for alias, old, value in reversed(defined):
+            del self._aliases[value]
+            self._alias_slots[alias] = old
+            if old is not None:
+                self._aliases[old] = alias
+            self._next_alias -= 1
+
+    def _varint_at(self, data, pos):
+        n = 0
+        shift = 0
+        while True:
+            b = ord(data[pos])
+            pos += 1
+            n |= (b & 0x7f) << shift
+            if b < 0x80:
+                return n, pos
+            shift += 7
+
+    def _decode(self, data, pos):
+        tag = ord(data[pos])
+        pos += 1
+        if tag == TAG_KNOWN:
+            return KNOWN_STRINGS[ord(data[pos])], pos + 1
+        if tag == TAG_INT:
+            n, pos = self._varint_at(data, pos)
+            return (n >> 1) if not n & 1 else -((n + 1) >> 1), pos
+        if tag == TAG_ALIAS:
+            alias, pos = self._varint_at(data, pos)
+            return self._peer_aliases[alias], pos
+        if tag in (TAG_BYTES, TAG_TEXT, TAG_BYTEARRAY):
+            length, pos = self._varint_at(data, pos)
+            value = data[pos:pos + length]
+            if len(value) != length:
+                raise ValueError("Truncated message")
+            if tag == TAG_TEXT:
+                value = value.decode('utf-8')
+            elif tag == TAG_BYTEARRAY:
+                value = bytearray(value)
+            return value, pos + length
+        if tag == TAG_DICT:
+            length, pos = self._varint_at(data, pos)
+            value = {}
+            for _ in xrange(length):
+                k, pos = self._decode(data, pos)
+                value[k], pos = self._decode(data, pos)
+            return value, pos
+        if tag == TAG_LIST:
+            length, pos = self._varint_at(data, pos)
+            value = []
+            for _ in xrange(length):
+                v, pos = self._decode(data, pos)
+                value.append(v)
+            return value, pos
+        if tag == TAG_TOKEN:
+            token_type = TOKEN_TYPES[ord(data[pos])]
+            token_data, pos = self._decode(data, pos + 1)
+            return {'type': token_type, 'data': token_data}, pos
+        if tag == TAG_NONE:
+            return None, pos
+        if tag == TAG_TRUE:
+            return True, pos
+        if tag == TAG_FALSE:
+            return False, pos
+        if tag == TAG_FLOAT:
+            return _FLOAT.unpack_from(data, pos)[0], pos + 8
+        if tag == TAG_ALIAS_DEF:
+            alias, pos = self._varint_at(data, pos)
+            value = data[pos:pos + 36]
+            self._peer_aliases[alias] = value
+            return value, pos + 36
+        raise ValueError("Unknown tag %d" % tag)
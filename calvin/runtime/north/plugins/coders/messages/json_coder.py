@@ -21,7 +21,7 @@ from message_coder import MessageCoderBase
 class MessageCoder(MessageCoderBase):
 
     def encode(self, data):
-        return json.dumps(data)
+        return self.encode_frames(data, json.dumps)
 
     def decode(self, data):
-        return json.loads(data)
+        return self.decode_frames(data, json.loads)
@@ -13,7 +13,96 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import struct
+import base64
 
+# Messages with binary token data start with FRAMED, followed by the length prefixed
+# encoded message and the length prefixed binary data, see MessageCoderBase.encode_frames
+FRAMED = '\x00'
+_LENGTH = struct.Struct('>I')
+
+
+# Messages carrying actor state, which may hold queued tokens anywhere in it
+_STATE_COMMANDS = ('ACTOR_NEW', 'ACTOR_MIGRATE')
+
+
+def _extract_token(token, frames):
+    # Returns the encoded token with binary data replaced by a frame index. Without frames,
+    # i.e. None, the data is base64 encoded in a plain token as runtimes without binary
+    # tokens expect.
+    if not isinstance(token, dict) or token.get('type') != 'BinaryToken' or 'data' not in token:
+        return token
+    if frames is None:
+        return {'type': 'Token', 'data': base64.b64encode(token['data'])}
+    frames.append(token['data'])
+    return {'type': 'BinaryToken', 'frame': len(frames) - 1}
+
+
+def _extract_all(value, frames):
+    # Returns value with all binary token data extracted, only copying what is changed
+    if isinstance(value, dict):
+        new = _extract_token(value, frames)
+        if new is not value:
+            return new
+        changed = None
+        for k, v in value.iteritems():
+            new = _extract_all(v, frames)
+            if new is not v:
+                if changed is None:
+                    changed = dict(value)
+                changed[k] = new
+        return value if changed is None else changed
+    if isinstance(value, (list, tuple)):
+        changed = None
+        for i, v in enumerate(value):
+            new = _extract_all(v, frames)
+            if new is not v:
+                if changed is None:
+                    changed = list(value)
+                changed[i] = new
+        return value if changed is None else changed
+    return value
+
+
+def _extract_payload(payload, frames):
+    # Only token positions of token messages are inspected, other messages are returned as is
+    cmd = payload.get('cmd')
+    if cmd == 'TOKEN':
+        token = _extract_token(payload.get('token'), frames)
+        if token is payload.get('token'):
+            return payload
+        return dict(payload, token=token)
+    if cmd == 'TOKENS':
+        tokens = payload.get('tokens') or ()
+        new = [_extract_token(t, frames) for t in tokens]
+        if all(n is t for n, t in zip(new, tokens)):
+            return payload
+        return dict(payload, tokens=new)
+    if cmd in _STATE_COMMANDS:
+        return _extract_all(payload, frames)
+    return payload
+
+
+def _extract(message, frames):
+    # Returns message with binary token data replaced by frame indexes, only copying what is changed
+    if not isinstance(message, dict):
+        return message
+    if message.get('cmd') == 'TUNNEL_DATA' and isinstance(message.get('value'), dict):
+        value = _extract_payload(message['value'], frames)
+        return message if value is message['value'] else dict(message, value=value)
+    return _extract_payload(message, frames)
+
+
+def _insert(value, frames):
+    if isinstance(value, dict):
+        if value.get('type') == 'BinaryToken' and 'frame' in value:
+            return {'type': 'BinaryToken', 'data': frames[value['frame']]}
+        for k, v in value.iteritems():
+            value[k] = _insert(v, frames)
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            value[i] = _insert(v, frames)
+    return value
 
 
 class MessageCoderBase(object):
@@ -27,7 +116,8 @@ class MessageCoderBase(object):
     """
 
     def __init__(self, *args, **kwargs):
-        pass
+        # Binary token data is sent in frames, cleared by transports when the peer can't decode frames
+        self.framing = True
 
     def encode(self, data):
         """
@@ -41,3 +131,34 @@ class MessageCoderBase(object):
         """
         raise NotImplementedError()
 
+    def encode_frames(self, data, encode):
+        """
+            Encodes data with encode, any binary token data is sent as is in
+            frames after the encoded message, or base64 encoded when framing is off.
+        """
+        frames = [] if self.framing else None
+        data = _extract(data, frames)
+        if not frames:
+            return encode(data)
+        message = encode(data)
+        parts = [FRAMED, _LENGTH.pack(len(message)), message]
+        for frame in frames:
+            parts.append(_LENGTH.pack(len(frame)))
+            parts.append(str(frame) if isinstance(frame, bytearray) else frame)
+        return ''.join(parts)
+
+    def decode_frames(self, data, decode):
+        """
+            Decodes data encoded by encode_frames with decode.
+        """
+        if not data.startswith(FRAMED):
+            return decode(data)
+        length, = _LENGTH.unpack_from(data, 1)
+        pos = 5 + length
+        message = decode(data[5:pos])
+        frames = []
+        while pos < len(data):
+            length, = _LENGTH.unpack_from(data, pos)
+            frames.append(data[pos + 4:pos + 4 + length])
+            pos += 4 + length
+        return _insert(message, frames)
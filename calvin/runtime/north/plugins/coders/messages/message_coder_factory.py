@@ -17,8 +17,17 @@
 # Coders
 import json_coder
 import msgpack_coder
+import binary_coder
+
+from calvin.utilities import calvinconfig
+
+_conf = calvinconfig.get()
 
 def get_prio_list():
+    # Coders are negotiated at join, the first one in this list the peer offers is used.
+    # Older runtimes never offer binary, hence it is safe to prefer it when enabled.
+    if _conf.get(None, 'binary_coder'):
+        return ['binary', 'json', 'msgpack']
     return ['json', 'msgpack']
 
 def get(type_):
@@ -28,4 +37,7 @@ def get(type_):
     if type_ == "msgpack":
         return msgpack_coder.MessageCoder()
 
+    if type_ == "binary":
+        return binary_coder.MessageCoder()
+
     raise Exception("Coder {} requested is not supported".format(type_))
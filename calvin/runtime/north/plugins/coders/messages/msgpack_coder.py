@@ -23,8 +23,8 @@ umsgpack.compatibility = True
 class MessageCoder(MessageCoderBase):
 
     def encode(self, data):
-        return umsgpack.packb(data)
+        return self.encode_frames(data, umsgpack.packb)
 
     def decode(self, data):
-        data = umsgpack.unpackb(data)
+        data = self.decode_frames(data, umsgpack.unpackb)
         return data
@@ -0,0 +1,83 @@
+import pytest
+from mock import patch
+
+from calvin.runtime.north.calvin_token import Token, EOSToken
+from calvin.runtime.north.plugins.coders.messages import binary_coder
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory
+
+pytest_unittest = pytest.mark.unittest
+
+RT1 = "11111111-2222-3333-4444-555555555555"
+RT2 = "aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee"
+
+
+def token_message(token, sequencenbr=0):
+    return {'cmd': 'TUNNEL_DATA', 'from_rt_uuid': RT1, 'to_rt_uuid': RT2, 'tunnel_id': u"tunnel",
+            'value': {'cmd': 'TOKEN', 'port_id': "port", 'peer_port_id': "peer", 'sequencenbr': sequencenbr,
+                      'token': token.encode()}}
+
+
+@pytest_unittest
+class TestBinaryCoder(object):
+
+    def setup(self):
+        self.sender = message_coder_factory.get("binary")
+        self.receiver = message_coder_factory.get("binary")
+
+    def roundtrip(self, data):
+        return self.receiver.decode(self.sender.encode(data))
+
+    def test_values(self):
+        data = {'none': None, 'bools': [True, False], 'ints': [0, 1, -1, 127, -300, 2**70, -2**70],
+                'float': 1.5, 'text': u"r\xe4ksm\xf6rg\xe5s", 'bytes': "\x00\xff\x80",
+                'bytearray': bytearray("\x01\x02"), 'nested': [{'a': [1, {'b': ()}]}], 1: "int key"}
+        result = self.roundtrip(data)
+        data['nested'][0]['a'][1]['b'] = []
+        assert result == data
+        assert isinstance(result['bytes'], str)
+        assert isinstance(result['bytearray'], bytearray)
+        assert isinstance(result['text'], unicode)
+
+    def test_tokens(self):
+        for token in [Token(5), Token("abc"), EOSToken()]:
+            result = Token.decode(self.roundtrip(token_message(token))['value']['token'])
+            assert type(result) is type(token)
+            assert result.value == token.value
+        # Not a token, just a dict looking like one
+        assert self.roundtrip({'type': [1], 'data': 2}) == {'type': [1], 'data': 2}
+
+    def test_uuid_aliases(self):
+        first = self.sender.encode(token_message(Token(1)))
+        second = self.sender.encode(token_message(Token(2)))
+        third = self.sender.encode(token_message(Token(3)))
+        # Second message defines the aliases, later ones only use them
+        assert len(third) < len(second) == len(first)
+        assert RT1 not in third
+        for data, value in [(first, 1), (second, 2), (third, 3)]:
+            assert self.receiver.decode(data) == token_message(Token(value))
+
+    def test_alias_slots_are_reused(self):
+        uuids = ["%08d-0000-0000-0000-000000000000" % i for i in range(binary_coder.ALIAS_SLOTS + 2)]
+        for uuid in uuids:
+            assert self.roundtrip([uuid, uuid, uuid]) == [uuid, uuid, uuid]
+        assert self.roundtrip(uuids[:3]) == uuids[:3]
+        assert len(self.sender._aliases) == binary_coder.ALIAS_SLOTS
+
+    def test_failed_encode_keeps_links_in_sync(self):
+        self.roundtrip(RT1)
+        with pytest.raises(TypeError):
+            self.sender.encode([RT1, object()])
+        assert self.roundtrip([RT1, RT1]) == [RT1, RT1]
+
+    def test_known_strings(self):
+        assert len(binary_coder.KNOWN_STRINGS) == len(set(binary_coder.KNOWN_STRINGS)) <= 256
+        assert self.sender.encode({'cmd': 'REPLY'}) == "\x09\x01\x0a\x00\x0a" + chr(
+            binary_coder.KNOWN_STRINGS.index('REPLY'))
+
+
+@pytest_unittest
+@pytest.mark.parametrize("enabled,prio_list", [(False, ['json', 'msgpack']), (True, ['binary', 'json', 'msgpack'])])
+def test_prio_list(enabled, prio_list):
+    with patch('calvin.runtime.north.plugins.coders.messages.message_coder_factory._conf') as conf:
+        conf.get.return_value = enabled
+        assert message_coder_factory.get_prio_list() == prio_list
@@ -0,0 +1,64 @@
+import base64
+
+import pytest
+
+from calvin.runtime.north.calvin_token import Token, BinaryToken
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory
+
+pytest_unittest = pytest.mark.unittest
+
+IMAGE = "\xff\xd8\xff\xe0\x00\x10JFIF\x00" * 100
+
+
+@pytest_unittest
+@pytest.mark.parametrize("coder_name", ['json', 'msgpack', 'binary'])
+def test_binary_token(coder_name):
+    coder = message_coder_factory.get(coder_name)
+    message = {'cmd': 'TOKENS', 'tokens': [BinaryToken(IMAGE).encode(), Token(1).encode(),
+                                           BinaryToken(bytearray(IMAGE[:10])).encode()]}
+    data = coder.encode(message)
+    assert IMAGE in data
+    tokens = [Token.decode(t) for t in coder.decode(data)['tokens']]
+    assert [type(t) for t in tokens] == [BinaryToken, Token, BinaryToken]
+    assert tokens[0].value == IMAGE
+    assert str(tokens[2].value) == IMAGE[:10]
+    # Message itself is not changed
+    assert message['tokens'][0]['data'] is IMAGE
+
+
+@pytest_unittest
+@pytest.mark.parametrize("coder_name", ["json", "msgpack"])
+def test_plain_messages_are_not_framed(coder_name):
+    coder = message_coder_factory.get(coder_name)
+    message = {'cmd': 'TOKEN', 'token': Token("text").encode()}
+    data = coder.encode(message)
+    assert not data.startswith('\x00')
+    assert coder.decode(data) == message
+
+
+@pytest_unittest
+@pytest.mark.parametrize("coder_name", ["json", "msgpack"])
+def test_binary_token_without_framing(coder_name):
+    coder = message_coder_factory.get(coder_name)
+    # Peers that don't decode frames get the data base64 encoded in a plain token
+    coder.framing = False
+    data = coder.encode({'cmd': 'TOKEN', 'token': BinaryToken(IMAGE).encode()})
+    assert not data.startswith('\x00')
+    token = Token.decode(coder.decode(data)['token'])
+    assert type(token) is Token
+    assert token.value == base64.b64encode(IMAGE)
+
+
+@pytest_unittest
+@pytest.mark.parametrize("coder_name", ["json", "msgpack"])
+def test_binary_token_positions(coder_name):
+    coder = message_coder_factory.get(coder_name)
+    tunnel_data = {'cmd': 'TUNNEL_DATA', 'value': {'cmd': 'TOKEN', 'token': BinaryToken(IMAGE).encode()}}
+    state = {'cmd': 'ACTOR_NEW', 'state': {'inports': {'in': {'queue': {'fifo': [BinaryToken(IMAGE).encode()]}}}}}
+    for message in [tunnel_data, state]:
+        data = coder.encode(message)
+        assert data.startswith('\x00')
+        assert coder.decode(data) == message
+    # Only token messages and actor state are inspected for binary tokens
+    other = {'cmd': 'REPLY', 'value': {'type': 'BinaryToken', 'data': "text"}}
+    assert not coder.encode(other).startswith('\x00')
@@ -18,10 +18,12 @@ from calvin.runtime.north.plugins.port import endpoint
 from calvin.runtime.north.plugins.port import queue
 import calvin.requests.calvinresponse as response
 from calvin.utilities import calvinlogger
+from calvin.utilities import calvinconfig
 from calvin.runtime.north.plugins.port.connection.common import BaseConnection
 from calvin.runtime.north.plugins.port import DISCONNECT
 
 _log = calvinlogger.get_logger(__name__)
+_conf = calvinconfig.get()
 
 
 class LocalConnection(BaseConnection):
@@ -59,7 +61,10 @@ class LocalConnection(BaseConnection):
         inport.set_queue(queue.get(inport, peer_port=outport))
         outport.set_queue(queue.get(outport, peer_port=inport))
         ein = endpoint.LocalInEndpoint(inport, outport)
-        eout = endpoint.LocalOutEndpoint(outport, inport)
+        if _conf.get(None, 'local_connections') == 'direct':
+            eout = endpoint.LocalOutEndpoint(outport, inport, self.node.sched.trigger_loop)
+        else:
+            eout = endpoint.LocalOutEndpoint(outport, inport)
 
         if ein.use_monitor():
             self.node.monitor.register_endpoint(ein)
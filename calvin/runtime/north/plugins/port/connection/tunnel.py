@@ -23,8 +23,16 @@ import calvin.requests.calvinresponse as response
 from calvin.utilities import calvinlogger
 from calvin.runtime.north.plugins.port.connection.common import BaseConnection, PURPOSE
 from calvin.runtime.north.plugins.port import DISCONNECT
+from calvin.runtime.north.plugins.port.endpoint.tunnel import TOKEN_PROTOCOL
+from calvin.utilities import calvinconfig
 
 _log = calvinlogger.get_logger(__name__)
+_conf = calvinconfig.get()
+
+
+def _token_protocol():
+    """ Highest token protocol version this runtime uses """
+    return min(TOKEN_PROTOCOL, _conf.get(None, 'token_protocol') or TOKEN_PROTOCOL)
 
 
 class TunnelConnection(BaseConnection):
@@ -125,7 +133,8 @@ class TunnelConnection(BaseConnection):
 
         self.node.proto.port_connect(callback=CalvinCB(self._connected_via_tunnel),
                                         port_id=self.port.id, port_properties=self.port.properties,
-                                        peer_port_meta=self.peer_port_meta, tunnel_id=tunnel.id)
+                                        peer_port_meta=self.peer_port_meta, tunnel_id=tunnel.id,
+                                        token_protocol=_token_protocol())
 
     def _connected_via_tunnel(self, reply):
         """ Gets called when remote responds to our request for port connection """
@@ -177,8 +186,9 @@ class TunnelConnection(BaseConnection):
         else:
             self.peer_port_meta.properties.update(reply.data.get('port_properties', {}))
 
-        # Set up the port's endpoint
+        # Set up the port's endpoint, peers not replying with a token protocol only support version 1
         tunnel = self.token_tunnel.tunnels[self.peer_port_meta.node_id]
+        token_protocol = reply.data.get('token_protocol', 1)
         self.port.set_queue(queue.get(self.port, peer_port_meta=self.peer_port_meta))
         if self.port.direction == 'in':
             endp = endpoint.TunnelInEndpoint(self.port,
@@ -186,14 +196,16 @@ class TunnelConnection(BaseConnection):
                                              self.peer_port_meta.node_id,
                                              reply.data['port_id'],
                                              self.peer_port_meta.properties,
-                                             self.node.sched.trigger_loop)
+                                             self.node.sched.trigger_loop,
+                                             token_protocol)
         else:
             endp = endpoint.TunnelOutEndpoint(self.port,
                                               tunnel,
                                               self.peer_port_meta.node_id,
                                               reply.data['port_id'],
                                               self.peer_port_meta.properties,
-                                              self.node.sched.trigger_loop)
+                                              self.node.sched.trigger_loop,
+                                              token_protocol)
         if endp.use_monitor():
             # register into main loop
             self.node.monitor.register_endpoint(endp)
@@ -238,6 +250,8 @@ class TunnelConnection(BaseConnection):
         self.node.rm.connect_verification(
             self.port.owner.id, self.port.id, payload['port_id'], self.peer_port_meta.node_id)
 
+        # Use the highest token protocol both support, peers not sending it only support version 1
+        token_protocol = min(payload.get('token_protocol', 1), _token_protocol())
         self.port.set_queue(queue.get(self.port, peer_port_meta=self.peer_port_meta))
         if self.port.direction == "in":
             endp = endpoint.TunnelInEndpoint(self.port,
@@ -245,14 +259,16 @@ class TunnelConnection(BaseConnection):
                                              self.peer_port_meta.node_id,
                                              self.peer_port_meta.port_id,
                                              self.peer_port_meta.properties,
-                                             self.node.sched.trigger_loop)
+                                             self.node.sched.trigger_loop,
+                                             token_protocol)
         else:
             endp = endpoint.TunnelOutEndpoint(self.port,
                                               tunnel,
                                               self.peer_port_meta.node_id,
                                               self.peer_port_meta.port_id,
                                               self.peer_port_meta.properties,
-                                              self.node.sched.trigger_loop)
+                                              self.node.sched.trigger_loop,
+                                              token_protocol)
         if endp.use_monitor():
             self.node.monitor.register_endpoint(endp)
 
@@ -267,7 +283,8 @@ class TunnelConnection(BaseConnection):
         self.node.storage.add_port(self.port, self.node.id, self.port.owner.id)
 
         _log.analyze(self.node.id, "+ OK", payload, peer_node_id=self.peer_port_meta.node_id)
-        return response.CalvinResponse(response.OK, {'port_id': self.port.id, 'port_properties': self.port.properties})
+        return response.CalvinResponse(response.OK, {'port_id': self.port.id, 'port_properties': self.port.properties,
+                                                      'token_protocol': token_protocol})
 
     def disconnect(self, terminate=DISCONNECT.TEMPORARY):
         """ Obtain any missing information to enable disconnecting one port peer and make the disconnect"""
@@ -452,6 +469,46 @@ class TunnelConnection(BaseConnection):
                     except:
                         pass
 
+        def recv_tokens_handler(self, tunnel, payload):
+            """ Gets called when a batch of tokens arrives on any port """
+            try:
+                port = self._get_local_port(port_id=payload['peer_port_id'])
+                for e in port.endpoints:
+                    # We might have started a disconnect, just ignore in that case
+                    # it is sorted out if we connect again
+                    try:
+                        if e.peer_id == payload['port_id']:
+                            e.recv_tokens(payload)
+                            break
+                    except:
+                        pass
+            except:
+                # See recv_token_handler
+                _log.debug("recv_tokens_handler, ABORT")
+                reply = {'cmd': 'TOKENS_REPLY',
+                         'port_id': payload['port_id'],
+                         'peer_port_id': payload['peer_port_id'],
+                         'sequencenbr': None,
+                         'credit': 0,
+                         'epoch': payload.get('epoch', 0),
+                         'value': 'ABORT'}
+                tunnel.send(reply)
+
+        def recv_tokens_reply_handler(self, tunnel, payload):
+            """ Gets called when a batch of tokens is (N)ACKed or credit is updated for any port """
+            try:
+                port = self._get_local_port(port_id=payload['port_id'])
+            except:
+                pass
+            else:
+                for e in port.endpoints:
+                    try:
+                        if e.get_peer()[1] == payload['peer_port_id']:
+                            e.reply_tokens(payload)
+                            break
+                    except:
+                        pass
+
         def tunnel_recv_handler(self, tunnel, payload):
             """ Gets called when we receive a message over a tunnel """
             if 'cmd' in payload:
@@ -459,6 +516,10 @@ class TunnelConnection(BaseConnection):
                     self.recv_token_handler(tunnel, payload)
                 elif 'TOKEN_REPLY' == payload['cmd']:
                     self.recv_token_reply_handler(tunnel, payload)
+                elif 'TOKENS' == payload['cmd']:
+                    self.recv_tokens_handler(tunnel, payload)
+                elif 'TOKENS_REPLY' == payload['cmd']:
+                    self.recv_tokens_reply_handler(tunnel, payload)
 
     def init(self):
         return TunnelConnection.TokenTunnel(self.node, self.kwargs['portmanager'])
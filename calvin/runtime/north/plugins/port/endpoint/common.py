@@ -25,6 +25,8 @@ class Endpoint(object):
         self.port = port
         self.former_peer_id = former_peer_id
         self.remaining_tokens = {}
+        # Set by the monitor when registered
+        self.monitor = None
 
     def __str__(self):
         return "%s(port_id=%s)" % (self.__class__.__name__, self.port.id)
@@ -35,6 +37,13 @@ class Endpoint(object):
     def use_monitor(self):
         return False
 
+    def notify(self):
+        """
+        Called when communicate() might have something to do, e.g. tokens written to the port.
+        """
+        if self.monitor is not None:
+            self.monitor.mark_dirty(self)
+
     def communicate(self):
         """
         Called by the runtime when it is possible to transfer data to counterpart.
@@ -42,6 +51,12 @@ class Endpoint(object):
         raise Exception("Can't communicate on endpoint in port %s.%s with id: %s" % (
             self.port.owner.name, self.port.name, self.port.id))
 
+    def get_actor_ids(self):
+        """
+        Ids of actors that might be able to fire after communicate() transferred data.
+        """
+        return []
+
     def destroy(self):
         pass
 
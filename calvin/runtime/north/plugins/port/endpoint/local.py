@@ -35,6 +35,7 @@ class LocalInEndpoint(Endpoint):
         super(LocalInEndpoint, self).__init__(port)
         self.peer_port = peer_port
         self.peer_id = peer_port.id
+        self.peer_endpoint = None
         self.pressure_count = 0
         self.pressure = [0] * PRESSURE_LENGTH
         self.pressure_last = 0
@@ -56,19 +57,36 @@ class LocalInEndpoint(Endpoint):
             tokens = self.port.queue.exhaust(peer_id=self.peer_port.id, terminate=DISCONNECT.EXHAUST_PEER_RECV)
             self.remaining_tokens = {self.port.id: tokens}
 
+    def notify(self):
+        # Token slots freed, the peer endpoint might be able to move more tokens
+        if self.peer_endpoint is None:
+            for e in self.peer_port.endpoints:
+                if e.peer_id == self.port.id:
+                    self.peer_endpoint = e
+                    break
+            else:
+                return
+        self.peer_endpoint.notify()
+
     def get_peer(self):
         return ('local', self.peer_id)
 
 
 class LocalOutEndpoint(Endpoint):
 
-    """docstring for LocalEndpoint"""
+    """
+    Local outport endpoint, tokens are moved to the peer inport's queue by communicate().
+    When trigger_loop is given, tokens are moved directly when written or when token slots
+    are freed in the peer queue, and the actors are triggered, instead of waiting for the
+    next monitor loop.
+    """
 
-    def __init__(self, port, peer_port):
+    def __init__(self, port, peer_port, trigger_loop=None):
         super(LocalOutEndpoint, self).__init__(port)
         self.peer_port = peer_port
         self.peer_id = peer_port.id
         self.peer_endpoint = None
+        self.trigger_loop = trigger_loop
 
     def is_connected(self):
         return True
@@ -97,6 +115,16 @@ class LocalOutEndpoint(Endpoint):
     def use_monitor(self):
         return True
 
+    def notify(self):
+        if self.trigger_loop is None:
+            super(LocalOutEndpoint, self).notify()
+        elif self.communicate():
+            self.trigger_loop(actor_ids=self.get_actor_ids())
+
+    def get_actor_ids(self):
+        # Peer got tokens and we got free token slots
+        return [self.peer_port.owner.id, self.port.owner.id]
+
     def communicate(self, *args, **kwargs):
         if self.peer_endpoint is None:
             for e in self.peer_port.endpoints:
@@ -26,23 +26,42 @@ _log = get_logger(__name__)
 #
 # Remote tunnel endpoints
 #
+# Token protocol versions, negotiated when connecting the ports:
+#   1: One TOKEN message per token, each (N)ACKed with a TOKEN_REPLY. After a NACK the
+#      sender backs off and sends one token at a time.
+#   2: TOKENS messages carry a batch of tokens with consecutive sequence numbers. The
+#      receiver answers with a TOKENS_REPLY holding a cumulative ACK (last contiguous
+#      sequence number accepted) and its free token slots (credit). The sender keeps at
+#      most credit tokens beyond the ACK in flight. The receiver sends unsolicited
+#      TOKENS_REPLY credit updates when its actor frees slots. A NACK means that tokens
+#      after the ACK were rejected, and the sender resends from there.
+#
 
 PRESSURE_LENGTH = 20
+TOKEN_PROTOCOL = 2
 
 class TunnelInEndpoint(Endpoint):
 
     """docstring for TunnelInEndpoint"""
 
-    def __init__(self, port, tunnel, peer_node_id, peer_port_id, peer_port_properties, trigger_loop):
+    def __init__(self, port, tunnel, peer_node_id, peer_port_id, peer_port_properties, trigger_loop, protocol=1):
         super(TunnelInEndpoint, self).__init__(port)
         self.tunnel = tunnel
         self.peer_id = peer_port_id
         self.peer_node_id = peer_node_id
         self.peer_port_properties = peer_port_properties
         self.trigger_loop = trigger_loop
+        self.protocol = protocol
         self.pressure_count = 0
         self.pressure = [0] * PRESSURE_LENGTH
         self.pressure_last = 0
+        # Protocol 2: last contiguous sequence number accepted and the last sequence number
+        # the sender is allowed to send according to the last reply
+        self._acked = None
+        self._advertised_end = None
+        self._queue_length = self.port.properties.get('queue_length', 4)
+        # Only update the credit when it has grown this much, to not reply on every token read
+        self._update_threshold = max(1, self._queue_length // 2)
 
     def __str__(self):
         str = super(TunnelInEndpoint, self).__str__()
@@ -71,7 +90,7 @@ class TunnelInEndpoint(Endpoint):
             r = self.port.queue.com_write(Token.decode(payload['token']), self.peer_id, payload['sequencenbr'])
             if r == COMMIT_RESPONSE.handled:
                 # New token, trigger loop
-                self.trigger_loop()
+                self.trigger_loop(actor_ids=[self.port.owner.id])
             if r == COMMIT_RESPONSE.invalid:
                 ok = False
             else:
@@ -81,9 +100,7 @@ class TunnelInEndpoint(Endpoint):
         except QueueFull:
             # Queue full just send NACK
             ok = False
-            if self.pressure[(self.pressure_count - 1) % PRESSURE_LENGTH] != payload['sequencenbr']:
-                self.pressure[self.pressure_count % PRESSURE_LENGTH] = payload['sequencenbr']
-                self.pressure_count += 1
+            self._record_pressure(payload['sequencenbr'])
         self.pressure_last = payload['sequencenbr']
         reply = {
             'cmd': 'TOKEN_REPLY',
@@ -92,7 +109,80 @@ class TunnelInEndpoint(Endpoint):
             'sequencenbr': payload['sequencenbr'],
             'value': 'ACK' if ok else 'NACK'
         }
-        self.tunnel.send(reply)
+        # The sender waits for the reply before sending more tokens
+        self.tunnel.send(reply, flush=True)
+
+    def _record_pressure(self, sequencenbr):
+        """ Token sequencenbr did not fit in the queue, each sequencenbr is only counted once """
+        if self.pressure[(self.pressure_count - 1) % PRESSURE_LENGTH] != sequencenbr:
+            self.pressure[self.pressure_count % PRESSURE_LENGTH] = sequencenbr
+            self.pressure_count += 1
+
+    def recv_tokens(self, payload):
+        first = payload['sequencenbr']
+        ok = True
+        new_tokens = False
+        ack = self._acked
+        for i, data in enumerate(payload['tokens']):
+            sequencenbr = first + i
+            self.pressure_last = sequencenbr
+            try:
+                r = self.port.queue.com_write(Token.decode(data), self.peer_id, sequencenbr)
+            except QueueFull:
+                # Only when the sender did not keep within the credit
+                ok = False
+                self._record_pressure(sequencenbr)
+                break
+            if r == COMMIT_RESPONSE.invalid:
+                # Not the next token, earlier tokens were rejected
+                ok = False
+                break
+            new_tokens |= r == COMMIT_RESPONSE.handled
+            if ack is None or sequencenbr > ack:
+                ack = sequencenbr
+        _log.debug("recv_tokens %s %s: %d-%d => %s %s" % (self.port.id, self.port.name, first,
+                                                           first + len(payload['tokens']) - 1, ok, ack))
+        self._acked = ack
+        if new_tokens:
+            self.trigger_loop(actor_ids=[self.port.owner.id])
+        self._send_reply(payload.get('epoch', 0), 'ACK' if ok else 'NACK')
+
+    def _free_slots(self):
+        # Largest number of slots available, slots_available only answers yes or no
+        low, high = 0, self._queue_length
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.port.queue.slots_available(mid, self.peer_id):
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    def _send_reply(self, epoch, value):
+        credit = self._free_slots()
+        if self._acked is not None:
+            self._advertised_end = self._acked + credit
+            if credit == 0:
+                # The sender is stopped from sending the next token, which is the same
+                # pressure as a token not fitting in the queue with protocol 1
+                self._record_pressure(self._acked + 1)
+        self.tunnel.send({
+            'cmd': 'TOKENS_REPLY',
+            'port_id': self.peer_id,
+            'peer_port_id': self.port.id,
+            'sequencenbr': self._acked,
+            'credit': credit,
+            'epoch': epoch,
+            'value': value
+        }, flush=True)
+
+    def notify(self):
+        # Token slots freed, send a credit update when the sender might be waiting for it
+        if self.protocol < 2 or self._advertised_end is None:
+            return
+        needed = self._advertised_end - self._acked + self._update_threshold
+        if needed <= self._queue_length and self.port.queue.slots_available(needed, self.peer_id):
+            self._send_reply(None, 'ACK')
 
     def set_peer_port_id(self, id):
         if self.peer_id is None:
@@ -108,18 +198,29 @@ class TunnelOutEndpoint(Endpoint):
 
     """docstring for TunnelOutEndpoint"""
 
-    def __init__(self, port, tunnel, peer_node_id, peer_port_id, peer_port_properties, trigger_loop):
+    MAX_BATCH = 32
+
+    def __init__(self, port, tunnel, peer_node_id, peer_port_id, peer_port_properties, trigger_loop, protocol=1):
         super(TunnelOutEndpoint, self).__init__(port)
         self.tunnel = tunnel
         self.peer_id = peer_port_id
         self.peer_node_id = peer_node_id
         self.peer_port_properties = peer_port_properties
         self.trigger_loop = trigger_loop
+        self.protocol = protocol
         # Keep track of acked tokens, only contains something post call if acks comes out of order
         self.sequencenbrs_acked = []
         self.backoff = 0.0
         self.time_cont = 0.0
         self.bulk = True
+        # Protocol 2: last acked sequence number, next sequence number to send and the last
+        # sequence number allowed to send. The epoch is increased when resending, to ignore
+        # NACKs for tokens sent before that.
+        self.acked = None
+        self.next_seq = None
+        self.window_end = None
+        self.epoch = 0
+        self.initial_credit = (peer_port_properties or {}).get('queue_length', 4)
 
     def __str__(self):
         str = super(TunnelOutEndpoint, self).__str__()
@@ -162,8 +263,9 @@ class TunnelOutEndpoint(Endpoint):
         # Back to full send speed directly
         self.bulk = True
         self.backoff = 0.0
+        self.notify()
         # Maybe someone can fill the queue again
-        self.trigger_loop()
+        self.trigger_loop(actor_ids=[self.port.owner.id])
         r = self.port.queue.com_commit(self.peer_id, sequencenbr)
         if r == COMMIT_RESPONSE.handled or r == COMMIT_RESPONSE.invalid:
             return
@@ -184,12 +286,63 @@ class TunnelOutEndpoint(Endpoint):
             self.trigger_loop()
         self.bulk = False
         self.backoff = min(1.0, 0.1 if self.backoff < 0.1 else self.backoff * 2.0)
+        self.notify()
 
         r = self.port.queue.com_cancel(self.peer_id, sequencenbr)
         if r == COMMIT_RESPONSE.handled:
             # Filter out ACK for later seq nbrs, should not happen but precaution
             self.sequencenbrs_acked = [n for n in self.sequencenbrs_acked if n < sequencenbr]
 
+    def reply_tokens(self, payload):
+        if payload['value'] == 'ABORT' or self.acked is None:
+            return
+        ack = payload['sequencenbr']
+        if ack is not None:
+            for sequencenbr in range(self.acked + 1, ack + 1):
+                if self.port.queue.com_commit(self.peer_id, sequencenbr) != COMMIT_RESPONSE.handled:
+                    break
+                self.acked = sequencenbr
+        self.window_end = self.acked + payload['credit']
+        if payload['value'] == 'NACK' and payload['epoch'] == self.epoch and self.acked + 1 < self.next_seq:
+            # Resend rejected tokens
+            self.port.queue.com_cancel(self.peer_id, self.acked + 1)
+            self.next_seq = self.acked + 1
+            self.epoch += 1
+        # Maybe someone can fill the queue again
+        self.trigger_loop(actor_ids=[self.port.owner.id])
+        self.notify()
+
+    def _send_tokens(self):
+        """ Send tokens within the window in one message, returns True if any was sent """
+        queue = self.port.queue
+        tokens = []
+        first = None
+        while len(tokens) < self.MAX_BATCH and queue.tokens_available(1, self.peer_id):
+            if self.next_seq is not None and self.next_seq > self.window_end:
+                break
+            sequencenbr, token = queue.com_peek(self.peer_id)
+            if self.next_seq is None:
+                # First token sent, the receiver's queue is assumed to have room
+                self.acked = sequencenbr - 1
+                self.window_end = self.acked + self.initial_credit
+            if first is None:
+                first = sequencenbr
+            tokens.append(token.encode())
+            self.next_seq = sequencenbr + 1
+        if not tokens:
+            return False
+        _log.debug("Send on port  %s/%s/%s [%i-%i]" % (self.port.owner.name, self.peer_id, self.port.name,
+                                                        first, self.next_seq - 1))
+        self.tunnel.send({
+            'cmd': 'TOKENS',
+            'tokens': tokens,
+            'peer_port_id': self.peer_id,
+            'sequencenbr': first,
+            'epoch': self.epoch,
+            'port_id': self.port.id
+        })
+        return True
+
     def _send_one_token(self):
         sequencenbr_sent, token = self.port.queue.com_peek(self.peer_id)
         _log.debug("Send on port  %s/%s/%s [%i] %s" % (self.port.owner.name,
@@ -209,6 +362,11 @@ class TunnelOutEndpoint(Endpoint):
         return True
 
     def communicate(self, *args, **kwargs):
+        if self.protocol >= 2:
+            sent = False
+            while self._send_tokens():
+                sent = True
+            return sent
         # FIXME uses internal queue attributes
         sent = False
         if self.bulk:
@@ -226,6 +384,9 @@ class TunnelOutEndpoint(Endpoint):
             self.time_cont = time.time() + self.backoff
             # Make sure that resend will be tried in backoff seconds
             self.trigger_loop(self.backoff)
+        if not sent and not self.bulk and self.port.queue.tokens_available(1, self.peer_id):
+            # Waiting for reply or backoff, check again next loop
+            self.notify()
         return sent
 
     def get_peer(self):
@@ -16,6 +16,7 @@
 
 # Queues
 _MODULES = {'fanout_fifo': 'FanoutFIFO',
+            'compact_fifo': 'CompactFIFO',
             'collect_unordered': 'CollectUnordered',
             'collect_tagged': "CollectTagged",
             'collect_synced': 'CollectSynced',
@@ -27,8 +28,10 @@ _MODULES = {'fanout_fifo': 'FanoutFIFO',
             'fanout_mapped_fifo': 'FanoutMappedFIFO'}
 
 from calvin.utilities.calvinlogger import get_logger
+from calvin.utilities import calvinconfig
 
 _log = get_logger(__name__)
+_conf = calvinconfig.get()
 
 
 for module in _MODULES.keys():
@@ -61,6 +64,8 @@ def get(port, peer_port=None, peer_port_meta=None):
             selected_queue = "collect_synced"
         elif routing_prop == 'collect-any-tagged':
             selected_queue = "collect_any"
+        elif _conf.get(None, 'queue_implementation') == 'compact':
+            selected_queue = "compact_fifo"
         else:
             selected_queue = "fanout_fifo"
     try:
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from array import array
+
+from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.plugins.port.queue.common import QueueFull, QueueEmpty, COMMIT_RESPONSE
+from calvin.runtime.north.plugins.port.queue.fanout_fifo import FanoutFIFO
+from calvin.utilities import calvinconfig
+from calvin.utilities import calvinlogger
+
+_log = calvinlogger.get_logger(__name__)
+_conf = calvinconfig.get()
+
+
+class TypedBuffer(object):
+
+    """
+    Token storage keeping the values of plain numeric tokens in a typed array,
+    tokens are recreated when read.
+    """
+
+    def __init__(self, typecode, length):
+        super(TypedBuffer, self).__init__()
+        self.values = array(typecode, [0] * length)
+        self.value_type = float if typecode in 'fd' else int
+        # Range of values the array can hold, None for floats
+        self.value_range = None
+        if self.value_type is int:
+            bits = 8 * self.values.itemsize
+            if typecode.isupper():
+                self.value_range = (0, (1 << bits) - 1)
+            else:
+                self.value_range = (-(1 << (bits - 1)), (1 << (bits - 1)) - 1)
+
+    def accepts(self, token):
+        if type(token) is not Token or type(token.value) is not self.value_type:
+            return False
+        return self.value_range is None or self.value_range[0] <= token.value <= self.value_range[1]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        return Token(self.values[index])
+
+    def __setitem__(self, index, token):
+        self.values[index] = token.value
+
+    def __iter__(self):
+        return (Token(v) for v in self.values)
+
+    def __str__(self):
+        return str(self.values.tolist())
+
+
+class CompactFIFO(FanoutFIFO):
+
+    """
+    Default FIFO, all tokens to all peers, with the slowest reader position cached
+    and bulk operations. Values of plain numeric tokens are optionally kept in a
+    typed array (see config option compact_queue_typecode), the queue falls back
+    to storing tokens when other tokens are written.
+    The state is that of FanoutFIFO, hence it migrates to and from runtimes using FanoutFIFO.
+    """
+
+    def __init__(self, port_properties, peer_port_properties):
+        super(CompactFIFO, self).__init__(port_properties, peer_port_properties)
+        self.typecode = _conf.get(None, 'compact_queue_typecode')
+        if self.typecode:
+            self.fifo = TypedBuffer(self.typecode, self.N)
+        # Lowest read position of all readers, None when it needs to be recalculated
+        self._min_read_pos = 0
+
+    def _set_state(self, state):
+        super(CompactFIFO, self)._set_state(state)
+        if self.typecode:
+            buf = TypedBuffer(self.typecode, self.N)
+            if all(buf.accepts(t) for t in self.fifo):
+                for i, t in enumerate(self.fifo):
+                    buf[i] = t
+                self.fifo = buf
+        self._min_read_pos = None
+
+    def _accept(self, tokens):
+        """ Make sure that the fifo can store the tokens """
+        if isinstance(self.fifo, TypedBuffer) and not all(self.fifo.accepts(t) for t in tokens):
+            self.fifo = list(self.fifo)
+
+    def _last_read_pos(self):
+        if self._min_read_pos is None:
+            self._min_read_pos = min(self.read_pos.values() or [0])
+        return self._min_read_pos
+
+    def add_reader(self, reader, properties):
+        super(CompactFIFO, self).add_reader(reader, properties)
+        self._min_read_pos = None
+
+    def remove_reader(self, reader):
+        super(CompactFIFO, self).remove_reader(reader)
+        self._min_read_pos = None
+
+    def write(self, data, metadata):
+        if not self.slots_available(1, metadata):
+            raise QueueFull()
+        self._accept((data,))
+        write_pos = self.write_pos
+        self.fifo[write_pos % self.N] = data
+        self.write_pos = write_pos + 1
+        return True
+
+    def write_many(self, data, metadata):
+        length = len(data)
+        if not self.slots_available(length, metadata):
+            raise QueueFull()
+        self._accept(data)
+        write_pos = self.write_pos
+        N = self.N
+        start = write_pos % N
+        end = start + length
+        if end <= N and not isinstance(self.fifo, TypedBuffer):
+            self.fifo[start:end] = data
+        else:
+            for i, d in enumerate(data):
+                self.fifo[(write_pos + i) % N] = d
+        self.write_pos = write_pos + length
+        return True
+
+    def slots_available(self, length, metadata):
+        return (self.N - ((self.write_pos - self._last_read_pos()) % self.N) - 1) >= length
+
+    def peek_many(self, metadata, length):
+        if metadata not in self.readers:
+            raise Exception("Unknown reader: '%s'" % metadata)
+        if not self.tokens_available(length, metadata):
+            raise QueueEmpty(reader=metadata)
+        read_pos = self.tentative_read_pos[metadata]
+        N = self.N
+        start = read_pos % N
+        end = start + length
+        if end <= N and not isinstance(self.fifo, TypedBuffer):
+            data = self.fifo[start:end]
+        else:
+            data = [self.fifo[(read_pos + i) % N] for i in range(length)]
+        self.tentative_read_pos[metadata] = read_pos + length
+        return data
+
+    def commit(self, metadata):
+        # Invalidate first since exhaustion tokens are transfered during commit
+        self._min_read_pos = None
+        terminated = super(CompactFIFO, self).commit(metadata)
+        self._min_read_pos = None
+        return terminated
+
+    def commit_many(self, metadata, length):
+        """ Commit the length oldest peeked tokens, any other peeked tokens are still tentative """
+        tentative_read_pos = self.tentative_read_pos[metadata]
+        read_pos = self.read_pos[metadata] + length
+        if read_pos > tentative_read_pos:
+            raise Exception("Can't commit %d tokens, only %d peeked" % (
+                length, tentative_read_pos - self.read_pos[metadata]))
+        self.tentative_read_pos[metadata] = read_pos
+        terminated = self.commit(metadata)
+        self.tentative_read_pos[metadata] = tentative_read_pos
+        return terminated
+
+    def com_commit(self, reader, sequence_nbr):
+        r = super(CompactFIFO, self).com_commit(reader, sequence_nbr)
+        if r == COMMIT_RESPONSE.handled:
+            self._min_read_pos = None
+        return r
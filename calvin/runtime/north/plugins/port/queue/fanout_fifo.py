@@ -211,6 +211,17 @@ class FanoutFIFO(object):
         self.write_pos = write_pos + 1
         return True
 
+    def write_many(self, data, metadata):
+        length = len(data)
+        if not self.slots_available(length, metadata):
+            raise QueueFull()
+        write_pos = self.write_pos
+        N = self.N
+        for i, d in enumerate(data):
+            self.fifo[(write_pos + i) % N] = d
+        self.write_pos = write_pos + length
+        return True
+
     def slots_available(self, length, metadata):
         last_readpos = min(self.read_pos.values() or [0])
         return (self.N - ((self.write_pos - last_readpos) % self.N) - 1) >= length
@@ -235,6 +246,17 @@ class FanoutFIFO(object):
         self.tentative_read_pos[metadata] = read_pos + 1
         return data
 
+    def peek_many(self, metadata, length):
+        if metadata not in self.readers:
+            raise Exception("Unknown reader: '%s'" % metadata)
+        if not self.tokens_available(length, metadata):
+            raise QueueEmpty(reader=metadata)
+        read_pos = self.tentative_read_pos[metadata]
+        N = self.N
+        data = [self.fifo[(read_pos + i) % N] for i in range(length)]
+        self.tentative_read_pos[metadata] = read_pos + length
+        return data
+
     def commit(self, metadata):
         _log.debug("COMMIT EXHAUSTING???")
         self.read_pos[metadata] = self.tentative_read_pos[metadata]
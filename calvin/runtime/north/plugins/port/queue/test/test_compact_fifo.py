@@ -0,0 +1,110 @@
+import pytest
+from mock import patch
+
+pytest_unittest = pytest.mark.unittest
+
+from calvin.runtime.north.calvin_token import Token, ExceptionToken
+from calvin.runtime.north.plugins.port import queue
+from calvin.runtime.north.plugins.port.queue.compact_fifo import CompactFIFO, TypedBuffer
+from calvin.runtime.north.plugins.port.queue.common import QueueFull
+from calvin.runtime.north.plugins.port.queue.test.test_fanout_fifo import TestFanoutFIFO, DummyPort
+
+
+@pytest_unittest
+class TestCompactFIFO(TestFanoutFIFO):
+
+    typecode = None
+
+    def create_port(self):
+        port = DummyPort()
+        port.properties = {'routing': self.routing, "direction": self.direction,
+                            'nbr_peers': self.num_peers}
+        with patch('calvin.runtime.north.plugins.port.queue._conf') as conf:
+            conf.get.return_value = 'compact'
+            with patch('calvin.runtime.north.plugins.port.queue.compact_fifo._conf') as compact_conf:
+                compact_conf.get.return_value = self.typecode
+                q = queue.get(port)
+        self.assertIsInstance(q, CompactFIFO)
+        return q
+
+    def testSlowestReader(self):
+        for r in ["reader-1", "reader-2"]:
+            self.outport.add_reader(r, {})
+        self.outport.write_many([Token(i) for i in range(self.outport.N - 1)], None)
+        self.assertFalse(self.outport.slots_available(1, None))
+        self.outport.peek("reader-1")
+        self.outport.commit("reader-1")
+        # reader-2 has not read anything yet
+        self.assertFalse(self.outport.slots_available(1, None))
+        self.outport.peek("reader-2")
+        self.outport.commit("reader-2")
+        self.assertTrue(self.outport.slots_available(1, None))
+        self.outport.remove_reader("reader-2")
+        self.assertTrue(self.outport.slots_available(1, None))
+
+    def testWrapAround(self):
+        self.outport.add_reader("reader", {})
+        for n in range(3):
+            data = [Token(n * 10 + i) for i in range(self.outport.N - 1)]
+            self.outport.write_many(data, None)
+            self.assertEqual([t.value for t in self.outport.peek_many("reader", len(data))],
+                             [t.value for t in data])
+            self.outport.commit("reader")
+            self.outport.write(Token(n), None)
+            self.assertEqual(self.outport.peek("reader").value, n)
+            self.outport.commit("reader")
+
+    def testCommitMany(self):
+        self.outport.add_reader("reader", {})
+        self.outport.write_many([Token(i) for i in range(4)], None)
+        self.outport.peek_many("reader", 3)
+        self.outport.commit_many("reader", 2)
+        # The third token is still peeked
+        self.assertEqual(self.outport.peek("reader").value, 3)
+        self.outport.cancel("reader")
+        self.assertEqual(self.outport.peek("reader").value, 2)
+        self.assertTrue(self.outport.slots_available(self.outport.N - 3, None))
+        with self.assertRaises(Exception):
+            self.outport.commit_many("reader", 3)
+
+
+@pytest_unittest
+class TestTypedCompactFIFO(TestCompactFIFO):
+
+    typecode = 'l'
+
+    def testTypedStorage(self):
+        self.outport.add_reader("reader", {})
+        self.outport.write_many([Token(1), Token(2)], None)
+        self.assertIsInstance(self.outport.fifo, TypedBuffer)
+        self.assertEqual(self.outport.peek("reader").value, 1)
+        # Non-numeric tokens switch to token storage, keeping previous tokens
+        self.outport.write(ExceptionToken(), None)
+        self.assertIsInstance(self.outport.fifo, list)
+        self.assertEqual(self.outport.peek("reader").value, 2)
+        self.assertIsInstance(self.outport.peek("reader"), ExceptionToken)
+
+    def testOutOfRange(self):
+        self.outport.add_reader("reader", {})
+        self.outport.write(Token(1), None)
+        # Too large for the typed array, switches to token storage
+        self.outport.write(Token(1 << 70), None)
+        self.assertIsInstance(self.outport.fifo, list)
+        self.assertEqual([t.value for t in self.outport.peek_many("reader", 2)], [1, 1 << 70])
+        self.outport.cancel("reader")
+        buf = TypedBuffer('B', 2)
+        self.assertTrue(buf.accepts(Token(255)))
+        self.assertFalse(buf.accepts(Token(256)))
+        self.assertFalse(buf.accepts(Token(-1)))
+
+    def testTypedState(self):
+        self.outport.add_reader("reader", {})
+        self.outport.write_many([Token(1), Token(2)], None)
+        state = self.outport._state()
+        self.assertEqual(state['queuetype'], "fanout_fifo")
+        port = self.create_port()
+        port._set_state(state)
+        self.assertIsInstance(port.fifo, TypedBuffer)
+        self.assertEqual([t.value for t in port.peek_many("reader", 2)], [1, 2])
+        with self.assertRaises(QueueFull):
+            port.write_many([Token(i) for i in range(port.N)], None)
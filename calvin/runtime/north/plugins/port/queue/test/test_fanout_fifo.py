@@ -136,6 +136,23 @@ class TestFanoutFIFO(unittest.TestCase):
         with self.assertRaises(Exception):
             self.outport.peek("unknown reader")
 
+    def testPeekMany(self):
+        self.outport.add_reader("reader", {})
+        self.outport.write_many(["data-1", "data-2", "data-3"], None)
+        self.assertEqual(self.outport.peek_many("reader", 2), ["data-1", "data-2"])
+        self.assertEqual(self.outport.peek("reader"), "data-3")
+        with self.assertRaises(QueueEmpty):
+            self.outport.peek_many("reader", 1)
+        self.outport.cancel("reader")
+        self.assertEqual(self.outport.peek_many("reader", 3), ["data-1", "data-2", "data-3"])
+
+    def testWriteMany_QueueFull(self):
+        self.outport.add_reader("reader", {})
+        with self.assertRaises(QueueFull):
+            self.outport.write_many(["data"] * self.outport.N, None)
+        # Nothing written
+        self.assertFalse(self.outport.tokens_available(1, "reader"))
+
     def testCancel(self):
         self.outport.add_reader("reader", {})
         self.outport.write("data", None)
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import time
+
+from calvin.utilities.calvin_callback import CalvinCB
+from calvin.utilities import calvinlogger
+
+_log = calvinlogger.get_logger(__name__)
+
+# Entries in a bucket before later entries go to the bucket one level deeper
+MAX_BUCKET_ENTRIES = 64
+# Seconds a bucket is known not to be split when adding
+BUCKET_STATE_TTL = 60.0
+
+
+def index_key(levels):
+    """ The registry key of an index given as list of levels """
+    return "/" + "/".join(levels)
+
+
+class _Node(object):
+    __slots__ = ('children', 'values')
+
+    def __init__(self):
+        self.children = {}  # key: level, value: _Node
+        self.values = set([])
+
+
+class PrefixIndex(object):
+    """
+        Trie of index levels, values are kept at the level they were added to.
+        A get of a level returns the values at that level and all levels below it.
+    """
+
+    def __init__(self):
+        super(PrefixIndex, self).__init__()
+        self._root = _Node()
+
+    def _path(self, levels):
+        """ The nodes from the root to levels, None when not in the trie """
+        path = [self._root]
+        for level in levels:
+            node = path[-1].children.get(level)
+            if node is None:
+                return None
+            path.append(node)
+        return path
+
+    def _prune(self, levels, path):
+        """ Remove nodes without values or children, from the end of path """
+        for level, parent, node in reversed(zip(levels, path[:-1], path[1:])):
+            if node.values or node.children:
+                break
+            del parent.children[level]
+
+    def add(self, levels, value):
+        node = self._root
+        for level in levels:
+            node = node.children.setdefault(level, _Node())
+        node.values.add(value)
+
+    def remove(self, levels, value):
+        """ Remove value added to levels, returns False when not there """
+        path = self._path(levels)
+        if path is None or value not in path[-1].values:
+            return False
+        path[-1].values.discard(value)
+        self._prune(levels, path)
+        return True
+
+    def delete(self, levels):
+        """ Remove all values at and below levels """
+        path = self._path(levels)
+        if path is None:
+            return False
+        path[-1].values.clear()
+        path[-1].children.clear()
+        self._prune(levels, path)
+        return True
+
+    def get(self, levels):
+        """ The set of values at and below levels """
+        path = self._path(levels)
+        values = set([])
+        nodes = [path[-1]] if path else []
+        while nodes:
+            node = nodes.pop()
+            values |= node.values
+            nodes.extend(node.children.values())
+        return values
+
+
+class PrefixHashTree(object):
+    """
+        Prefix search on top of a registry with only append, remove and get_concat, e.g. the DHT.
+
+        The entries of an index are kept in one bucket, the registry key of its root prefix levels.
+        Each entry is the levels below the root and the value, hence adding a value is one write.
+        A bucket with max_entries entries is split, later entries go to the bucket one level
+        deeper and a child marker in the bucket tells searches to follow.
+        Get, remove and delete don't know the root prefix level the values were added with, they
+        read the buckets of all prefixes of the index in parallel and use the entries at or below it.
+
+        Runtimes before the tree stored the value itself at each level from the root prefix level
+        down to the index, such values are still found and removed. With tree False values are
+        added and removed that way, for registries shared with such runtimes, and get and delete
+        read only the index key, the buckets of the tree are searched when entries are found there.
+    """
+
+    def __init__(self, storage, prefix="index-", tree=True, max_entries=MAX_BUCKET_ENTRIES):
+        super(PrefixHashTree, self).__init__()
+        self._storage = storage
+        self._prefix = prefix
+        self._tree = tree
+        self._max_entries = max_entries
+        self._sizes = {}  # key: bucket, value: (entries, time when read), a split bucket counts as full
+        self._children = set([])  # (bucket, level) child markers written by this runtime
+
+    @staticmethod
+    def _entry(path, value):
+        return json.dumps([path, value])
+
+    @staticmethod
+    def _child(level):
+        return json.dumps({'child': level})
+
+    @staticmethod
+    def _parse(item):
+        """ Returns (path, value) of an entry, (None, level) of a child marker and
+            (None, None) of a value stored per level
+        """
+        try:
+            parsed = json.loads(item)
+        except (ValueError, TypeError):
+            return None, None
+        if isinstance(parsed, list) and len(parsed) == 2 and isinstance(parsed[0], list):
+            return parsed
+        if isinstance(parsed, dict) and 'child' in parsed:
+            return None, parsed['child']
+        return None, None
+
+    def _size(self, items):
+        if any(path is None and child is not None for path, child in (self._parse(i) for i in items)):
+            return self._max_entries
+        return len(items)
+
+    def _known_split(self, key):
+        size, when = self._sizes.get(key, (0, None))
+        if size >= self._max_entries:
+            return True
+        if when is None or time.time() - when > BUCKET_STATE_TTL:
+            return None
+        return False
+
+    def _has_tree_items(self, items):
+        return any(path is not None or child is not None for path, child in (self._parse(i) for i in items))
+
+    @staticmethod
+    def _level_keys(levels, root_prefix_level):
+        """ The keys a value is stored at when stored per level """
+        return [index_key(levels[:n]) for n in range(min(root_prefix_level, len(levels)), len(levels) + 1)]
+
+    def _write_keys(self, op, keys, values, org_key, cb):
+        """ op(values) at each key, cb(key=org_key, value=True when all succeeded) """
+        state = {'pending': len(keys), 'ok': True}
+        for key in keys:
+            op(prefix=self._prefix, key=key, value=values,
+               cb=CalvinCB(self._done, state=state, org_key=org_key, org_cb=cb))
+
+    def add(self, levels, root_prefix_level, value, cb=None):
+        if not self._tree:
+            self._write_keys(self._storage.append, self._level_keys(levels, root_prefix_level), [value],
+                             index_key(levels), cb)
+            return
+        key = index_key(levels[:root_prefix_level])
+        split = self._known_split(key)
+        if split is None:
+            self._storage.get_concat(prefix=self._prefix, key=key,
+                                     cb=CalvinCB(self._add_bucket, levels=levels,
+                                                 root_prefix_level=root_prefix_level, index_value=value, org_cb=cb))
+        else:
+            self._add(levels, root_prefix_level, value, split, cb)
+
+    def _add_bucket(self, key, value, levels, root_prefix_level, index_value, org_cb):
+        self._sizes[key] = (self._size(value or []), time.time())
+        self._add(levels, root_prefix_level, index_value, self._known_split(key), org_cb)
+
+    def _add(self, levels, root_prefix_level, value, split, cb):
+        key = index_key(levels[:root_prefix_level])
+        if split and root_prefix_level < len(levels):
+            child = levels[root_prefix_level]
+            if (key, child) not in self._children:
+                self._children.add((key, child))
+                self._storage.append(prefix=self._prefix, key=key, value=[self._child(child)], cb=None)
+            self.add(levels, root_prefix_level + 1, value, cb=cb)
+            return
+        size, when = self._sizes[key]
+        self._sizes[key] = (size + 1, when)
+        self._storage.append(prefix=self._prefix, key=key,
+                             value=[self._entry(levels[root_prefix_level:], value)], cb=cb)
+
+    def remove(self, levels, value, root_prefix_level=2, cb=None):
+        """ Remove value added to levels, in the tree with any root prefix level,
+            otherwise from each level from root_prefix_level down to levels without reading
+        """
+        if not self._tree:
+            self._write_keys(self._storage.remove, self._level_keys(levels, root_prefix_level), [value],
+                             index_key(levels), cb)
+            return
+        self._search(levels, self._match_remove(value),
+                     CalvinCB(self._remove_entries, org_key=index_key(levels), org_cb=cb), descend=False)
+
+    def delete(self, levels, root_prefix_level=2, cb=None):
+        """ Remove all entries at and below levels """
+        if not self._tree:
+            # Only the index key is read, the values stored there are removed from the levels above it
+            self._storage.get_concat(prefix=self._prefix, key=index_key(levels),
+                                     cb=CalvinCB(self._delete_levels, levels=levels,
+                                                 root_prefix_level=root_prefix_level, org_cb=cb))
+            return
+        self._search(levels, self._match_below,
+                     CalvinCB(self._remove_entries, org_key=index_key(levels), org_cb=cb))
+
+    def get(self, levels, cb):
+        """ Callback cb(key=key, value=<list of values or None when none>) """
+        if not self._tree:
+            # Only the index key is read, unless entries of the tree are found there
+            self._storage.get_concat(prefix=self._prefix, key=index_key(levels),
+                                     cb=CalvinCB(self._got_levels, levels=levels, org_cb=cb))
+            return
+        self._search(levels, self._match_below,
+                     CalvinCB(self._got_entries, org_key=index_key(levels), org_cb=cb))
+
+    @staticmethod
+    def _match_below(path, entry_path, _):
+        return entry_path[:len(path)] == path
+
+    @staticmethod
+    def _match_remove(value):
+        return lambda path, entry_path, entry_value: entry_path == path and entry_value == value
+
+    def _got_levels(self, key, value, levels, org_cb):
+        items = value or []
+        if self._has_tree_items(items):
+            self._search(levels, self._match_below, CalvinCB(self._got_entries, org_key=key, org_cb=org_cb))
+            return
+        org_cb(key=key, value=list(set(items)) if items else None)
+
+    def _delete_levels(self, key, value, levels, root_prefix_level, org_cb):
+        items = value or []
+        if self._has_tree_items(items):
+            self._search(levels, self._match_below,
+                         CalvinCB(self._remove_entries, org_key=key, org_cb=org_cb))
+            return
+        keys = self._level_keys(levels, root_prefix_level)[:-1] if items else []
+        state = {'pending': len(keys) + 1, 'ok': True}
+        for level_key in keys:
+            self._storage.remove(prefix=self._prefix, key=level_key, value=items,
+                                 cb=CalvinCB(self._done, state=state, org_key=key, org_cb=org_cb))
+        self._storage.delete(prefix=self._prefix, key=key,
+                             cb=CalvinCB(self._done, state=state, org_key=key, org_cb=org_cb))
+
+    def _search(self, levels, match, cb, descend=True):
+        """ Read the buckets of all prefixes of levels, and with descend the split buckets below it,
+            cb(entries) with entries a dict with key: bucket, value: list of items for which
+            match(levels, levels of the entry, value) is true
+        """
+        state = {'pending': 1, 'entries': {}, 'values': {}, 'matched': set([])}
+        if not levels:
+            cb(state['entries'])
+            return
+        for n in range(1, len(levels) + 1):
+            self._get_bucket(levels, levels[:n], match, descend, state, cb)
+        self._bucket_done(state, cb)
+
+    def _get_bucket(self, levels, bucket_levels, match, descend, state, org_cb):
+        state['pending'] += 1
+        self._storage.get_concat(prefix=self._prefix, key=index_key(bucket_levels),
+                                 cb=CalvinCB(self._search_bucket, levels=levels, bucket_levels=bucket_levels,
+                                             match=match, descend=descend, state=state, org_cb=org_cb))
+
+    def _search_bucket(self, key, value, levels, bucket_levels, match, descend, state, org_cb):
+        entries = []
+        values = []
+        items = value or []
+        for item in items:
+            path, item_value = self._parse(item)
+            if path is not None:
+                if match(levels, bucket_levels + path, item_value):
+                    entries.append(item)
+            elif item_value is not None:
+                if descend and len(bucket_levels) >= len(levels):
+                    self._get_bucket(levels, bucket_levels + [item_value], match, descend, state, org_cb)
+            else:
+                # A value stored per level, it belongs to the bucket levels or below
+                values.append(item)
+                if match(levels, bucket_levels, item):
+                    state['matched'].add(item)
+        self._sizes[key] = (self._size(items), time.time())
+        if entries:
+            state['entries'][key] = entries
+        if values:
+            state['values'][key] = values
+        self._bucket_done(state, org_cb)
+
+    def _bucket_done(self, state, org_cb):
+        state['pending'] -= 1
+        if state['pending']:
+            return
+        # Values stored per level are also removed from the levels above, where they were added as well
+        for key, values in state['values'].iteritems():
+            matched = [v for v in values if v in state['matched']]
+            if matched:
+                state['entries'].setdefault(key, []).extend(matched)
+        org_cb(state['entries'])
+
+    def _value(self, item):
+        path, value = self._parse(item)
+        return value if path is not None else item
+
+    def _got_entries(self, entries, org_key, org_cb):
+        values = set([])
+        for bucket_entries in entries.itervalues():
+            values.update(self._value(entry) for entry in bucket_entries)
+        org_cb(key=org_key, value=list(values) if values else None)
+
+    def _remove_entries(self, entries, org_key, org_cb):
+        if not entries:
+            if org_cb:
+                org_cb(key=org_key, value=True)
+            return
+        state = {'pending': len(entries), 'ok': True}
+        for bucket, bucket_entries in entries.iteritems():
+            self._storage.remove(prefix=self._prefix, key=bucket, value=bucket_entries,
+                                 cb=CalvinCB(self._done, state=state, org_key=org_key, org_cb=org_cb))
+
+    def _done(self, key, value, state, org_key, org_cb):
+        state['ok'] = state['ok'] and bool(value)
+        state['pending'] -= 1
+        if not state['pending'] and org_cb:
+            org_cb(key=org_key, value=state['ok'])
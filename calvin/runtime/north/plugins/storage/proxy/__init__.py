@@ -14,7 +14,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+
 from calvin.runtime.north.plugins.storage.storage_base import StorageBase
+from calvin.runtime.south.plugins.async import async
 from calvin.utilities import calvinlogger
 from calvin.utilities import calvinconfig
 from calvin.utilities.calvin_callback import CalvinCB
@@ -23,14 +26,26 @@ from calvin.utilities import calvinuuid
 _conf = calvinconfig.get()
 _log = calvinlogger.get_logger(__name__)
 
+# Seconds to wait for the master to tell its commands, older masters don't answer
+CAPABILITIES_TIMEOUT = 5.0
+
 
 class StorageProxy(StorageBase):
     """ Implements a storage that asks a master node, this is the client class"""
+
+    @property
+    def prefix_search(self):
+        # Index operations are done by the master, one request each, when it has them
+        return 'ADD_INDEX' in self._master_cmds
+
     def __init__(self, node):
         self.master_uri = _conf.get('global', 'storage_proxy')
         self.node = node
         self.tunnel = None
         self.replies = {}
+        self._master_cmds = set([])  # commands of the master, besides those all masters have
+        self._node_lost_cb = None
+        self._master_lost = False
         _log.info("PROXY init for %s", self.master_uri)
         super(StorageProxy, self).__init__()
 
@@ -68,6 +83,7 @@ class StorageProxy(StorageBase):
             return True
         _log.analyze(self.node.id, "+ CLIENT", {'tunnel_id': self.tunnel.id})
         self.tunnel = None
+        self._master_lost = True
         # FIXME assumes that the org_cb is the callback given by storage when starting, can only be called once
         # not future up/down
         if org_cb:
@@ -81,12 +97,30 @@ class StorageProxy(StorageBase):
         if not self.tunnel:
             return True
         _log.analyze(self.node.id, "+ CLIENT", {'tunnel_id': self.tunnel.id})
+        if self._master_lost:
+            # The master may have lost what this runtime wrote
+            self._master_lost = False
+            if self._node_lost_cb:
+                self._node_lost_cb()
+        # Started when the commands of the master are known
+        msg_id = self.send(cmd='CAPABILITIES', msg={}, cb=CalvinCB(self._capabilities_cb, org_cb=org_cb))
+        async.DelayedCall(CAPABILITIES_TIMEOUT, self._capabilities_timeout, msg_id)
+        # We should always return True which sends an ACK on the destruction of the tunnel
+        return True
+
+    def _capabilities_cb(self, key, value, org_cb):
+        self._master_cmds = set(value or [])
+        _log.debug("Storage master commands %s" % list(self._master_cmds))
         # FIXME assumes that the org_cb is the callback given by storage when starting, can only be called once
         # not future up/down
         if org_cb:
             org_cb(True)
-        # We should always return True which sends an ACK on the destruction of the tunnel
-        return True
+
+    def _capabilities_timeout(self, msg_id):
+        """ Master without CAPABILITIES, it only has the commands all masters have """
+        cb = self.replies.pop(msg_id, None)
+        if cb:
+            cb(key=None, value=None)
 
     def tunnel_recv_handler(self, payload):
         """ Gets called when a storage master replies"""
@@ -94,11 +128,15 @@ class StorageProxy(StorageBase):
         if 'msg_uuid' in payload and payload['msg_uuid'] in self.replies and 'cmd' in payload and payload['cmd']=='REPLY':
             self.replies.pop(payload['msg_uuid'])(**{k: v for k, v in payload.iteritems() if k in ('key', 'value')})
 
+    def set_node_lost_callback(self, cb):
+        self._node_lost_cb = cb
+
     def send(self, cmd, msg, cb):
         msg_id = calvinuuid.uuid("MSGID")
         self.replies[msg_id] = cb
         msg['msg_uuid'] = msg_id
         self.tunnel.send(dict(msg, cmd=cmd, msg_uuid=msg_id))
+        return msg_id
 
     def set(self, key, value, cb=None):
         """
@@ -129,6 +167,47 @@ class StorageProxy(StorageBase):
         _log.analyze(self.node.id, "+ CLIENT", {'key': key, 'value': value})
         self.send(cmd='REMOVE',msg={'key':key, 'value': value}, cb=cb)
 
+    # Batches are one request when the master has them, otherwise one request per key
+
+    def set_many(self, items, cb=None):
+        if 'SET_MANY' not in self._master_cmds:
+            return super(StorageProxy, self).set_many(items, cb=cb)
+        _log.analyze(self.node.id, "+ CLIENT", {'keys': items.keys()})
+        self.send(cmd='SET_MANY', msg={'items': items}, cb=cb)
+
+    def get_many(self, keys, cb=None):
+        if 'GET_MANY' not in self._master_cmds:
+            return super(StorageProxy, self).get_many(keys, cb=cb)
+        _log.analyze(self.node.id, "+ CLIENT", {'keys': keys})
+        self.send(cmd='GET_MANY', msg={'keys': keys}, cb=cb)
+
+    def append_many(self, items, cb=None):
+        if 'APPEND_MANY' not in self._master_cmds:
+            return super(StorageProxy, self).append_many(items, cb=cb)
+        _log.analyze(self.node.id, "+ CLIENT", {'keys': items.keys()})
+        self.send(cmd='APPEND_MANY', msg={'items': items}, cb=cb)
+
+    def add_index(self, index, value, root_prefix_level, cb=None):
+        _log.analyze(self.node.id, "+ CLIENT", {'index': index, 'value': value})
+        self.send(cmd='ADD_INDEX', msg={'key': index, 'value': json.dumps(value),
+                                        'root_prefix_level': root_prefix_level}, cb=cb)
+
+    def remove_index(self, index, value, root_prefix_level, cb=None):
+        _log.analyze(self.node.id, "+ CLIENT", {'index': index, 'value': value})
+        self.send(cmd='REMOVE_INDEX', msg={'key': index, 'value': json.dumps(value),
+                                           'root_prefix_level': root_prefix_level}, cb=cb)
+
+    def delete_index(self, index, root_prefix_level, cb=None):
+        _log.analyze(self.node.id, "+ CLIENT", {'index': index})
+        self.send(cmd='DELETE_INDEX', msg={'key': index, 'root_prefix_level': root_prefix_level}, cb=cb)
+
+    def get_index(self, index, cb=None):
+        _log.analyze(self.node.id, "+ CLIENT", {'index': index})
+        self.send(cmd='GET_INDEX', msg={'key': index}, cb=CalvinCB(self._get_index_cb, org_cb=cb))
+
+    def _get_index_cb(self, key, value, org_cb):
+        org_cb(key=key, value=json.loads(value) if value else None)
+
     def bootstrap(self, addrs, cb=None):
         _log.analyze(self.node.id, "+ CLIENT", None)
 
@@ -14,6 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from calvin.utilities.calvin_callback import CalvinCB
 
 
 class StorageBase(object):
@@ -36,10 +37,22 @@ class StorageBase(object):
             append:
                 key: The key
                 status: True or False
+            set_many/append_many:
+                key: List of the keys
+                status: Dict with key: True or False
+            get_many:
+                key: List of the keys
+                value: Dict with key: returned value
             bootstrap:
                 status: List of True and/or false:s
 
+        Plugins with prefix search set prefix_search and implement add_index, remove_index,
+        delete_index and get_index, index is the list of index levels. Otherwise the
+        index is kept with append, remove and get_concat.
+
     """
+    prefix_search = False
+
     def __init__(self, node=None):
         pass
 
@@ -74,8 +87,80 @@ class StorageBase(object):
     def remove(self, key, value, cb=None):
         raise NotImplementedError()
 
+    def _many_cb(self, key, value, keys, results, org_cb):
+        results[key] = value
+        if len(results) == len(keys) and org_cb:
+            org_cb(key=keys, value=results)
+
+    def _many(self, op, items, cb):
+        """ Batch operation done one key at a time, for plugins without it """
+        keys = list(items)
+        if not keys:
+            if cb:
+                cb(key=keys, value={})
+            return
+        results = {}
+        for key in keys:
+            op(key, items[key], cb=CalvinCB(self._many_cb, keys=keys, results=results, org_cb=cb))
+
+    def set_many(self, items, cb=None):
+        """
+            Set many key, value pairs in the storage, items is a dict with key: value
+        """
+        self._many(lambda key, value, cb: self.set(key=key, value=value, cb=cb), items, cb)
+
+    def get_many(self, keys, cb=None):
+        """
+            Gets the values of many keys from the storage
+        """
+        self._many(lambda key, value, cb: self.get(key=key, cb=cb), dict.fromkeys(keys), cb)
+
+    def append_many(self, items, cb=None):
+        """
+            Append to many keys, items is a dict with key: value
+        """
+        self._many(lambda key, value, cb: self.append(key=key, value=value, cb=cb), items, cb)
+
     def bootstrap(self, addrs, cb=None):
         raise NotImplementedError()
 
     def stop(self, cb=None):
         raise NotImplementedError()
+
+    def add_index(self, index, value, root_prefix_level, cb=None):
+        """
+            Add value at the index levels
+        """
+        raise NotImplementedError()
+
+    def remove_index(self, index, value, root_prefix_level, cb=None):
+        """
+            Remove value added at the index levels
+        """
+        raise NotImplementedError()
+
+    def delete_index(self, index, root_prefix_level, cb=None):
+        """
+            Remove all values at and below the index levels
+        """
+        raise NotImplementedError()
+
+    def get_index(self, index, cb=None):
+        """
+            Gets the values at and below the index levels, a list or None when none
+        """
+        raise NotImplementedError()
+
+    def set_change_callback(self, cb):
+        """
+            Plugins that are told when keys change call cb(key=key),
+            so that values cached by the runtime are not used anymore
+        """
+        pass
+
+    def set_node_lost_callback(self, cb):
+        """
+            Plugins that know when a storage node holding data is lost call cb(),
+            so that the runtime writes its records again
+        """
+        pass
@@ -15,6 +15,7 @@
 # limitations under the License.
 
 from calvin.runtime.south.plugins.async import async
+from calvin.runtime.north.plugins.storage.prefix_index import PrefixIndex, index_key
 
 
 class StorageLocal(object):
@@ -41,8 +42,11 @@ class StorageLocal(object):
                 status: List of True and/or false:s
 
     """
+    prefix_search = True
+
     def __init__(self, node=None):
         self._data = {}
+        self._index = PrefixIndex()
 
     def _dummy_cb(self, *args, **kwargs):
         pass
@@ -106,6 +110,41 @@ class StorageLocal(object):
                 self._data.pop(key)
                 async.DelayedCall(0, cb, key, True)
 
+    def set_many(self, items, cb=None):
+        cb = cb or self._dummy_cb
+        self._data.update(items)
+        async.DelayedCall(0, cb, list(items), dict.fromkeys(items, True))
+
+    def get_many(self, keys, cb=None):
+        cb = cb or self._dummy_cb
+        async.DelayedCall(0, cb, list(keys), {key: self._data.get(key) for key in keys})
+
+    def append_many(self, items, cb=None):
+        cb = cb or self._dummy_cb
+        for key, value in items.items():
+            self.append(key, value)
+        async.DelayedCall(0, cb, list(items), dict.fromkeys(items, True))
+
+    def add_index(self, index, value, root_prefix_level, cb=None):
+        cb = cb or self._dummy_cb
+        self._index.add(index, value)
+        async.DelayedCall(0, cb, index_key(index), True)
+
+    def remove_index(self, index, value, root_prefix_level, cb=None):
+        cb = cb or self._dummy_cb
+        self._index.remove(index, value)
+        async.DelayedCall(0, cb, index_key(index), True)
+
+    def delete_index(self, index, root_prefix_level, cb=None):
+        cb = cb or self._dummy_cb
+        self._index.delete(index)
+        async.DelayedCall(0, cb, index_key(index), True)
+
+    def get_index(self, index, cb=None):
+        cb = cb or self._dummy_cb
+        values = self._index.get(index)
+        async.DelayedCall(0, cb, index_key(index), list(values) if values else None)
+
     def bootstrap(self, addrs, cb=None):
         cb = cb or self._dummy_cb
         async.DelayedCall(0, cb, True)
@@ -0,0 +1,503 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import re
+import json
+import mmap
+import zlib
+import struct
+import hashlib
+
+from calvin.runtime.south.plugins.async import async
+from calvin.runtime.north.plugins.storage.storage_base import StorageBase
+from calvin.utilities import calvinlogger
+from calvin.utilities import calvinconfig
+
+_log = calvinlogger.get_logger(__name__)
+_conf = calvinconfig.get()
+
+# Log records are crc, operation, key length and value length followed by key and value,
+# the crc covers all but itself
+_RECORD = struct.Struct('>IBII')
+SET = 1
+DELETE = 2
+# Append and remove records have the change of a list, after the offset of the previous record of the key,
+# the live bytes of the records before it and the number of changes since the last set
+APPEND = 3
+REMOVE = 4
+_DELTA = struct.Struct('>QQI')
+NO_RECORD = 0xffffffffffffffff
+# Changes of a list before it is written whole again
+MAX_DELTAS = 16
+
+# Index file header is magic, number of slots, used slots, log size indexed and size of live records
+_MAGIC = b'CALVIDX1'
+_HEADER = struct.Struct('>8sQQQQ')
+# Index slots are key hash, 0 when empty, and log offset of the latest record of the key
+_SLOT = struct.Struct('>QQ')
+MIN_SLOTS = 1024
+
+# Compact when the log is larger than this and more than COMPACT_RATIO times the live records
+COMPACT_MIN_SIZE = 1048576
+COMPACT_RATIO = 2.0
+
+_FILE = re.compile(r'^registry\.(\d+)\.log$')
+
+
+def _bytes(s):
+    return s if isinstance(s, bytes) else s.encode('utf-8')
+
+
+def _hash(key):
+    return struct.unpack('>Q', hashlib.sha1(key).digest()[:8])[0] or 1
+
+
+class HashIndex(object):
+    """
+        Open addressing hash table in a memory mapped file, from key hash to the log offset of
+        the latest record of the key. Kept at most half full, hence probing always ends at an empty slot.
+    """
+
+    def __init__(self, path, slots=None):
+        super(HashIndex, self).__init__()
+        self.path = path
+        if slots is not None:
+            with open(path, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, slots, 0, 0, 0))
+                f.truncate(_HEADER.size + slots * _SLOT.size)
+        with open(path, 'r+b') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0)
+        magic, self.slots, self.used, self.log_end, self.live = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC or len(self._mmap) != _HEADER.size + self.slots * _SLOT.size:
+            self._mmap.close()
+            raise ValueError("Not an index file %s" % path)
+
+    def save_header(self):
+        _HEADER.pack_into(self._mmap, 0, _MAGIC, self.slots, self.used, self.log_end, self.live)
+
+    def probe(self, h):
+        """ Yields (slot, offset) of the slots with hash h and at last the empty slot (slot, None) """
+        i = h % self.slots
+        while True:
+            slot_hash, offset = _SLOT.unpack_from(self._mmap, _HEADER.size + i * _SLOT.size)
+            if not slot_hash:
+                yield i, None
+                return
+            if slot_hash == h:
+                yield i, offset
+            i = (i + 1) % self.slots
+
+    def put(self, slot, h, offset):
+        _SLOT.pack_into(self._mmap, _HEADER.size + slot * _SLOT.size, h, offset)
+
+    def entries(self):
+        """ Yields (hash, offset) of all used slots """
+        for i in range(self.slots):
+            slot_hash, offset = _SLOT.unpack_from(self._mmap, _HEADER.size + i * _SLOT.size)
+            if slot_hash:
+                yield slot_hash, offset
+
+    def insert(self, h, offset):
+        """ Add hash of a key not in the index """
+        for slot, old in self.probe(h):
+            if old is None:
+                self.put(slot, h, offset)
+                self.used += 1
+
+    def close(self):
+        self.save_header()
+        self._mmap.flush()
+        self._mmap.close()
+
+
+class StorageDisk(StorageBase):
+    """
+        Persistent storage in a directory, for the runtime acting as storage node.
+
+        Every change is appended to a log, a delete as a tombstone record and a change of a list as
+        the values appended or removed. A memory mapped hash index has the log offset of the latest
+        record of each key, hence a restart only opens the index and replays the records written after
+        the index was last saved. The log is synced once for all changes since the last sync, and their
+        callbacks called after it. The log is compacted to its live records when mostly superseded
+        records, each compaction is a new generation of log and index.
+    """
+
+    def __init__(self, node=None, directory=None):
+        super(StorageDisk, self).__init__(node)
+        self._directory = (directory or _conf.get('global', 'storage_disk_directory') or
+                           os.path.join(os.path.expanduser("~"), ".calvin", "storage"))
+        self._generation = 0
+        self._log = None
+        self._reader = None
+        self._index = None
+        self._end = 0  # end of the written log, the index header has the end of the synced log
+        self._compact_delayedcall = None
+        self._sync_delayedcall = None
+        self._synced_cbs = []
+
+    def _dummy_cb(self, *args, **kwargs):
+        pass
+
+    def _path(self, generation, suffix):
+        return os.path.join(self._directory, "registry.%d.%s" % (generation, suffix))
+
+    ### Log and index ###
+
+    def open(self):
+        """ Open the latest generation of log and index, cleaning up after interrupted compactions """
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory)
+        generations = sorted(int(m.group(1)) for m in map(_FILE.match, os.listdir(self._directory)) if m)
+        self._generation = generations[-1] if generations else 0
+        for name in os.listdir(self._directory):
+            m = re.match(r'^registry\.(\d+)\.', name)
+            if m and int(m.group(1)) != self._generation or name.endswith('.tmp'):
+                os.remove(os.path.join(self._directory, name))
+        self._log = open(self._path(self._generation, 'log'), 'ab')
+        self._reader = open(self._path(self._generation, 'log'), 'rb')
+        log_size = os.fstat(self._log.fileno()).st_size
+        self._index = None
+        try:
+            self._index = HashIndex(self._path(self._generation, 'idx'))
+            if not self._index_valid(log_size):
+                raise ValueError("Index does not match the log")
+            self._recover(log_size)
+        except Exception:
+            # Index or log damaged, e.g. the index saved but not the log at a power loss, or
+            # slots pointing at changes not yet synced when stopped without closing
+            _log.info("Rebuilding storage index of %s" % self._directory, exc_info=True)
+            if self._index:
+                self._index.close()
+            self._index = HashIndex(self._path(self._generation, 'idx'), MIN_SLOTS)
+            self._recover(os.fstat(self._log.fileno()).st_size)
+
+    def _index_valid(self, log_size):
+        """ The indexed part of the log is there and all slots point at records in it """
+        if self._index.log_end > log_size:
+            return False
+        return all(offset + _RECORD.size <= self._index.log_end for _, offset in self._index.entries())
+
+    def close(self):
+        if self._log is None:
+            return
+        if self._sync_delayedcall:
+            self._sync_delayedcall.cancel()
+        self._sync()
+        self._log.close()
+        self._reader.close()
+        self._index.close()
+        self._log = self._reader = self._index = None
+
+    def _recover(self, log_size):
+        """ Index the records after the indexed part of the log, a torn record at the end is cut off """
+        offset = self._index.log_end
+        while offset < log_size:
+            record = self._read(offset, verify=True)
+            if record is None:
+                _log.warning("Storage log %s damaged at %d of %d bytes, cut off" %
+                             (self._path(self._generation, 'log'), offset, log_size))
+                self._log.truncate(offset)
+                break
+            op, key, value = record
+            size = _RECORD.size + len(key) + len(value)
+            self._indexed(key, op, offset, size, value)
+            offset += size
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._index.log_end = self._end = offset
+        self._index.save_header()
+
+    def _read(self, offset, verify=False):
+        """ The record at offset as (op, key, value), None when verify and it is not complete """
+        self._reader.seek(offset)
+        header = self._reader.read(_RECORD.size)
+        if len(header) < _RECORD.size:
+            return None
+        crc, op, klen, vlen = _RECORD.unpack(header)
+        data = self._reader.read(klen + vlen)
+        if verify and (len(data) < klen + vlen or zlib.crc32(header[4:] + data) & 0xffffffff != crc):
+            return None
+        return op, data[:klen], data[klen:]
+
+    def _record_key(self, offset):
+        self._reader.seek(offset)
+        _, _, klen, _ = _RECORD.unpack(self._reader.read(_RECORD.size))
+        return self._reader.read(klen)
+
+    def _find(self, key):
+        """ Returns (hash, slot, offset) of key, offset None when not indexed """
+        h = _hash(key)
+        for slot, offset in self._index.probe(h):
+            if offset is None or self._record_key(offset) == key:
+                return h, slot, offset
+
+    @staticmethod
+    def _live(op, size, value):
+        """ Bytes of the log a record and the records before it of its key keep live """
+        if op == SET:
+            return size
+        if op in (APPEND, REMOVE):
+            return size + _DELTA.unpack_from(value)[1]
+        return 0
+
+    def _indexed(self, key, op, offset, size, value):
+        """ Point the index at the record of key at offset """
+        h, slot, old = self._find(key)
+        if old is None:
+            self._index.used += 1
+        else:
+            old_op, _, old_value = self._read(old)
+            self._index.live -= self._live(old_op, _RECORD.size + len(key) + len(old_value), old_value)
+        self._index.put(slot, h, offset)
+        self._index.live += self._live(op, size, value)
+        if self._index.used * 2 > self._index.slots:
+            self._grow()
+
+    def _grow(self):
+        """ Double the index slots """
+        path = self._path(self._generation, 'idx')
+        index = HashIndex(path + '.tmp', self._index.slots * 2)
+        for h, offset in self._index.entries():
+            index.insert(h, offset)
+        index.log_end, index.live = self._index.log_end, self._index.live
+        index.close()
+        self._index.close()
+        os.rename(path + '.tmp', path)
+        self._index = HashIndex(path)
+
+    @staticmethod
+    def _pack(op, key, value):
+        body = _RECORD.pack(0, op, len(key), len(value))[4:] + key + value
+        return struct.pack('>I', zlib.crc32(body) & 0xffffffff) + body
+
+    def _append_record(self, op, key, value=b''):
+        """ Append a record to the log and index it, the log is synced at the next sync """
+        key, value = _bytes(key), _bytes(value)
+        record = self._pack(op, key, value)
+        offset = self._end
+        self._log.write(record)
+        # Readable, but the index header only counts it as indexed when synced
+        self._log.flush()
+        self._indexed(key, op, offset, len(record), value)
+        self._end = offset + len(record)
+        if self._sync_delayedcall is None:
+            self._sync_delayedcall = async.DelayedCall(_conf.get('global', 'storage_disk_sync_interval') or 0,
+                                                       self._sync)
+
+    def _sync(self):
+        """ Sync the log written since the last sync, then call the callbacks waiting for it """
+        self._sync_delayedcall = None
+        if self._index.log_end != self._end:
+            # The records are on disk before the index header counts them
+            os.fsync(self._log.fileno())
+            self._index.log_end = self._end
+            self._index.save_header()
+        cbs, self._synced_cbs = self._synced_cbs, []
+        for cb, args in cbs:
+            cb(*args)
+
+    def _done(self, cb, *args):
+        """ Call cb when the changes made so far are synced """
+        if self._sync_delayedcall:
+            self._synced_cbs.append((cb, args))
+        else:
+            async.DelayedCall(0, cb, *args)
+
+    @staticmethod
+    def _apply(values, op, delta):
+        if op == APPEND:
+            return list(set(values + delta))
+        return list(set(values) - set(delta))
+
+    def _value(self, offset):
+        """ The value of the record at offset, with the changes of a list applied, None when deleted """
+        deltas = []
+        while offset != NO_RECORD:
+            op, _, value = self._read(offset)
+            if op not in (APPEND, REMOVE):
+                break
+            offset = _DELTA.unpack_from(value)[0]
+            deltas.append((op, value[_DELTA.size:]))
+        else:
+            op, value = DELETE, None
+        if not deltas:
+            return value if op == SET else None
+        try:
+            values = json.loads(value) if op == SET else []
+        except ValueError:
+            values = []
+        values = values if isinstance(values, list) else []
+        for op, delta in reversed(deltas):
+            values = self._apply(values, op, json.loads(delta))
+        return json.dumps(values)
+
+    def _get(self, key):
+        """ The value of key, None when not set """
+        _, _, offset = self._find(_bytes(key))
+        if offset is None:
+            return None
+        return self._value(offset)
+
+    def _set(self, key, value):
+        if value is None:
+            if self._get(key) is not None:
+                self._append_record(DELETE, key)
+        else:
+            self._append_record(SET, key, value)
+
+    ### Compaction ###
+
+    def compact(self):
+        """ Write the live records to a new generation of log and index, the old generation is removed """
+        generation = self._generation + 1
+        log_path = self._path(generation, 'log')
+        live = [offset for _, offset in self._index.entries() if self._read(offset)[0] != DELETE]
+        slots = MIN_SLOTS
+        while len(live) * 4 > slots:
+            slots *= 2
+        index = HashIndex(self._path(generation, 'idx'), slots)
+        end = 0
+        with open(log_path + '.tmp', 'wb') as f:
+            for offset in sorted(live):
+                key = self._record_key(offset)
+                # A list is written whole
+                record = self._pack(SET, key, self._value(offset))
+                f.write(record)
+                index.insert(_hash(key), end)
+                end += len(record)
+            f.flush()
+            os.fsync(f.fileno())
+        index.log_end = index.live = end
+        index.close()
+        # The new generation is complete when its log has its name
+        os.rename(log_path + '.tmp', log_path)
+        _log.info("Compacted storage from %d to %d bytes" % (self._index.log_end, end))
+        self.close()
+        self.open()
+
+    def _compact_timeout(self):
+        interval = _conf.get('global', 'storage_disk_compact_interval')
+        self._compact_delayedcall = async.DelayedCall(interval, self._compact_timeout) if interval else None
+        if self._index.log_end > COMPACT_MIN_SIZE and self._index.log_end > COMPACT_RATIO * self._index.live:
+            self.compact()
+
+    ### Bulk export and import ###
+
+    def export_data(self, fp):
+        """ Write all key, value pairs as lines of JSON objects to file fp, returns the number written """
+        count = 0
+        for _, offset in self._index.entries():
+            value = self._value(offset)
+            if value is not None:
+                key = self._record_key(offset)
+                fp.write(json.dumps({'key': key.decode('utf-8'), 'value': value.decode('utf-8')}) + '\n')
+                count += 1
+        return count
+
+    def import_data(self, fp):
+        """ Set the key, value pairs in lines of JSON objects read from file fp, returns the number read """
+        count = 0
+        for line in fp:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            self._set(item['key'], item['value'])
+            count += 1
+        return count
+
+    ### Storage plugin ###
+
+    def start(self, iface='', network='', bootstrap=[], cb=None, name=None, nodeid=None):
+        """
+            Opens the storage directory
+        """
+        cb = cb or self._dummy_cb
+        try:
+            self.open()
+        except Exception:
+            _log.exception("Failed to open storage directory %s" % self._directory)
+            async.DelayedCall(0, cb, False)
+            return
+        self._compact_timeout()
+        async.DelayedCall(0, cb, True)
+
+    def set(self, key, value, cb=None):
+        """
+            Set a key, value pair in the storage
+        """
+        cb = cb or self._dummy_cb
+        self._set(key, value)
+        self._done(cb, key, True)
+
+    def get(self, key, cb=None):
+        """
+            Gets a value from the storage
+        """
+        cb = cb or self._dummy_cb
+        async.DelayedCall(0, cb, key, self._get(key))
+
+    def get_concat(self, key, cb=None):
+        """
+            Gets a value from the storage
+        """
+        cb = cb or self._dummy_cb
+        async.DelayedCall(0, cb, key, self._get(key))
+
+    def _update_list(self, key, value, op):
+        """ Append the change of the list at key, the whole list when changed MAX_DELTAS times """
+        try:
+            values = json.loads(value)
+        except (ValueError, TypeError):
+            values = None
+        if not isinstance(values, list):
+            _log.debug("Trying to update something not a JSON coded list %s" % value)
+            return False
+        key = _bytes(key)
+        _, _, offset = self._find(key)
+        prev, live, deltas = NO_RECORD, 0, 1
+        if offset is not None:
+            old_op, _, old_value = self._read(offset)
+            if old_op != DELETE:
+                prev, deltas = offset, 1 + (_DELTA.unpack_from(old_value)[2] if old_op != SET else 0)
+                live = self._live(old_op, _RECORD.size + len(key) + len(old_value), old_value)
+        if deltas > MAX_DELTAS:
+            self._append_record(SET, key, json.dumps(self._apply(json.loads(self._value(prev)), op, values)))
+        else:
+            self._append_record(op, key, _DELTA.pack(prev, live, deltas) + json.dumps(values))
+        return True
+
+    def append(self, key, value, cb=None):
+        cb = cb or self._dummy_cb
+        ok = self._update_list(key, value, APPEND)
+        self._done(cb, key, ok)
+
+    def remove(self, key, value, cb=None):
+        cb = cb or self._dummy_cb
+        ok = self._update_list(key, value, REMOVE)
+        self._done(cb, key, ok)
+
+    def bootstrap(self, addrs, cb=None):
+        cb = cb or self._dummy_cb
+        async.DelayedCall(0, cb, True)
+
+    def stop(self, cb=None):
+        cb = cb or self._dummy_cb
+        if self._compact_delayedcall:
+            self._compact_delayedcall.cancel()
+            self._compact_delayedcall = None
+        self.close()
+        async.DelayedCall(0, cb, True)
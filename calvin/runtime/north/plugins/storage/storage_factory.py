@@ -19,6 +19,7 @@
 from calvin.runtime.south.plugins.storage import dht, securedht
 from calvin.runtime.north.plugins.storage.proxy import StorageProxy
 from calvin.runtime.north.plugins.storage.storage_dict_local import StorageLocal
+from calvin.runtime.north.plugins.storage.storage_disk import StorageDisk
 
 def get(type_, node=None):
     if type_ == "dht":
@@ -31,5 +32,7 @@ def get(type_, node=None):
         return None
     elif type_ == "local_dict":
         return StorageLocal(node)
+    elif type_ == "disk":
+        return StorageDisk(node)
 
     raise Exception("Parser {} requested is not supported".format(type_))
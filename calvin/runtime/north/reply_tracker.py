@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import random
+import time
+
+import calvin.requests.calvinresponse as response
+from calvin.runtime.south.plugins.async import async
+from calvin.utilities import calvinlogger
+
+_log = calvinlogger.get_logger(__name__)
+
+# Seconds until a request without reply gets a GATEWAY_TIMEOUT
+REPLY_TIMEOUT = 10.0
+# Resolution of the timeouts, a request times out between REPLY_TIMEOUT and REPLY_TIMEOUT + TICK seconds
+TICK = 0.5
+
+
+class TimerWheel(object):
+    """
+        Hashed timer wheel with one bucket per tick. Keys are added to the bucket
+        which is reached when the timeout has passed, removing a key is a set operation
+        and only one reactor timer is running, and only while there are keys in the wheel.
+        expired(key) is called for keys which times out.
+    """
+
+    def __init__(self, timeout, tick, expired):
+        super(TimerWheel, self).__init__()
+        self._tick = tick
+        # At least one whole tick after adding, since the timer is already running when added
+        self._ticks = int(math.ceil(timeout / tick)) + 1
+        self._buckets = [set() for _ in range(self._ticks + 1)]
+        self._current = 0
+        self._bucket_of = {}
+        self._expired = expired
+        self._timer = None
+
+    def __len__(self):
+        return len(self._bucket_of)
+
+    def add(self, key):
+        bucket = (self._current + self._ticks) % len(self._buckets)
+        self._buckets[bucket].add(key)
+        self._bucket_of[key] = bucket
+        if self._timer is None:
+            self._timer = async.DelayedCall(self._tick, self._advance)
+
+    def remove(self, key):
+        """ Returns False if key is not in the wheel """
+        try:
+            self._buckets[self._bucket_of.pop(key)].discard(key)
+        except KeyError:
+            return False
+        return True
+
+    def _advance(self):
+        self._current = (self._current + 1) % len(self._buckets)
+        expired = self._buckets[self._current]
+        self._buckets[self._current] = set()
+        for key in expired:
+            del self._bucket_of[key]
+        self._timer = async.DelayedCall(self._tick, self._advance) if self._bucket_of else None
+        for key in expired:
+            self._expired(key)
+
+    def cancel(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+class ReplyTracker(object):
+    """
+        Keeps the callbacks of a link's requests until their reply arrives or they time out.
+        Message ids are integers, unique per link.
+    """
+
+    def __init__(self, timeout=REPLY_TIMEOUT, tick=TICK):
+        super(ReplyTracker, self).__init__()
+        # Start at random, a late reply to a request on an earlier link to the same peer
+        # should not be taken for a reply on this link
+        self._next_id = random.randint(1, 1 << 30)
+        self._pending = {}
+        self._wheel = TimerWheel(timeout, tick, self._timeout)
+        self.sent = 0
+        self.replied = 0
+        self.timeouts = 0
+
+    def add(self, callback):
+        """ Returns the message id to use in the request """
+        msg_id = self._next_id
+        self._next_id += 1
+        self._pending[msg_id] = (callback, time.time())
+        self._wheel.add(msg_id)
+        self.sent += 1
+        return msg_id
+
+    def pop(self, msg_id):
+        """ Returns (callback, send_time) of the request, raises KeyError for unknown msg_id """
+        reply = self._pending.pop(msg_id)
+        self._wheel.remove(msg_id)
+        self.replied += 1
+        return reply
+
+    def _timeout(self, msg_id):
+        self.timeouts += 1
+        callback, _ = self._pending.pop(msg_id)
+        try:
+            callback(response.CalvinResponse(response.GATEWAY_TIMEOUT))
+        except: # Dangerous but needed
+            _log.exception("Unknown exception in response handler")
+
+    def get_statistics(self):
+        return {'requests_sent': self.sent, 'requests_outstanding': len(self._pending),
+                'replies_received': self.replied, 'requests_timed_out': self.timeouts}
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from calvin.utilities import calvinlogger
+
+_log = calvinlogger.get_logger(__name__)
+
+# Routes longer than this are dropped, also stops routes counting to infinity in loops.
+# Routes announced with this many hops are withdrawn (poisoned).
+MAX_HOPS = 8
+# An announced cost increasing more than this factor is passed on to the peers
+COST_INCREASE_FACTOR = 1.5
+# Seconds a next hop decision is reused before the link RTTs are looked at again
+NEXT_HOP_TTL = 5.0
+
+
+class RoutingTable(object):
+    """
+        Distance vector routing table of the runtimes reachable through the direct links.
+
+        Each directly linked peer announces the runtimes it can reach, with the cost (sum of
+        link RTTs in seconds) and number of hops. A route to a destination is scored by the RTT
+        of the link to the announcing peer plus the announced cost, the best next hop is cached.
+        Destinations no longer reachable, or only reachable through the peer itself, are announced
+        with MAX_HOPS hops (poisoned), which withdraws them also at older runtimes.
+
+        link_rtt(peer_id) should return the RTT of the direct link to peer_id, None when no link.
+    """
+
+    def __init__(self, node_id, link_rtt):
+        super(RoutingTable, self).__init__()
+        self.node_id = node_id
+        self._link_rtt = link_rtt
+        self._links = set()  # peer ids of direct links
+        self._announced = {}  # key: peer id of direct link, value: dict with key: destination, value: (cost, hops)
+        self._next_hop = {}  # key: destination, value: (next hop peer id or None, timestamp)
+        self._reachable = {}  # key: peer id of direct link, value: destinations last announced reachable to it
+
+    def add_link(self, peer_id):
+        """ A direct link to peer_id is up """
+        self._links.add(peer_id)
+        self._next_hop.clear()
+
+    def remove_link(self, peer_id):
+        """ The direct link to peer_id is down, forget the routes through it """
+        self._links.discard(peer_id)
+        self._announced.pop(peer_id, None)
+        self._reachable.pop(peer_id, None)
+        self._next_hop.clear()
+
+    def update(self, peer_id, routes):
+        """ Replace the routes announced by peer_id,
+            routes: dict with key: destination, value: (cost, hops)
+
+            returns: True when the routes through peer_id changed enough to be passed on, i.e. when
+                     the reachable destinations or their hops changed, or a cost increased more than
+                     COST_INCREASE_FACTOR. Smaller cost changes are not passed on to keep RTT jitter
+                     from flooding the network.
+        """
+        if peer_id not in self._links:
+            _log.debug("Ignoring routes from %s without a direct link", peer_id)
+            return False
+        previous = self._announced.get(peer_id, {})
+        current = {dest: (cost, hops) for dest, (cost, hops) in routes.iteritems()
+                   if dest != self.node_id and hops < MAX_HOPS}
+        self._announced[peer_id] = current
+        self._next_hop.clear()
+        if set(previous) != set(current):
+            return True
+        for dest, (cost, hops) in current.iteritems():
+            previous_cost, previous_hops = previous[dest]
+            if hops != previous_hops or cost > previous_cost * COST_INCREASE_FACTOR:
+                return True
+        return False
+
+    def _rtt(self, peer_id):
+        rtt = self._link_rtt(peer_id)
+        return 0.2 if rtt is None else rtt
+
+    def _best(self, dest, exclude=None):
+        """ Returns (cost, hops, next hop) of the best route to dest not through exclude, None when no route """
+        best = None
+        for peer_id, routes in self._announced.iteritems():
+            if peer_id == exclude or dest not in routes:
+                continue
+            cost, hops = routes[dest]
+            route = (self._rtt(peer_id) + cost, hops + 1, peer_id)
+            if best is None or route < best:
+                best = route
+        return best
+
+    def next_hop(self, dest):
+        """ Returns the peer id of the direct link to send messages for dest on, None when no route is known """
+        if dest in self._links:
+            return dest
+        cached = self._next_hop.get(dest)
+        now = time.time()
+        if cached is not None and cached[1] + NEXT_HOP_TTL > now:
+            return cached[0]
+        best = self._best(dest)
+        peer_id = best[2] if best else None
+        self._next_hop[dest] = (peer_id, now)
+        return peer_id
+
+    def announcement(self, peer_id):
+        """ The routes to announce to the directly linked peer_id, dict with key: destination, value: [cost, hops]
+
+            Destinations only reachable through peer_id (poisoned reverse), and destinations
+            announced to peer_id before but no longer reachable, are poisoned with MAX_HOPS hops.
+        """
+        routes = {dest: [self._rtt(dest), 0] for dest in self._links if dest != peer_id}
+        destinations = set()
+        for announced in self._announced.itervalues():
+            destinations.update(announced)
+        poisoned = self._reachable.get(peer_id, set()).union(destinations)
+        for dest in destinations.difference(self._links):
+            best = self._best(dest, exclude=peer_id)
+            if best:
+                routes[dest] = [best[0], best[1]]
+        routes.pop(peer_id, None)
+        self._reachable[peer_id] = set(routes)
+        for dest in poisoned.difference(routes):
+            if dest != peer_id:
+                routes[dest] = [0.0, MAX_HOPS]
+        return routes
+
+    def get_routes(self):
+        """ Returns dict with key: destination, value: next hop peer id, for all reachable runtimes """
+        destinations = set(self._links)
+        for announced in self._announced.itervalues():
+            destinations.update(announced)
+        return {dest: self.next_hop(dest) for dest in destinations}
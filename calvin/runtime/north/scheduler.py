@@ -17,6 +17,8 @@
 import sys
 import time
 import random
+import bisect
+from collections import OrderedDict
 
 from calvin.runtime.south.plugins.async import async
 from calvin.utilities.calvin_callback import CalvinCB
@@ -27,6 +29,79 @@ _log = get_logger(__name__)
 _conf = calvinconfig.get()
 
 
+# Scheduling classes in priority order, actors of a class are fired before actors of lower classes
+SCHEDULING_CLASSES = ('realtime', 'normal', 'background')
+_CLASS_PRIORITY = {c: i for i, c in enumerate(SCHEDULING_CLASSES)}
+_NORMAL_PRIORITY = _CLASS_PRIORITY['normal']
+
+
+def _priority(actor):
+    return _CLASS_PRIORITY.get(actor.scheduling_class, _NORMAL_PRIORITY)
+
+
+class LatencyHistogram(object):
+
+    """
+    Histogram of the time (seconds) from an actor being triggered until it is fired.
+    Bucket i counts latencies up to BUCKETS[i], the last bucket counts anything larger.
+    """
+
+    BUCKETS = (0.001, 0.002, 0.005, 0.010, 0.020, 0.050, 0.100, 0.200, 0.500, 1.0)
+
+    def __init__(self):
+        super(LatencyHistogram, self).__init__()
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, latency):
+        self.counts[bisect.bisect_left(self.BUCKETS, latency)] += 1
+        self.total += latency
+        if latency > self.max:
+            self.max = latency
+
+    def as_dict(self):
+        count = sum(self.counts)
+        return {'buckets': list(self.BUCKETS), 'counts': list(self.counts), 'count': count,
+                'mean': self.total / count if count else 0.0, 'max': self.max}
+
+
+class ActorUsage(object):
+
+    """
+    Wall clock and CPU time (in seconds) spent firing an actor, in total and per fired action.
+    CPU time is process time, hence includes any other threads running in the runtime.
+    """
+
+    def __init__(self):
+        super(ActorUsage, self).__init__()
+        self.fire_count = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        # Number of times a fire exceeded the actor's time budget
+        self.overruns = 0
+        # action name -> [fire count, wall, cpu]
+        self.actions = {}
+
+    def fired(self, wall, cpu):
+        self.fire_count += 1
+        self.wall += wall
+        self.cpu += cpu
+
+    def action_fired(self, action_name, wall, cpu):
+        action = self.actions.get(action_name)
+        if action is None:
+            action = self.actions[action_name] = [0, 0.0, 0.0]
+        action[0] += 1
+        action[1] += wall
+        action[2] += cpu
+
+    def as_dict(self):
+        return {'fire_count': self.fire_count, 'wall': self.wall, 'cpu': self.cpu, 'overruns': self.overruns,
+                'actions': {name: {'fire_count': a[0], 'wall': a[1], 'cpu': a[2]}
+                            for name, a in self.actions.iteritems()}}
+
+
 class Scheduler(object):
 
     """docstring for Scheduler"""
@@ -46,6 +121,14 @@ class Scheduler(object):
         self._maintenance_loop = None
         self._maintenance_delay = _conf.get(None, "maintenance_delay") or 300
         self.actor_pressures = {}
+        # Time given to an actor to repeatedly fire actions, and to a round of firing actors
+        self._time_budget = _conf.get(None, "actor_time_budget") or 0.020
+        self._loop_time_budget = _conf.get(None, "scheduler_time_budget") or 0.100
+        # actor id -> ActorUsage
+        self.actor_usage = {}
+        # actor id -> time when triggered, for actors triggered but not yet fired
+        self._triggered = {}
+        self.latency = {c: LatencyHistogram() for c in SCHEDULING_CLASSES}
 
     def run(self):
         async.run_ioloop()
@@ -97,6 +180,7 @@ class Scheduler(object):
                 self._loop_once = async.DelayedCall(0, self.loop_once, True)
             else:
                 self._trigger_set.update(actor_ids)
+                self._mark_triggered(actor_ids)
                 # Don't run None jobs
                 if self._trigger_set == set([None]):
                     _log.debug("Ignoring fire")
@@ -108,30 +192,94 @@ class Scheduler(object):
     def _log_exception_during_fire(self, e):
         _log.exception(e)
 
+    def set_time_budget(self, actor_ids, time_budget=None):
+        """
+        Set the time budget (seconds) of actors, None restores the default budget.
+        The budget is kept by the actor, hence it follows the actor when migrated.
+        """
+        for actor_id in actor_ids:
+            self.actor_mgr.actors[actor_id].set_time_budget(time_budget)
+
+    def get_time_budget(self, actor_id):
+        actor = self.actor_mgr.actors.get(actor_id)
+        return self._actor_time_budget(actor) if actor else self._time_budget
+
+    def _actor_time_budget(self, actor):
+        return self._time_budget if actor.time_budget is None else actor.time_budget
+
+    def get_usage(self, actor_id=None):
+        """ Time usage of actor_id, or of all actors fired by the scheduler when actor_id is None """
+        if actor_id is None:
+            return {actor_id: usage.as_dict() for actor_id, usage in self.actor_usage.iteritems()}
+        usage = self.actor_usage.get(actor_id)
+        if usage is None:
+            if actor_id not in self.actor_mgr.actors:
+                raise KeyError("Unknown actor %s" % actor_id)
+            usage = ActorUsage()
+        return dict(usage.as_dict(), time_budget=self.get_time_budget(actor_id))
+
+    def get_latency(self):
+        """ Trigger to fire latency histogram per scheduling class """
+        return {c: h.as_dict() for c, h in self.latency.iteritems()}
+
+    def _mark_triggered(self, actor_ids):
+        now = time.time()
+        for actor_id in actor_ids:
+            if actor_id is not None and actor_id not in self._triggered:
+                self._triggered[actor_id] = now
+
+    def remove_actor(self, actor_id):
+        """ Forget accounting of an actor that is destroyed or migrated """
+        self.actor_usage.pop(actor_id, None)
+        self._triggered.pop(actor_id, None)
+        self.actor_pressures.pop(actor_id, None)
+
+    def _fire_actor(self, actor):
+        """ Fire one actor and keep track of its pressure and time usage, returns True if any action fired """
+        did_fire = False
+        usage = self.actor_usage.get(actor.id)
+        if usage is None:
+            usage = self.actor_usage[actor.id] = ActorUsage()
+        time_budget = self._actor_time_budget(actor)
+        start_time = time.time()
+        triggered = self._triggered.pop(actor.id, None)
+        if triggered is not None:
+            self.latency.get(actor.scheduling_class, self.latency['normal']).add(start_time - triggered)
+        start_cpu = time.clock()
+        try:
+            _log.debug("Fire actor %s (%s, %s)" % (actor.name, actor._type, actor.id))
+            did_fire = actor.fire(time_budget, usage)
+        except Exception as e:
+            self._log_exception_during_fire(e)
+        time_spent = time.time() - start_time
+        usage.fired(time_spent, time.clock() - start_cpu)
+        if time_spent > time_budget:
+            usage.overruns += 1
+            actor._warn_slow_actor(time_spent, start_time)
+
+        pressure = actor.get_pressure().values()
+        pressure_values = [p for _, _, p in pressure]
+        if self.actor_pressures.get(actor.id, False) != pressure_values:
+            self.actor_pressures[actor.id] = pressure_values
+        return did_fire
+
     def fire_actors(self, actor_ids=None):
         did_fire = False
         actor_ids = set()
 
         actors = self.actor_mgr.enabled_actors()
-        # Shuffle order since now we stop after executing actors for too long
+        # Shuffle order since now we stop after executing actors for too long,
+        # but always fire actors of higher scheduling classes first
         random.shuffle(actors)
+        actors.sort(key=_priority)
 
         start_time = time.time()
         timeout = False
         for actor in actors:
-            try:
-                _log.debug("Fire actor %s (%s, %s)" % (actor.name, actor._type, actor.id))
-                did_fire |= actor.fire()
-                actor_ids.add(actor.id)
-            except Exception as e:
-                self._log_exception_during_fire(e)
-
-            pressure = actor.get_pressure().values()
-            pressure_values = [p for _, _, p in pressure]
-            if self.actor_pressures.get(actor.id, False) != pressure_values:
-                self.actor_pressures[actor.id] = pressure_values
-
-            timeout = time.time() - start_time > 0.100
+            did_fire |= self._fire_actor(actor)
+            actor_ids.add(actor.id)
+
+            timeout = time.time() - start_time > self._loop_time_budget
             if timeout:
                 break
 
@@ -162,6 +310,117 @@ class Scheduler(object):
             self._maintenance_loop = async.DelayedCall(0, self.maintenance_loop)
 
 
+class EventScheduler(Scheduler):
+    """
+    Scheduler only firing actors that have been triggered, i.e. that got tokens, token slots
+    or a calvinsys event since they were last fired. Idle actors are never visited except
+    during the heartbeat sweep, which fires every enabled actor as a safety net.
+    Ready actors of higher scheduling classes are fired first.
+    """
+
+    def __init__(self, node, actor_mgr, monitor):
+        super(EventScheduler, self).__init__(node, actor_mgr, monitor)
+        # Ordered sets of actor ids to fire per scheduling class, the order gives round-robin fairness
+        self._ready = [OrderedDict() for _ in SCHEDULING_CLASSES]
+        self._sweep = False
+
+    def loop_once(self, all_=False):
+        self._loop_once = None
+        if all_:
+            self._sweep = True
+        try:
+            activity = self.monitor.loop(self)
+        except:
+            _log.exception("loop_once monitor failed")
+            return
+        # Endpoints that transferred tokens make the actors involved ready
+        for endpoint in activity or []:
+            self.make_ready(endpoint.get_actor_ids())
+
+        if self._sweep:
+            self._sweep = False
+            self.make_ready([actor.id for actor in self.actor_mgr.enabled_actors()])
+
+        self.fire_actors()
+
+        if any(self._ready) or activity:
+            # Something left to do - run again
+            if self._loop_once is None:
+                self._loop_once = async.DelayedCall(0, self.loop_once)
+        # Sweep every heartbeat also when busy, actors that missed a trigger would otherwise starve
+        if self._heartbeat_loop is None:
+            self._heartbeat_loop = async.DelayedCall(self._heartbeat, self._heartbeat_sweep)
+
+        # Control replication
+        self.node.rm.replication_loop()
+
+    def _heartbeat_sweep(self):
+        self._heartbeat_loop = None
+        self.trigger_loop()
+
+    def make_ready(self, actor_ids):
+        """ Put actors last in the ready queue of their scheduling class, unless already queued """
+        now = time.time()
+        for actor_id in actor_ids:
+            actor = self.actor_mgr.actors.get(actor_id, None)
+            if actor is None:
+                continue
+            ready = self._ready[_priority(actor)]
+            if actor_id not in ready:
+                ready[actor_id] = True
+                self._triggered.setdefault(actor_id, now)
+
+    def trigger_loop(self, delay=0, actor_ids=None):
+        """ Trigger the loop_once potentially after waiting delay seconds """
+        if delay > 0:
+            _log.debug("Delayed trigger %s" % delay)
+            async.DelayedCall(delay, self.trigger_loop, 0, actor_ids)
+            return
+        if actor_ids is None:
+            # Unknown which actors are affected, fire all of them
+            self._sweep = True
+        else:
+            self.make_ready(actor_ids)
+            if not any(self._ready):
+                _log.debug("Ignoring fire")
+                return
+        # Never have more then one outstanding loop_once
+        if self._loop_once is None:
+            self._loop_once = async.DelayedCall(0, self.loop_once)
+
+    def fire_actors(self, actor_ids=None):
+        did_fire = False
+        fired_ids = set()
+
+        start_time = time.time()
+        timeout = False
+        # Fire the actors that were ready when the round started, highest scheduling class first.
+        # Actors made ready while firing (including requeued actors) are placed last and fired next round
+        counts = [len(ready) for ready in self._ready]
+        for ready, count in zip(self._ready, counts):
+            for _ in range(count):
+                actor_id = ready.popitem(last=False)[0]
+                actor = self.actor_mgr.actors.get(actor_id, None)
+                if actor is None or not actor.enabled():
+                    self._triggered.pop(actor_id, None)
+                    continue
+                if self._fire_actor(actor):
+                    did_fire = True
+                    # Might be able to fire again
+                    self.make_ready([actor_id])
+                fired_ids.add(actor_id)
+
+                timeout = time.time() - start_time > self._loop_time_budget
+                if timeout:
+                    break
+            if timeout:
+                break
+
+        self.idle = not any(self._ready)
+
+        return (did_fire, timeout, fired_ids)
+
+
 class DebugScheduler(Scheduler):
     """This is an instrumented version of the scheduler for use in debugging runs."""
 
@@ -185,3 +444,8 @@ class DebugScheduler(Scheduler):
         from infi.traceback import traceback_context
         traceback_context()
         return super(DebugScheduler, self).fire_actors(actor_ids)
+
+
+class DebugEventScheduler(DebugScheduler, EventScheduler):
+    """This is an instrumented version of the event scheduler for use in debugging runs."""
+    pass
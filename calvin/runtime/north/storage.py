@@ -15,6 +15,8 @@
 # limitations under the License.
 
 from calvin.runtime.north.plugins.storage import storage_factory
+from calvin.runtime.north.storage_cache import RegistryCache
+from calvin.runtime.north.plugins.storage.prefix_index import PrefixIndex, PrefixHashTree, index_key
 from calvin.runtime.north.plugins.coders.messages import message_coder_factory
 from calvin.csparser.port_property_syntax import list_port_property_capabilities
 from calvin.runtime.south.plugins.async import async
@@ -26,11 +28,23 @@ from calvin.utilities import calvinconfig
 from calvin.actorstore.store import GlobalStore
 from calvin.utilities.security import Security, security_enabled
 from calvin.utilities import dynops
+from calvin.utilities.utils import get_host_id
 import re
+import time
+from collections import OrderedDict
 
 _log = calvinlogger.get_logger(__name__)
 _conf = calvinconfig.get()
 
+# Max seconds between retries of failed writes
+FLUSH_TIMEOUT_MAX = 60.0
+# Seconds without an answer before a write is sent again
+IN_FLIGHT_TIMEOUT = 30.0
+# Seconds to wait for more storage nodes to be lost before republishing
+REPUBLISH_DELAY = 5.0
+# Times a failed index operation of a storage plugin with prefix search is retried
+INDEX_RETRIES = 5
+
 class Storage(object):
 
     """
@@ -39,8 +53,12 @@ class Storage(object):
     """
 
     def __init__(self, node, override_storage=None):
-        self.localstore = {}
-        self.localstore_sets = {}
+        # Written but not yet acknowledged by storage, or all data when storage is local
+        self.localstore = {}  # key: value
+        self.localstore_sets = {}  # key: {'+': values appended, '-': values removed}
+        self._dirty = set()  # keys changed since their last send
+        self._in_flight = {}  # key: time of the send not yet answered, at most one per key
+        self._callbacks = {}  # key: [(org_key, cb)] waiting for the next send of key
         self.started = False
         self.node = node
         storage_type = _conf.get('global', 'storage_type')
@@ -54,6 +72,24 @@ class Storage(object):
         else:
             self.storage = storage_factory.get(storage_type, node)
         self.coder = message_coder_factory.get("json")  # TODO: always json? append/remove requires json at the moment
+        # Values read from storage, the cache keys are ('get', key) and ('concat', key)
+        self.cache = RegistryCache(_conf.get('global', 'storage_cache_size') or 0,
+                                   _conf.get('global', 'storage_cache_ttl') or 0,
+                                   _conf.get('global', 'storage_cache_prefixes'))
+        if hasattr(self.storage, 'set_change_callback'):
+            self.storage.set_change_callback(CalvinCB(self.invalidate))
+        if hasattr(self.storage, 'set_node_lost_callback'):
+            self.storage.set_node_lost_callback(CalvinCB(self.republish))
+        # What this runtime wrote, to republish when storage nodes are lost
+        self._own_records = OrderedDict()  # key: value or set of appended values
+        self._own_records_size = (_conf.get('global', 'storage_own_records') or 0) if self.starting else 0
+        self._republish_delayedcall = None
+        # Index with prefix search, by the storage plugin when it has it, a trie when storage is only local,
+        # otherwise a prefix hash tree on top of append, remove and get_concat
+        self.localindex = PrefixIndex() if self.storage is None else None
+        self.prefix_hash_tree = PrefixHashTree(self, tree=_conf.get('global', 'storage_index_format') == 'tree')
+        self._index_ops = []  # (plugin method, args, number, retries) to do when started or retry
+        self._index_numbers = {}  # key: (index, value), value: number of the latest operation on it
         self.flush_delayedcall = None
         self.reset_flush_timeout()
 
@@ -67,45 +103,201 @@ class Storage(object):
     def trigger_flush(self, delay=None):
         """ Trigger a flush of internal data
         """
-        if self.localstore or self.localstore_sets:
+        if self._dirty or self._index_ops:
             if delay is None:
                 delay = self.flush_timeout
             if self.flush_delayedcall is None:
                 self.flush_delayedcall = async.DelayedCall(delay, self.flush_localdata)
 
     def flush_localdata(self):
-        """ Write data in localstore to storage
+        """ Write changes in localstore not yet sent to storage
         """
-        _log.debug("Flush local storage data")
-        if self.flush_timeout < 600:
-            self.flush_timeout = self.flush_timeout * 2
+        _log.debug("Flush local storage data, %d keys" % len(self._dirty))
+        self.flush_timeout = min(self.flush_timeout * 2, FLUSH_TIMEOUT_MAX)
         self.flush_delayedcall = None
-        for key in self.localstore:
-            _log.debug("Flush key %s: %s" % (key, self.localstore[key]))
-            self.storage.set(key=key, value=self.localstore[key],
-                             cb=CalvinCB(func=self.set_cb, org_key=None, org_value=None, org_cb=None, silent=True))
+        now = time.time()
+        # Not in flight or the answer was lost
+        self._send_many([key for key in self._dirty if self._in_flight.get(key, 0) < now - IN_FLIGHT_TIMEOUT])
+        index_ops, self._index_ops = self._index_ops, []
+        for op, args, number, retries in index_ops:
+            self._index_op(op, None, args, number, retries)
+        # Keys waiting for an answer
+        self.trigger_flush()
 
-        for key, value in self.localstore_sets.iteritems():
-            self._flush_append(key, value['+'])
-            self._flush_remove(key, value['-'])
+    def _write(self, key, org_key, cb):
+        """ Key changed in localstore, send the change when no earlier change of key is in flight
+        """
+        self._dirty.add(key)
+        if cb:
+            self._callbacks.setdefault(key, []).append((org_key, cb))
+        if key not in self._in_flight:
+            self._send(key)
+        else:
+            self.trigger_flush()
 
-    def _flush_append(self, key, value):
-        if not value:
-            return
+    def _send(self, key):
+        """ Send the changes of key, coalesced since the last send
+        """
+        self._dirty.discard(key)
+        callbacks = self._callbacks.pop(key, [])
+        if key in self.localstore:
+            value = self.localstore[key]
+            _log.debug("Send set on key %s: %s" % (key, value))
+            self._in_flight[key] = time.time()
+            self.storage.set(key=key, value=value, cb=CalvinCB(func=self.set_cb, callbacks=callbacks))
+        elif key in self.localstore_sets:
+            change = self.localstore_sets[key]
+            self._send_set_change(key, set(change['+']), set(change['-']), callbacks)
+        else:
+            # Deleted before start, nothing to send
+            self._acknowledged(key, True, callbacks)
 
-        _log.debug("Flush append on key %s: %s" % (key, list(value)))
-        coded_value = self.coder.encode(list(value))
-        self.storage.append(key=key, value=coded_value,
-                            cb=CalvinCB(func=self.append_cb, org_key=None, org_value=None, org_cb=None, silent=True))
+    def _write_many(self, keys, org_keys, cb):
+        """ Keys changed in localstore, send the changes in batches, keys with earlier changes in flight later
+        """
+        state = {'pending': len(keys), 'ok': True}
+        for key, org_key in zip(keys, org_keys):
+            self._dirty.add(key)
+            if cb:
+                self._callbacks.setdefault(key, []).append(
+                    (org_key, CalvinCB(self._many_cb, state=state, org_keys=org_keys, org_cb=cb)))
+        self._send_many([key for key in keys if key not in self._in_flight])
+        self.trigger_flush()
 
-    def _flush_remove(self, key, value):
-        if not value:
+    def _many_cb(self, key, value, state, org_keys, org_cb):
+        """ One key of a batch done, callback org_cb(key=org_keys, value=True/False) when all are done """
+        state['ok'] = state['ok'] and bool(value)
+        state['pending'] -= 1
+        if not state['pending']:
+            org_cb(key=org_keys, value=state['ok'])
+
+    def _send_many(self, keys):
+        """ Send the changes of keys, sets in one batch and appends in one batch, the others one by one
+        """
+        sets = {}
+        appends = {}
+        for key in keys:
+            if key in self.localstore:
+                sets[key] = self.localstore[key]
+            elif key in self.localstore_sets and self.localstore_sets[key]['+'] and not self.localstore_sets[key]['-']:
+                appends[key] = set(self.localstore_sets[key]['+'])
+            else:
+                self._send(key)
+        if len(sets) > 1:
+            _log.debug("Send set on keys %s" % sets.keys())
+            self.storage.set_many(items=sets, cb=CalvinCB(func=self._set_many_cb, callbacks=self._sending(sets)))
+        else:
+            for key in sets:
+                self._send(key)
+        if len(appends) > 1:
+            _log.debug("Send append on keys %s" % appends.keys())
+            callbacks = self._sending(appends)
+            self.storage.append_many(items={key: self.coder.encode(list(added)) for key, added in appends.items()},
+                                     cb=CalvinCB(func=self._append_many_cb, added=appends, callbacks=callbacks))
+        else:
+            for key in appends:
+                self._send(key)
+
+    def _sending(self, keys):
+        """ Keys are sent, returns their callbacks """
+        now = time.time()
+        callbacks = {}
+        for key in keys:
+            self._dirty.discard(key)
+            self._in_flight[key] = now
+            callbacks[key] = self._callbacks.pop(key, [])
+        return callbacks
+
+    @staticmethod
+    def _many_status(value, key):
+        """ Status of key in the answer of a batch operation, a dict or False when all failed """
+        return value.get(key, False) if isinstance(value, dict) else False
+
+    def _set_many_cb(self, key, value, callbacks):
+        """ set_many callback """
+        for k in callbacks:
+            self.set_cb(k, self._many_status(value, k), callbacks[k])
+
+    def _append_many_cb(self, key, value, added, callbacks):
+        """ append_many callback """
+        for k in callbacks:
+            self.append_cb(k, self._many_status(value, k), added[k], set([]), callbacks[k])
+
+    def _send_set_change(self, key, added, removed, callbacks):
+        """ Append added and then remove removed values """
+        if added:
+            _log.debug("Send append on key %s: %s" % (key, list(added)))
+            self._in_flight[key] = time.time()
+            self.storage.append(key=key, value=self.coder.encode(list(added)),
+                                cb=CalvinCB(func=self.append_cb, added=added, removed=removed, callbacks=callbacks))
+        elif removed:
+            _log.debug("Send remove on key %s: %s" % (key, list(removed)))
+            self._in_flight[key] = time.time()
+            self.storage.remove(key=key, value=self.coder.encode(list(removed)),
+                                cb=CalvinCB(func=self.remove_cb, removed=removed, callbacks=callbacks))
+        else:
+            self._acknowledged(key, True, callbacks)
+
+    def _acknowledged(self, key, value, callbacks):
+        """ Storage answered the change of key sent, send later changes """
+        self._in_flight.pop(key, None)
+        if value:
+            self.reset_flush_timeout()
+        else:
+            _log.warning("Failed to update %s, will retry" % key)
+            self._dirty.add(key)
+        for org_key, cb in callbacks:
+            cb(key=org_key, value=bool(value))
+        if key in self._dirty:
+            if value:
+                self._send(key)
+            else:
+                self.trigger_flush()
+
+    def _own(self, key, value=None, added=None, removed=None):
+        """ Keep what this runtime wrote to key for republishing, the least recently written are forgotten
+        """
+        if not self._own_records_size:
             return
+        record = self._own_records.pop(key, None)
+        if added is not None or removed is not None:
+            record = record if isinstance(record, set) else set([])
+            record |= set(added or [])
+            record -= set(removed or [])
+            if not record:
+                return
+        else:
+            record = value
+            if record is None:
+                return
+        self._own_records[key] = record
+        while len(self._own_records) > self._own_records_size:
+            self._own_records.popitem(last=False)
+
+    def forget(self, keys):
+        """ Stop republishing keys, e.g. records of an actor that migrated and is now registered by another runtime
+        """
+        for key in keys:
+            self._own_records.pop(key, None)
 
-        _log.debug("Flush remove on key %s: %s" % (key, list(value)))
-        coded_value = self.coder.encode(list(value))
-        self.storage.remove(key=key, value=coded_value,
-                            cb=CalvinCB(func=self.remove_cb, org_key=None, org_value=None, org_cb=None, silent=True))
+    def republish(self, delay=REPUBLISH_DELAY):
+        """ Write the records of this runtime again, called by the storage plugin when a storage node was lost
+        """
+        if not self.started or not self._own_records or self._republish_delayedcall is not None:
+            return
+        self._republish_delayedcall = async.DelayedCall(delay, self._republish)
+
+    def _republish(self):
+        self._republish_delayedcall = None
+        _log.debug("Republish %d records" % len(self._own_records))
+        for key, record in self._own_records.items():
+            if isinstance(record, set):
+                change = self.localstore_sets.setdefault(key, {'+': set([]), '-': set([])})
+                change['+'] |= record - change['-']
+            elif key not in self.localstore:
+                self.localstore[key] = record
+            self._dirty.add(key)
+        self.trigger_flush(0)
 
     def started_cb(self, *args, **kwargs):
         """ Called when storage has started, flushes localstore
@@ -120,14 +312,21 @@ class Storage(object):
             async.DelayedCall(0, kwargs["org_cb"], args[0])
 
     def dump(self):
-        "Dump the local storage to a temp file"
+        """ Dump what this runtime wrote to a temp file, i.e. the records kept for republishing
+            and the writes not yet acknowledged by storage (all data when storage is local)
+        """
         import tempfile
         import json
+        values = {k: v for k, v in self._own_records.iteritems() if not isinstance(v, set)}
+        values.update(self.localstore)
+        sets = {k: set(v) for k, v in self._own_records.iteritems() if isinstance(v, set)}
+        for k, v in self.localstore_sets.iteritems():
+            sets[k] = (sets.get(k, set([])) | v['+']) - v['-']
         with tempfile.NamedTemporaryFile(mode='w', prefix="storage", delete=False) as fp:
             fp.write("[")
-            json.dump({k: json.loads(v) for k, v in self.localstore.items()}, fp)
+            json.dump({k: json.loads(v) if v else v for k, v in values.items()}, fp)
             fp.write(", ")
-            json.dump({k: list(v['+']) for k, v in self.localstore_sets.items()}, fp)
+            json.dump({k: list(v) for k, v in sets.items()}, fp)
             fp.write("]")
             name = fp.name
         return name
@@ -157,6 +356,14 @@ class Storage(object):
                             'APPEND': self.append,
                             'REMOVE': self.remove,
                             'DELETE': self.delete,
+                            'ADD_INDEX': self._proxy_add_index,
+                            'REMOVE_INDEX': self._proxy_remove_index,
+                            'DELETE_INDEX': self._proxy_delete_index,
+                            'GET_INDEX': self._proxy_get_index,
+                            'SET_MANY': self._proxy_set_many,
+                            'GET_MANY': self._proxy_get_many,
+                            'APPEND_MANY': self._proxy_append_many,
+                            'CAPABILITIES': self._proxy_capabilities,
                             'REPLY': self._proxy_reply}
         try:
             self.node.proto.register_tunnel_handler('storage', CalvinCB(self.tunnel_request_handles))
@@ -176,25 +383,31 @@ class Storage(object):
 
     ### Storage operations ###
 
-    def set_cb(self, key, value, org_key, org_value, org_cb, silent=False):
-        """ set callback, on error store in localstore and retry after flush_timeout
+    def invalidate(self, key):
+        """ The value of registry key (including prefix) changed, don't use cached values """
+        self.cache.invalidate(('get', key), ('concat', key))
+
+    def get_cache_statistics(self):
+        """ Hit, miss and invalidation counters and size of the registry cache """
+        return self.cache.get_statistics()
+
+    def set_cb(self, key, value, callbacks):
+        """ set callback, forget the value when no later change, on error retry after flush_timeout
         """
-        if value:
-            if key in self.localstore:
-                del self.localstore[key]
-            self.reset_flush_timeout()
-        else:
-            if not silent:
-                _log.error("Failed to store %s" % key)
-            if org_key and org_value:
-                if not org_value is None:
-                    self.localstore[key] = org_value
+        if value and key not in self._dirty:
+            self.localstore.pop(key, None)
+        self._acknowledged(key, value, callbacks)
 
-        if org_cb:
-            org_cb(key=key, value=bool(value))
+    def _set_local(self, key, value):
+        value = self.coder.encode(value) if value else value
 
-        self.trigger_flush()
+        if key in self.localstore_sets:
+            del self.localstore_sets[key]
+        self.invalidate(key)
 
+        # Always save locally
+        self.localstore[key] = value
+        self._own(key, value=value)
 
     def set(self, prefix, key, value, cb):
         """ Set registry key: prefix+key to be single value: value
@@ -205,22 +418,40 @@ class Storage(object):
             value indicate success.
         """
         _log.debug("Set key %s, value %s" % (prefix + key, value))
-        value = self.coder.encode(value) if value else value
-
-        if prefix + key in self.localstore_sets:
-            del self.localstore_sets[prefix + key]
-
-        # Always save locally
-        self.localstore[prefix + key] = value
+        self._set_local(prefix + key, value)
         if self.started:
-            self.storage.set(key=prefix + key, value=value, cb=CalvinCB(func=self.set_cb, org_key=key, org_value=value, org_cb=cb))
-        elif cb:
-            async.DelayedCall(0, cb, key=key, value=True)
+            self._write(prefix + key, key, cb)
+        else:
+            if self.starting:
+                self._dirty.add(prefix + key)
+            if cb:
+                async.DelayedCall(0, cb, key=key, value=True)
+
+    def set_many(self, prefix, items, cb):
+        """ Set many registry keys: prefix+key to single values, items is a dict with key: value,
+            sent to storage in one batch when the storage plugin supports it.
+            Callback cb with signature cb(key=<list of keys>, value=True/False)
+            note that the keys here are without the prefix and
+            value indicate success of all.
+        """
+        _log.debug("Set keys %s" % [prefix + key for key in items])
+        keys = list(items)
+        for key in keys:
+            self._set_local(prefix + key, items[key])
+        if self.started and keys:
+            self._write_many([prefix + key for key in keys], keys, cb)
+        else:
+            if self.starting:
+                self._dirty.update([prefix + key for key in keys])
+            if cb:
+                async.DelayedCall(0, cb, key=keys, value=True)
 
-    def get_cb(self, key, value, org_cb, org_key):
+    def get_cb(self, key, value, org_cb, org_key, version=None):
         """ get callback
         """
         if value:
+            if version is not None:
+                self.cache.put(('get', key), value, version)
             value = self.coder.decode(value)
         org_cb(org_key, value)
 
@@ -243,18 +474,69 @@ class Storage(object):
                 value = self.coder.decode(value)
             async.DelayedCall(0, cb, key=key, value=value)
         else:
+            hit, value = self.cache.get(('get', prefix + key))
+            if hit:
+                async.DelayedCall(0, cb, key=key, value=self.coder.decode(value))
+                return
             try:
-                self.storage.get(key=prefix + key, cb=CalvinCB(func=self.get_cb, org_cb=cb, org_key=key))
+                self.storage.get(key=prefix + key, cb=CalvinCB(func=self.get_cb, org_cb=cb, org_key=key,
+                                                               version=self.cache.version))
             except:
                 if self.started:
                     _log.error("Failed to get: %s" % key)
                 async.DelayedCall(0, cb, key=key, value=False)
 
-    def get_iter_cb(self, key, value, it, org_key, include_key=False):
+    def _get_many_cb(self, key, value, prefix, org_keys, values, org_cb, version):
+        """ get_many callback """
+        for org_key in org_keys:
+            if org_key in values:
+                continue
+            v = value.get(prefix + org_key) if isinstance(value, dict) else False
+            if v:
+                self.cache.put(('get', prefix + org_key), v, version)
+                v = self.coder.decode(v)
+            values[org_key] = v
+        org_cb(key=org_keys, value=values)
+
+    def get_many(self, prefix, keys, cb):
+        """ Get single values for many registry keys: prefix+key,
+            the keys not locally set or cached are got from storage in one batch
+            when the storage plugin supports it.
+            Callback cb with signature cb(key=<list of keys>, value=<dict with key: retrived value/None/False>)
+            note that the keys here are without the prefix.
+        """
+        if not cb:
+            return
+        keys = list(keys)
+        values = {}
+        for key in keys:
+            if prefix + key in self.localstore:
+                value = self.localstore[prefix + key]
+                values[key] = self.coder.decode(value) if value else value
+                continue
+            hit, value = self.cache.get(('get', prefix + key))
+            if hit:
+                values[key] = self.coder.decode(value)
+        missing = [prefix + key for key in keys if key not in values]
+        if not missing:
+            async.DelayedCall(0, cb, key=keys, value=values)
+            return
+        try:
+            self.storage.get_many(keys=missing, cb=CalvinCB(func=self._get_many_cb, prefix=prefix, org_keys=keys,
+                                                            values=values, org_cb=cb, version=self.cache.version))
+        except:
+            if self.started:
+                _log.error("Failed to get: %s" % missing)
+            async.DelayedCall(0, self._get_many_cb, key=missing, value=False, prefix=prefix, org_keys=keys,
+                              values=values, org_cb=cb, version=None)
+
+    def get_iter_cb(self, key, value, it, org_key, include_key=False, version=None):
         """ get callback
         """
         _log.analyze(self.node.id, "+ BEGIN", {'value': value, 'key': org_key})
         if value:
+            if version is not None:
+                self.cache.put(('get', key), value, version)
             value = self.coder.decode(value)
             it.append((key, value) if include_key else value)
             _log.analyze(self.node.id, "+", {'value': value, 'key': org_key})
@@ -286,20 +568,28 @@ class Storage(object):
                     value = self.coder.decode(value)
                 _log.analyze(self.node.id, "+", {'value': value, 'key': key})
                 it.append((key, value) if include_key else value)
+                return
+            hit, value = self.cache.get(('get', prefix + key))
+            if hit:
+                value = self.coder.decode(value)
+                it.append((key, value) if include_key else value)
             else:
                 try:
                     self.storage.get(key=prefix + key,
-                                     cb=CalvinCB(func=self.get_iter_cb, it=it, org_key=key, include_key=include_key))
+                                     cb=CalvinCB(func=self.get_iter_cb, it=it, org_key=key, include_key=include_key,
+                                                 version=self.cache.version))
                 except:
                     if self.started:
                         _log.analyze(self.node.id, "+", {'value': 'FailedElement', 'key': key})
                         _log.error("Failed to get: %s" % key)
                     it.append((key, dynops.FailedElement) if include_key else dynops.FailedElement)
 
-    def get_concat_cb(self, key, value, org_cb, org_key, local_list):
+    def get_concat_cb(self, key, value, org_cb, org_key, local_list, version=None):
         """ get callback
         """
         if value:
+            if version is not None:
+                self.cache.put(('concat', key), value, version)
             value = self.coder.decode(value)
             if isinstance(value, (list, tuple, set)):
                 org_cb(org_key, list(set(value + local_list)))
@@ -334,19 +624,27 @@ class Storage(object):
             local_list = list(value['+'])
         else:
             local_list = []
+        hit, value = self.cache.get(('concat', prefix + key))
+        if hit:
+            async.DelayedCall(0, self.get_concat_cb, key=prefix + key, value=value, org_cb=cb, org_key=key,
+                              local_list=local_list)
+            return
         try:
             self.storage.get_concat(key=prefix + key,
-                                    cb=CalvinCB(func=self.get_concat_cb, org_cb=cb, org_key=key, local_list=local_list))
+                                    cb=CalvinCB(func=self.get_concat_cb, org_cb=cb, org_key=key, local_list=local_list,
+                                                version=self.cache.version))
         except:
             if self.started:
                 _log.error("Failed to get: %s" % key, exc_info=True)
             async.DelayedCall(0, cb, key=key, value=local_list if local_list else None)
 
-    def get_concat_iter_cb(self, key, value, org_key, include_key, it):
+    def get_concat_iter_cb(self, key, value, org_key, include_key, it, version=None):
         """ get callback
         """
         _log.analyze(self.node.id, "+ BEGIN", {'key': org_key, 'value': value, 'iter': str(it)})
         if value:
+            if version is not None:
+                self.cache.put(('concat', key), value, version)
             value = self.coder.decode(value)
             _log.analyze(self.node.id, "+ VALUE", {'value': value, 'key': org_key})
             if isinstance(value, (list, tuple, set)):
@@ -386,10 +684,15 @@ class Storage(object):
         if include_key:
             local_list = [(key, v) for v in local_list]
         it = dynops.List(local_list)
+        hit, value = self.cache.get(('concat', prefix + key))
+        if hit:
+            self.get_concat_iter_cb(prefix + key, value, org_key=key, include_key=include_key, it=it)
+            _log.analyze(self.node.id, "+ END CACHED", {'key': key, 'iter': str(it)})
+            return it
         try:
             self.storage.get_concat(key=prefix + key,
                             cb=CalvinCB(func=self.get_concat_iter_cb, org_key=key,
-                                        include_key=include_key, it=it))
+                                        include_key=include_key, it=it, version=self.cache.version))
         except:
             if self.started:
                 _log.error("Failed to get: %s" % key, exc_info=True)
@@ -397,23 +700,37 @@ class Storage(object):
         _log.analyze(self.node.id, "+ END", {'key': key, 'iter': str(it)})
         return it
 
-    def append_cb(self, key, value, org_key, org_value, org_cb, silent=False):
-        """ append callback, on error retry after flush_timeout
+    def _set_change_acknowledged(self, key):
+        change = self.localstore_sets.get(key)
+        if change is not None and not change['+'] and not change['-']:
+            del self.localstore_sets[key]
+
+    def append_cb(self, key, value, added, removed, callbacks):
+        """ append callback, forget the appended values and continue with removed values,
+            on error retry after flush_timeout
         """
-        if value:
-            if key in self.localstore_sets:
-                if self.localstore_sets[key]['-']:
-                    self.localstore_sets[key]['+'] = set([])
-                else:
-                    del self.localstore_sets[key]
-                self.reset_flush_timeout()
-        else:
-            if not silent:
-                _log.warning("Failed to update %s" % key)
+        if not value:
+            self._acknowledged(key, value, callbacks)
+            return
+        if key in self.localstore_sets:
+            self.localstore_sets[key]['+'] -= added
+        if removed:
+            self._send_set_change(key, set([]), removed, callbacks)
+            return
+        self._set_change_acknowledged(key)
+        self._acknowledged(key, value, callbacks)
 
-        if org_cb:
-            org_cb(key=org_key, value=bool(value))
-        self.trigger_flush()
+    def _append_local(self, key, value):
+        self.invalidate(key)
+        # Keep local storage for sets updated until confirmed
+        if key in self.localstore_sets:
+            # Append value items
+            self.localstore_sets[key]['+'] |= set(value)
+            # Don't remove value items any more
+            self.localstore_sets[key]['-'] -= set(value)
+        else:
+            self.localstore_sets[key] = {'+': set(value), '-': set([])}
+        self._own(key, added=value)
 
     def append(self, prefix, key, value, cb):
         """ Add multiple values value to registry key: prefix+key,
@@ -426,40 +743,42 @@ class Storage(object):
             value indicate success.
         """
         _log.debug("Append key %s, value %s" % (prefix + key, value))
-        # Keep local storage for sets updated until confirmed
-        if (prefix + key) in self.localstore_sets:
-            # Append value items
-            self.localstore_sets[prefix + key]['+'] |= set(value)
-            # Don't remove value items any more
-            self.localstore_sets[prefix + key]['-'] -= set(value)
-        else:
-            self.localstore_sets[prefix + key] = {'+': set(value), '-': set([])}
-
+        self._append_local(prefix + key, value)
         if self.started:
-            coded_value = self.coder.encode(list(self.localstore_sets[prefix + key]['+']))
-            self.storage.append(key=prefix + key, value=coded_value,
-                                cb=CalvinCB(func=self.append_cb, org_key=key, org_value=value, org_cb=cb))
+            self._write(prefix + key, key, cb)
         else:
+            if self.starting:
+                self._dirty.add(prefix + key)
             if cb:
                 cb(key=key, value=True)
 
-    def remove_cb(self, key, value, org_key, org_value, org_cb, silent=False):
-        """ remove callback, on error retry after flush_timeout
+    def append_many(self, prefix, items, cb):
+        """ Add multiple values to many registry keys: prefix+key, items is a dict with key: value,
+            sent to storage in one batch when the storage plugin supports it.
+            Callback cb with signature cb(key=<list of keys>, value=True/False)
+            note that the keys here are without the prefix and
+            value indicate success of all.
         """
-        if value:
-            if key in self.localstore_sets:
-                if self.localstore_sets[key]['+']:
-                    self.localstore_sets[key]['-'] = set([])
-                else:
-                    del self.localstore_sets[key]
-            self.reset_flush_timeout()
+        _log.debug("Append keys %s" % [prefix + key for key in items])
+        keys = list(items)
+        for key in keys:
+            self._append_local(prefix + key, items[key])
+        if self.started and keys:
+            self._write_many([prefix + key for key in keys], keys, cb)
         else:
-            if not silent:
-                _log.warning("Failed to update %s" % key)
+            if self.starting:
+                self._dirty.update([prefix + key for key in keys])
+            if cb:
+                cb(key=keys, value=True)
 
-        if org_cb:
-            org_cb(key=org_key, value=bool(value))
-        self.trigger_flush()
+    def remove_cb(self, key, value, removed, callbacks):
+        """ remove callback, forget the removed values, on error retry after flush_timeout
+        """
+        if value:
+            if key in self.localstore_sets:
+                self.localstore_sets[key]['-'] -= removed
+            self._set_change_acknowledged(key)
+        self._acknowledged(key, value, callbacks)
 
     def remove(self, prefix, key, value, cb):
         """ Remove multiple values value from registry key: prefix+key,
@@ -472,6 +791,7 @@ class Storage(object):
             value indicate success.
         """
         _log.debug("Remove key %s, value %s" % (prefix + key, value))
+        self.invalidate(prefix + key)
         # Keep local storage for sets updated until confirmed
         if (prefix + key) in self.localstore_sets:
             # Don't append value items any more
@@ -480,12 +800,13 @@ class Storage(object):
             self.localstore_sets[prefix + key]['-'] |= set(value)
         else:
             self.localstore_sets[prefix + key] = {'+': set([]), '-': set(value)}
+        self._own(prefix + key, removed=value)
 
         if self.started:
-            coded_value = self.coder.encode(list(self.localstore_sets[prefix + key]['-']))
-            self.storage.remove(key=prefix + key, value=coded_value,
-                                cb=CalvinCB(func=self.remove_cb, org_key=key, org_value=value, org_cb=cb))
+            self._write(prefix + key, key, cb)
         else:
+            if self.starting:
+                self._dirty.add(prefix + key)
             if cb:
                 cb(key=key, value=True)
 
@@ -499,10 +820,12 @@ class Storage(object):
             value indicate success.
         """
         _log.debug("Deleting key %s" % prefix + key)
+        self.invalidate(prefix + key)
         if prefix + key in self.localstore:
             del self.localstore[prefix + key]
         if (prefix + key) in self.localstore_sets:
             del self.localstore_sets[prefix + key]
+        self._own_records.pop(prefix + key, None)
         if self.started:
             self.set(prefix, key, None, cb)
         else:
@@ -517,6 +840,7 @@ class Storage(object):
         """
         self.set(prefix="node-", key=node.id,
                   value={"uris": node.uris,
+                         "host_id": get_host_id(),
                          "control_uris": [node.external_control_uri],
                          "attributes": {'public': node.attributes.get_public(),
                                         'indexed_public': node.attributes.get_indexed_public(as_list=False)}}, cb=cb)
@@ -670,29 +994,44 @@ class Storage(object):
         _log.debug("Delete application %s" % application_id)
         self.delete(prefix="application-", key=application_id, cb=cb)
 
-    def add_actor(self, actor, node_id, cb=None):
-        """
-        Add actor and its ports to storage
-        """
-        _log.debug("Add actor %s id %s" % (actor, node_id))
+    def _actor_data(self, actor, node_id):
         data = {"name": actor.name, "type": actor._type, "node_id": node_id}
         inports = []
         for p in actor.inports.values():
             port = {"id": p.id, "name": p.name}
             inports.append(port)
-            self.add_port(p, node_id, actor.id)
         data["inports"] = inports
         outports = []
         for p in actor.outports.values():
             port = {"id": p.id, "name": p.name}
             outports.append(port)
-            self.add_port(p, node_id, actor.id)
         data["outports"] = outports
         data["is_shadow"] = isinstance(actor, ShadowActor)
         if actor._replication_data.id:
             data["replication_id"] = actor._replication_data.id
             data["replication_master_id"] = actor._replication_data.master
-        self.set(prefix="actor-", key=actor.id, value=data, cb=cb)
+        return data
+
+    def add_actor(self, actor, node_id, cb=None):
+        """
+        Add actor and its ports to storage
+        """
+        _log.debug("Add actor %s id %s" % (actor, node_id))
+        self.add_ports(actor.inports.values() + actor.outports.values(), node_id, actor.id)
+        self.set(prefix="actor-", key=actor.id, value=self._actor_data(actor, node_id), cb=cb)
+
+    def add_actors(self, actors, node_id, cb=None):
+        """
+        Add actors and their ports to storage, the actors in one batch and the ports in one batch
+        Callback cb with signature cb(key=<list of actor ids>, value=True/False)
+        """
+        _log.debug("Add actors %s id %s" % (actors, node_id))
+        ports = {}
+        for actor in actors:
+            for p in actor.inports.values() + actor.outports.values():
+                ports[p.id] = self._port_data(p, node_id, actor.id)
+        self.set_many(prefix="port-", items=ports, cb=None)
+        self.set_many(prefix="actor-", items={a.id: self._actor_data(a, node_id) for a in actors}, cb=cb)
 
     def get_actor(self, actor_id, cb=None):
         """
@@ -700,6 +1039,13 @@ class Storage(object):
         """
         self.get(prefix="actor-", key=actor_id, cb=cb)
 
+    def get_actors(self, actor_ids, cb=None):
+        """
+        Get actors from storage, in one batch
+        Callback cb with signature cb(key=<list of actor ids>, value=<dict with actor id: actor>)
+        """
+        self.get_many(prefix="actor-", keys=actor_ids, cb=cb)
+
     def delete_actor(self, actor_id, cb=None):
         """
         Delete actor from storage
@@ -707,10 +1053,13 @@ class Storage(object):
         _log.debug("Delete actor id %s" % (actor_id))
         self.delete(prefix="actor-", key=actor_id, cb=cb)
 
-    def add_port(self, port, node_id, actor_id=None, exhausting_peers=None, cb=None):
+    def forget_actor(self, actor_id, port_ids):
         """
-        Add port to storage
+        Stop republishing actor and its ports, they are registered by the runtime the actor migrated to
         """
+        self.forget(["actor-" + actor_id] + ["port-" + port_id for port_id in port_ids])
+
+    def _port_data(self, port, node_id, actor_id=None, exhausting_peers=None):
         if actor_id is None:
             actor_id = port.owner.id
 
@@ -720,7 +1069,19 @@ class Storage(object):
             if exhausting_peers is None:
                 exhausting_peers = []
             data["peers"] = [peer for peer in port.get_peers() if peer[1] not in exhausting_peers]
-        self.set(prefix="port-", key=port.id, value=data, cb=cb)
+        return data
+
+    def add_port(self, port, node_id, actor_id=None, exhausting_peers=None, cb=None):
+        """
+        Add port to storage
+        """
+        self.set(prefix="port-", key=port.id, value=self._port_data(port, node_id, actor_id, exhausting_peers), cb=cb)
+
+    def add_ports(self, ports, node_id, actor_id=None, cb=None):
+        """
+        Add ports to storage in one batch
+        """
+        self.set_many(prefix="port-", items={p.id: self._port_data(p, node_id, actor_id) for p in ports}, cb=cb)
 
     def get_port(self, port_id, cb=None):
         """
@@ -734,6 +1095,18 @@ class Storage(object):
         """
         self.delete(prefix="port-", key=port_id, cb=cb)
 
+    def delete_ports(self, port_ids, cb=None):
+        """
+        Delete ports from storage, in one batch when started
+        """
+        if not self.started:
+            for port_id in port_ids:
+                self.delete(prefix="port-", key=port_id, cb=None)
+            if cb:
+                cb(key=list(port_ids), value=True)
+            return
+        self.set_many(prefix="port-", items=dict.fromkeys(port_ids), cb=cb)
+
     def add_replica(self, replication_id, actor_id, node_id=None, cb=None):
         self.add_index(['replicas', 'actors', replication_id], actor_id, root_prefix_level=3, cb=cb)
         self.add_index(['replicas', 'nodes', replication_id],
@@ -822,38 +1195,69 @@ class Storage(object):
         self.get_replica(replication_id,
                 cb=CalvinCB(self.get_replication_cb, org_cb=cb, data=data))
 
-    def index_cb(self, key, value, org_cb, index_items):
-        """
-        Collect all the index levels operations into one callback
-        """
-        _log.debug("index cb key:%s, value:%s, index_items:%s" % (key, value, index_items))
-        #org_key = key.partition("-")[2]
-        org_key = key
-        # cb False if not already done it at first False value
-        if not value and index_items:
-            org_cb(key=org_key, value=False)
-            del index_items[:]
-        if org_key in index_items:
-            # remove this index level from list
-            index_items.remove(org_key)
-            # If all done send True
-            if not index_items:
-                org_cb(key=org_key, value=True)
-
-    def _index_strings(self, index, root_prefix_level):
-        # Make the list of index levels that should be used
+    def _index_levels(self, index):
         # The index string must been escaped with \/ and \\ for / and \ within levels, respectively
         if isinstance(index, list):
-            items = index
+            index = "/".join(index)
+        return re.split(r'(?<![^\\]\\)/', index.lstrip("/"))
+
+    def _prefix_search(self):
+        """ The storage plugin does the index operations, e.g. the proxy when its master has them """
+        return getattr(self.storage, 'prefix_search', False)
+
+    @staticmethod
+    def _index_target(op, args):
+        """ The (index, value) of an index operation, value None for delete """
+        return index_key(args[0]), args[1] if op != 'delete_index' else None
+
+    def _index_op(self, op, cb, args, number=None, retries=0):
+        """ Index operation by a storage plugin with prefix search, kept until started and retried on error
+            at most INDEX_RETRIES times and only while no later operation on the same index and value
+        """
+        target = self._index_target(op, args)
+        if number is None:
+            number = self._index_numbers[target] = self._index_numbers.get(target, 0) + 1
+        if not self.started:
+            self._index_ops.append((op, args, number, retries))
+            if cb:
+                async.DelayedCall(0, cb, key=index_key(args[0]), value=True)
+            return
+        if not self._prefix_search():
+            # e.g. the proxy got a master without prefix search
+            self._index_numbers.pop(target, None)
+            getattr(self, '_tree_' + op)(*args, cb=cb)
+            return
+        try:
+            getattr(self.storage, op)(*args, cb=CalvinCB(self._index_op_cb, op=op, args=args, number=number,
+                                                         retries=retries, org_cb=cb))
+        except:
+            _log.error("Failed to %s %s" % (op, index_key(args[0])), exc_info=True)
+            async.DelayedCall(0, self._index_op_cb, key=index_key(args[0]), value=False, op=op, args=args,
+                              number=number, retries=retries, org_cb=cb)
+
+    def _index_op_cb(self, key, value, op, args, number, retries, org_cb):
+        target = self._index_target(op, args)
+        latest = self._index_numbers.get(target) == number
+        if not value and latest and retries < INDEX_RETRIES:
+            _log.warning("Failed to %s %s, will retry" % (op, key))
+            self._index_ops.append((op, args, number, retries + 1))
+            self.trigger_flush()
         else:
-            items = re.split(r'(?<![^\\]\\)/', index.lstrip("/"))
-        root = "/".join(items[:root_prefix_level])
-        del items[:root_prefix_level]
-        items.insert(0, root)
+            if not value:
+                _log.error("Failed to %s %s, %s" % (op, key, "gave up" if latest else "superseded"))
+            if latest:
+                self._index_numbers.pop(target)
+        if org_cb:
+            org_cb(key=key, value=bool(value))
 
-        # index strings for all levels
-        indexes = ['/'+'/'.join(items[:l]) for l in range(1,len(items)+1)]
-        return indexes
+    def _tree_add_index(self, levels, value, root_prefix_level, cb):
+        self.prefix_hash_tree.add(levels, root_prefix_level, value, cb=cb)
+
+    def _tree_remove_index(self, levels, value, root_prefix_level, cb):
+        self.prefix_hash_tree.remove(levels, value, root_prefix_level=root_prefix_level, cb=cb)
+
+    def _tree_delete_index(self, levels, root_prefix_level, cb):
+        self.prefix_hash_tree.delete(levels, root_prefix_level=root_prefix_level, cb=cb)
 
     def add_index(self, index, value, root_prefix_level=3, cb=None):
         """
@@ -864,27 +1268,24 @@ class Storage(object):
                e.g. node/address/example_street/3/buildingA/level3/room3003,
                index string must been escaped with \/ and \\ for / and \ within levels
                OR a list of each levels strings
-        value: the value that is to be added to the set stored at each level of the index
+        value: the value that is to be added to the set stored at the index,
+               it is found also when getting any level above it
         root_prefix_level: the top level of the index that can be searched separately,
                with e.g. =1 then node/address can't be split
         cb: Callback with signature cb(key=key, value=True/False)
             note that the key here is without the prefix and
             value indicate success.
         """
-
-        # TODO this implementation will store the value to each level of the index.
-        # When time permits a proper implementation should be done with for example
-        # a prefix hash table on top of the DHT or using other storage backend with
-        # prefix search built in.
-
         _log.debug("add index %s: %s" % (index, value))
-
-        indexes = self._index_strings(index, root_prefix_level)
-
-        # make copy of indexes since altered in callbacks
-        for i in indexes[:]:
-            self.append(prefix="index-", key=i, value=[value],
-                        cb=CalvinCB(self.index_cb, org_cb=cb, index_items=indexes) if cb else None)
+        levels = self._index_levels(index)
+        if self.storage is None:
+            self.localindex.add(levels, value)
+            if cb:
+                async.DelayedCall(0, cb, key=index_key(levels), value=True)
+        elif self._prefix_search() or not self.started and self.proxy:
+            self._index_op('add_index', cb, (levels, value, root_prefix_level))
+        else:
+            self._tree_add_index(levels, value, root_prefix_level, cb=cb)
 
     def remove_index(self, index, value, root_prefix_level=2, cb=None):
         """
@@ -896,35 +1297,28 @@ class Storage(object):
                node/affiliation/name/com.ericsson/laptop,
                index string must been escaped with \/ and \\ for / and \ within levels
                OR a list of each levels strings
-        value: the value that is to be removed from the set stored at each level of the index
+        value: the value that is to be removed from the set stored at the index
         root_prefix_level: the top level of the index that can be searched separately,
-               with e.g. =1 then node/address can't be split
+               with e.g. =1 then node/address can't be split, with storage_index_format 'tree'
+               values are found whatever level they were added with
         cb: Callback with signature cb(key=key, value=True/False)
             note that the key here is without the prefix and
             value indicate success.
         """
-
-        # TODO this implementation will delete the value to each level of the index.
-        # When time permits a proper implementation should be done with for example
-        # a prefix hash table on top of the DHT or using other storage backend with
-        # prefix search built in.
-
-        # TODO Currently we don't go deeper than the specified index for a remove,
-        # e.g. node/affiliation/owner/com.ericsson would remove the value from
-        # all deeper indeces. But no current use case exist either.
-
         _log.debug("remove index %s: %s" % (index, value))
-
-        indexes = self._index_strings(index, root_prefix_level)
-
-        # make copy of indexes since altered in callbacks
-        for i in indexes[:]:
-            self.remove(prefix="index-", key=i, value=[value],
-                        cb=CalvinCB(self.index_cb, org_cb=cb, index_items=indexes) if cb else None)
+        levels = self._index_levels(index)
+        if self.storage is None:
+            self.localindex.remove(levels, value)
+            if cb:
+                async.DelayedCall(0, cb, key=index_key(levels), value=True)
+        elif self._prefix_search() or not self.started and self.proxy:
+            self._index_op('remove_index', cb, (levels, value, root_prefix_level))
+        else:
+            self._tree_remove_index(levels, value, root_prefix_level, cb=cb)
 
     def delete_index(self, index, root_prefix_level=2, cb=None):
         """
-        Remove index entry in registry
+        Remove index entry in registry, all values at the level or below it in hierarchy
         index: The multilevel key:
                a string with slash as delimiter for finer level of index,
                e.g. node/address/example_street/3/buildingA/level3/room3003,
@@ -933,18 +1327,21 @@ class Storage(object):
                index string must been escaped with \/ and \\ for / and \ within levels
                OR a list of each levels strings
         root_prefix_level: the top level of the index that can be searched separately,
-               with e.g. =1 then node/address can't be split
+               with e.g. =1 then node/address can't be split, with storage_index_format 'tree'
+               values are found whatever level they were added with
         cb: Callback with signature cb(key=key, value=True/False)
             note that the key here is without the prefix and
             value indicate success.
         """
-
-        indexes = self._index_strings(index, root_prefix_level)
-
-        # make copy of indexes since altered in callbacks
-        for i in indexes[:]:
-            self.delete(prefix="index-", key=i,
-                        cb=CalvinCB(self.index_cb, org_cb=cb, index_items=indexes) if cb else None)
+        levels = self._index_levels(index)
+        if self.storage is None:
+            self.localindex.delete(levels)
+            if cb:
+                async.DelayedCall(0, cb, key=index_key(levels), value=True)
+        elif self._prefix_search() or not self.started and self.proxy:
+            self._index_op('delete_index', cb, (levels, root_prefix_level))
+        else:
+            self._tree_delete_index(levels, root_prefix_level, cb=cb)
 
     def get_index(self, index, cb=None):
         """
@@ -966,19 +1363,25 @@ class Storage(object):
         list of values, it may also miss values added by others but
         not yet distributed.
         """
+        levels = self._index_levels(index)
+        _log.debug("get index %s" % (index_key(levels)))
+        if self.storage is None:
+            values = self.localindex.get(levels)
+            async.DelayedCall(0, cb, key=index_key(levels), value=list(values) if values else None)
+        elif self._prefix_search():
+            try:
+                self.storage.get_index(levels, cb=cb)
+            except:
+                if self.started:
+                    _log.error("Failed to get index: %s" % index_key(levels), exc_info=True)
+                async.DelayedCall(0, cb, key=index_key(levels), value=None)
+        else:
+            self.prefix_hash_tree.get(levels, cb=cb)
 
-        # TODO this implementation will get the value from the level of the index.
-        # When time permits a proper implementation should be done with for example
-        # a prefix hash table on top of the DHT or using other storage backend with
-        # prefix search built in.
-
-        if isinstance(index, list):
-            index = "/".join(index)
-
-        if not index.startswith("/"):
-            index = "/" + index
-        _log.debug("get index %s" % (index))
-        self.get_concat(prefix="index-", key=index, cb=cb)
+    def _get_index_iter_cb(self, key, value, it, include_key):
+        if value:
+            it.extend([(key, v) for v in value] if include_key else value)
+        it.final()
 
     def get_index_iter(self, index, include_key=False):
         """
@@ -1007,19 +1410,10 @@ class Storage(object):
         list of values, it may also miss values added by others but
         not yet distributed.
         """
-
-        # TODO this implementation will get the value from the level of the index.
-        # When time permits a proper implementation should be done with for example
-        # a prefix hash table on top of the DHT or using other storage backend with
-        # prefix search built in.
-
-        if isinstance(index, list):
-            index = "/".join(index)
-
-        if not index.startswith("/"):
-            index = "/" + index
         _log.debug("get index iter %s" % (index))
-        return self.get_concat_iter(prefix="index-", key=index, include_key=include_key)
+        it = dynops.List()
+        self.get_index(index, cb=CalvinCB(self._get_index_iter_cb, it=it, include_key=include_key))
+        return it
 
     ### Storage proxy server ###
 
@@ -1050,6 +1444,41 @@ class Storage(object):
         # Should not get any replies to the server but log it just in case
         _log.analyze(self.node.id, "+ SERVER", {args: args, 'kwargs': kwargs})
 
+    def _proxy_capabilities(self, cb, prefix):
+        # Clients only send the commands older masters lack when listed here
+        cb(key=None, value=sorted(self._proxy_cmds))
+
+    def _proxy_add_index(self, cb, prefix, key, value, root_prefix_level):
+        self.add_index(key, value, root_prefix_level=root_prefix_level, cb=cb)
+
+    def _proxy_remove_index(self, cb, prefix, key, value, root_prefix_level):
+        self.remove_index(key, value, root_prefix_level=root_prefix_level, cb=cb)
+
+    def _proxy_delete_index(self, cb, prefix, key, root_prefix_level):
+        self.delete_index(key, root_prefix_level=root_prefix_level, cb=cb)
+
+    def _proxy_get_index(self, cb, prefix, key):
+        self.get_index(key, cb=cb)
+
+    def _proxy_many_reply(self, key, value, org_cb):
+        # The client's storage plugin level expects the status of each key
+        org_cb(key=key, value=dict.fromkeys(key, value))
+
+    def _proxy_set_many(self, cb, prefix, items):
+        # None is a delete, the other values will be encoded again in set_many, hence decode
+        items = {k: self.coder.decode(v) if v is not None else None for k, v in items.iteritems()}
+        self.set_many(prefix, items, cb=CalvinCB(self._proxy_many_reply, org_cb=cb))
+
+    def _proxy_append_many(self, cb, prefix, items):
+        items = {k: self.coder.decode(v) for k, v in items.iteritems()}
+        self.append_many(prefix, items, cb=CalvinCB(self._proxy_many_reply, org_cb=cb))
+
+    def _proxy_get_many_reply(self, key, value, org_cb):
+        org_cb(key=key, value={k: self.coder.encode(v) if v else v for k, v in value.iteritems()})
+
+    def _proxy_get_many(self, cb, prefix, keys):
+        self.get_many(prefix, keys, cb=CalvinCB(self._proxy_get_many_reply, org_cb=cb))
+
     def tunnel_recv_handler(self, tunnel, payload):
         """ Gets called when a storage client request"""
         _log.debug("Storage proxy request %s" % payload)
@@ -1068,10 +1497,11 @@ class Storage(object):
             # If we are doing a get or get_concat then the result needs to be encoded, to correspond with what the
             # client's higher level expect from storage plugin level.
             self._proxy_cmds[payload['cmd']](cb=CalvinCB(self._proxy_send_reply, tunnel=tunnel,
-                                                        encode=True if payload['cmd'] in ('GET', 'GET_CONCAT') else False,
+                                                        encode=payload['cmd'] in ('GET', 'GET_CONCAT', 'GET_INDEX'),
                                                         msgid=payload['msg_uuid']),
                                              prefix="",
-                                             **{k: v for k, v in payload.iteritems() if k in ('key', 'value')})
+                                             **{k: v for k, v in payload.iteritems()
+                                                if k in ('key', 'value', 'root_prefix_level', 'items', 'keys')})
         else:
             _log.error("Unknown storage proxy request %s" % payload['cmd'] if 'cmd' in payload else "")
 
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from collections import OrderedDict
+
+
+class RegistryCache(object):
+    """
+        Bounded LRU cache of values read from the registry, each kept for at most ttl seconds.
+        A size of 0 disables the cache. Keys are (kind, registry key), when prefixes is given
+        only registry keys starting with one of them are cached, e.g. keys whose values don't
+        change, since changes made by other runtimes are not seen until the value expires.
+
+        Keys are invalidated when written locally or when the storage reports a change.
+        Values read while the key was invalidated could be stale and are not cached,
+        hence take the version before the read and give it to put. The version of the last
+        invalidation is kept for as many keys as the cache size, for older invalidations
+        put only caches values read after the latest of them.
+    """
+
+    def __init__(self, size, ttl, prefixes=None):
+        super(RegistryCache, self).__init__()
+        self.size = size
+        self.ttl = ttl
+        self.prefixes = None if prefixes is None else tuple(prefixes)
+        self._entries = OrderedDict()  # key: cache key, value: (value, expiry time)
+        self._version = 0
+        self._invalidated = OrderedDict()  # key: cache key, value: version when invalidated
+        self._floor = 0  # latest version of invalidations no longer kept per key
+        self._statistics = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @property
+    def version(self):
+        return self._version
+
+    def get(self, key):
+        """ Returns (True, value) on a hit, (False, None) on a miss """
+        entry = self._entries.pop(key, None)
+        if entry is None or entry[1] < time.time():
+            self._statistics['misses'] += 1
+            return False, None
+        # Most recently used last
+        self._entries[key] = entry
+        self._statistics['hits'] += 1
+        return True, entry[0]
+
+    def put(self, key, value, version):
+        """ Cache value, read after version was taken """
+        if not self.size or version < self._invalidated.get(key, self._floor):
+            return
+        if self.prefixes is not None and not key[1].startswith(self.prefixes):
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = (value, time.time() + self.ttl)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *keys):
+        self._version += 1
+        self._statistics['invalidations'] += 1
+        for key in keys:
+            self._entries.pop(key, None)
+            self._invalidated.pop(key, None)
+            self._invalidated[key] = self._version
+        while len(self._invalidated) > self.size:
+            _, version = self._invalidated.popitem(last=False)
+            self._floor = max(self._floor, version)
+
+    def clear(self):
+        self._version += 1
+        self._floor = self._version
+        self._invalidated.clear()
+        self._entries.clear()
+
+    def get_statistics(self):
+        statistics = dict(self._statistics)
+        statistics['size'] = len(self._entries)
+        return statistics
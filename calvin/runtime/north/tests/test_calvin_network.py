@@ -669,3 +669,20 @@ class TestCalvinNetwork(object):
 
         yield self._stop_servers()
 
+
+
+@pytest.mark.unittest
+def test_link_request_no_usable_uri():
+    network = CalvinNetwork(Mock(id="rt1"))
+    network.join = Mock()
+    callback = Mock()
+    network._peer_cache['rt2'] = {'uris': [], 'timestamp': time.time(), 'callbacks': []}
+    # A host local uri of a peer on another host is not used, the request fails
+    network._update_cache_request_finished('rt2', {'uris': ["calvinunix:///tmp/calvin-rt2.sock"],
+                                                   'host_id': "other-host",
+                                                   'attributes': {'indexed_public': []}},
+                                           callback=callback)
+    assert network._peer_cache['rt2']['uris'] == []
+    assert not network.join.called
+    assert callback.call_args[0][:2] == ('rt2', None)
+    assert not callback.call_args[1]['status']
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock
+
+from calvin.runtime.north.calvin_proto import CalvinTunnel
+
+pytestmark = pytest.mark.unittest
+
+
+def test_send_on_link_up():
+    network = Mock()
+    link = network.link_get.return_value
+    tunnel = CalvinTunnel(network, {}, "rt2", "token", None, rt_id="rt1", id="tunnel1")
+    tunnel.send({'cmd': 'TOKEN'})
+    link.send.assert_called_once_with({'cmd': 'TUNNEL_DATA', 'value': {'cmd': 'TOKEN'}, 'tunnel_id': "tunnel1"},
+                                      flush=False)
+    assert not network.link_request.called
+    # A replaced link is picked up
+    network.link_get.return_value = new_link = Mock()
+    tunnel.send({'cmd': 'TOKEN'})
+    assert new_link.send.call_count == 1 and link.send.call_count == 1
+
+
+def test_send_on_link_down():
+    network = Mock()
+    network.link_get.return_value = None
+    tunnel = CalvinTunnel(network, {}, "rt2", "token", None, rt_id="rt1", id="tunnel1")
+    tunnel.send({'cmd': 'TOKEN'})
+    assert network.link_request.call_args[0] == ("rt2",)
+    # Sent when the link is up
+    link = Mock()
+    network.link_request.call_args[1]['callback']("rt2", link, status=True)
+    assert link.send.call_args[0][0]['value'] == {'cmd': 'TOKEN'}
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock, patch
+
+from calvin.runtime.north import join_manager
+
+pytestmark = pytest.mark.unittest
+
+
+@pytest.fixture
+def async():
+    with patch.object(join_manager, 'async') as async:
+        yield async
+
+
+def test_concurrency(async):
+    start_join = Mock()
+    manager = join_manager.JoinManager(start_join, Mock(), concurrency=2)
+    for i in range(3):
+        manager.request("calvinip://10.0.0.%d:5000" % i)
+    # Already requested
+    manager.request("calvinip://10.0.0.0:5000")
+    assert [c[0][0] for c in start_join.call_args_list] == ["calvinip://10.0.0.0:5000", "calvinip://10.0.0.1:5000"]
+    manager.finished("calvinip://10.0.0.1:5000", "rt1")
+    assert start_join.call_args[0][0] == "calvinip://10.0.0.2:5000"
+    assert manager.get_statistics("rt1")['join_attempts'] == 1
+    assert "join_latency" in manager.get_statistics("rt1")
+
+
+def test_retry_with_backoff(async):
+    start_join = Mock()
+    give_up = Mock()
+    manager = join_manager.JoinManager(start_join, give_up, retries=1, backoff=2.0)
+    manager.request("calvinip://10.0.0.1:5000")
+    assert manager.failed("calvinip://10.0.0.1:5000")
+    delay, retry, uri = async.DelayedCall.call_args[0]
+    assert 1.0 <= delay <= 3.0
+    retry(uri)
+    assert start_join.call_count == 2
+    # Retries used up
+    assert not manager.failed("calvinip://10.0.0.1:5000")
+    assert "calvinip://10.0.0.1:5000" not in manager
+
+
+def test_timeout(async):
+    give_up = Mock()
+    manager = join_manager.JoinManager(Mock(), give_up, retries=0)
+    manager.request("calvinip://10.0.0.1:5000")
+    delay, timed_out, uri = async.DelayedCall.call_args[0]
+    timed_out(uri)
+    give_up.assert_called_once_with("calvinip://10.0.0.1:5000")
+
+
+def test_timed_out_attempt_is_stale(async):
+    transports = [Mock(), Mock()]
+    start_join = Mock(side_effect=transports)
+    give_up = Mock()
+    manager = join_manager.JoinManager(start_join, give_up, retries=1)
+    manager.request("calvinip://10.0.0.1:5000")
+    delay, timed_out, uri = async.DelayedCall.call_args[0]
+    timed_out(uri)
+    assert transports[0].disconnect.called
+    assert not give_up.called
+    # Retried with a new attempt, a late result of the first attempt is ignored
+    async.DelayedCall.call_args[0][1](uri)
+    assert start_join.call_count == 2
+    assert manager.stale(transports[0])
+    assert not manager.stale(transports[1])
+
+
+def test_host_local_not_retried(async):
+    manager = join_manager.JoinManager(Mock(), Mock(), retries=3)
+    manager.request("calvinunix:///tmp/calvin-rt1.sock")
+    assert not manager.failed("calvinunix:///tmp/calvin-rt1.sock")
+    assert "calvinunix:///tmp/calvin-rt1.sock" not in manager
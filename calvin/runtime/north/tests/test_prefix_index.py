@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock
+
+from calvin.runtime.north.plugins.storage.prefix_index import PrefixIndex, PrefixHashTree, index_key
+
+pytestmark = pytest.mark.unittest
+
+HARALD = ['node', 'affiliation', 'owner', 'com.ericsson', 'Harald']
+PER = ['node', 'affiliation', 'owner', 'com.ericsson', 'Per']
+
+
+class SetStorage(object):
+    """ Registry with only sets, answers at once """
+
+    def __init__(self):
+        self.data = {}
+        self.writes = 0
+
+    def append(self, prefix, key, value, cb):
+        self.writes += 1
+        self.data.setdefault(prefix + key, set([])).update(value)
+        if cb:
+            cb(key=key, value=True)
+
+    def remove(self, prefix, key, value, cb):
+        self.writes += 1
+        self.data.get(prefix + key, set([])).difference_update(value)
+        if cb:
+            cb(key=key, value=True)
+
+    def delete(self, prefix, key, cb):
+        self.writes += 1
+        self.data.pop(prefix + key, None)
+        if cb:
+            cb(key=key, value=True)
+
+    def get_concat(self, prefix, key, cb):
+        value = self.data.get(prefix + key)
+        cb(key=key, value=list(value) if value else None)
+
+
+def test_trie():
+    index = PrefixIndex()
+    index.add(HARALD, "n1")
+    index.add(HARALD, "n2")
+    index.add(PER, "n3")
+    assert index.get(HARALD) == set(["n1", "n2"])
+    assert index.get(HARALD[:-1]) == set(["n1", "n2", "n3"])
+    assert index.get(HARALD + ['more']) == set([])
+    assert index.remove(HARALD, "n1")
+    assert not index.remove(HARALD, "n1")
+    assert index.get(HARALD[:2]) == set(["n2", "n3"])
+    index.delete(PER)
+    assert index.get([]) == set(["n2"])
+    index.remove(HARALD, "n2")
+    # Empty levels are pruned
+    assert not index._root.children
+
+
+def test_prefix_hash_tree():
+    storage = SetStorage()
+    tree = PrefixHashTree(storage)
+    tree.add(HARALD, 3, "n1")
+    tree.add(HARALD, 3, "n2")
+    tree.add(PER, 3, "n3")
+    # One write each
+    assert storage.writes == 3
+    assert list(storage.data) == ["index-/node/affiliation/owner"]
+    cb = Mock()
+    tree.get(HARALD, cb)
+    assert set(cb.call_args[1]['value']) == set(["n1", "n2"])
+    tree.get(HARALD[:4], cb)
+    assert set(cb.call_args[1]['value']) == set(["n1", "n2", "n3"])
+    assert cb.call_args[1]['key'] == "/node/affiliation/owner/com.ericsson"
+    tree.remove(HARALD, "n1")
+    tree.get(HARALD, cb)
+    assert cb.call_args[1]['value'] == ["n2"]
+    tree.delete(HARALD)
+    tree.get(HARALD[:4], cb)
+    assert cb.call_args[1]['value'] == ["n3"]
+    tree.get(['node', 'other'], cb)
+    assert cb.call_args[1]['value'] is None
+
+
+def test_prefix_hash_tree_root():
+    storage = SetStorage()
+    tree = PrefixHashTree(storage)
+    tree.add(['authorization_server'], 1, "n1")
+    tree.add(['replicas', 'actors', 'r1'], 3, "a1")
+    cb = Mock()
+    tree.get(['authorization_server'], cb)
+    assert cb.call_args[1]['value'] == ["n1"]
+    tree.delete(['replicas', 'actors', 'r1'])
+    tree.get(['replicas', 'actors', 'r1'], cb)
+    assert cb.call_args[1]['value'] is None
+
+
+def test_prefix_hash_tree_any_root():
+    storage = SetStorage()
+    tree = PrefixHashTree(storage)
+    # Added with root prefix level 3, removed without knowing it
+    tree.add(HARALD, 3, "n1")
+    tree.add(HARALD, 3, "n2")
+    tree.add(PER, 2, "n3")
+    cb = Mock()
+    tree.remove(HARALD, "n1", cb=cb)
+    cb.assert_called_once_with(key=index_key(HARALD), value=True)
+    tree.get(HARALD[:4], cb)
+    assert set(cb.call_args[1]['value']) == set(["n2", "n3"])
+    tree.delete(HARALD[:4])
+    tree.get(HARALD[:3], cb)
+    assert cb.call_args[1]['value'] is None
+    # Only the changed bucket is written
+    tree.add(HARALD, 3, "n1")
+    writes = storage.writes
+    tree.remove(HARALD, "n1")
+    assert storage.writes == writes + 1
+
+
+def test_prefix_hash_tree_no_levels():
+    tree = PrefixHashTree(SetStorage())
+    cb = Mock()
+    tree.get([], cb)
+    cb.assert_called_once_with(key="/", value=None)
+
+
+def test_prefix_hash_tree_split():
+    storage = SetStorage()
+    tree = PrefixHashTree(storage, max_entries=2)
+    tree.add(HARALD, 3, "n1")
+    tree.add(PER, 3, "n2")
+    # Bucket is full, goes one level deeper
+    tree.add(HARALD, 3, "n3")
+    tree.add(PER, 3, "n4")
+    assert len(storage.data["index-/node/affiliation/owner"]) == 3
+    assert len(storage.data["index-/node/affiliation/owner/com.ericsson"]) == 2
+    cb = Mock()
+    tree.get(HARALD[:3], cb)
+    assert set(cb.call_args[1]['value']) == set(["n1", "n2", "n3", "n4"])
+    tree.get(HARALD, cb)
+    assert set(cb.call_args[1]['value']) == set(["n1", "n3"])
+    tree.remove(HARALD, "n3")
+    tree.get(HARALD[:3], cb)
+    assert set(cb.call_args[1]['value']) == set(["n1", "n2", "n4"])
+    tree.delete(PER[:4])
+    tree.get(HARALD[:3], cb)
+    assert cb.call_args[1]['value'] is None
+
+
+def test_prefix_hash_tree_levels_format():
+    storage = SetStorage()
+    # Values stored at each level, as by older runtimes
+    PrefixHashTree(storage, tree=False).add(HARALD, 3, "n1")
+    assert sorted(storage.data) == ["index-" + index_key(HARALD[:n]) for n in range(3, 6)]
+    tree = PrefixHashTree(storage)
+    tree.add(PER, 3, "n2")
+    cb = Mock()
+    tree.get(HARALD[:3], cb)
+    assert set(cb.call_args[1]['value']) == set(["n1", "n2"])
+    tree.get(HARALD, cb)
+    assert cb.call_args[1]['value'] == ["n1"]
+    tree.get(PER, cb)
+    assert cb.call_args[1]['value'] == ["n2"]
+    # Removed from all levels
+    tree.remove(HARALD, "n1")
+    tree.get(HARALD[:3], cb)
+    assert cb.call_args[1]['value'] == ["n2"]
+    assert not storage.data["index-" + index_key(HARALD[:4])]
+
+
+def test_prefix_hash_tree_levels_reads():
+    storage = SetStorage()
+    storage.get_concat = Mock(side_effect=SetStorage.get_concat.__get__(storage))
+    tree = PrefixHashTree(storage, tree=False)
+    tree.add(HARALD, 3, "n1")
+    tree.add(PER, 3, "n2")
+    cb = Mock()
+    # Only the index key is read
+    tree.get(HARALD, cb)
+    assert cb.call_args[1]['value'] == ["n1"]
+    assert storage.get_concat.call_count == 1
+    tree.get(HARALD[:3], cb)
+    assert set(cb.call_args[1]['value']) == set(["n1", "n2"])
+    # Removed without reading
+    tree.remove(HARALD, "n1", root_prefix_level=3)
+    assert storage.get_concat.call_count == 2
+    tree.get(HARALD[:4], cb)
+    assert cb.call_args[1]['value'] == ["n2"]
+    tree.delete(PER, root_prefix_level=3)
+    tree.get(HARALD[:3], cb)
+    assert cb.call_args[1]['value'] is None
+    # Entries of the tree at the index key are searched
+    PrefixHashTree(storage).add(HARALD, 5, "n3")
+    tree.get(HARALD, cb)
+    assert cb.call_args[1]['value'] == ["n3"]
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock, patch
+
+import calvin.requests.calvinresponse as response
+from calvin.runtime.north import reply_tracker
+from calvin.runtime.north.calvin_network import CalvinLink
+
+pytestmark = pytest.mark.unittest
+
+
+@pytest.fixture
+def async():
+    with patch.object(reply_tracker, 'async') as async:
+        yield async
+
+
+def tick(async):
+    """ Runs the last scheduled wheel timer """
+    delay, advance = async.DelayedCall.call_args[0]
+    advance()
+
+
+def test_timeout(async):
+    tracker = reply_tracker.ReplyTracker(timeout=1.0, tick=0.5)
+    callback = Mock()
+    msg_id = tracker.add(callback)
+    assert tracker.add(Mock()) == msg_id + 1
+    # One timer for all requests
+    assert async.DelayedCall.call_count == 1
+    tracker.pop(msg_id + 1)
+    for _ in range(2):
+        tick(async)
+        assert not callback.called
+    tick(async)
+    assert callback.call_args[0][0].status == response.GATEWAY_TIMEOUT
+    with pytest.raises(KeyError):
+        tracker.pop(msg_id)
+    # Timer not rescheduled when no requests are outstanding
+    assert async.DelayedCall.call_count == 3
+    assert tracker.get_statistics() == {'requests_sent': 2, 'requests_outstanding': 0,
+                                        'replies_received': 1, 'requests_timed_out': 1}
+
+
+def test_link_reply(async):
+    transport = Mock()
+    transport.get_rtt.return_value = None
+    transport.get_statistics.return_value = {'messages_sent': 1}
+    link = CalvinLink("rt1", "rt2", transport)
+    callback = Mock()
+    link.send_with_reply(callback, {'cmd': 'PING'})
+    msg = transport.send.call_args[0][0]
+    assert isinstance(msg['msg_uuid'], int)
+    assert link.get_statistics()['requests_outstanding'] == 1
+    link.reply_handler({'msg_uuid': msg['msg_uuid'], 'value': response.CalvinResponse(response.OK).encode()})
+    assert callback.call_args[0][0].status == response.OK
+    # Late duplicate is ignored
+    link.reply_handler({'msg_uuid': msg['msg_uuid'], 'value': response.CalvinResponse(response.OK).encode()})
+    assert callback.call_count == 1
+    assert link.get_statistics() == {'messages_sent': 1, 'requests_sent': 1, 'requests_outstanding': 0,
+                                     'replies_received': 1, 'requests_timed_out': 0}
+
+
+def test_link_flushes_replies(async):
+    transport = Mock()
+    transport.get_rtt.return_value = None
+    link = CalvinLink("rt1", "rt2", transport)
+    link.send({'cmd': 'TUNNEL_DATA'})
+    assert transport.send.call_args[1] == {}
+    link.send({'cmd': 'REPLY', 'msg_uuid': 1})
+    assert transport.send.call_args[1] == {'flush': True}
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock, patch
+
+from calvin.runtime.north import routing_table
+from calvin.runtime.north.calvin_network import CalvinNetwork, CalvinLink, CalvinRoutingLink
+from calvin.runtime.north.calvin_proto import CalvinProto
+
+pytestmark = pytest.mark.unittest
+
+
+@pytest.fixture
+def table():
+    rtts = {'gw1': 0.1, 'gw2': 0.3}
+    table = routing_table.RoutingTable("rt1", rtts.get)
+    table.add_link('gw1')
+    table.add_link('gw2')
+    return table
+
+
+def test_cheapest_route(table):
+    assert table.next_hop('gw1') == 'gw1'
+    assert table.next_hop('edge') is None
+    table.update('gw2', {'edge': [0.01, 0]})
+    assert table.next_hop('edge') == 'gw2'
+    # Lower link RTT plus announced cost wins
+    table.update('gw1', {'edge': [0.1, 1], 'rt1': [0.1, 0]})
+    assert table.next_hop('edge') == 'gw1'
+    assert table.get_routes() == {'gw1': 'gw1', 'gw2': 'gw2', 'edge': 'gw1'}
+
+
+def test_route_removed_with_link(table):
+    table.update('gw1', {'edge': [0.1, 0]})
+    table.update('gw2', {'edge': [0.1, 0]})
+    table.remove_link('gw1')
+    assert table.next_hop('edge') == 'gw2'
+    # Withdrawn when no longer announced
+    table.update('gw2', {})
+    assert table.next_hop('edge') is None
+    # Only learned from direct links
+    table.update('gw1', {'edge': [0.1, 0]})
+    assert table.next_hop('edge') is None
+
+
+def test_announcement(table):
+    table.update('gw1', {'edge': [0.1, 0], 'far': [0.1, routing_table.MAX_HOPS]})
+    assert table.announcement('gw2') == {'gw1': [0.1, 0], 'edge': [0.2, 1]}
+    # Poisoned reverse, routes through gw1 are announced to gw1 as unreachable
+    assert table.announcement('gw1') == {'gw2': [0.3, 0], 'edge': [0.0, routing_table.MAX_HOPS]}
+    # Withdrawn destinations are poisoned once
+    table.update('gw1', {})
+    assert table.announcement('gw2') == {'gw1': [0.1, 0], 'edge': [0.0, routing_table.MAX_HOPS]}
+    assert table.announcement('gw2') == {'gw1': [0.1, 0]}
+
+
+def test_update_changed(table):
+    assert table.update('gw1', {'edge': [0.1, 0]})
+    # Only cost changed a little
+    assert not table.update('gw1', {'edge': [0.12, 0]})
+    assert not table.update('gw1', {'edge': [0.05, 0]})
+    # Cost increased a lot, or hops changed
+    assert table.update('gw1', {'edge': [0.5, 0]})
+    assert table.update('gw1', {'edge': [0.5, 1]})
+    # Poisoned
+    assert table.update('gw1', {'edge': [0.0, routing_table.MAX_HOPS]})
+    assert table.next_hop('edge') is None
+
+
+def test_withdrawn_route_in_loop():
+    # Triangle rt1, rt2, rt3 with edge only linked to rt3
+    links = set([('rt1', 'rt2'), ('rt2', 'rt3'), ('rt1', 'rt3'), ('rt3', 'edge')])
+
+    def peers(node_id):
+        return [b for a, b in links if a == node_id] + [a for a, b in links if b == node_id]
+
+    tables = {node_id: routing_table.RoutingTable(node_id, lambda peer_id: 0.01)
+              for node_id in ['rt1', 'rt2', 'rt3', 'edge']}
+    for a, b in links:
+        tables[a].add_link(b)
+        tables[b].add_link(a)
+
+    def announce(changed):
+        # Announce to the peers until no table changes, as CalvinNetwork.routes_update does
+        for _ in range(100):
+            if not changed:
+                return
+            announcing, changed = changed, set()
+            for node_id in sorted(announcing):
+                for peer_id in peers(node_id):
+                    if tables[peer_id].update(node_id, tables[node_id].announcement(peer_id)):
+                        changed.add(peer_id)
+        assert False, "Routes did not converge"
+
+    announce(set(tables))
+    assert [tables[n].next_hop('edge') for n in ['rt1', 'rt2', 'rt3']] == ['rt3', 'rt3', 'edge']
+    links.remove(('rt3', 'edge'))
+    tables['rt3'].remove_link('edge')
+    tables['edge'].remove_link('rt3')
+    announce(set(['rt3', 'edge']))
+    assert [tables[n].next_hop('edge') for n in ['rt1', 'rt2', 'rt3']] == [None, None, None]
+
+
+@pytest.fixture
+def network(request):
+    patcher = patch('calvin.runtime.north.calvin_network.async')
+    patcher.start()
+    request.addfinalizer(patcher.stop)
+    network = CalvinNetwork(Mock(id="rt1"))
+    for peer_id, rtt in [('gw1', 0.1), ('gw2', 0.3)]:
+        transport = Mock()
+        transport.get_rtt.return_value = rtt
+        network._links[peer_id] = CalvinLink("rt1", peer_id, transport)
+        network.routing_table.add_link(peer_id)
+    return network
+
+
+def test_routed_link_follows_route(network):
+    network.routes_update('gw2', {'edge': [0.01, 0]})
+    link = network.link_request('edge')
+    assert isinstance(link, CalvinRoutingLink) and link.link is network._links['gw2']
+    # Cheaper route through gw1, the routed link moves
+    network.routes_update('gw1', {'edge': [0.01, 0]})
+    assert link.link is network._links['gw1']
+    assert network._links['gw1'].routes == ['edge'] and network._links['gw2'].routes == []
+    # Withdrawn by both, the routed link is removed
+    network.routes_update('gw1', {})
+    network.routes_update('gw2', {})
+    assert network.link_get('edge') is None
+    assert network._links['gw1'].routes == []
+
+
+def test_forwarded_hops():
+    network = Mock()
+    proto = CalvinProto(Mock(id="rt1"), network)
+    payload = {'cmd': 'TUNNEL_DATA', 'from_rt_uuid': "gw1", 'to_rt_uuid': "edge"}
+    proto.recv_handler(None, payload)
+    assert payload['hops'] == 1
+    network.link_route.return_value.transport.send.assert_called_once_with(payload, flush=False)
+    # Caught in a loop
+    network.reset_mock()
+    payload['hops'] = routing_table.MAX_HOPS
+    proto.recv_handler(None, payload)
+    assert not network.link_route.called
+
+
+def test_forwarded_replies_flushed():
+    network = Mock()
+    proto = CalvinProto(Mock(id="rt1"), network)
+    send = network.link_route.return_value.transport.send
+    proto.recv_handler(None, {'cmd': 'REPLY', 'from_rt_uuid': "gw1", 'to_rt_uuid': "edge"})
+    assert send.call_args[1] == {'flush': True}
+    proto.recv_handler(None, {'cmd': 'TUNNEL_DATA', 'value': {'cmd': 'TOKEN_REPLY'},
+                              'from_rt_uuid': "gw1", 'to_rt_uuid': "edge"})
+    assert send.call_args[1] == {'flush': True}
+    proto.recv_handler(None, {'cmd': 'TUNNEL_DATA', 'value': {'cmd': 'TOKEN'},
+                              'from_rt_uuid': "gw1", 'to_rt_uuid': "edge"})
+    assert send.call_args[1] == {'flush': False}
@@ -19,6 +19,7 @@ from calvin.runtime.north import storage
 from calvin.runtime.north import appmanager
 from calvin.runtime.south.plugins.async import threads
 from calvin.utilities.calvin_callback import CalvinCB
+from calvin.utilities.utils import get_host_id
 from calvin.tests import DummyNode
 from calvin.tests.helpers_twisted import create_callback, wait_for
 import calvin.tests
@@ -214,7 +215,8 @@ class TestStorageNotStarted(object):
         yield wait_for(self.q.empty, condition=lambda x: not x())
         value = self.q.get(timeout=.001)
         assert value["key"] == node.id and value["value"] == {u'attributes': {u'indexed_public': [], u'public': {}},
-                                                              u'control_uris': [u'127.0.0.1:5000'], 'uris': node.uris}
+                                                              u'control_uris': [u'127.0.0.1:5000'], 'uris': node.uris,
+                                                              u'host_id': get_host_id()}
 
         self.storage.delete_node(node, cb=CalvinCB(func=cb))
         yield wait_for(self.q.empty, condition=lambda x: not x())
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import pytest
+from mock import Mock, patch
+
+from calvin.runtime.north import storage
+from calvin.runtime.north.plugins.storage.storage_dict_local import StorageLocal
+from calvin.runtime.north.plugins.storage.proxy import StorageProxy
+from calvin.runtime.north.plugins.storage.prefix_index import PrefixHashTree
+from calvin.tests import DummyNode
+from calvin.tests.helpers_storage import registry, answer_many
+
+pytestmark = pytest.mark.unittest
+
+
+def test_set_many_one_batch(registry):
+    backend = registry.storage
+    cb = Mock()
+    registry.set_many("port-", {"1": {'a': 1}, "2": {'a': 2}}, cb)
+    assert backend.set_many.call_count == 1
+    assert not backend.set.called
+    items = backend.set_many.call_args[1]['items']
+    assert {k: json.loads(v) for k, v in items.items()} == {"port-1": {'a': 1}, "port-2": {'a': 2}}
+    answer_many(backend.set_many)
+    assert sorted(cb.call_args[1]['key']) == ["1", "2"]
+    assert cb.call_args[1]['value'] is True
+    assert not registry.localstore
+
+
+def test_set_many_partly_failed(registry):
+    cb = Mock()
+    registry.set_many("port-", {"1": 1, "2": 2}, cb)
+    answer_many(registry.storage.set_many, {"port-1": True, "port-2": False})
+    assert cb.call_args[1]['value'] is False
+    # Only the failed key is kept for retry
+    assert registry._dirty == set(["port-2"])
+    assert list(registry.localstore) == ["port-2"]
+
+
+def test_append_many_one_batch(registry):
+    backend = registry.storage
+    registry.append_many("index-", {"a": ["x"], "b": ["y"]}, None)
+    assert backend.append_many.call_count == 1
+    items = backend.append_many.call_args[1]['items']
+    assert {k: json.loads(v) for k, v in items.items()} == {"index-a": ["x"], "index-b": ["y"]}
+    answer_many(backend.append_many)
+    assert not registry.localstore_sets
+
+
+def test_flush_batched(registry):
+    registry.started = False
+    for key in ["1", "2", "3"]:
+        registry.set("node-", key, 1, None)
+    registry.started = True
+    registry.flush_localdata()
+    assert registry.storage.set_many.call_count == 1
+    assert not registry.storage.set.called
+    answer_many(registry.storage.set_many)
+    assert not registry.localstore
+
+
+def test_get_many(registry):
+    backend = registry.storage
+    cb = Mock()
+    registry.set("node-", "1", {'a': 1}, None)
+    registry.get_many("node-", ["1", "2", "3"], cb)
+    # The locally set key is not got from storage
+    assert sorted(backend.get_many.call_args[1]['keys']) == ["node-2", "node-3"]
+    answer_many(backend.get_many, {"node-2": json.dumps({'a': 2}), "node-3": None})
+    cb.assert_called_once_with(key=["1", "2", "3"], value={"1": {'a': 1}, "2": {'a': 2}, "3": None})
+    # Got values are cached
+    cb.reset_mock()
+    registry.get_many("node-", ["2"], cb)
+    assert backend.get_many.call_count == 1
+
+
+def test_index_removed_with_other_root_level(request):
+    for module in ['calvin.runtime.north.storage.async',
+                   'calvin.runtime.north.plugins.storage.storage_dict_local.async']:
+        patcher = patch(module)
+        # Answers at once
+        patcher.start().DelayedCall.side_effect = lambda delay, f, *args, **kwargs: f(*args, **kwargs)
+        request.addfinalizer(patcher.stop)
+    registry = storage.Storage(DummyNode(), override_storage=StorageLocal())
+    # Index in a prefix hash tree on top of append, remove and get_concat
+    registry.storage.prefix_search = False
+    registry.prefix_hash_tree = PrefixHashTree(registry, tree=True)
+    registry.started = True
+    registry.add_index(['node', 'attr', 'a'], "n1", root_prefix_level=3)
+    registry.remove_index(['node', 'attr', 'a'], "n1", root_prefix_level=2)
+    cb = Mock()
+    registry.get_index(['node', 'attr', 'a'], cb=cb)
+    cb.assert_called_once_with(key="/node/attr/a", value=None)
+
+
+def test_add_actors_one_batch(registry):
+    backend = registry.storage
+    actors = []
+    for n in range(3):
+        port = Mock(id="p%d" % n, properties={})
+        port.name = "in"
+        port.is_connected.return_value = False
+        actor = Mock(id="a%d" % n, _type="std.Identity", inports={"in": port}, outports={})
+        actor.name = "actor%d" % n
+        actor._replication_data.id = None
+        actors.append(actor)
+    registry.add_actors(actors, "node1")
+    assert backend.set_many.call_count == 2
+    assert not backend.set.called
+    ports, actors = [call[1]['items'] for call in backend.set_many.call_args_list]
+    assert sorted(ports) == ["port-p0", "port-p1", "port-p2"]
+    assert sorted(actors) == ["actor-a0", "actor-a1", "actor-a2"]
+    assert json.loads(actors["actor-a1"])["inports"] == [{"id": "p1", "name": "in"}]
+
+
+@pytest.mark.parametrize("master_cmds", [None, ['SET_MANY']])
+def test_proxy_batch_when_master_has_it(request, master_cmds):
+    patcher = patch('calvin.runtime.north.plugins.storage.proxy.async')
+    proxy_async = patcher.start()
+    request.addfinalizer(patcher.stop)
+    proxy = StorageProxy(Mock())
+    proxy.tunnel = Mock()
+    started = Mock()
+    proxy.tunnel_up(org_cb=started)
+    request_msg = proxy.tunnel.send.call_args[0][0]
+    assert request_msg['cmd'] == 'CAPABILITIES'
+    assert not started.called
+    if master_cmds is None:
+        # Older masters don't answer
+        delay, timeout = proxy_async.DelayedCall.call_args[0][:2]
+        timeout(*proxy_async.DelayedCall.call_args[0][2:])
+    else:
+        proxy.tunnel_recv_handler({'cmd': 'REPLY', 'msg_uuid': request_msg['msg_uuid'], 'key': None,
+                                 'value': master_cmds})
+    started.assert_called_once_with(True)
+    proxy.tunnel.send.reset_mock()
+    proxy.set_many({"a": "1", "b": "2"}, cb=Mock())
+    cmds = [c[0][0]['cmd'] for c in proxy.tunnel.send.call_args_list]
+    assert cmds == (['SET', 'SET'] if master_cmds is None else ['SET_MANY'])
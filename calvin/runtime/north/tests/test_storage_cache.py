@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import patch
+
+from calvin.runtime.north.storage_cache import RegistryCache
+
+pytestmark = pytest.mark.unittest
+
+
+def test_hit_and_miss():
+    cache = RegistryCache(10, 10.0)
+    assert cache.get('a') == (False, None)
+    cache.put('a', '"x"', cache.version)
+    assert cache.get('a') == (True, '"x"')
+    assert cache.get_statistics() == {'hits': 1, 'misses': 1, 'invalidations': 0, 'size': 1}
+
+
+def test_expired():
+    cache = RegistryCache(10, 10.0)
+    with patch('calvin.runtime.north.storage_cache.time.time', return_value=100.0):
+        cache.put('a', '"x"', cache.version)
+    with patch('calvin.runtime.north.storage_cache.time.time', return_value=111.0):
+        assert cache.get('a') == (False, None)
+
+
+def test_lru():
+    cache = RegistryCache(2, 10.0)
+    cache.put('a', 1, cache.version)
+    cache.put('b', 2, cache.version)
+    cache.get('a')
+    cache.put('c', 3, cache.version)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.get('c') == (True, 3)
+
+
+def test_invalidate():
+    cache = RegistryCache(10, 10.0)
+    cache.put('a', 1, cache.version)
+    cache.invalidate('a')
+    assert cache.get('a') == (False, None)
+
+
+def test_stale_read_not_cached():
+    cache = RegistryCache(10, 10.0)
+    version = cache.version
+    # Changed while the read was in progress
+    cache.invalidate('a')
+    cache.put('a', 1, version)
+    assert cache.get('a') == (False, None)
+    # Other keys are not affected
+    cache.put('b', 2, version)
+    assert cache.get('b') == (True, 2)
+    cache.put('a', 1, cache.version)
+    assert cache.get('a') == (True, 1)
+
+
+def test_forgotten_invalidation():
+    cache = RegistryCache(1, 10.0)
+    version = cache.version
+    cache.invalidate('a')
+    cache.invalidate('b')
+    # The invalidation of a is no longer kept, reads older than it are not cached
+    cache.put('a', 1, version)
+    assert cache.get('a') == (False, None)
+
+
+def test_disabled():
+    cache = RegistryCache(0, 10.0)
+    cache.put('a', 1, cache.version)
+    assert cache.get('a') == (False, None)
+
+
+def test_only_prefixes_cached():
+    cache = RegistryCache(10, 10.0, prefixes=['node-'])
+    cache.put(('get', 'node-1'), 1, cache.version)
+    cache.put(('get', 'actor-1'), 2, cache.version)
+    assert cache.get(('get', 'node-1')) == (True, 1)
+    assert cache.get(('get', 'actor-1')) == (False, None)
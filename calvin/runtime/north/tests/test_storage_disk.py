@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+from StringIO import StringIO
+
+import pytest
+from mock import Mock, patch
+
+from calvin.runtime.north.plugins.storage import storage_disk
+
+pytestmark = pytest.mark.unittest
+
+
+@pytest.fixture
+def directory(request, tmpdir):
+    patcher = patch('calvin.runtime.north.plugins.storage.storage_disk.async')
+    mock_async = patcher.start()
+    request.addfinalizer(patcher.stop)
+    # Callbacks are called at once, the compaction timer never fires
+    mock_async.DelayedCall.side_effect = lambda delay, f, *args, **kwargs: f(*args, **kwargs) if not delay else None
+    return str(tmpdir)
+
+
+def started(directory):
+    storage = storage_disk.StorageDisk(directory=directory)
+    cb = Mock()
+    storage.start(cb=cb)
+    cb.assert_called_once_with(True)
+    return storage
+
+
+def get(storage, key):
+    cb = Mock()
+    storage.get(key, cb=cb)
+    return cb.call_args[0][1]
+
+
+def test_set_get_delete(directory):
+    storage = started(directory)
+    cb = Mock()
+    storage.set("actor-1", '{"a": 1}', cb=cb)
+    cb.assert_called_once_with("actor-1", True)
+    storage.set("actor-1", '{"a": 2}')
+    assert get(storage, "actor-1") == '{"a": 2}'
+    storage.set("actor-1", None)
+    assert get(storage, "actor-1") is None
+    assert get(storage, "actor-2") is None
+
+
+def test_append_remove(directory):
+    storage = started(directory)
+    storage.append("index-a", json.dumps(["x", "y"]))
+    storage.append("index-a", json.dumps(["z"]))
+    storage.remove("index-a", json.dumps(["y"]))
+    cb = Mock()
+    storage.get_concat("index-a", cb=cb)
+    assert set(json.loads(cb.call_args[0][1])) == set(["x", "z"])
+
+
+def test_restart(directory):
+    storage = started(directory)
+    for n in range(2000):
+        storage.set("node-%d" % n, str(n))
+    storage.set("node-1", None)
+    storage.stop()
+    storage = started(directory)
+    assert get(storage, "node-1") is None
+    assert get(storage, "node-1999") == "1999"
+
+
+def test_torn_record_cut_off(directory):
+    storage = started(directory)
+    storage.set("node-1", "1")
+    # Lost the index and the end of the last record
+    storage.set("node-2", "2")
+    log_path = storage._path(0, 'log')
+    size = os.path.getsize(log_path)
+    storage.stop()
+    os.remove(storage._path(0, 'idx'))
+    with open(log_path, 'r+b') as f:
+        f.truncate(size - 1)
+    storage = started(directory)
+    assert get(storage, "node-1") == "1"
+    assert get(storage, "node-2") is None
+    storage.set("node-3", "3")
+    storage.stop()
+    assert get(started(directory), "node-3") == "3"
+
+
+def test_compact(directory):
+    storage = started(directory)
+    for n in range(100):
+        storage.set("node-1", str(n))
+    storage.set("node-2", "2")
+    storage.set("node-2", None)
+    size = os.path.getsize(storage._path(0, 'log'))
+    storage.compact()
+    # The old generation is removed
+    assert sorted(os.listdir(directory)) == ["registry.1.idx", "registry.1.log"]
+    assert os.path.getsize(storage._path(1, 'log')) < size
+    assert get(storage, "node-1") == "99"
+    assert get(storage, "node-2") is None
+    storage.stop()
+    assert get(started(directory), "node-1") == "99"
+
+
+def test_export_import(directory):
+    storage = started(directory)
+    storage.set("node-1", '{"a": 1}')
+    storage.set("node-2", None)
+    storage.append("index-a", json.dumps(["x"]))
+    exported = StringIO()
+    assert storage.export_data(exported) == 2
+    storage.stop()
+    other = started(os.path.join(directory, "other"))
+    assert other.import_data(StringIO(exported.getvalue())) == 2
+    assert get(other, "node-1") == '{"a": 1}'
+    assert json.loads(get(other, "index-a")) == ["x"]
+
+
+def test_damaged_index_rebuilt(directory):
+    storage = started(directory)
+    storage.set("node-1", "1")
+    storage.set("node-2", "2")
+    storage.stop()
+    # A slot points past the end of the log, as when the index but not the log was saved
+    index = storage_disk.HashIndex(storage._path(0, 'idx'))
+    slot, _ = next(index.probe(storage_disk._hash("node-1")))
+    index.put(slot, storage_disk._hash("node-1"), index.log_end + 100)
+    index.close()
+    storage = started(directory)
+    assert get(storage, "node-1") == "1"
+    assert get(storage, "node-2") == "2"
+
+
+def test_log_synced_before_index(directory):
+    storage = started(directory)
+    calls = Mock()
+    with patch('calvin.runtime.north.plugins.storage.storage_disk.os.fsync', calls.fsync):
+        with patch.object(storage._index, 'save_header', calls.save_header):
+            storage.set("node-1", "1")
+    assert [name for name, _, _ in calls.mock_calls] == ['fsync', 'save_header']
+
+
+def test_synced_once_for_all_changes(directory):
+    storage = started(directory)
+    delayed = []
+    storage_disk.async.DelayedCall.side_effect = lambda delay, f, *args, **kwargs: delayed.append((f, args)) or Mock()
+    log_end = storage._index.log_end
+    cb = Mock()
+    with patch('calvin.runtime.north.plugins.storage.storage_disk.os.fsync') as fsync:
+        storage.set("node-1", "1", cb=cb)
+        storage.set("node-2", "2", cb=cb)
+        storage.append("index-a", json.dumps(["x"]), cb=cb)
+        # Readable but not synced, nor answered
+        assert storage._get("node-2") == "2"
+        assert not fsync.called and not cb.called
+        assert storage._index.log_end == log_end
+        assert len(delayed) == 1
+        f, args = delayed.pop(0)
+        f(*args)
+        fsync.assert_called_once_with(storage._log.fileno())
+    assert cb.call_count == 3
+    assert storage._index.log_end == os.path.getsize(storage._path(0, 'log'))
+
+
+def test_list_changes_appended(directory):
+    storage = started(directory)
+    storage.append("index-a", json.dumps(["x", "y"]))
+    size = os.path.getsize(storage._path(0, 'log'))
+    storage.append("index-a", json.dumps(["z"]))
+    # Only the change is written
+    offset = storage._find("index-a")[2]
+    op, _, value = storage._read(offset)
+    assert op == storage_disk.APPEND and json.loads(value[storage_disk._DELTA.size:]) == ["z"]
+    assert offset == size
+    for n in range(storage_disk.MAX_DELTAS - 1):
+        storage.remove("index-a", json.dumps(["x"]))
+    # Written whole after MAX_DELTAS changes
+    assert storage._read(storage._find("index-a")[2])[0] == storage_disk.SET
+    assert set(json.loads(get(storage, "index-a"))) == set(["y", "z"])
+    storage.append("index-a", json.dumps(["x"]))
+    storage.stop()
+    storage = started(directory)
+    assert set(json.loads(get(storage, "index-a"))) == set(["x", "y", "z"])
+    storage.compact()
+    assert storage._read(storage._find("index-a")[2])[0] == storage_disk.SET
+    assert set(json.loads(get(storage, "index-a"))) == set(["x", "y", "z"])
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+
+import pytest
+from mock import Mock, patch
+
+from calvin.runtime.north import storage
+from calvin.tests import DummyNode
+from calvin.tests.helpers_storage import registry, answer
+
+pytestmark = pytest.mark.unittest
+
+
+def test_set_coalesced(registry):
+    backend = registry.storage
+    registry.set("node-", "1", {'a': 1}, None)
+    registry.set("node-", "1", {'a': 2}, None)
+    registry.set("node-", "1", {'a': 3}, None)
+    # One write in flight per key, the later ones are coalesced
+    assert backend.set.call_count == 1
+    answer(backend.set)
+    assert backend.set.call_count == 2
+    assert json.loads(backend.set.call_args[1]['value']) == {'a': 3}
+    assert "node-1" in registry.localstore
+    answer(backend.set)
+    assert not registry.localstore
+    assert not registry._dirty
+
+
+def test_set_callbacks(registry):
+    cb1, cb2 = Mock(), Mock()
+    registry.set("node-", "1", 1, cb1)
+    registry.set("node-", "1", 2, cb2)
+    answer(registry.storage.set)
+    cb1.assert_called_once_with(key="1", value=True)
+    assert not cb2.called
+    answer(registry.storage.set)
+    cb2.assert_called_once_with(key="1", value=True)
+
+
+def test_failed_set_retried(registry):
+    cb = Mock()
+    registry.set("node-", "1", 1, cb)
+    answer(registry.storage.set, value=False)
+    cb.assert_called_once_with(key="1", value=False)
+    assert "node-1" in registry.localstore
+    assert "node-1" in registry._dirty
+    registry.flush_localdata()
+    assert registry.storage.set.call_count == 2
+    answer(registry.storage.set)
+    assert not registry.localstore
+
+
+def test_append_remove_deltas(registry):
+    backend = registry.storage
+    registry.append("index-", "a", ["x"], None)
+    registry.append("index-", "a", ["y"], None)
+    registry.remove("index-", "a", ["x"], None)
+    assert backend.append.call_count == 1
+    answer(backend.append)
+    # Only the changes made while the first append was in flight
+    assert json.loads(backend.append.call_args[1]['value']) == ["y"]
+    answer(backend.append)
+    assert json.loads(backend.remove.call_args[1]['value']) == ["x"]
+    answer(backend.remove)
+    assert not registry.localstore_sets
+
+
+def test_not_started_flushed(registry):
+    registry.started = False
+    registry.set("node-", "1", 1, None)
+    registry.append("index-", "a", ["x"], None)
+    assert not registry.storage.set.called
+    registry.started = True
+    registry.flush_localdata()
+    answer(registry.storage.set)
+    answer(registry.storage.append)
+    assert not registry.localstore
+    assert not registry.localstore_sets
+
+
+def test_own_records_republished(registry):
+    registry._own_records_size = 2
+    registry.set("node-", "1", 1, None)
+    registry.append("index-", "a", ["x", "y"], None)
+    registry.remove("index-", "a", ["y"], None)
+    registry.set("actor-", "1", 1, None)
+    registry.delete("actor-", "1", None)
+    registry.set("port-", "1", 1, None)
+    # Bounded, the least recently written are forgotten
+    assert list(registry._own_records) == ["index-a", "port-1"]
+    assert registry._own_records["index-a"] == set(["x"])
+    registry._republish()
+    assert registry.localstore_sets["index-a"]['+'] >= set(["x"])
+    assert "port-1" in registry.localstore
+
+
+def test_migrated_actor_forgotten(registry):
+    registry._own_records_size = 10
+    registry.set("actor-", "1", {'node_id': "rt1"}, None)
+    registry.set("port-", "2", {'node_id': "rt1"}, None)
+    registry.set("node-", "3", 1, None)
+    registry.forget_actor("1", ["2"])
+    assert list(registry._own_records) == ["node-3"]
+
+
+def test_republish_when_storage_node_lost(request):
+    patcher = patch('calvin.runtime.north.storage.async')
+    async_ = patcher.start()
+    request.addfinalizer(patcher.stop)
+    backend = Mock()
+    registry = storage.Storage(DummyNode(), override_storage=backend)
+    registry.started = True
+    registry._own_records_size = 10
+    registry.set("node-", "1", 1, None)
+    async_.DelayedCall.reset_mock()
+    backend.set_node_lost_callback.call_args[0][0]()
+    async_.DelayedCall.assert_called_once_with(storage.REPUBLISH_DELAY, registry._republish)
+
+
+def test_dump_acknowledged_records(registry, request):
+    registry._own_records_size = 10
+    registry.set("node-", "1", {'a': 1}, None)
+    answer(registry.storage.set)
+    registry.append("index-", "a", ["x"], None)
+    answer(registry.storage.append)
+    registry.append("index-", "a", ["y"], None)
+    # Acknowledged writes are only kept as own records
+    assert "node-1" not in registry.localstore
+    name = registry.dump()
+    request.addfinalizer(lambda: os.remove(name))
+    values, sets = json.load(open(name))
+    assert values == {"node-1": {'a': 1}}
+    assert sorted(sets["index-a"]) == ["x", "y"]
+
+
+def test_failed_index_op_retries_bounded(registry):
+    backend = registry.storage
+    registry.add_index(['node', 'attr', 'a'], "n1")
+    for n in range(storage.INDEX_RETRIES + 1):
+        assert backend.add_index.call_count == n + 1
+        backend.add_index.call_args[1]['cb'](key="/node/attr/a", value=False)
+        registry.flush_localdata()
+    # Gave up
+    assert backend.add_index.call_count == storage.INDEX_RETRIES + 1
+    assert not registry._index_ops
+
+
+def test_failed_index_op_superseded(registry):
+    backend = registry.storage
+    registry.remove_index(['node', 'attr', 'a'], "n1")
+    remove_cb = backend.remove_index.call_args[1]['cb']
+    registry.add_index(['node', 'attr', 'a'], "n1")
+    # The remove is not retried after the later add
+    remove_cb(key="/node/attr/a", value=False)
+    assert not registry._index_ops
+    backend.add_index.call_args[1]['cb'](key="/node/attr/a", value=False)
+    assert len(registry._index_ops) == 1
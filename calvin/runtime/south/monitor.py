@@ -21,18 +21,36 @@ _log = get_logger(__name__)
 
 class Event_Monitor(object):
 
+    """
+    Calls communicate() on endpoints that have been marked dirty, i.e. notified that
+    tokens were written, token slots freed or replies received since last loop.
+    """
+
     def __init__(self):
         super(Event_Monitor, self).__init__()
         """docstring for __init__"""
 
         self.endpoints = []
+        self._dirty = set()
 
     def register_endpoint(self, endpoint):
         self.endpoints.append(endpoint)
+        endpoint.monitor = self
+        # Might already have something to send
+        self._dirty.add(endpoint)
 
     def unregister_endpoint(self, endpoint):
         self.endpoints.remove(endpoint)
+        self._dirty.discard(endpoint)
+        endpoint.monitor = None
+
+    def mark_dirty(self, endpoint):
+        self._dirty.add(endpoint)
 
     def loop(self, scheduler):
-        # Communicate endpoint, see if anyone sent anything
-        return any([endp.communicate() for endp in self.endpoints])
+        # Communicate dirty endpoints, see if anyone sent anything
+        # Returns the endpoints that did, i.e. evaluates to False when nothing happend
+        if not self._dirty:
+            return []
+        dirty, self._dirty = self._dirty, set()
+        return [endp for endp in dirty if endp.communicate()]
@@ -31,6 +31,7 @@ _MODULES = {'async': ['DelayedCall', 'run_ioloop', 'stop_ioloop'],
             'pipe': ['Pipe'],
             'defer': [],
             'threads': [],
+            'process': [],
             'server_connection': ['ServerProtocolFactory', 'LineProtocol', 'RawDataProtocol'],
             'client_connection': ['ClientProtocolFactory'],
             'http_client': ['HTTPClient']}
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import cPickle as pickle
+import traceback
+import multiprocessing
+
+from twisted.internet import reactor, defer
+
+from calvin.utilities import calvinconfig
+from calvin.utilities.calvinlogger import get_logger
+
+_log = get_logger(__name__)
+_conf = calvinconfig.get()
+
+_pool = None
+
+
+def _run(func, args, kwargs):
+    """
+    Executed in the worker process, exceptions are returned since they might not be picklable.
+    The result is checked to be picklable here, since the pool never answers a job with a result it can't send.
+    """
+    try:
+        result = func(*args, **kwargs)
+        pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        return (True, result)
+    except:
+        return (False, "".join(traceback.format_exception(*sys.exc_info())))
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        processes = _conf.get(None, 'worker_processes') or multiprocessing.cpu_count()
+        _log.info("Starting %d worker processes" % processes)
+        _pool = multiprocessing.Pool(processes)
+        reactor.addSystemEventTrigger('before', 'shutdown', terminate)
+    return _pool
+
+
+def terminate():
+    """ Stop all worker processes, outstanding jobs are lost """
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool = None
+
+
+def defer_to_process(func, *args, **kwargs):
+    """
+    Run func(*args, **kwargs) in a worker process and return a deferred for the result.
+    The function must be defined on module level and arguments and result must be picklable.
+    """
+    d = defer.Deferred()
+    try:
+        # The pool never answers a job it can't send to a worker process
+        pickle.dumps((func, args, kwargs), pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        d.errback(Exception("Job can't be sent to a worker process: %s" % e))
+        return d
+
+    def _done(reply):
+        # Called in the pool's result thread
+        ok, result = reply
+        if ok:
+            reactor.callFromThread(d.callback, result)
+        else:
+            reactor.callFromThread(d.errback, Exception(result))
+
+    _get_pool().apply_async(_run, (func, args, kwargs), callback=_done)
+    return d
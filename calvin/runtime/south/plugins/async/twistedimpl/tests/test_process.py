@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock, patch
+
+from calvin.runtime.south.plugins.async.twistedimpl import process
+from calvin.calvinsys.process.pool import ProcessPool
+
+pytestmark = pytest.mark.unittest
+
+
+def square(x):
+    return x * x
+
+
+def unpicklable():
+    return lambda: None
+
+
+def test_run_result():
+    assert process._run(square, (3,), {}) == (True, 9)
+
+
+def test_run_unpicklable_result_is_error():
+    ok, error = process._run(unpicklable, (), {})
+    assert not ok
+    assert "pickle" in error.lower()
+
+
+def test_unpicklable_job_fails_at_once():
+    with patch('calvin.runtime.south.plugins.async.twistedimpl.process._get_pool') as get_pool:
+        d = process.defer_to_process(square, lambda: 3)
+        errback = Mock()
+        d.addErrback(errback)
+        assert errback.called
+        assert not get_pool.called
+
+
+def test_failed_job_does_not_block_later_results():
+    actor = Mock(id="actor")
+    with patch('calvin.calvinsys.process.pool.process') as mock_process:
+        deferreds = []
+        mock_process.defer_to_process.side_effect = lambda *args, **kwargs: deferreds.append(Mock()) or deferreds[-1]
+        pool = ProcessPool(Mock(), actor)
+        pool.submit(square, 2)
+        pool.submit(square, 3)
+        # The first job fails, the second one succeeds
+        failure = Mock()
+        deferreds[0].addCallbacks.call_args[0][1](failure, *deferreds[0].addCallbacks.call_args[1]['errbackArgs'])
+        deferreds[1].addCallbacks.call_args[0][0](9, *deferreds[1].addCallbacks.call_args[1]['callbackArgs'])
+    assert pool.read() is None
+    assert pool.read() == 9
+    assert not pool.pending()
@@ -55,6 +55,8 @@ class KademliaProtocolAppend(KademliaProtocol):
 
     def __init__(self, *args, **kwargs):
         self.set_keys = kwargs.pop('set_keys', set([]))
+        # Called when a node in the routing table stops responding, it may have held our values
+        self.node_lost_cb = None
         KademliaProtocol.__init__(self, *args, **kwargs)
 
     ###############################################################################
@@ -73,7 +75,10 @@ class KademliaProtocolAppend(KademliaProtocol):
          else:
              self.log.debug("no response from %s, removing from router" % node)
              _log.debug("no response from %s, removing from router" % node)
+             lost = not self.router.isNewNode(node)
              self.router.removeContact(node)
+             if lost and self.node_lost_cb:
+                 self.node_lost_cb()
          return result
 
     def maybeTransferKeyValues(self, node):
@@ -232,6 +237,29 @@ class AppendServer(Server):
             _log.debug("AppendServer.bootstrap(%s)" % addrs)
             return Server.bootstrap(self, addrs)
 
+    def _append_to(self, nodes, key, value):
+        """ Append to key at nodes, the nodes closest to key """
+        dkey = digest(key)
+        node = Node(dkey)
+        # if this node is close too, then store here as well
+        if not nodes or self.node.distanceTo(node) < max([n.distanceTo(node) for n in nodes]):
+            try:
+                pvalue = json.loads(value)
+                self.set_keys.add(dkey)
+                if dkey not in self.storage:
+                    _log.debug("%s local append key: %s not in storage set value: %s" % (base64.b64encode(node.id), base64.b64encode(dkey), pvalue))
+                    self.storage[dkey] = value
+                else:
+                    old_value_ = self.storage[dkey]
+                    old_value = json.loads(old_value_)
+                    new_value = list(set(old_value + pvalue))
+                    _log.debug("%s local append key: %s old: %s add: %s new: %s" % (base64.b64encode(node.id), base64.b64encode(dkey), old_value, pvalue, new_value))
+                    self.storage[dkey] = json.dumps(new_value)
+            except:
+                _log.debug("Trying to append something not a JSON coded list %s" % value, exc_info=True)
+        ds = [self.protocol.callAppend(n, dkey, value) for n in nodes]
+        return defer.DeferredList(ds).addCallback(self._anyRespondSuccess)
+
     def append(self, key, value):
         """
         For the given key append the given list values to the set in the network.
@@ -239,26 +267,6 @@ class AppendServer(Server):
         dkey = digest(key)
         node = Node(dkey)
 
-        def append_(nodes):
-            # if this node is close too, then store here as well
-            if not nodes or self.node.distanceTo(node) < max([n.distanceTo(node) for n in nodes]):
-                try:
-                    pvalue = json.loads(value)
-                    self.set_keys.add(dkey)
-                    if dkey not in self.storage:
-                        _log.debug("%s local append key: %s not in storage set value: %s" % (base64.b64encode(node.id), base64.b64encode(dkey), pvalue))
-                        self.storage[dkey] = value
-                    else:
-                        old_value_ = self.storage[dkey]
-                        old_value = json.loads(old_value_)
-                        new_value = list(set(old_value + pvalue))
-                        _log.debug("%s local append key: %s old: %s add: %s new: %s" % (base64.b64encode(node.id), base64.b64encode(dkey), old_value, pvalue, new_value))
-                        self.storage[dkey] = json.dumps(new_value)
-                except:
-                    _log.debug("Trying to append something not a JSON coded list %s" % value, exc_info=True)
-            ds = [self.protocol.callAppend(n, dkey, value) for n in nodes]
-            return defer.DeferredList(ds).addCallback(self._anyRespondSuccess)
-
         nearest = self.protocol.router.findNeighbors(node)
         if len(nearest) == 0:
             self.log.warning("There are no known neighbors to set key %s" % key)
@@ -266,7 +274,20 @@ class AppendServer(Server):
             return defer.succeed(False)
 
         spider = NodeSpiderCrawl(self.protocol, node, nearest, self.ksize, self.alpha)
-        return spider.find().addCallback(append_)
+        return spider.find().addCallback(self._append_to, key, value)
+
+    def _store_to(self, nodes, key, value):
+        """ Store key at nodes, the nodes closest to key """
+        dkey = digest(key)
+        node = Node(dkey)
+        _log.debug("setting '%s' to %s on %s" % (key, value, map(str, nodes)))
+        # if this node is close too, then store here as well
+        if (not nodes or self.node.distanceTo(node) < max([n.distanceTo(node) for n in nodes]) or
+            dkey in self.storage):
+            _log.debug("setting '%s' to %s locally" % (key, value))
+            self.storage[dkey] = value
+        ds = [self.protocol.callStore(n, dkey, value) for n in nodes]
+        return defer.DeferredList(ds).addCallback(self._anyRespondSuccess)
 
     def set(self, key, value):
         """
@@ -276,22 +297,73 @@ class AppendServer(Server):
         dkey = digest(key)
         node = Node(dkey)
 
-        def store(nodes):
-            _log.debug("setting '%s' to %s on %s" % (key, value, map(str, nodes)))
-            # if this node is close too, then store here as well
-            if (not nodes or self.node.distanceTo(node) < max([n.distanceTo(node) for n in nodes]) or
-                dkey in self.storage):
-                _log.debug("setting '%s' to %s locally" % (key, value))
-                self.storage[dkey] = value
-            ds = [self.protocol.callStore(n, dkey, value) for n in nodes]
-            return defer.DeferredList(ds).addCallback(self._anyRespondSuccess)
-
         nearest = self.protocol.router.findNeighbors(node)
         if len(nearest) == 0:
             _log.warning("There are no known neighbors to set key %s" % key)
             return defer.succeed(False)
         spider = NodeSpiderCrawl(self.protocol, node, nearest, self.ksize, self.alpha)
-        return spider.find().addCallback(store)
+        return spider.find().addCallback(self._store_to, key, value)
+
+    def _many(self, items, to_nodes):
+        """
+        Do to_nodes(nodes, key, value) for all items, a dict with key: value, where nodes are the
+        k closest nodes of key. Keys with the same k closest known nodes in the routing table share
+        one node lookup crawl, the nodes of each key are then the k closest to it of the nodes found
+        by the crawl and the known nodes.
+        Returns a dict with key: True/False
+        """
+        results = {}
+        groups = {}
+        for key in items:
+            node = Node(digest(key))
+            nearest = self.protocol.router.findNeighbors(node)
+            if len(nearest) == 0:
+                _log.warning("There are no known neighbors to set key %s" % key)
+                results[key] = False
+                continue
+            group = frozenset(n.id for n in nearest)
+            if group not in groups:
+                groups[group] = (node, nearest, [])
+            groups[group][2].append(key)
+        ds = []
+        for node, nearest, keys in groups.values():
+            spider = NodeSpiderCrawl(self.protocol, node, nearest, self.ksize, self.alpha)
+            ds.append(spider.find().addCallback(self._many_found, nearest, keys, items, to_nodes, results))
+        return defer.DeferredList(ds).addCallback(lambda _: results)
+
+    @staticmethod
+    def _many_result(value, key, results):
+        results[key] = value
+
+    def _many_found(self, nodes, nearest, keys, items, to_nodes, results):
+        candidates = {n.id: n for n in list(nodes) + list(nearest)}.values()
+        ds = []
+        for key in keys:
+            node = Node(digest(key))
+            closest = sorted(candidates, key=node.distanceTo)[:self.ksize]
+            ds.append(to_nodes(closest, key, items[key]).addCallback(self._many_result, key, results))
+        return defer.DeferredList(ds)
+
+    def set_many(self, items):
+        """
+        Set the given keys to values in the network, items is a dict with key: value.
+        """
+        return self._many(items, self._store_to)
+
+    def append_many(self, items):
+        """
+        For the given keys append the given list values to the sets in the network,
+        items is a dict with key: value.
+        """
+        return self._many(items, self._append_to)
+
+    def get_many(self, keys):
+        """
+        Get many keys if the network has them, returns a dict with key: value
+        """
+        results = {}
+        ds = [self.get(key).addCallback(self._many_result, key, results) for key in keys]
+        return defer.DeferredList(ds).addCallback(lambda _: results)
 
     def get(self, key):
         """
@@ -101,13 +101,15 @@ class TwistedWaitObject(object):
         self._func = func
         self._kwargs = kwargs
         self._callback_class = kwargs.pop("cb")
+        # The key given to the callback, the keys of batch operations
+        self._cb_key = kwargs.pop("cb_key", kwargs.get('key'))
         d = func(**kwargs)
         d.addCallback(self._callback)
 
     def _callback(self, value):
         self._value = value
         if self._callback_class:
-            self._callback_class(self._kwargs['key'], value)
+            self._callback_class(self._cb_key, value)
             # reactor.callFromThread(self._callback_class, self._kwargs['key'], value)
         self._q.put(self._value)
         self._done = True
@@ -137,6 +139,10 @@ class AutoDHTServer(StorageBase):
         self._started = False
         self._node_id = node_id
         self._control_uri = control_uri
+        self._node_lost_cb = None
+
+    def set_node_lost_callback(self, cb):
+        self._node_lost_cb = cb
 
     def start(self, iface='', network=None, bootstrap=None, cb=None, name=None, nodeid=None):
         if bootstrap is None:
@@ -147,6 +153,7 @@ class AutoDHTServer(StorageBase):
 
         self.dht_server = ServerApp(AppendServer)
         ip, port = self.dht_server.start(iface=iface)
+        self.dht_server.kserver.protocol.node_lost_cb = self._node_lost_cb
 
         dlist = []
         dlist.append(self.dht_server.bootstrap(bootstrap))
@@ -214,6 +221,15 @@ class AutoDHTServer(StorageBase):
     def remove(self, key, value, cb=None):
         return TwistedWaitObject(self.dht_server.remove, key=key, value=value, cb=cb)
 
+    def set_many(self, items, cb=None):
+        return TwistedWaitObject(self.dht_server.set_many, items=items, cb=cb, cb_key=list(items))
+
+    def get_many(self, keys, cb=None):
+        return TwistedWaitObject(self.dht_server.get_many, keys=keys, cb=cb, cb_key=list(keys))
+
+    def append_many(self, items, cb=None):
+        return TwistedWaitObject(self.dht_server.append_many, items=items, cb=cb, cb_key=list(items))
+
     def bootstrap(self, addrs, cb=None):
         return TwistedWaitObject(self.dht_server.bootstrap, addr=addrs, cb=cb)
 
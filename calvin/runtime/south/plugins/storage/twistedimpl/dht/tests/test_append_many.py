@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock, patch
+from twisted.internet import defer
+from kademlia.node import Node
+
+from calvin.runtime.south.plugins.storage.twistedimpl.dht.append_server import AppendServer
+
+pytestmark = pytest.mark.unittest
+
+
+def test_keys_grouped_by_closest_nodes(request):
+    # Keys are their own node ids
+    patcher = patch('calvin.runtime.south.plugins.storage.twistedimpl.dht.append_server.digest', lambda key: key)
+    patcher.start()
+    request.addfinalizer(patcher.stop)
+    server = AppendServer(ksize=2)
+    # More than k known nodes, keys 3 and 4 have the same k closest of them, key 202 others
+    known = [Node(chr(n) * 20) for n in (1, 2, 200, 201)]
+    server.protocol.router.findNeighbors = lambda node: sorted(known, key=node.distanceTo)[:2]
+    keys = [chr(n) * 20 for n in (3, 4, 202)]
+    server._store_to = Mock(side_effect=lambda nodes, key, value: defer.succeed(True))
+    with patch('calvin.runtime.south.plugins.storage.twistedimpl.dht.append_server.NodeSpiderCrawl') as crawl:
+        crawl.return_value.find.side_effect = lambda: defer.succeed(known)
+        result = []
+        server._many(dict.fromkeys(keys, "v"), server._store_to).addCallback(result.append)
+    assert crawl.call_count == 2
+    assert result == [dict.fromkeys(keys, True)]
+    # Each key is stored at its own k closest nodes
+    assert server._store_to.call_count == 3
+    for args, _ in server._store_to.call_args_list:
+        nodes, key, value = args
+        assert nodes == sorted(known, key=Node(key).distanceTo)[:2]
@@ -14,6 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from collections import OrderedDict
 from calvin.utilities.calvin_callback import CalvinCBClass
 from calvin.runtime.north.plugins.coders.messages import message_coder_factory
 
@@ -26,6 +27,11 @@ class URI(object):
         scheme_del = uri.index("://")
         port_del = uri.rindex(":")
         self.scheme = uri[0:scheme_del]
+        if self.scheme == "calvinunix":
+            # calvinunix://<socket path>[?<connection nbr>], the hostname is the socket path
+            self.hostname = uri[scheme_del + 3:].split("?", 1)[0]
+            self.port = None
+            return
         self.hostname = uri[scheme_del + 3:port_del]
         if scheme_del != port_del:
             self.port = int(uri[port_del + 1:len(uri)])
@@ -97,15 +103,23 @@ class BaseTransport(CalvinCBClass):
         """
             Return the filtered coders on this transport
                 can be a subset of the total in the system.
+                Ordered with the most preferred first.
         """
-        coders = {}
+        coders = OrderedDict()
         for coder in message_coder_factory.get_prio_list():
             coders[coder] = message_coder_factory.get(coder)
         return coders
 
-    def send(self, payload, timeout=None):
+    def get_statistics(self):
+        """
+            Return a dictionary with counters of messages and bytes sent and received
+        """
+        return {}
+
+    def send(self, payload, timeout=None, flush=False):
         """
-            Send data with a payload to the transport with a timepout
+            Send data with a payload to the transport with a timepout,
+            flush sends it at once also when the transport collects messages into batches
         """
         raise NotImplementedError()
 
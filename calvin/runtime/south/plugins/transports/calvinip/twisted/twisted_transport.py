@@ -14,13 +14,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import struct
+
 from calvin.utilities.calvin_callback import CalvinCB, CalvinCBClass
 from calvin.utilities import calvinlogger
 from calvin.utilities import certificate
 from calvin.utilities import runtime_credentials
 from calvin.runtime.south.plugins.transports.lib.twisted import base_transport
 
-from twisted.protocols.basic import Int32StringReceiver
+from twisted.protocols.basic import Int32StringReceiver, StringTooLongError
 from twisted.internet import error
 from twisted.internet import reactor, protocol, ssl, endpoints
 
@@ -121,6 +123,13 @@ class StringProtocol(CalvinCBClass, Int32StringReceiver):
         self._callback_execute('disconnected', reason)
         # TODO: Remove all callbacks
 
+    def sendString(self, string):
+        # Write prefix and string separately, avoids copying large messages, e.g. with images
+        if len(string) >= 2 ** (8 * self.prefixLength):
+            raise StringTooLongError("Try to send %s bytes whereas maximum is %s" % (
+                len(string), 2 ** (8 * self.prefixLength)))
+        self.transport.writeSequence([struct.pack(self.structFormat, len(string)), string])
+
     def stringReceived(self, data):
         "As soon as any data is received, send it to callback"
         self._callback_execute('data', data)
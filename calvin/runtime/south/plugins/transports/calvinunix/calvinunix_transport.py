@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+
+from calvin.utilities import calvinlogger
+from calvin.utilities import calvinconfig
+from twisted.twisted_transport import TwistedCalvinServer, TwistedCalvinTransport
+from calvin.runtime.south.plugins.transports import base_transport
+from calvin.runtime.south.plugins.transports.lib.twisted import twisted_transport
+
+_log = calvinlogger.get_logger(__name__)
+_conf = calvinconfig.get()
+
+
+def default_uri(rt_id):
+    """ The uri of the socket a runtime listens on when not configured, calvinunix://<path> """
+    directory = _conf.get(None, 'unix_socket_directory') or tempfile.gettempdir()
+    return "calvinunix://" + os.path.join(directory, "calvin-%s.sock" % rt_id)
+
+
+class CalvinTransportFactory(base_transport.BaseTransportFactory):
+    """ Runtime to runtime transport over Unix domain sockets, for runtimes on the same host """
+
+    def __init__(self, rt_id, node_name, callbacks):
+        super(CalvinTransportFactory, self).__init__(rt_id, callbacks=callbacks)
+        self._node_name = node_name
+        self._peers = {}
+        self._servers = {}
+        self._callbacks = callbacks
+        self._client_validator = None
+
+    def join(self, uri, server_node_name=None):
+        """docstring for join"""
+        schema, peer_addr = uri.split(':', 1)
+        if schema != 'calvinunix':
+            raise Exception("Cant handle schema %s!!" % schema)
+        _log.debug("calvinunix join %s", uri)
+        try:
+            tp = twisted_transport.CalvinTransport(self._rt_id,
+                                                   uri, self._callbacks,
+                                                   TwistedCalvinTransport,
+                                                   node_name=self._node_name,
+                                                   client_validator=self._client_validator)
+            self._peers[peer_addr] = tp
+            tp.connect()
+            return tp
+        except:
+            _log.exception("Error creating TwistedCalvinTransport")
+            raise
+
+    def get_default_uri(self):
+        return default_uri(self._rt_id)
+
+    def _get_uri(self, uri):
+        if uri == "calvinunix://default":
+            uri = default_uri(self._rt_id)
+        return uri
+
+    def listen(self, uri):
+        _log.debug("Listen incoming uri %s", uri)
+        uri = self._get_uri(uri)
+        schema, _peer_addr = uri.split(':', 1)
+        if schema != 'calvinunix':
+            raise Exception("Cant handle schema %s!!" % schema)
+
+        if uri in self._servers:
+            raise Exception("Server already started!!" % uri)
+
+        try:
+            tp = twisted_transport.CalvinServer(
+                self._rt_id, self._node_name, uri, self._callbacks, TwistedCalvinServer, TwistedCalvinTransport,
+                client_validator=self._client_validator)
+            tp.start()
+            _log.debug("Listen real uri %s", uri)
+            self._servers[uri] = tp
+            return tp
+        except:
+            _log.exception("Error starting server")
+            raise
+
+    def stop_listening(self, uri):
+        _log.debug("Stop listnening %s", uri)
+        uri = self._get_uri(uri)
+        if uri in self._servers:
+            server = self._servers.pop(uri)
+            server.stop()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mmap
+import os
+import re
+import stat
+import struct
+import tempfile
+
+from calvin.utilities import calvinlogger
+
+_log = calvinlogger.get_logger(__name__)
+
+# The ring file starts with the position the reader has consumed up to, written by the reader
+_HEADER = struct.Struct('>Q')
+# Names of ring files, as made by mkstemp
+_NAME = re.compile(r'^calvin-\w+\.ring$')
+
+
+def ring_directory(directory=None):
+    """ The directory ring files are created in """
+    return os.path.abspath(directory or tempfile.gettempdir())
+
+
+class RingWriter(object):
+    """
+        Sending end of a single producer, single consumer ring buffer in a memory mapped file,
+        shared with a RingReader in another process on the same host.
+
+        Positions increase for ever, the offset in the ring is the position modulo the size.
+        Data is never split, when it does not fit before the end of the ring it is put at the start.
+    """
+
+    def __init__(self, size, directory=None):
+        super(RingWriter, self).__init__()
+        fd, self.path = tempfile.mkstemp(prefix='calvin-', suffix='.ring', dir=ring_directory(directory))
+        try:
+            os.ftruncate(fd, _HEADER.size + size)
+            self._mmap = mmap.mmap(fd, _HEADER.size + size)
+        finally:
+            os.close(fd)
+        self._size = size
+        self._head = 0
+
+    def put(self, data):
+        """ Copies data to the ring, returns the position of data, None when the ring is too full """
+        length = len(data)
+        if length > self._size:
+            return None
+        tail, = _HEADER.unpack_from(self._mmap, 0)
+        position = self._head
+        offset = position % self._size
+        if offset + length > self._size:
+            # Wrap to the start of the ring
+            position += self._size - offset
+            offset = 0
+        if position + length - tail > self._size:
+            return None
+        start = _HEADER.size + offset
+        self._mmap[start:start + length] = data
+        self._head = position + length
+        return position
+
+    def close(self):
+        self._mmap.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            # Already removed by the reader
+            pass
+
+
+class RingReader(object):
+    """
+        Receiving end of a RingWriter's ring, data must be read in the order it was put.
+
+        The path comes from the peer, hence it must be a ring file in the ring directory,
+        a regular file owned by this user, otherwise ValueError.
+    """
+
+    def __init__(self, path, directory=None):
+        super(RingReader, self).__init__()
+        if os.path.dirname(path) != ring_directory(directory) or not _NAME.match(os.path.basename(path)):
+            raise ValueError("Not a ring file %s" % path)
+        fd = os.open(path, os.O_RDWR | os.O_NOFOLLOW)
+        try:
+            info = os.fstat(fd)
+            if not stat.S_ISREG(info.st_mode) or info.st_uid != os.getuid() or info.st_size <= _HEADER.size:
+                raise ValueError("Not a ring file %s" % path)
+            self._mmap = mmap.mmap(fd, info.st_size)
+        finally:
+            os.close(fd)
+        # Both ends have it mapped, the file is not needed anymore, unless replaced since opened
+        linked = os.lstat(path)
+        if (linked.st_dev, linked.st_ino) == (info.st_dev, info.st_ino):
+            os.unlink(path)
+        self._size = info.st_size - _HEADER.size
+
+    def get(self, position, length):
+        """ Returns a copy of the data at position and frees its space in the ring """
+        start = _HEADER.size + position % self._size
+        data = self._mmap[start:start + length]
+        _HEADER.pack_into(self._mmap, 0, position + length)
+        return data
+
+    def close(self):
+        self._mmap.close()
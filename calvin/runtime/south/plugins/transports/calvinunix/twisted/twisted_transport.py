@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+import os
+import struct
+
+from calvin.utilities.calvin_callback import CalvinCB
+from calvin.utilities import calvinlogger
+from calvin.runtime.south.plugins.transports.lib.twisted import base_transport
+from calvin.runtime.south.plugins.transports.calvinip.twisted.twisted_transport import StringProtocol
+from calvin.runtime.south.plugins.transports.calvinip.twisted.twisted_transport import TCPServerFactory
+from calvin.runtime.south.plugins.transports.calvinip.twisted.twisted_transport import TCPClientFactory
+from calvin.runtime.south.plugins.transports.calvinunix import shm_ring
+
+from twisted.internet import error
+from twisted.internet import reactor
+
+_log = calvinlogger.get_logger(__name__)
+
+from calvin.utilities import calvinconfig
+_conf = calvinconfig.get()
+
+# Each frame starts with one of these
+INLINE = '\x00'  # followed by the data
+SHARED = '\x01'  # followed by position and length of the data in the sender's ring
+RING = '\x02'  # followed by the path of the sender's ring file
+RING_OK = '\x03'  # the receiver opened the ring, data may be sent in it
+RING_FAILED = '\x04'  # the receiver could not open the ring, all data is sent on the socket
+_SHARED = struct.Struct('>QI')
+
+# Connections accepted by a server are told apart by a sequence number in their uri
+_connection_nbr = itertools.count()
+
+
+def create_uri(path):
+    return "%s://%s" % ("calvinunix", path)
+
+
+# Server
+class TwistedCalvinServer(base_transport.CalvinServerBase):
+    """ Listens on a Unix domain socket, host is the path of the socket """
+
+    def __init__(self, iface='', node_name=None, port=0, callbacks=None, host=None, *args, **kwargs):
+        super(TwistedCalvinServer, self).__init__(callbacks=callbacks)
+        self._path = host
+        self._node_name = node_name
+        self._server = None
+        self._callbacks = callbacks
+
+    def start(self):
+        callbacks = {'connected': [CalvinCB(self._connected)]}
+        f = TCPServerFactory(callbacks)
+        if os.path.exists(self._path):
+            # Left by a runtime that did not stop cleanly
+            os.unlink(self._path)
+        try:
+            self._server = reactor.listenUNIX(self._path, f, mode=0o660)
+        except error.CannotListenError:
+            _log.exception("Could not listen on %s", self._path)
+            raise
+        self._callback_execute('server_started', self._path)
+        return self._path
+
+    def stop(self):
+        _log.debug("Stopping server %s", self._server)
+        def fire_callback(args):
+            _log.debug("Server stopped %s", self._server)
+            self._callback_execute('server_stopped')
+        def fire_errback(args):
+            _log.warning("Server did not stop as excpected %s", args)
+            self._callback_execute('server_stopped')
+
+        if self._server:
+            d = self._server.stopListening()
+            self._server = None
+            d.addCallback(fire_callback)
+            d.addErrback(fire_errback)
+
+    def is_listening(self):
+        return self._server is not None
+
+    def _connected(self, proto):
+        self._callback_execute('client_connected', create_uri("%s?%d" % (self._path, next(_connection_nbr))), proto)
+
+
+# Client
+class TwistedCalvinTransport(base_transport.CalvinTransportBase):
+    """
+        Transport over a Unix domain socket, host is the path of the socket.
+
+        Data at least unix_shm_threshold bytes large is put in a shared memory ring, when enabled,
+        and only its position is sent on the socket. The ring is only used after the peer has
+        reported that it could open it, until then data is sent on the socket. The peer's ring is
+        only opened once the link is joined.
+    """
+
+    def __init__(self, host, port, callbacks=None, proto=None, node_name=None, server_node_name=None, *args, **kwargs):
+        super(TwistedCalvinTransport, self).__init__(host, port, callbacks=callbacks)
+        self._path = host
+        self._proto = proto
+        self._factory = None
+        self._node_name = node_name
+        self._ring = None
+        self._ring_ready = False
+        self._peer_ring = None
+        self._joined = False
+        self._shm_threshold = _conf.get(None, 'unix_shm_threshold')
+
+        # Server created us already have a proto
+        if proto:
+            proto.callback_register('connected', CalvinCB(self._connected))
+            proto.callback_register('disconnected', CalvinCB(self._disconnected))
+            proto.callback_register('data', CalvinCB(self._data))
+
+        self._callbacks = callbacks
+
+    def is_connected(self):
+        return self._proto is not None
+
+    def disconnect(self):
+        if self._proto:
+            self._proto.transport.loseConnection()
+
+    def joined(self):
+        self._joined = True
+
+    def send(self, data):
+        if not self._proto:
+            return
+        if self._shm_threshold and len(data) >= self._shm_threshold:
+            if self._ring is None:
+                self._create_ring()
+            position = self._ring.put(data) if self._ring_ready else None
+            if position is not None:
+                self._proto.sendString(SHARED + _SHARED.pack(position, len(data)))
+                return
+        self._proto.transport.writeSequence([struct.pack(self._proto.structFormat, len(data) + 1), INLINE, data])
+
+    def _create_ring(self):
+        try:
+            self._ring = shm_ring.RingWriter(_conf.get(None, 'unix_shm_size'), _conf.get(None, 'unix_shm_directory'))
+        except Exception:
+            _log.exception("Could not create shared memory ring, sending all data on the socket")
+            self._shm_threshold = None
+            return
+        self._proto.sendString(RING + self._ring.path)
+
+    def _close_ring(self):
+        """ Stop using the shared memory ring, all data is sent on the socket """
+        self._shm_threshold = None
+        self._ring_ready = False
+        if self._ring:
+            self._ring.close()
+            self._ring = None
+
+    def join(self):
+        if self._proto:
+            raise Exception("Already connected")
+
+        # Own callbacks
+        callbacks = {'connected': [CalvinCB(self._connected)],
+                     'disconnected': [CalvinCB(self._disconnected)],
+                     'connection_failed': [CalvinCB(self._connection_failed)],
+                     'data': [CalvinCB(self._data)],
+                     'set_proto': [CalvinCB(self._set_proto)]}
+
+        self._factory = UNIXClientFactory(callbacks)
+        reactor.connectUNIX(self._path, self._factory)
+
+    def _set_proto(self, proto):
+        _log.debug("%s, %s, %s" % (self, '_set_proto', proto))
+        if self._proto:
+            _log.error("_set_proto: Already connected")
+            return
+        self._proto = proto
+
+    def _connected(self, proto):
+        _log.debug("%s, %s" % (self, 'connected'))
+        self._callback_execute('connected')
+
+    def _disconnected(self, reason):
+        _log.debug("%s, %s, %s" % (self, 'disconnected', reason))
+        self._joined = False
+        if self._ring:
+            self._ring.close()
+            self._ring = None
+            self._ring_ready = False
+        if self._peer_ring:
+            self._peer_ring.close()
+            self._peer_ring = None
+        self._callback_execute('disconnected', reason)
+
+    def _connection_failed(self, addr, reason):
+        _log.debug("%s, %s, %s" % (self, 'connection_failed', reason))
+        self._callback_execute('connection_failed', reason)
+
+    def _data(self, data):
+        frame, data = data[:1], data[1:]
+        if frame == SHARED:
+            if self._peer_ring is None:
+                # The peer only uses the ring after RING_OK, the data is lost, hence so is the link
+                _log.error("Data in shared memory from %s but no ring, disconnecting", self._path)
+                self.disconnect()
+                return
+            data = self._peer_ring.get(*_SHARED.unpack(data))
+        elif frame == RING:
+            if not self._joined or self._peer_ring is not None:
+                _log.warning("Shared memory ring from %s before join or again, not opened", self._path)
+                self._proto.sendString(RING_FAILED)
+                return
+            try:
+                self._peer_ring = shm_ring.RingReader(data, _conf.get(None, 'unix_shm_directory'))
+            except Exception:
+                _log.exception("Could not open shared memory ring %s", data)
+                self._proto.sendString(RING_FAILED)
+            else:
+                self._proto.sendString(RING_OK)
+            return
+        elif frame == RING_OK:
+            self._ring_ready = self._ring is not None
+            return
+        elif frame == RING_FAILED:
+            _log.warning("Peer could not open shared memory ring, sending all data to %s on the socket", self._path)
+            self._close_ring()
+            return
+        self._callback_execute('data', data)
+
+
+class UNIXClientFactory(TCPClientFactory):
+    protocol = StringProtocol
+
+    def clientConnectionFailed(self, connector, reason):
+        _log.info('Connection failed. reason: %s, dest %s', reason, connector.getDestination())
+        self._callback_execute('connection_failed', connector.getDestination().name, reason)
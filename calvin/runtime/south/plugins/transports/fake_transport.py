@@ -34,7 +34,7 @@ class FakeTransport(base_transport.BaseTransport):
         # But we actually cheat and never encode/decode
         return coders.get("json")
 
-    def send(self, payload, timeout=None):
+    def send(self, payload, timeout=None, flush=False):
         self.peer._callback_execute('data_received', self.peer, payload)
 
 
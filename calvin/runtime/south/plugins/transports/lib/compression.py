@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import zlib
+
+from calvin.runtime.north.plugins.coders.messages.binary_coder import KNOWN_STRINGS, TOKEN_TYPES
+
+# lz4 is optional
+try:
+    from lz4 import block as _lz4
+except ImportError:
+    try:
+        import lz4 as _lz4
+    except ImportError:
+        _lz4 = None
+
+#
+# Compression of the data sent on a link, one codec instance per link and direction pair
+#
+
+# Message keys, types and tokens as json encoded, makes the compression good from the first message
+_PRIME = "".join(['"%s": ' % s for s in KNOWN_STRINGS] +
+                 ['{"type": "%s", "data": ' % t for t in TOKEN_TYPES])
+# Trailer of a sync flushed deflate block, always the same so it is not sent
+_SYNC_TRAILER = '\x00\x00\xff\xff'
+
+
+class ZlibCodec(object):
+    """
+        Deflate stream over all data on the link, which gives later data the earlier as
+        dictionary. Relies on data being decompressed in the order it was compressed.
+    """
+    name = 'zlib'
+
+    def __init__(self, level=6):
+        super(ZlibCodec, self).__init__()
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        primer = self._compressor.compress(_PRIME) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        # The peer's compressor is primed with the same data, any deflate stream of it works
+        self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        self._decompressor.decompress(primer)
+
+    def compress(self, data):
+        data = self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return data[:-len(_SYNC_TRAILER)]
+
+    def decompress(self, data):
+        return self._decompressor.decompress(data + _SYNC_TRAILER)
+
+
+class Lz4Codec(object):
+    """ Each data compressed on its own, fast but compresses less than zlib """
+    name = 'lz4'
+
+    def compress(self, data):
+        return _lz4.compress(data)
+
+    def decompress(self, data):
+        return _lz4.decompress(data)
+
+
+_CODECS = {'zlib': ZlibCodec}
+if _lz4 is not None:
+    _CODECS['lz4'] = Lz4Codec
+
+
+def supported(names):
+    """ Returns the codecs in names which are available """
+    return [name for name in names if name in _CODECS]
+
+
+def get(name):
+    """ Returns a new codec instance """
+    return _CODECS[name]()
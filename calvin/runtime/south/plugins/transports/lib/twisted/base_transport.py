@@ -123,5 +123,11 @@ class CalvinTransportBase(CalvinCBClass):
         """
         raise NotImplementedError()
 
+    def joined(self):
+        """
+            Called when the join handshake with the peer succeeded
+        """
+        pass
+
     def get_rtt(self):
         return self._rtt
@@ -14,17 +14,30 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import struct
 import time
 
 from calvin.utilities.calvin_callback import CalvinCB
 from calvin.utilities import calvinlogger
 from calvin.utilities import calvinuuid
+from calvin.utilities import calvinconfig
+from calvin.runtime.south.plugins.async import async
 from calvin.runtime.south.plugins.transports import base_transport
+from calvin.runtime.south.plugins.transports.lib import compression
 
 _log = calvinlogger.get_logger(__name__)
+_conf = calvinconfig.get()
 
-_join_request_reply = {'cmd': 'JOIN_REPLY', 'id': None, 'sid': None, 'serializer': None}
-_join_request = {'cmd': 'JOIN_REQUEST', 'id': None, 'sid': None, 'serializers': []}
+_join_request_reply = {'cmd': 'JOIN_REPLY', 'id': None, 'sid': None, 'serializer': None, 'batching': False,
+                       'compression': None, 'framing': True}
+_join_request = {'cmd': 'JOIN_REQUEST', 'id': None, 'sid': None, 'serializers': [], 'batching': False,
+                 'compressions': [], 'framing': True}
+
+# A batch of encoded messages is sent as BATCH followed by each message with a length prefix,
+# compressed data as COMPRESSED followed by the compressed data. No coder output starts with these.
+BATCH = '\xfe'
+COMPRESSED = '\xfd'
+_LENGTH = struct.Struct('>I')
 
 
 class CalvinTransport(base_transport.BaseTransport):
@@ -50,6 +63,16 @@ class CalvinTransport(base_transport.BaseTransport):
         self._coder = None
         self._transport = transport(self._uri.hostname, self._uri.port, callbacks, proto=proto, node_name=self._node_name, server_node_name=server_node_name)
         self._rtt = None  # Init rtt in s
+        # Batching of messages is used when both runtimes support it
+        self._batching = False
+        self._batch = []
+        self._batch_bytes = 0
+        self._batch_timer = None
+        # Compression codec, when both runtimes support the same
+        self._compression = None
+        self._statistics = {'messages_sent': 0, 'messages_received': 0,
+                            'bytes_sent': 0, 'bytes_sent_uncompressed': 0,
+                            'bytes_received': 0, 'bytes_received_uncompressed': 0}
 
         if not client_validator:
             self._verify_client = lambda x: True
@@ -77,12 +100,13 @@ class CalvinTransport(base_transport.BaseTransport):
     def disconnect(self, timeout=10):
         # TODO: Set timepout
         if self._transport.is_connected():
+            self._flush()
             self._transport.disconnect()
 
     def is_connected(self):
         return self._transport.is_connected()
 
-    def send(self, payload, timeout=None, coder=None):
+    def send(self, payload, timeout=None, coder=None, flush=False):
         tcoder = coder or self._coder
         try:
             _log.debug('send_message %s => %s "%s"' % (self._rt_id, self._remote_rt_id, payload))
@@ -92,7 +116,15 @@ class CalvinTransport(base_transport.BaseTransport):
 
             # _log.debug('raw_send_message %s => %s "%s"' % (self._rt_id, self._remote_rt_id, raw_payload))
             self._callback_execute('raw_send_message', self, raw_payload)
-            self._transport.send(raw_payload)
+            if coder is not None:
+                # Join messages, before batching and compression are agreed on, are not counted
+                self._transport.send(raw_payload)
+            else:
+                self._statistics['messages_sent'] += 1
+                if self._batching:
+                    self._add_to_batch(raw_payload, flush)
+                else:
+                    self._write(raw_payload)
             # TODO: Set timeout of send
             return True
         except:
@@ -100,6 +132,53 @@ class CalvinTransport(base_transport.BaseTransport):
             _log.error("Payload = '%s'" % repr(payload))
         return False
 
+    def _add_to_batch(self, raw_payload, flush):
+        self._batch.append(raw_payload)
+        self._batch_bytes += len(raw_payload)
+        if flush or self._batch_bytes >= _conf.get(None, 'transport_batch_size'):
+            self._flush()
+        elif self._batch_timer is None:
+            self._batch_timer = async.DelayedCall(_conf.get(None, 'transport_batch_delay') or 0, self._flush)
+
+    def _flush(self):
+        """ Send the collected messages """
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        batch = self._batch
+        if not batch:
+            return
+        self._batch = []
+        self._batch_bytes = 0
+        if len(batch) == 1:
+            data = batch[0]
+        else:
+            parts = [BATCH]
+            for raw_payload in batch:
+                parts.append(_LENGTH.pack(len(raw_payload)))
+                parts.append(raw_payload)
+            data = ''.join(parts)
+        try:
+            self._write(data)
+        except:
+            _log.exception("Send of %d messages failed!!" % len(batch))
+
+    def _write(self, data):
+        self._statistics['bytes_sent_uncompressed'] += len(data)
+        if self._compression and len(data) >= _conf.get(None, 'transport_compression_threshold'):
+            data = COMPRESSED + self._compression.compress(data)
+        self._statistics['bytes_sent'] += len(data)
+        self._transport.send(data)
+
+    def get_statistics(self):
+        statistics = dict(self._statistics)
+        statistics['batching'] = self._batching
+        statistics['compression'] = self._compression.name if self._compression else None
+        return statistics
+
+    def _compressions(self):
+        return compression.supported(_conf.get(None, 'transport_compression') or [])
+
     def _get_join_coder(self):
         return self.get_coders()['json']
 
@@ -112,6 +191,8 @@ class CalvinTransport(base_transport.BaseTransport):
         msg['id'] = self._rt_id
         msg['sid'] = self._get_msg_uuid()
         msg['serializers'] = self.get_coders().keys()
+        msg['batching'] = bool(_conf.get(None, 'transport_batching'))
+        msg['compressions'] = self._compressions()
         self._join_start = time.time()
         self.send(msg, coder=self._get_join_coder())
 
@@ -120,6 +201,8 @@ class CalvinTransport(base_transport.BaseTransport):
         msg['id'] = self._rt_id
         msg['sid'] = sid
         msg['serializer'] = serializer
+        msg['batching'] = self._batching
+        msg['compression'] = self._compression.name if self._compression else None
         self.send(msg, coder=self._get_join_coder())
 
     def _handle_join(self, data):
@@ -142,6 +225,16 @@ class CalvinTransport(base_transport.BaseTransport):
                     self._coder = self.get_coders()[coder]
                     coder_name = coder
                     break
+            # Older runtimes don't decode binary token data sent in frames
+            if self._coder is not None:
+                self._coder.framing = bool(data_obj.get('framing'))
+
+            # Older runtimes don't send batching or compressions
+            self._batching = bool(data_obj.get('batching') and _conf.get(None, 'transport_batching'))
+            for name in self._compressions():
+                if name in data_obj.get('compressions', []):
+                    self._compression = compression.get(name)
+                    break
 
             # Verify remote
             valid = self._verify_client(data_obj)
@@ -165,6 +258,7 @@ class CalvinTransport(base_transport.BaseTransport):
         if not success:
             self._callback_execute('join_failed', self, self._remote_rt_id, self.get_uri(), is_orginator, reason)
         else:
+            self._transport.joined()
             self._callback_execute('join_finished', self, self._remote_rt_id, self.get_uri(), is_orginator)
 
     def _handle_join_reply(self, data):
@@ -180,6 +274,10 @@ class CalvinTransport(base_transport.BaseTransport):
 
             if data_obj['serializer'] in self.get_coders():
                 self._coder = self.get_coders()[data_obj['serializer']]
+                self._coder.framing = bool(data_obj.get('framing'))
+            self._batching = bool(data_obj.get('batching') and _conf.get(None, 'transport_batching'))
+            if data_obj.get('compression') in self._compressions():
+                self._compression = compression.get(data_obj['compression'])
 
             if data_obj['id'] is not None:
                 # Request denied
@@ -203,6 +301,11 @@ class CalvinTransport(base_transport.BaseTransport):
             self._joined(True, True)
 
     def _disconnected(self, reason):
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        self._batch = []
+        self._batch_bytes = 0
         # TODO: unify reason
         status = "ERROR"
         if reason.getErrorMessage() == "Connection was closed cleanly.":
@@ -227,6 +330,25 @@ class CalvinTransport(base_transport.BaseTransport):
                 self._handle_join_reply(data)
             return
 
+        self._statistics['bytes_received'] += len(data)
+        if data.startswith(COMPRESSED) and self._compression:
+            try:
+                data = self._compression.decompress(data[1:])
+            except:
+                _log.exception("Decompression failed")
+                return
+        self._statistics['bytes_received_uncompressed'] += len(data)
+        if data.startswith(BATCH):
+            pos = 1
+            while pos < len(data):
+                length, = _LENGTH.unpack_from(data, pos)
+                self._message_received(data[pos + 4:pos + 4 + length])
+                pos += 4 + length
+        else:
+            self._message_received(data)
+
+    def _message_received(self, data):
+        self._statistics['messages_received'] += 1
         # TODO: How to error this
         data_obj = None
         # decode
@@ -251,7 +373,8 @@ class CalvinServer(base_transport.BaseServer):
         # TODO: Get iface from addr and lookup host
         iface = '::'
 
-        self._transport = server_transport(iface=iface, node_name=self._node_name, port=self._listen_uri.port or 0)
+        self._transport = server_transport(iface=iface, node_name=self._node_name, port=self._listen_uri.port or 0,
+                                           host=self._listen_uri.hostname)
         self._client_transport = client_transport
 
     def _started(self, port):
@@ -273,7 +396,7 @@ class CalvinServer(base_transport.BaseServer):
         from calvin.utilities import calvinconfig
         _conf = calvinconfig.get()
         runtime_to_runtime_security = _conf.get("security","runtime_to_runtime_security")
-        if runtime_to_runtime_security=="tls":
+        if runtime_to_runtime_security=="tls" and uri.startswith("calvinip"):
             _log.debug("TLS enabled, get FQDN of runtime")
             try:
                 junk, ipv6 = uri.split("//")
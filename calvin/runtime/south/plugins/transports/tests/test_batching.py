@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock, patch
+
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory
+from calvin.runtime.south.plugins.transports.lib.twisted import twisted_transport
+
+pytestmark = pytest.mark.unittest
+
+CONFIG = {'transport_batching': True, 'transport_batch_size': 100, 'transport_batch_delay': 0}
+
+
+@pytest.fixture
+def transport():
+    with patch.object(twisted_transport, '_conf') as conf, patch.object(twisted_transport, 'async') as async:
+        conf.get.side_effect = lambda section, option: CONFIG[option]
+        tp = twisted_transport.CalvinTransport("rt1", "calvinip://127.0.0.1:5000", {}, Mock(), proto=Mock())
+        tp._coder = message_coder_factory.get("json")
+        tp._remote_rt_id = "rt2"
+        tp._batching = True
+        tp.async = async
+        yield tp
+
+
+def test_messages_in_one_tick_are_batched(transport):
+    transport.send({'a': 1})
+    transport.send({'b': 2})
+    assert not transport._transport.send.called
+    # Flushed at the end of the tick
+    delay, flush = transport.async.DelayedCall.call_args[0]
+    assert transport.async.DelayedCall.call_count == 1
+    flush()
+    data = transport._transport.send.call_args[0][0]
+    assert data.startswith(twisted_transport.BATCH)
+    received = []
+    transport._callback_execute = lambda name, tp, data_obj: name == 'data_received' and received.append(data_obj)
+    transport._data_received(data)
+    assert received == [{'a': 1}, {'b': 2}]
+
+
+def test_flush_and_size_limit(transport):
+    transport.send({'a': 1}, flush=True)
+    # A single message is sent as is
+    transport._transport.send.assert_called_once_with('{"a": 1}')
+    transport.send({'a': "x" * 100})
+    assert transport._transport.send.call_count == 2
+    assert not transport._batch
+
+
+def test_join_negotiates_batching(transport):
+    transport._batching = False
+    transport._remote_rt_id = None
+    transport._verify_client = lambda data_obj: True
+    transport._callback_execute = Mock()
+    join = message_coder_factory.get("json").encode(
+        {'cmd': 'JOIN_REQUEST', 'id': "rt2", 'sid': "sid", 'serializers': ["json"]})
+    transport._handle_join(join)
+    # An old runtime doesn't know about batching
+    assert not transport._batching
+    reply = transport._transport.send.call_args[0][0]
+    assert '"batching": false' in reply
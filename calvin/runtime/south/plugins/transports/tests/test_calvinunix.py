@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+
+import pytest
+from mock import Mock, patch
+from twisted.internet import reactor
+
+from calvin.utilities.calvin_callback import CalvinCB
+from calvin.runtime.south.plugins.transports.base_transport import split_uri
+from calvin.runtime.south.plugins.transports.calvinunix import calvinunix_transport
+from calvin.runtime.south.plugins.transports.calvinunix.twisted import twisted_transport as unix_transport
+
+pytestmark = pytest.mark.unittest
+
+
+def test_socket_path_from_uri():
+    uri = split_uri("calvinunix:///tmp/calvin-rt1.sock")
+    assert (uri.scheme, uri.hostname, uri.port) == ("calvinunix", "/tmp/calvin-rt1.sock", None)
+    # Connections accepted by a server have a sequence number
+    assert split_uri("calvinunix:///tmp/calvin-rt1.sock?3").hostname == "/tmp/calvin-rt1.sock"
+
+
+def iterate_until(condition, timeout=5.0):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        reactor.iterate(0.01)
+    return condition()
+
+
+def factory(rt_id, events):
+    callbacks = {name: [CalvinCB(events.setdefault(name, Mock()))]
+                 for name in ['join_finished', 'join_failed', 'server_started', 'server_stopped', 'data_received',
+                              'peer_connection_failed', 'peer_disconnected']}
+    return calvinunix_transport.CalvinTransportFactory(rt_id, rt_id, callbacks)
+
+
+def test_loopback_listen_join(tmpdir):
+    uri = "calvinunix://" + os.path.join(str(tmpdir), "calvin-rt1.sock")
+    server_events, client_events = {}, {}
+    server = factory("rt1", server_events)
+    client = factory("rt2", client_events)
+    server.listen(uri)
+    assert server_events['server_started'].called
+    tp = client.join(uri)
+    try:
+        assert iterate_until(lambda: client_events['join_finished'].called and server_events['join_finished'].called)
+        _, peer_id, joined_uri, is_orginator = client_events['join_finished'].call_args[0]
+        assert (peer_id, joined_uri, is_orginator) == ("rt1", uri, True)
+        tp.send({'cmd': 'PING'})
+        assert iterate_until(lambda: server_events['data_received'].called)
+        assert server_events['data_received'].call_args[0][1]['cmd'] == 'PING'
+    finally:
+        tp.disconnect()
+        server.stop_listening(uri)
+        iterate_until(lambda: server_events['server_stopped'].called)
+
+
+def transport_with_ring():
+    proto = Mock(structFormat="!I")
+    with patch.object(unix_transport, '_conf') as conf, patch.object(unix_transport.shm_ring, 'RingWriter') as writer:
+        conf.get.return_value = 4
+        tp = unix_transport.TwistedCalvinTransport("/tmp/calvin-rt1.sock", None, proto=proto)
+        tp.send("data-1")
+    ring = writer.return_value
+    ring.put.return_value = 0
+    return tp, proto, ring
+
+
+def test_ring_used_when_opened():
+    tp, proto, ring = transport_with_ring()
+    # Sent on the socket until the peer has opened the ring
+    proto.sendString.assert_called_once_with(unix_transport.RING + ring.path)
+    assert proto.transport.writeSequence.call_args[0][0][1:] == [unix_transport.INLINE, "data-1"]
+    assert not ring.put.called
+    tp._data(unix_transport.RING_OK)
+    tp.send("data-2")
+    ring.put.assert_called_once_with("data-2")
+    assert proto.sendString.call_args[0][0].startswith(unix_transport.SHARED)
+
+
+def test_ring_failed():
+    tp, proto, ring = transport_with_ring()
+    tp._data(unix_transport.RING_FAILED)
+    assert ring.close.called
+    tp.send("data-2")
+    assert not ring.put.called
+    assert proto.transport.writeSequence.call_args[0][0][1:] == [unix_transport.INLINE, "data-2"]
+
+
+def test_ring_open_failure_reported(tmpdir):
+    proto = Mock()
+    tp = unix_transport.TwistedCalvinTransport("/tmp/calvin-rt1.sock", None, proto=proto)
+    tp.joined()
+    tp._data(unix_transport.RING + os.path.join(str(tmpdir), "missing"))
+    proto.sendString.assert_called_once_with(unix_transport.RING_FAILED)
+    # Shared data without a ring is lost, the link is closed
+    tp._data(unix_transport.SHARED + unix_transport._SHARED.pack(0, 10))
+    assert proto.transport.loseConnection.called
+
+
+def test_ring_before_join_refused(tmpdir):
+    proto = Mock()
+    writer = unix_transport.shm_ring.RingWriter(100)
+    tp = unix_transport.TwistedCalvinTransport("/tmp/calvin-rt1.sock", None, proto=proto)
+    tp._data(unix_transport.RING + writer.path)
+    proto.sendString.assert_called_once_with(unix_transport.RING_FAILED)
+    assert os.path.exists(writer.path)
+    tp.joined()
+    tp._data(unix_transport.RING + writer.path)
+    proto.sendString.assert_called_with(unix_transport.RING_OK)
+    assert not os.path.exists(writer.path)
+    writer.close()
+    tp._peer_ring.close()
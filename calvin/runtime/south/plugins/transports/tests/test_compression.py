@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import pytest
+from mock import Mock, patch
+
+from calvin.runtime.south.plugins.transports.lib import compression
+from calvin.runtime.south.plugins.transports.lib.twisted import twisted_transport
+
+pytestmark = pytest.mark.unittest
+
+CONFIG = {'transport_batching': False, 'transport_compression': ['lz4', 'zlib'],
+          'transport_compression_threshold': 40}
+
+
+def message(i):
+    return {'cmd': 'TUNNEL_DATA', 'value': {'cmd': 'TOKEN', 'sequencenbr': i,
+                                            'token': {'type': 'Token', 'data': {'temperature': 20 + i % 3,
+                                                                                'humidity': 40}}}}
+
+
+def test_zlib_stream():
+    sender = compression.get('zlib')
+    receiver = compression.get('zlib')
+    data = [json.dumps(message(i)) for i in range(10)]
+    compressed = [sender.compress(d) for d in data]
+    assert [receiver.decompress(c) for c in compressed] == data
+    # Later messages use the earlier as dictionary
+    assert len(compressed[-1]) < len(data[-1]) / 4
+
+
+@pytest.fixture
+def link():
+    """ Two joined transports sending to each other """
+    with patch.object(twisted_transport, '_conf') as conf:
+        conf.get.side_effect = lambda section, option: CONFIG[option]
+        client = twisted_transport.CalvinTransport("rt1", "calvinip://127.0.0.1:5000", {}, Mock())
+        server = twisted_transport.CalvinTransport("rt2", "calvinip://127.0.0.1:5001", {}, Mock(), proto=Mock())
+        for tp in [client, server]:
+            tp._verify_client = lambda data_obj: True
+            tp._callback_execute = Mock()
+        client._transport.send.side_effect = server._data_received
+        server._transport.send.side_effect = client._data_received
+        client._send_join()
+        yield client, server
+
+
+def test_negotiated_at_join(link):
+    client, server = link
+    assert client.get_statistics()['compression'] == server.get_statistics()['compression'] == 'zlib'
+
+
+def test_compressed_above_threshold(link):
+    client, server = link
+    received = []
+    server._callback_execute = lambda name, tp, data_obj: name == 'data_received' and received.append(data_obj)
+    client.send({'cmd': 'REPLY'})
+    for i in range(5):
+        client.send(message(i))
+    assert received[0] == {'cmd': 'REPLY'}
+    assert received[1:] == json.loads(json.dumps([message(i) for i in range(5)]))
+    statistics = client.get_statistics()
+    assert statistics['messages_sent'] == 6
+    assert statistics['bytes_sent'] < statistics['bytes_sent_uncompressed']
+    assert server.get_statistics()['bytes_received_uncompressed'] == statistics['bytes_sent_uncompressed']
+
+
+def test_old_runtime_gets_uncompressed():
+    with patch.object(twisted_transport, '_conf') as conf:
+        conf.get.side_effect = lambda section, option: CONFIG[option]
+        client = twisted_transport.CalvinTransport("rt1", "calvinip://127.0.0.1:5000", {}, Mock())
+        client._callback_execute = Mock()
+        client._send_join()
+        client._handle_join_reply(json.dumps({'cmd': 'JOIN_REPLY', 'id': "rt2", 'sid': "sid", 'serializer': "json"}))
+    assert client.get_statistics()['compression'] is None
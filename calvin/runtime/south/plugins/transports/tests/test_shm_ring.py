@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pytest
+
+from calvin.runtime.south.plugins.transports.calvinunix import shm_ring
+
+pytestmark = pytest.mark.unittest
+
+
+def test_ring():
+    writer = shm_ring.RingWriter(100)
+    reader = shm_ring.RingReader(writer.path)
+    assert not os.path.exists(writer.path)
+    first = writer.put('a' * 60)
+    assert writer.put('b' * 60) is None
+    assert reader.get(first, 60) == 'a' * 60
+    # Does not fit before the end, put at the start of the ring
+    second = writer.put('b' * 60)
+    assert second == 100
+    assert reader.get(second, 60) == 'b' * 60
+    assert writer.put('c' * 101) is None
+    writer.close()
+    reader.close()
+
+
+def test_ring_in_directory(tmpdir):
+    writer = shm_ring.RingWriter(100, str(tmpdir))
+    # Only ring files in the ring directory are opened
+    with pytest.raises(ValueError):
+        shm_ring.RingReader(writer.path)
+    assert os.path.exists(writer.path)
+    reader = shm_ring.RingReader(writer.path, str(tmpdir))
+    assert not os.path.exists(writer.path)
+    writer.close()
+    reader.close()
+
+
+def test_ring_not_a_ring_file(tmpdir):
+    other = tmpdir.join("calvin-other.txt")
+    other.write("x" * 100)
+    with pytest.raises(ValueError):
+        shm_ring.RingReader(str(other), str(tmpdir))
+    assert other.check()
+    # Small files are not rings either
+    small = tmpdir.join("calvin-small.ring")
+    small.write("x")
+    with pytest.raises(ValueError):
+        shm_ring.RingReader(str(small), str(tmpdir))
+    assert small.check()
+
+
+def test_ring_symlink_refused(tmpdir):
+    target = tmpdir.join("target")
+    target.write("x" * 100)
+    link = tmpdir.join("calvin-link.ring")
+    link.mksymlinkto(target)
+    with pytest.raises(OSError):
+        shm_ring.RingReader(str(link), str(tmpdir))
+    assert link.check(link=1)
+    assert target.check()
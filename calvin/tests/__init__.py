@@ -23,6 +23,7 @@ class DummyNode:
         self.pm = Mock()
         self.storage = Mock()
         self.control = Mock()
+        self.sched = Mock()
         self.metering = metering.set_metering(metering.Metering(self))
         self.attributes = attribute_resolver.AttributeResolver({})
 
@@ -0,0 +1,29 @@
+import pytest
+from mock import Mock, patch
+
+from calvin.runtime.north import storage
+from calvin.tests import DummyNode
+
+
+@pytest.fixture
+def registry(request):
+    """ A started Storage with a Mock storage plugin and no timers """
+    patcher = patch('calvin.runtime.north.storage.async')
+    patcher.start()
+    request.addfinalizer(patcher.stop)
+    s = storage.Storage(DummyNode(), override_storage=Mock())
+    s.started = True
+    return s
+
+
+def answer(method, value=True):
+    """ Answer the last call of the storage method """
+    kwargs = method.call_args[1]
+    kwargs['cb'](key=kwargs['key'], value=value)
+
+
+def answer_many(method, value=True):
+    """ Answer the last call of the storage batch method, value is the status of all keys """
+    kwargs = method.call_args[1]
+    keys = kwargs['items'] if 'items' in kwargs else kwargs['keys']
+    kwargs['cb'](key=list(keys), value=value if isinstance(value, dict) else dict.fromkeys(keys, value))
@@ -20,7 +20,8 @@ from mock import Mock
 from calvin.tests import DummyNode, TestPort
 from calvin.runtime.north.actormanager import ActorManager
 from calvin.runtime.north.plugins.port.endpoint import LocalOutEndpoint, LocalInEndpoint
-from calvin.actor.actor import Actor
+from calvin.actor.actor import Actor, batch_condition
+from calvin.runtime.north.calvin_token import Token, ExceptionToken
 from calvin.runtime.north.plugins.port import queue
 
 pytestmark = pytest.mark.unittest
@@ -115,6 +116,79 @@ def test_connections():
     }
 
 
+class BatchActor(Actor):
+    """
+    Inputs:
+      token : a token
+    Outputs:
+      token : the same token
+    """
+
+    inport_properties = {'token': {}}
+    outport_properties = {'token': {}}
+
+    def init(self):
+        self.batches = []
+
+    def exception_handler(self, action, args):
+        return ("exception", )
+
+    @batch_condition([('token', 2, 3)], ['token'])
+    def forward(self, values):
+        self.batches.append(values)
+        return (values, )
+
+    action_priority = (forward, )
+
+
+@pytest.mark.parametrize("queue_class", [queue.fanout_fifo.FanoutFIFO, queue.compact_fifo.CompactFIFO])
+def test_batch_condition(queue_class):
+    actor = BatchActor('BatchActor')
+    actor.init()
+    inport = actor.inports['token']
+    outport = actor.outports['token']
+    inport.set_queue(queue_class({'queue_length': 8, 'direction': "in"}, {}))
+    inport.queue.add_reader(inport.id, {})
+    outport.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 8, 'direction': "out"}, {}))
+    outport.queue.add_reader("reader", {})
+
+    inport.queue.write(Token(1), None)
+    # Too few tokens for minimum batch
+    assert BatchActor.forward(actor) == (False, True, ())
+    for value in [2, 3, 4]:
+        inport.queue.write(Token(value), None)
+    inport.queue.write(ExceptionToken(), None)
+    inport.queue.write(Token(5), None)
+    inport.queue.write(Token(6), None)
+
+    # Maximum batch, batch ended before exception token, exception token alone
+    for _ in range(3):
+        assert BatchActor.forward(actor)[0]
+    assert BatchActor.forward(actor)[0]
+    assert actor.batches == [[1, 2, 3], [4], [5, 6]]
+    assert [t.value for t in outport.queue.peek_many("reader", 6)] == [1, 2, 3, 4, "exception", 5]
+
+
+def test_batch_condition_trailing_exception():
+    actor = BatchActor('BatchActor')
+    actor.init()
+    inport = actor.inports['token']
+    outport = actor.outports['token']
+    inport.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 8, 'direction': "in"}, {}))
+    inport.queue.add_reader(inport.id, {})
+    outport.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 8, 'direction': "out"}, {}))
+    outport.queue.add_reader("reader", {})
+
+    for token in [Token(1), Token(2), Token(3), ExceptionToken()]:
+        inport.queue.write(token, None)
+    # The exception token is the last token, and alone below the minimum batch
+    assert BatchActor.forward(actor)[0]
+    assert BatchActor.forward(actor)[0]
+    assert BatchActor.forward(actor) == (False, True, ())
+    assert actor.batches == [[1, 2, 3]]
+    assert [t.value for t in outport.queue.peek_many("reader", 4)] == [1, 2, 3, "exception"]
+
+
 def test_state(actor):
     inport = actor.inports['token']
     outport = actor.outports['token']
@@ -122,11 +196,13 @@ def test_state(actor):
         '_component_members': set([actor.id]),
         '_has_started': False,
         '_deployment_requirements': [],
-        '_managed': set(['dump', '_has_started', '_signature', '_id', '_deployment_requirements', '_name', '_subject_attributes', '_migration_info', '_port_property_capabilities', '_replication_data', 'last']),
+        '_managed': set(['dump', '_has_started', '_signature', '_id', '_deployment_requirements', '_name', '_subject_attributes', '_migration_info', '_port_property_capabilities', '_replication_data', '_scheduling_class', '_time_budget', 'last']),
         '_signature': None,
         'dump': False,
         '_id': actor.id,
         '_port_property_capabilities': None,
+        '_scheduling_class': 'normal',
+        '_time_budget': None,
         'inports': {'token': {'properties': {'direction': 'in',
                                              'routing': 'default',
                                              'nbr_peers': 1},
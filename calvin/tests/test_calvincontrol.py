@@ -58,12 +58,18 @@ def test_get_calvincontrol_returns_xxx():
     ("GET /actor/" + uuid + "/report HTTP/1", uuid, "handle_actor_report"),
     ("POST /actor/" + uuid + "/migrate HTTP/1", uuid, "handle_actor_migrate"),
     ("POST /actor/" + uuid + "/disable HTTP/1", uuid, "handle_actor_disable"),
+    ("GET /actor/" + uuid + "/usage HTTP/1", uuid, "handle_get_actor_usage"),
+    ("POST /actor/" + uuid + "/time_budget HTTP/1", uuid, "handle_post_actor_time_budget"),
+    ("GET /scheduler/latency HTTP/1", None, "handle_get_scheduler_latency"),
+    ("GET /links HTTP/1", None, "handle_get_links"),
     ("GET /actor/" + uuid + "/port/PORT_" + uuid + " HTTP/1", uuid, "handle_get_port"),
     ("GET /actor/" + uuid + "/port/PORT_" + uuid + "/state HTTP/1", uuid, "handle_get_port_state"),
     ("POST /connect HTTP/1", None, "handle_connect"),
     ("POST /set_port_property HTTP/1", None, "handle_set_port_property"),
     ("POST /deploy HTTP/1", None, "handle_deploy"),
     ("POST /application/APP_" + uuid + "/migrate HTTP/1", "APP_" + uuid, "handle_post_application_migrate"),
+    ("POST /application/APP_" + uuid + "/time_budget HTTP/1", "APP_" + uuid,
+     "handle_post_application_time_budget"),
     ("POST /disconnect HTTP/1", None, "handle_disconnect"),
     ("DELETE /node HTTP/1", None, "handle_quit"),
     ("DELETE /node/migrate HTTP/1", "migrate", "handle_quit"),
@@ -71,6 +71,46 @@ class TestLocalEndpoint(unittest.TestCase):
         assert self.local_out.get_peer() == ('local', self.port.id)
 
 
+class TestDirectLocalEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.port = InPort("port", Mock())
+        self.peer_port = OutPort("peer_port", Mock())
+        self.trigger_loop = Mock()
+        self.local_in = LocalInEndpoint(self.port, self.peer_port)
+        self.local_out = LocalOutEndpoint(self.peer_port, self.port, self.trigger_loop)
+        self.port.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "in"}, {}))
+        self.peer_port.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "out"}, {}))
+        self.peer_port.attach_endpoint(self.local_out)
+        self.port.attach_endpoint(self.local_in)
+
+    def test_write_transfers(self):
+        self.peer_port.write_token(Token(0))
+        assert self.port.tokens_available(1, self.port.id)
+        self.trigger_loop.assert_called_with(actor_ids=[self.port.owner.id, self.peer_port.owner.id])
+        self.peer_port.write_tokens([Token(1), Token(2), Token(3)])
+        assert self.port.tokens_available(4, self.port.id)
+        # Peer queue full, token stays in outport queue until communicated
+        self.trigger_loop.reset_mock()
+        self.peer_port.write_token(Token(4))
+        assert not self.trigger_loop.called
+        assert [self.port.queue.peek(self.port.id).value for _ in range(4)] == [0, 1, 2, 3]
+        self.port.queue.commit(self.port.id)
+        assert self.local_out.communicate()
+        assert self.port.queue.peek(self.port.id).value == 4
+
+    def test_commit_transfers(self):
+        self.peer_port.write_tokens([Token(i) for i in range(4)])
+        self.peer_port.write_token(Token(4))
+        assert self.peer_port.queue.tokens_available(1, self.port.id)
+        self.trigger_loop.reset_mock()
+        self.port.read()
+        # Freed slot filled directly from the outport queue
+        self.trigger_loop.assert_called_with(actor_ids=[self.port.owner.id, self.peer_port.owner.id])
+        assert self.port.tokens_available(4, self.port.id)
+        assert not self.peer_port.queue.tokens_available(1, self.port.id)
+
+
 class TestTunnelEndpoint(unittest.TestCase):
 
     def setUp(self):
@@ -104,7 +144,7 @@ class TestTunnelEndpoint(unittest.TestCase):
         self.tunnel_in.recv_token(payload)
         assert self.trigger_loop.called
         assert self.port.queue.fifo[0].value == 5
-        self.tunnel.send.assert_called_with(expected_reply)
+        self.tunnel.send.assert_called_with(expected_reply, flush=True)
 
         self.trigger_loop.reset_mock()
         self.tunnel.send.reset_mock()
@@ -114,7 +154,7 @@ class TestTunnelEndpoint(unittest.TestCase):
         assert not self.trigger_loop.called
         expected_reply['sequencenbr'] = 100
         expected_reply['value'] = 'NACK'
-        self.tunnel.send.assert_called_with(expected_reply)
+        self.tunnel.send.assert_called_with(expected_reply, flush=True)
 
         self.trigger_loop.reset_mock()
         self.tunnel.send.reset_mock()
@@ -124,7 +164,7 @@ class TestTunnelEndpoint(unittest.TestCase):
         assert not self.trigger_loop.called
         expected_reply['sequencenbr'] = 0
         expected_reply['value'] = 'ACK'
-        self.tunnel.send.assert_called_with(expected_reply)
+        self.tunnel.send.assert_called_with(expected_reply, flush=True)
 
     def test_get_peer(self):
         assert self.tunnel_in.get_peer() == (self.peer_node_id, self.peer_port.id)
@@ -191,3 +231,94 @@ class TestTunnelEndpoint(unittest.TestCase):
         self.tunnel_out.reply(1, 'ACK')
         assert self.tunnel_out.communicate() is True
         assert self.tunnel.send.call_count == 2
+
+
+class TestTunnelEndpointProtocol2(unittest.TestCase):
+
+    def setUp(self):
+        self.port = InPort("port", Mock(), {'queue_length': 4})
+        self.peer_port = OutPort("peer_port", Mock())
+        self.tunnel = Mock()
+        self.trigger_loop = Mock()
+        self.tunnel_in = TunnelInEndpoint(self.port, self.tunnel, 456, self.peer_port.id, {}, self.trigger_loop, 2)
+        self.tunnel_out = TunnelOutEndpoint(self.peer_port, self.tunnel, 123, self.port.id, {'queue_length': 4},
+                                            self.trigger_loop, 2)
+        self.port.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "in"}, {}))
+        self.port.attach_endpoint(self.tunnel_in)
+        self.peer_port.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 8, 'direction': "out"}, {}))
+        self.peer_port.attach_endpoint(self.tunnel_out)
+
+    def _write(self, values):
+        for value in values:
+            self.peer_port.queue.write(Token(value), None)
+
+    def test_batch_within_window(self):
+        self._write(range(6))
+        assert self.tunnel_out.communicate()
+        # Only the initial credit is sent, in one message
+        self.tunnel.send.assert_called_once()
+        payload = self.tunnel.send.call_args[0][0]
+        assert payload['cmd'] == 'TOKENS'
+        assert payload['sequencenbr'] == 0
+        assert [Token.decode(t).value for t in payload['tokens']] == [0, 1, 2, 3]
+        assert not self.tunnel_out.communicate()
+
+    def test_recv_tokens(self):
+        payload = {'port_id': self.peer_port.id, 'peer_port_id': self.port.id, 'sequencenbr': 0, 'epoch': 0,
+                   'tokens': [Token(v).encode() for v in range(3)]}
+        self.tunnel_in.recv_tokens(payload)
+        assert self.trigger_loop.called
+        self.tunnel.send.assert_called_with({
+            'cmd': 'TOKENS_REPLY', 'port_id': self.peer_port.id, 'peer_port_id': self.port.id,
+            'sequencenbr': 2, 'credit': 1, 'epoch': 0, 'value': 'ACK'}, flush=True)
+        # Second token in the batch does not fit
+        payload['sequencenbr'] = 3
+        self.tunnel_in.recv_tokens(payload)
+        reply = self.tunnel.send.call_args[0][0]
+        assert (reply['sequencenbr'], reply['credit'], reply['value']) == (3, 0, 'NACK')
+        assert self.port.queue.fifo[3].value == 0
+
+    def test_credit_update_on_read(self):
+        payload = {'port_id': self.peer_port.id, 'peer_port_id': self.port.id, 'sequencenbr': 0, 'epoch': 0,
+                   'tokens': [Token(v).encode() for v in range(4)]}
+        self.tunnel_in.recv_tokens(payload)
+        # No credit left is pressure on the next token
+        assert self.tunnel_in.pressure_count == 1
+        assert self.tunnel_in.pressure[0] == 4
+        self.tunnel.send.reset_mock()
+        self.port.queue.peek(self.port.id)
+        self.port.queue.commit(self.port.id)
+        self.tunnel_in.notify()
+        assert not self.tunnel.send.called
+        self.port.queue.peek(self.port.id)
+        self.port.queue.commit(self.port.id)
+        self.tunnel_in.notify()
+        reply = self.tunnel.send.call_args[0][0]
+        assert (reply['sequencenbr'], reply['credit'], reply['epoch']) == (3, 2, None)
+
+    def test_cumulative_ack(self):
+        self._write(range(6))
+        self.tunnel_out.communicate()
+        self.tunnel.send.reset_mock()
+        self.tunnel_out.reply_tokens({'sequencenbr': 2, 'credit': 3, 'epoch': 0, 'value': 'ACK'})
+        assert self.peer_port.queue.read_pos[self.port.id] == 3
+        assert self.tunnel_out.window_end == 5
+        assert self.trigger_loop.called
+        self.tunnel_out.communicate()
+        payload = self.tunnel.send.call_args[0][0]
+        assert payload['sequencenbr'] == 4
+        assert [Token.decode(t).value for t in payload['tokens']] == [4, 5]
+
+    def test_nack_resends(self):
+        self._write(range(4))
+        self.tunnel_out.communicate()
+        self.tunnel.send.reset_mock()
+        self.tunnel_out.reply_tokens({'sequencenbr': 1, 'credit': 2, 'epoch': 0, 'value': 'NACK'})
+        assert self.tunnel_out.epoch == 1
+        self.tunnel_out.communicate()
+        payload = self.tunnel.send.call_args[0][0]
+        assert (payload['sequencenbr'], payload['epoch']) == (2, 1)
+        assert [Token.decode(t).value for t in payload['tokens']] == [2, 3]
+        # A NACK sent before the resend is ignored
+        self.tunnel_out.reply_tokens({'sequencenbr': 1, 'credit': 2, 'epoch': 0, 'value': 'NACK'})
+        assert self.tunnel_out.next_seq == 4
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock
+
+from calvin.runtime.south.monitor import Event_Monitor
+from calvin.runtime.north.plugins.port.endpoint.common import Endpoint
+
+pytestmark = pytest.mark.unittest
+
+
+def create_endpoint(sent):
+    endpoint = Endpoint(Mock())
+    endpoint.communicate = Mock(return_value=sent)
+    return endpoint
+
+
+def test_only_dirty_endpoints_communicate():
+    monitor = Event_Monitor()
+    idle, active = create_endpoint(False), create_endpoint(True)
+    monitor.register_endpoint(idle)
+    monitor.register_endpoint(active)
+    # Newly registered endpoints are dirty
+    assert monitor.loop(None) == [active]
+    assert idle.communicate.call_count == 1
+    # Nothing notified
+    assert monitor.loop(None) == []
+    assert idle.communicate.call_count == 1
+    assert active.communicate.call_count == 1
+    active.notify()
+    assert monitor.loop(None) == [active]
+    assert idle.communicate.call_count == 1
+
+
+def test_unregistered_endpoint_is_not_serviced():
+    monitor = Event_Monitor()
+    endpoint = create_endpoint(True)
+    monitor.register_endpoint(endpoint)
+    monitor.unregister_endpoint(endpoint)
+    endpoint.notify()
+    assert monitor.loop(None) == []
+    assert not endpoint.communicate.called
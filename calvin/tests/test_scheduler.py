@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock, patch
+
+from calvin.runtime.north.scheduler import EventScheduler, LatencyHistogram
+
+pytestmark = pytest.mark.unittest
+
+
+def create_actor(actor_id, fire=False, scheduling_class='normal'):
+    actor = Mock()
+    actor.id = actor_id
+    actor.scheduling_class = scheduling_class
+    actor.enabled.return_value = True
+    actor.fire.return_value = fire
+    actor.get_pressure.return_value = {}
+    actor.time_budget = None
+    actor.set_time_budget.side_effect = lambda time_budget: setattr(actor, 'time_budget', time_budget)
+    return actor
+
+
+@pytest.fixture
+def sched():
+    actor_mgr = Mock()
+    actor_mgr.actors = {a.id: a for a in [create_actor("a1"), create_actor("a2", fire=True), create_actor("a3"),
+                                          create_actor("rt", scheduling_class='realtime'),
+                                          create_actor("bg", scheduling_class='background')]}
+    actor_mgr.enabled_actors.side_effect = lambda: actor_mgr.actors.values()
+    monitor = Mock()
+    monitor.loop.return_value = []
+    with patch('calvin.runtime.north.scheduler.async'):
+        yield EventScheduler(Mock(), actor_mgr, monitor)
+
+
+def test_only_triggered_actors_fire(sched):
+    sched.trigger_loop(actor_ids=["a1"])
+    sched.loop_once()
+    assert sched.actor_mgr.actors["a1"].fire.called
+    assert not sched.actor_mgr.actors["a2"].fire.called
+    assert not sched.actor_mgr.actors["a3"].fire.called
+    assert not any(sched._ready)
+
+
+def test_sweep_fires_all_and_requeues_fired(sched):
+    sched.loop_once(all_=True)
+    for actor in sched.actor_mgr.actors.values():
+        assert actor.fire.called
+    # Only the actor that fired is ready again
+    assert [ready.keys() for ready in sched._ready] == [[], ["a2"], []]
+
+
+def test_endpoint_activity_makes_actors_ready(sched):
+    endpoint = Mock()
+    endpoint.get_actor_ids.return_value = ["a3"]
+    sched.monitor.loop.return_value = [endpoint]
+    sched.loop_once()
+    assert sched.actor_mgr.actors["a3"].fire.called
+    assert not sched.actor_mgr.actors["a1"].fire.called
+
+
+def test_round_robin_order(sched):
+    sched.make_ready(["a3", "a1", "a3", None])
+    assert sched._ready[1].keys() == ["a3", "a1"]
+    sched.actor_mgr.actors["a1"].enabled.return_value = False
+    sched.fire_actors()
+    assert sched.actor_mgr.actors["a3"].fire.called
+    assert not sched.actor_mgr.actors["a1"].fire.called
+
+
+def test_usage_accounting(sched):
+    actor = sched.actor_mgr.actors["a2"]
+    actor.fire.side_effect = lambda time_budget, usage: usage.action_fired("action", 0.5, 0.25) or True
+    sched.set_time_budget(["a2"], 0.5)
+    sched.make_ready(["a2"])
+    sched.fire_actors()
+    args, _ = actor.fire.call_args
+    assert args[0] == 0.5
+    usage = sched.get_usage("a2")
+    assert usage['fire_count'] == 1
+    assert usage['time_budget'] == 0.5
+    assert usage['actions'] == {"action": {'fire_count': 1, 'wall': 0.5, 'cpu': 0.25}}
+    # Unfired but known actor has no usage, unknown actor is an error
+    assert sched.get_usage("a1")['fire_count'] == 0
+    with pytest.raises(KeyError):
+        sched.get_usage("unknown")
+    sched.set_time_budget(["a2"], None)
+    sched.remove_actor("a2")
+    assert sched.get_usage().keys() == []
+    assert sched.get_time_budget("a2") == sched._time_budget
+
+
+def test_time_budget_kept_by_actor(sched):
+    sched.set_time_budget(["a1"], 0.5)
+    assert sched.actor_mgr.actors["a1"].time_budget == 0.5
+    # Migrating the actor keeps the budget
+    sched.remove_actor("a1")
+    assert sched.get_time_budget("a1") == 0.5
+    sched.make_ready(["a1"])
+    sched.fire_actors()
+    assert sched.actor_mgr.actors["a1"].fire.call_args[0][0] == 0.5
+
+
+def test_overrun_is_counted(sched):
+    actor = sched.actor_mgr.actors["a1"]
+    sched.set_time_budget(["a1"], 0.0)
+    sched.make_ready(["a1"])
+    sched.fire_actors()
+    assert sched.actor_usage["a1"].overruns == 1
+    assert actor._warn_slow_actor.called
+
+
+def test_higher_class_fires_first(sched):
+    order = []
+    for actor in sched.actor_mgr.actors.values():
+        actor.fire.side_effect = (lambda actor_id: lambda *args: order.append(actor_id) or False)(actor.id)
+    sched.make_ready(["bg", "a1", "rt"])
+    sched.fire_actors()
+    assert order == ["rt", "a1", "bg"]
+    latency = sched.get_latency()
+    assert [latency[c]['count'] for c in ['realtime', 'normal', 'background']] == [1, 1, 1]
+
+
+def test_heartbeat_sweep_while_busy(sched):
+    # a2 always fires, hence the scheduler never gets idle
+    sched.trigger_loop(actor_ids=["a2"])
+    sched.loop_once()
+    sched.loop_once()
+    assert any(sched._ready)
+    assert sched._heartbeat_loop is not None
+    # The sweep fires every enabled actor, and is scheduled again
+    sched._heartbeat_sweep()
+    sched.loop_once()
+    assert sched.actor_mgr.actors["a1"].fire.called
+    assert sched._heartbeat_loop is not None
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    for latency in [0.0005, 0.001, 0.003, 2.0]:
+        histogram.add(latency)
+    result = histogram.as_dict()
+    assert result['counts'][:3] == [2, 0, 1]
+    assert result['counts'][-1] == 1
+    assert result['count'] == 4
+    assert result['max'] == 2.0
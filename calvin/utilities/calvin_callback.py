@@ -14,17 +14,28 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import logging
+import traceback
 
 from calvin.utilities import calvinuuid
 from calvin.utilities import calvinlogger
+from calvin.utilities import calvinconfig
 
 _log = calvinlogger.get_logger(__name__)
+_conf = calvinconfig.get()
+
+# Capturing the creation stack of every callback is expensive, only do it when asked for
+_debug = bool(_conf.get('global', 'callback_debug'))
+
+
+def capture_debug_info(enabled):
+    """ Turn on/off capturing of where callbacks are created, logged when a callback fails """
+    global _debug
+    _debug = bool(enabled)
+
 
 def get_debug_info(start=-2, limit=10):
-    if _log.getEffectiveLevel() == logging.INFO:
-        import traceback
-        return traceback.format_stack(limit=10)[:start]
+    if _debug:
+        return traceback.format_stack(limit=limit)[:start]
     return None
 
 def dump_debug_info(debug_info):
@@ -38,20 +49,32 @@ class CalvinCB(object):
         args: any positional arguments specific for this callback
         kwargs: any key-value arguments specific for this callback
 
+        The id is only created when first used, e.g. when registered in a CalvinCBClass.
+
         For example see example code at end of file.
     """
+    __slots__ = ('func', 'args', 'kwargs', '_cb_id', '_debug_info')
+
     def __init__(self, func, *args, **kwargs):
-        super(CalvinCB, self).__init__()
-        self._debug_info = get_debug_info()
-        self._id = calvinuuid.uuid("CB")
+        self._debug_info = get_debug_info() if _debug else None
+        self._cb_id = None
         self.func = func
         self.args = list(args)
         self.kwargs = kwargs
+
+    @property
+    def _id(self):
+        if self._cb_id is None:
+            self._cb_id = calvinuuid.uuid("CB")
+        return self._cb_id
+
+    @property
+    def name(self):
         # Ref a functions name if we wrap several CalvinCB and need to take __str__
         try:
-            self.name = self.func.__name__
+            return self.func.__name__
         except:
-            self.name = self.func.name if hasattr(self.func, 'name') else "unknown"
+            return self.func.name if hasattr(self.func, 'name') else "unknown"
 
     def args_append(self, *args):
         """ Append specific args to the call"""
@@ -91,17 +91,51 @@ class CalvinConfig(object):
                 'comment': 'User definable section',
                 'actor_paths': ['systemactors'],
                 'framework': 'twistedimpl',
-                'storage_type': 'dht', # supports dht, securedht, local, and proxy
+                'storage_type': 'dht', # supports dht, securedht, local, disk, and proxy
                 'storage_proxy': None,
+                'scheduler': 'default', # supports default and event
+                'actor_time_budget': 0.020,  # seconds an actor may repeatedly fire actions
+                'scheduler_time_budget': 0.100,  # seconds for a round of firing actors
+                'worker_processes': 0,  # size of calvinsys.process.pool, 0 means one per CPU core
+                'queue_implementation': 'default',  # supports default and compact
+                'local_connections': 'queued',  # supports queued and direct, i.e. move tokens when written
+                'token_protocol': 2,  # highest tunnel token protocol version, 1 sends one message per token
+                'compact_queue_typecode': None,  # e.g. 'd' keeps float token values in typed arrays
                 'capabilities_blacklist': [],
                 'remote_coder_negotiator': 'static',
                 'static_coder': 'json',
+                'binary_coder': False,  # offer and prefer the binary message coder when runtimes join
                 'metering_timeout': 10.0,
                 'metering_aggregated_timeout': 3600.0,  # Larger or equal to metering_timeout
                 'media_framework': 'defaultimpl',
                 'display_plugin': 'stdout_impl',
                 'stdout_plugin': 'defaultimpl',
                 'transports': ['calvinip'],
+                'transport_batching': False,  # collect messages sent in one reactor tick into one write
+                'transport_batch_size': 65536,  # bytes, a batch is sent at once when larger
+                'transport_batch_delay': 0,  # seconds to wait for more messages, 0 is the end of the tick
+                'transport_compression': [],  # compression codecs to use, in preference order, e.g. ['lz4', 'zlib']
+                'transport_compression_threshold': 256,  # bytes, smaller data is sent uncompressed
+                'callback_debug': False,  # record where each callback is created, logged if it fails
+                'route_announcements': True,  # tell peers which runtimes can be reached through this runtime
+                'join_concurrency': 16,  # joins to other runtimes in progress at once, others wait
+                'join_retries': 3,  # times a join that could not connect is retried
+                'join_backoff': 1.0,  # seconds before first retry, doubled for each retry with +-50% jitter
+                'join_backoff_max': 30.0,  # seconds, longest delay between retries
+                'join_timeout': 15.0,  # seconds until an unanswered join counts as failed to connect
+                'host_id': None,  # runtimes with the same host id connect with calvinunix, default is the machine id
+                'unix_socket_directory': None,  # where calvinunix sockets are created, default is the temp directory
+                'unix_shm_threshold': 0,  # bytes, larger data on calvinunix is put in shared memory, 0 is never
+                'unix_shm_size': 16777216,  # bytes, size of the shared memory ring of a calvinunix link
+                'unix_shm_directory': None,  # where shared memory files are created, e.g. /dev/shm
+                'storage_cache_size': 1000,  # values read from storage kept in the registry cache, 0 is no cache
+                'storage_cache_ttl': 10.0,  # seconds a value is kept in the registry cache
+                'storage_cache_prefixes': ['actor_type-', 'node-'],  # cached registry keys, None caches all keys
+                'storage_own_records': 1000,  # records written by this runtime kept for republishing to storage
+                'storage_index_format': 'levels',  # 'levels' stores index values at each level as older runtimes, 'tree' in one bucket per index
+                'storage_disk_directory': None,  # where storage_type disk keeps the registry, default is ~/.calvin/storage
+                'storage_disk_compact_interval': 600.0,  # seconds between checks if the disk storage log needs compaction
+                'storage_disk_sync_interval': 0,  # seconds changes to the disk storage log wait to be synced together, 0 is once per reactor loop
                 'control_proxy': None
             },
             'testing': {
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2016 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from calvin.utilities import calvin_callback
+from calvin.utilities.calvin_callback import CalvinCB, CalvinCBClass
+
+pytestmark = pytest.mark.unittest
+
+
+def add(a, b, c=0):
+    return a + b + c
+
+
+def test_call():
+    cb = CalvinCB(add, 1, c=3)
+    assert cb(2) == 6
+    assert cb(2, c=0) == 3
+    assert cb.name == "add"
+    assert CalvinCB(cb).name == "add"
+
+
+def test_lazy_id():
+    cb = CalvinCB(add)
+    assert cb._cb_id is None
+    assert cb._id == cb._id
+    assert cb._id != CalvinCB(add)._id
+    with pytest.raises(AttributeError):
+        cb.other = 1
+
+
+def test_registered_by_id():
+    cbs = CalvinCBClass(callback_valid_names=["test"])
+    cb = CalvinCB(add, 1)
+    cbs.callback_register("test", cb)
+    assert cbs._callback_execute("test", 2) == {cb._id: 3}
+    cbs.callback_unregister(cb._id)
+    assert cbs._callback_execute("test", 2) == {}
+
+
+def test_debug_info():
+    assert CalvinCB(add)._debug_info is None
+    calvin_callback.capture_debug_info(True)
+    try:
+        assert CalvinCB(add)._debug_info
+    finally:
+        calvin_callback.capture_debug_info(False)
@@ -32,6 +32,20 @@ def get_local_ip():
             for s in [socket.socket(socket.AF_INET, socket.SOCK_DGRAM)]][0][1]
 
 
+def get_host_id():
+    """ Identifies the host, runtimes with the same host id can use host local transports """
+    from calvin.utilities import calvinconfig
+    host_id = calvinconfig.get().get(None, 'host_id')
+    if host_id:
+        return host_id
+    try:
+        with open("/etc/machine-id") as f:
+            return f.read().strip()
+    except IOError:
+        import socket
+        return socket.gethostname()
+
+
 def enum(*sequential, **named):
     enums = dict(zip(sequential, range(len(sequential))), **named)
     reverse = dict((value, key) for key, value in enums.iteritems())